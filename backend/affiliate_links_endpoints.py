@@ -9,23 +9,33 @@ Endpoints:
 - POST /api/affiliate/link/{id}/publish - Publier sur réseaux sociaux
 - GET /api/affiliate/publications - Historique publications
 - DELETE /api/affiliate/link/{id} - Désactiver lien
+- GET /api/affiliate/qr/{short_code}.png - QR code du lien (rendu local)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 import hashlib
-import secrets
 import structlog
 
 from auth import get_current_user
 from supabase_client import supabase
 from services.social_auto_publish_service import auto_publisher
+from services.link_stats_service import LinkStatsResolver
+from services.short_code_service import short_code_allocator, is_reserved_code
+from services.qr_code_service import (
+    SHORT_CODE_PATTERN,
+    qr_code_url,
+    render_qr_png,
+    short_link_url,
+)
 
 router = APIRouter(prefix="/api/affiliate", tags=["Affiliate Links"])
 logger = structlog.get_logger()
 
+link_stats_resolver = LinkStatsResolver(supabase)
+
 
 # ============================================
 # PYDANTIC MODELS
@@ -70,6 +80,7 @@ class PublishToSocialRequest(BaseModel):
 
 @router.get("/my-links", response_model=dict)
 async def get_my_affiliate_links(
+    request: Request,
     page: int = 1,
     limit: int = 20,
     current_user: dict = Depends(get_current_user)
@@ -95,35 +106,17 @@ async def get_my_affiliate_links(
 
         links = result.data or []
 
-        # Enrichir avec stats
-        for link in links:
-            link_id = link['id']
-
-            # Stats tracking
-            stats_result = supabase.table('tracking_events').select('*', count='exact').eq('link_id', link_id).execute()
-
-            clicks_count = stats_result.count or 0
-
-            # Conversions
-            conv_result = supabase.table('conversions').select('*', count='exact').eq('link_id', link_id).execute()
-            conversions_count = conv_result.count or 0
+        # Enrichir avec stats (une seule requête groupée pour toute la page)
+        stats_by_link = link_stats_resolver.get_stats(link['id'] for link in links)
 
-            # Commissions
-            comm_result = supabase.table('commissions').select('amount').eq('link_id', link_id).eq('status', 'approved').execute()
-            total_commissions = sum(c.get('amount', 0) for c in (comm_result.data or []))
-
-            link['stats'] = {
-                'clicks': clicks_count,
-                'conversions': conversions_count,
-                'total_commissions': float(total_commissions) if total_commissions else 0.0,
-                'conversion_rate': round((conversions_count / clicks_count * 100), 2) if clicks_count > 0 else 0.0
-            }
+        for link in links:
+            link['stats'] = stats_by_link[link['id']]
 
             # Générer lien complet
-            link['full_url'] = f"https://shareyoursales.ma/r/{link['short_code']}"
+            link['full_url'] = short_link_url(link['short_code'])
 
-            # QR code URL
-            link['qr_code_url'] = f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data={link['full_url']}"
+            # QR code (rendu localement et mis en cache)
+            link['qr_code_url'] = qr_code_url(link['short_code'], request.base_url)
 
         return {
             "success": True,
@@ -144,6 +137,7 @@ async def get_my_affiliate_links(
 @router.post("/generate-link", response_model=dict, status_code=201)
 async def generate_affiliate_link(
     request_data: GenerateLinkRequest,
+    request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -185,13 +179,19 @@ async def generate_affiliate_link(
                 "message": "Lien existant retourné",
                 "link": {
                     **link,
-                    "full_url": f"https://shareyoursales.ma/r/{link['short_code']}",
-                    "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{link['short_code']}"
+                    "full_url": short_link_url(link['short_code']),
+                    "qr_code_url": qr_code_url(link['short_code'], request.base_url)
                 }
             }
 
         # Générer short code unique
         if request_data.custom_slug:
+            if is_reserved_code(request_data.custom_slug):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Ce format de slug est réservé aux codes générés"
+                )
+
             # Vérifier disponibilité
             check_slug = supabase.table('affiliate_links').select('id').eq('short_code', request_data.custom_slug).execute()
             if check_slug.data:
@@ -201,12 +201,8 @@ async def generate_affiliate_link(
                 )
             short_code = request_data.custom_slug
         else:
-            # Générer code aléatoire (8 caractères)
-            while True:
-                short_code = secrets.token_urlsafe(6)[:8]
-                check = supabase.table('affiliate_links').select('id').eq('short_code', short_code).execute()
-                if not check.data:
-                    break
+            # Code unique garanti par la séquence (aucune vérification d'existence)
+            short_code = short_code_allocator.allocate()
 
         # Créer lien
         affiliate_link = {
@@ -233,8 +229,8 @@ async def generate_affiliate_link(
             "message": "Lien d'affiliation créé avec succès",
             "link": {
                 **link,
-                "full_url": f"https://shareyoursales.ma/r/{short_code}",
-                "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{short_code}",
+                "full_url": short_link_url(short_code),
+                "qr_code_url": qr_code_url(short_code, request.base_url),
                 "stats": {
                     "clicks": 0,
                     "conversions": 0,
@@ -323,6 +319,27 @@ async def get_link_stats(
         )
 
 
+@router.get("/qr/{short_code}.png")
+async def get_link_qr_code(short_code: str):
+    """
+    QR code PNG d'un lien court
+
+    Public (le QR encode une URL publique). Le rendu ne dépend que du
+    short code: réponse immuable, cachable par le navigateur et le CDN.
+    """
+    if not SHORT_CODE_PATTERN.match(short_code):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Short code invalide"
+        )
+
+    return Response(
+        content=render_qr_png(short_link_url(short_code)),
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
+
+
 @router.post("/link/{link_id}/publish", response_model=dict)
 async def publish_link_to_social(
     link_id: str,
@@ -362,7 +379,7 @@ async def publish_link_to_social(
         link = link_result.data[0]
         product = link['products']
         short_code = link['short_code']
-        affiliate_url = f"https://shareyoursales.ma/r/{short_code}"
+        affiliate_url = short_link_url(short_code)
 
         # Médias (images produit par défaut)
         if not publish_data.media_urls:
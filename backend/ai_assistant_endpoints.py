@@ -3,7 +3,7 @@
 ShareYourSales - Version Premium 2025
 
 Routes pour toutes les fonctionnalités IA:
-1. POST /ai/chat - Chatbot multilingue
+1. POST /ai/chat - Chatbot multilingue (POST /ai/chat/stream: réponse en streaming SSE)
 2. POST /ai/product-description - Génération descriptions produits
 3. POST /ai/product-suggestions - Suggestions personnalisées
 4. POST /ai/seo-optimize - Optimisation SEO
@@ -25,6 +25,7 @@ from backend.services.ai_assistant_multilingual_service import (
     SEODifficulty,
     ai_assistant_service
 )
+from backend.utils.sse import sse_response
 
 router = APIRouter(prefix="/ai", tags=["AI Assistant"])
 
@@ -141,6 +142,24 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Erreur chatbot: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    🤖 Chatbot IA Multilingue - réponse en streaming (text/event-stream)
+
+    Événements:
+    - token: {"text"} fragment de la réponse, dès qu'il est généré
+    - done: {"language", "model", "suggested_actions"} une fois la réponse complète
+    - error: {"error", "fallback_response"}
+    """
+    return sse_response(ai_assistant_service.chat_stream(
+        message=request.message,
+        language=request.language,
+        context=request.context,
+        user_id=request.user_id
+    ))
+
+
 @router.post("/product-description")
 async def generate_product_description(request: ProductDescriptionRequest):
     """
@@ -3,6 +3,7 @@ API Endpoints pour le Bot IA Conversationnel
 
 Endpoints:
 - POST /api/bot/chat - Envoyer un message au bot
+- POST /api/bot/chat/stream - Idem, réponse en streaming (Server-Sent Events)
 - GET /api/bot/conversations - Historique des conversations
 - DELETE /api/bot/conversations/{id} - Supprimer une conversation
 - POST /api/bot/feedback - Feedback sur une réponse
@@ -24,6 +25,7 @@ from services.ai_bot_service import (
     create_conversation_context
 )
 from auth import get_current_user
+from utils.sse import sse_response
 
 router = APIRouter(prefix="/api/bot", tags=["AI Bot"])
 logger = structlog.get_logger()
@@ -100,21 +102,8 @@ async def chat_with_bot(
     """
     try:
         user_id = current_user["id"]
-        user_role = current_user.get("role", "influencer")
-
-        # Récupérer ou créer contexte
-        session_id = request.session_id or f"{user_id}_{datetime.utcnow().timestamp()}"
-
-        if session_id in conversations_store:
-            context = conversations_store[session_id]
-        else:
-            context = create_conversation_context(
-                user_id=user_id,
-                user_role=user_role,
-                language=request.language
-            )
-            context.session_id = session_id
-            conversations_store[session_id] = context
+        context = _get_or_create_context(request, current_user)
+        session_id = context.session_id
 
         # Créer le service bot
         bot = AIBotService()
@@ -149,6 +138,44 @@ async def chat_with_bot(
         )
 
 
+@router.post("/chat/stream")
+async def chat_with_bot_stream(
+    request: ChatRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Converser avec le bot IA, réponse en streaming (text/event-stream)
+
+    Événements:
+    - token: {"text"} fragment de la réponse, dès qu'il est généré
+    - done: {"session_id", "intent_detected", "action_executed", "suggestions", "timestamp"}
+    - error: {"message"} si la génération est interrompue (message non enregistré)
+    """
+    context = _get_or_create_context(request, current_user)
+    bot = AIBotService()
+
+    async def events():
+        async for event, data in bot.chat_stream(request.message, context):
+            if event == "done":
+                data = {
+                    "session_id": context.session_id,
+                    "intent_detected": data["intent"],
+                    "action_executed": data["action"],
+                    "suggestions": _generate_suggestions(context, current_user),
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            yield event, data
+
+        logger.info(
+            "bot_chat_stream",
+            user_id=current_user["id"],
+            session_id=context.session_id,
+            message_length=len(request.message)
+        )
+
+    return sse_response(events())
+
+
 @router.get("/conversations", response_model=List[ConversationHistoryResponse])
 async def get_conversations(
     limit: int = 10,
@@ -357,6 +384,26 @@ async def get_suggestions(
 # FONCTIONS UTILITAIRES
 # ============================================
 
+def _get_or_create_context(request: ChatRequest, current_user: dict) -> ConversationContext:
+    """
+    Récupère la conversation de la session, ou en crée une nouvelle
+    """
+    user_id = current_user["id"]
+    session_id = request.session_id or f"{user_id}_{datetime.utcnow().timestamp()}"
+
+    if session_id in conversations_store:
+        return conversations_store[session_id]
+
+    context = create_conversation_context(
+        user_id=user_id,
+        user_role=current_user.get("role", "influencer"),
+        language=request.language
+    )
+    context.session_id = session_id
+    conversations_store[session_id] = context
+    return context
+
+
 def _generate_suggestions(
     context: Optional[ConversationContext],
     current_user: dict
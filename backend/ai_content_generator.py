@@ -7,9 +7,10 @@ from typing import Optional, List, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
 import os
-import httpx
 from enum import Enum
 
+from services.llm_gateway import llm_gateway
+
 # ============================================
 # MODELS
 # ============================================
@@ -324,33 +325,14 @@ Langue: {request.language}
     async def _call_claude_api(self, prompt: str) -> str:
         """Appelle l'API Claude (Anthropic)"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers={
-                        "x-api-key": self.anthropic_api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": "claude-3-5-sonnet-20241022",
-                        "max_tokens": 2000,
-                        "messages": [
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ]
-                    },
-                    timeout=30.0
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["content"][0]["text"]
-                else:
-                    print(f"Claude API Error: {response.status_code}")
-                    return self._generate_template_content(prompt)
+            response = await llm_gateway.complete(
+                "anthropic",
+                [{"role": "user", "content": prompt}],
+                model="claude-3-5-sonnet-20241022",
+                max_tokens=2000,
+                api_key=self.anthropic_api_key
+            )
+            return response.text
 
         except Exception as e:
             print(f"Error calling Claude API: {e}")
@@ -359,37 +341,16 @@ Langue: {request.language}
     async def _call_openai_api(self, prompt: str) -> str:
         """Appelle l'API OpenAI GPT-4"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.openai_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "gpt-4-turbo-preview",
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Tu es un expert en marketing digital et création de contenu viral pour les réseaux sociaux, spécialisé dans le marché marocain."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "max_tokens": 2000,
-                        "temperature": 0.8
-                    },
-                    timeout=30.0
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    print(f"OpenAI API Error: {response.status_code}")
-                    return self._generate_template_content(prompt)
+            response = await llm_gateway.complete(
+                "openai",
+                [{"role": "user", "content": prompt}],
+                model="gpt-4-turbo-preview",
+                system="Tu es un expert en marketing digital et création de contenu viral pour les réseaux sociaux, spécialisé dans le marché marocain.",
+                max_tokens=2000,
+                temperature=0.8,
+                api_key=self.openai_api_key
+            )
+            return response.text
 
         except Exception as e:
             print(f"Error calling OpenAI API: {e}")
@@ -5,6 +5,8 @@ Gère la validation des ventes et les paiements automatiques
 
 from datetime import datetime, timedelta
 from supabase_client import supabase
+from services.leaderboard_service import leaderboard_service
+from services.user_context_service import user_context_service
 from typing import List, Dict, Optional
 import os
 from dotenv import load_dotenv
@@ -134,6 +136,12 @@ class AutoPaymentService:
                     validated_count += 1
                     total_commission += float(sale["influencer_commission"])
 
+                    # 5. Classements mensuels (gains, ventes, conversion)
+                    leaderboard_service.record_sale(
+                        sale["influencer_id"], float(sale["influencer_commission"])
+                    )
+                    user_context_service.invalidate_owner(sale["influencer_id"])
+
                     print(
                         f"✅ Vente validée: {sale['id']} - Commission: {sale['influencer_commission']}€"
                     )
@@ -261,6 +269,7 @@ class AutoPaymentService:
                         supabase.table("influencers").update(
                             {"balance": 0.0, "updated_at": datetime.now().isoformat()}
                         ).eq("id", influencer["id"]).execute()
+                        user_context_service.invalidate(influencer["user_id"])
 
                         processed_count += 1
                         total_paid += payout_amount
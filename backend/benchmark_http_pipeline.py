@@ -0,0 +1,105 @@
+"""
+Benchmark du pipeline HTTP
+
+Compare le coût par requête (hors handler) de:
+- before: métriques + trace Supabase en `@app.middleware("http")` (pile précédente des serveurs)
+- full:    pile complète de middleware/ en `@app.middleware("http")` (BaseHTTPMiddleware)
+- after:   HTTPPipelineMiddleware, CSRF inclus (un seul passage ASGI)
+
+sur la redirection /r/{short_code} et un endpoint JSON.
+
+Usage: python benchmark_http_pipeline.py [nombre de requêtes]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import httpx
+import structlog
+
+# middleware.auth quitte le process sans secret JWT
+os.environ.setdefault("JWT_SECRET", "benchmark-secret-with-at-least-32-characters")
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import RedirectResponse
+
+from middleware.security import (
+    csrf_middleware,
+    ip_filtering_middleware,
+    request_validation_middleware,
+    security_headers_middleware,
+)
+from services.http_pipeline import HTTPPipelineMiddleware
+from services.metrics_service import metrics_middleware
+from services.query_trace_service import query_trace_middleware
+
+try:
+    from middleware.monitoring import request_logging_middleware
+except Exception:  # sentry_sdk sans SQLAlchemy
+    request_logging_middleware = None
+
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL))
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/r/{short_code}")
+    async def redirect(short_code: str):
+        return RedirectResponse(f"https://shop.example.com/{short_code}", status_code=302)
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    if stack == "before":
+        app.middleware("http")(metrics_middleware)
+        app.middleware("http")(query_trace_middleware)
+    elif stack == "full":
+        for middleware in (
+            metrics_middleware,
+            query_trace_middleware,
+            request_logging_middleware,
+            security_headers_middleware,
+            request_validation_middleware,
+            csrf_middleware,
+            ip_filtering_middleware,
+        ):
+            if middleware is not None:
+                app.middleware("http")(middleware)
+    elif stack == "after":
+        app.add_middleware(HTTPPipelineMiddleware, csrf=True)
+
+    if stack != "bare":
+        app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int) -> float:
+    """Durée moyenne par requête (µs)"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests // 10):
+            await client.get(path)
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path)
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(requests: int):
+    apps = {stack: build_app(stack) for stack in ("bare", "before", "full", "after")}
+    for path in ("/r/abc123", "/api/ping"):
+        timings = {stack: await run(app, path, requests) for stack, app in apps.items()}
+        bare = timings["bare"]
+        print(f"{path} ({requests} requêtes)")
+        for stack in ("before", "full", "after"):
+            print(f"  {stack:<7} {timings[stack]:8.1f} µs/req   surcoût middlewares: {timings[stack] - bare:7.1f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
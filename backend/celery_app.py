@@ -6,6 +6,8 @@ Tâches principales:
 - Rafraîchissement des tokens expirants
 - Notifications par email/SMS
 - Génération de rapports
+- Recommandations produits (filtrage collaboratif)
+- Prévisions de ventes (dashboard prédictif)
 
 Installation requise:
 pip install celery redis
@@ -24,6 +26,8 @@ from celery import Celery
 from celery.schedules import crontab
 import os
 
+from services.metrics_service import connect_celery_metrics
+
 # Configuration Redis (broker et backend)
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
@@ -36,6 +40,10 @@ app = Celery(
         'celery_tasks.social_media_tasks',
         'celery_tasks.notification_tasks',
         'celery_tasks.report_tasks',
+        'celery_tasks.recommendation_tasks',
+        'celery_tasks.forecast_tasks',
+        'celery_tasks.leaderboard_tasks',
+        'celery_tasks.invoicing_tasks',
     ]
 )
 
@@ -70,6 +78,9 @@ app.conf.update(
     worker_task_log_format='[%(asctime)s: %(levelname)s/%(processName)s] [%(task_name)s(%(task_id)s)] %(message)s',
 )
 
+# Durée des tâches -> celery_task_duration_seconds (PROMETHEUS_MULTIPROC_DIR pour le prefork)
+connect_celery_metrics()
+
 # Configuration des tâches périodiques (Celery Beat)
 app.conf.beat_schedule = {
     # Synchroniser tous les comptes sociaux chaque jour à 8h00
@@ -119,6 +130,34 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=9, minute=0),
         'kwargs': {'days_before': 3},
     },
+
+    # Cumuler les co-clics / co-achats et recalculer les voisins touchés (toutes les 15 minutes)
+    'refresh-product-recommendations': {
+        'task': 'celery_tasks.recommendation_tasks.refresh_product_recommendations',
+        'schedule': crontab(minute='*/15'),
+        'options': {
+            'expires': 900,
+        }
+    },
+
+    # Recalculer le top-K de tous les produits (chaque jour à 4h30)
+    'rebuild-product-recommendations': {
+        'task': 'celery_tasks.recommendation_tasks.refresh_product_recommendations',
+        'schedule': crontab(hour=4, minute=30),
+        'kwargs': {'full': True},
+    },
+
+    # Réajuster les prévisions de ventes de tous les influenceurs et marchands (chaque jour à 3h30)
+    'fit-sales-forecasts': {
+        'task': 'celery_tasks.forecast_tasks.fit_sales_forecasts',
+        'schedule': crontab(hour=3, minute=30),
+    },
+
+    # Reconstruire les classements mensuels depuis la base (chaque jour à 2h15)
+    'rebuild-leaderboards': {
+        'task': 'celery_tasks.leaderboard_tasks.rebuild_leaderboards',
+        'schedule': crontab(hour=2, minute=15),
+    },
 }
 
 # Configuration des routes (pour diriger certaines tâches vers des workers spécifiques)
@@ -126,6 +165,10 @@ app.conf.task_routes = {
     'celery_tasks.social_media_tasks.*': {'queue': 'social_media'},
     'celery_tasks.notification_tasks.*': {'queue': 'notifications'},
     'celery_tasks.report_tasks.*': {'queue': 'reports'},
+    'celery_tasks.recommendation_tasks.*': {'queue': 'reports'},
+    'celery_tasks.forecast_tasks.*': {'queue': 'reports'},
+    'celery_tasks.leaderboard_tasks.*': {'queue': 'reports'},
+    'celery_tasks.invoicing_tasks.*': {'queue': 'reports'},
 }
 
 # Configuration des limites de taux (rate limiting)
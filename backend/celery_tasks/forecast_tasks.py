@@ -0,0 +1,38 @@
+"""
+Tâches Celery pour les prévisions de ventes
+
+- Ajustement nocturne des modèles de tous les influenceurs et marchands
+"""
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+# ============================================
+# TÂCHES DE PRÉVISION
+# ============================================
+
+@shared_task(
+    name='celery_tasks.forecast_tasks.fit_sales_forecasts',
+    bind=True,
+    max_retries=3
+)
+def fit_sales_forecasts(self):
+    """
+    Réajuster tendance et saisonnalité de toutes les entités actives
+
+    Le dashboard prédictif lit ensuite les paramètres de sales_forecasts et
+    les met à jour avec les données du jour (ForecastService.models).
+    """
+    try:
+        from services.forecast_service import forecast_service
+
+        logger.info("📈 Fitting sales forecasts")
+        result = forecast_service.fit_all()
+        logger.info(f"✅ Sales forecasts fitted: {result}")
+        return result
+
+    except Exception as exc:
+        logger.error(f"❌ Sales forecasts fit failed: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
@@ -0,0 +1,42 @@
+"""
+Tâches Celery pour la facturation plateforme
+
+- Génération des factures mensuelles (déclenchée depuis l'admin)
+"""
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+# ============================================
+# TÂCHES DE FACTURATION
+# ============================================
+
+@shared_task(
+    name='celery_tasks.invoicing_tasks.generate_monthly_invoices',
+    bind=True,
+    max_retries=3
+)
+def generate_monthly_invoices(self, year: int, month: int):
+    """
+    Générer les factures du mois hors du processus web
+
+    Le run reprend aux checkpoints des factures: une relance ne recrée ni ne
+    renvoie les factures déjà traitées.
+    """
+    try:
+        from invoicing_service import invoicing_service
+
+        logger.info(f"🧾 Generating invoices for {year}-{month:02d}")
+        result = invoicing_service.generate_monthly_invoices(year, month)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error") or "invoice generation failed")
+
+        result.pop("invoices", None)  # Résultat stocké dans le backend Celery: compteurs seulement
+        logger.info(f"✅ Invoices generated: {result}")
+        return result
+
+    except Exception as exc:
+        logger.error(f"❌ Invoice generation failed: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
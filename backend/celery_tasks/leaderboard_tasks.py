@@ -0,0 +1,46 @@
+"""
+Tâches Celery pour les classements mensuels
+
+- Reconstruction nocturne des classements du mois courant et du mois précédent
+"""
+
+from datetime import datetime, timedelta
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+# ============================================
+# TÂCHES DE CLASSEMENT
+# ============================================
+
+@shared_task(
+    name='celery_tasks.leaderboard_tasks.rebuild_leaderboards',
+    bind=True,
+    max_retries=3
+)
+def rebuild_leaderboards(self, month: str = None):
+    """
+    Reconstruire les classements Redis depuis la base
+
+    Sans mois: le mois courant et le précédent (ventes validées après la fin
+    du mois). Les mises à jour perdues pendant une panne Redis sont rattrapées.
+    """
+    try:
+        from services.leaderboard_service import leaderboard_service, month_key
+
+        if month:
+            months = [month]
+        else:
+            first_day = datetime.now().replace(day=1)
+            months = [month_key(first_day - timedelta(days=1)), month_key(first_day)]
+
+        logger.info(f"🏆 Rebuilding leaderboards: {months}")
+        results = [leaderboard_service.rebuild(m) for m in months]
+        logger.info(f"✅ Leaderboards rebuilt: {results}")
+        return results
+
+    except Exception as exc:
+        logger.error(f"❌ Leaderboard rebuild failed: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
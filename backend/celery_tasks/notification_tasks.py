@@ -12,12 +12,14 @@ from celery import shared_task
 from celery.utils.log import get_task_logger
 from datetime import datetime, timedelta
 from typing import List, Dict
+import html
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 
 from database import get_db_connection
+from services.email_delivery_service import SMTPConnectionPool, chunked, rate_limiters
 
 logger = get_task_logger(__name__)
 
@@ -28,6 +30,9 @@ SMTP_USER = os.getenv('SMTP_USER', '')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
 FROM_EMAIL = os.getenv('FROM_EMAIL', 'noreply@shareyoursales.ma')
 
+# Taille max d'un lot pour send_bulk_emails
+BULK_EMAIL_CHUNK_SIZE = 100
+
 # ============================================
 # TÂCHES DE NOTIFICATION
 # ============================================
@@ -332,10 +337,176 @@ def send_sync_failure_email(email: str, full_name: str, platform: str, error_mes
         raise
 
 
+@shared_task(
+    name='celery_tasks.notification_tasks.deliver_notifications',
+    bind=True,
+    max_retries=3
+)
+def deliver_notifications(self, notifications: List[Dict], channels: List[str]):
+    """
+    Livrer des notifications in-app déjà enregistrées sur d'autres canaux
+
+    Planifiée par NotificationOutbox.publish: les coordonnées de tous les
+    destinataires sont chargées en une requête, puis les emails partent par
+    lots et les messages WhatsApp en parallèle.
+
+    Chaque canal est livré indépendamment: en cas d'échec, seuls les couples
+    (notification, canal) non livrés sont re-planifiés. Une notification peut
+    donc porter sa propre liste 'channels', qui remplace `channels`.
+
+    Args:
+        notifications: Liste de dicts {user_id, title, message, action_url}
+        channels: Canaux ('email', 'sms', 'whatsapp')
+    """
+    try:
+        from supabase_client import supabase
+
+        user_ids = list({n['user_id'] for n in notifications})
+        users = supabase.table('users').select('id, email, phone').in_('id', user_ids).execute()
+        contacts = {u['id']: u for u in (users.data or [])}
+    except Exception as exc:
+        logger.error(f"❌ Notification delivery failed: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+
+    def for_channel(channel):
+        return [n for n in notifications if channel in n.get('channels', channels)]
+
+    result = {'email': 0, 'whatsapp': 0, 'sms': 0}
+    failed: Dict[int, List[str]] = {}  # id(notification) -> canaux à relivrer
+
+    email_notifications = for_channel('email')
+    if email_notifications:
+        try:
+            result['email'] = _queue_notification_emails(email_notifications, contacts)
+        except Exception as exc:
+            logger.error(f"❌ Email notifications not queued: {str(exc)}")
+            for n in email_notifications:
+                failed.setdefault(id(n), []).append('email')
+
+    whatsapp_notifications = for_channel('whatsapp')
+    if whatsapp_notifications:
+        delivered, undelivered = _send_notification_whatsapp(whatsapp_notifications, contacts)
+        result['whatsapp'] = delivered
+        for n in undelivered:
+            failed.setdefault(id(n), []).append('whatsapp')
+
+    sms_notifications = for_channel('sms')
+    if sms_notifications:
+        # Aucun fournisseur SMS intégré pour l'instant
+        logger.warning(f"SMS channel requested for {len(sms_notifications)} notifications but no provider is configured")
+
+    logger.info(f"✅ Notifications delivered: {result}")
+
+    if failed:
+        retry = [{**n, 'channels': failed[id(n)]} for n in notifications if id(n) in failed]
+        if self.request.retries < self.max_retries:
+            raise self.retry(
+                kwargs={'notifications': retry, 'channels': channels},
+                countdown=60 * (2 ** self.request.retries)
+            )
+        logger.error(f"❌ Giving up on {len(retry)} notifications after {self.max_retries} retries")
+
+    return result
+
+
+def _notification_email_html(notification: Dict) -> str:
+    """Corps HTML d'une notification (titre et message échappés)"""
+    title = html.escape(notification['title'] or '')
+    message = html.escape(notification['message'] or '')
+    link = ''
+    if notification.get('action_url'):
+        url = html.escape(f"https://shareyoursales.ma{notification['action_url']}", quote=True)
+        link = f'<p><a href="{url}">Voir</a></p>'
+    return f"<h2>{title}</h2><p>{message}</p>{link}"
+
+
+def _queue_notification_emails(notifications: List[Dict], contacts: Dict[str, Dict]) -> int:
+    """Confier les emails à la queue (send_bulk_emails gère ses propres retries)"""
+    messages = []
+    for n in notifications:
+        email = contacts.get(n['user_id'], {}).get('email')
+        if not email:
+            continue
+        messages.append({
+            'to_email': email,
+            'subject': n['title'],
+            'html_body': _notification_email_html(n)
+        })
+    queue_bulk_emails(messages)
+    return len(messages)
+
+
+def _send_notification_whatsapp(notifications: List[Dict], contacts: Dict[str, Dict]):
+    """
+    Envoyer les messages WhatsApp en parallèle
+
+    Returns:
+        (nombre de messages envoyés, notifications non livrées)
+    """
+    import asyncio
+    from services.whatsapp_business_service import WhatsAppBusinessService
+
+    targets = [
+        (n, contacts[n['user_id']]['phone'])
+        for n in notifications
+        if contacts.get(n['user_id'], {}).get('phone')
+    ]
+    if not targets:
+        return 0, []
+
+    try:
+        whatsapp = WhatsAppBusinessService()
+    except Exception as exc:
+        logger.error(f"❌ WhatsApp unavailable: {str(exc)}")
+        return 0, [n for n, _ in targets]
+
+    async def _send_all():
+        semaphore = asyncio.Semaphore(10)
+
+        async def _send(phone, text):
+            async with semaphore:
+                return await whatsapp.send_text_message(to_phone=phone, message=text)
+
+        return await asyncio.gather(
+            *[_send(phone, f"{n['title']}\n{n['message']}") for n, phone in targets],
+            return_exceptions=True
+        )
+
+    sent = asyncio.run(_send_all())
+    undelivered = [
+        n for (n, _), r in zip(targets, sent)
+        if isinstance(r, Exception) or not r.get('success')
+    ]
+    return len(targets) - len(undelivered), undelivered
+
+
 # ============================================
 # FONCTION UTILITAIRE D'ENVOI D'EMAIL
 # ============================================
 
+def _create_smtp_connection() -> smtplib.SMTP:
+    """Ouvrir une connexion SMTP authentifiée (utilisée par le pool)"""
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    server.starttls()
+    if SMTP_USER and SMTP_PASSWORD:
+        server.login(SMTP_USER, SMTP_PASSWORD)
+    return server
+
+
+# Pool par process worker: les connexions survivent d'une tâche à l'autre
+smtp_pool = SMTPConnectionPool(factory=_create_smtp_connection)
+
+
+def _build_message(to_email: str, subject: str, html_body: str) -> MIMEMultipart:
+    """Construire le message MIME"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = FROM_EMAIL
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+
 def send_email(to_email: str, subject: str, html_body: str):
     """
     Fonction utilitaire pour envoyer un email via SMTP
@@ -346,22 +517,8 @@ def send_email(to_email: str, subject: str, html_body: str):
         html_body: Corps HTML de l'email
     """
     try:
-        # Créer le message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = subject
-
-        # Ajouter le corps HTML
-        html_part = MIMEText(html_body, 'html')
-        msg.attach(html_part)
-
-        # Connexion SMTP
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            if SMTP_USER and SMTP_PASSWORD:
-                server.login(SMTP_USER, SMTP_PASSWORD)
-            server.send_message(msg)
+        rate_limiters['smtp'].acquire()
+        smtp_pool.send_message(_build_message(to_email, subject, html_body))
 
         logger.info(f"✅ Email sent successfully to {to_email}")
 
@@ -379,3 +536,58 @@ def send_email_task(to_email: str, subject: str, html_body: str):
     Tâche Celery pour envoyer un email
     """
     return send_email(to_email=to_email, subject=subject, html_body=html_body)
+
+
+@shared_task(
+    name='celery_tasks.notification_tasks.send_bulk_emails',
+    bind=True,
+    max_retries=5
+)
+def send_bulk_emails(self, messages: List[Dict]):
+    """
+    Envoyer un lot d'emails en réutilisant les connexions SMTP du pool
+
+    Seuls les emails en échec sont re-planifiés, avec backoff exponentiel
+    (1 min, 2 min, 4 min...) sur la queue notifications.
+
+    Args:
+        messages: Liste de dicts {to_email, subject, html_body}
+    """
+    failed = []
+
+    for message in messages:
+        try:
+            rate_limiters['smtp'].acquire()
+            smtp_pool.send_message(
+                _build_message(message['to_email'], message['subject'], message['html_body'])
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to send email to {message['to_email']}: {str(e)}")
+            failed.append(message)
+
+    sent = len(messages) - len(failed)
+    logger.info(f"✅ Bulk emails: {sent}/{len(messages)} sent")
+
+    if failed:
+        if self.request.retries < self.max_retries:
+            raise self.retry(
+                kwargs={'messages': failed},
+                countdown=60 * (2 ** self.request.retries)
+            )
+        logger.error(f"❌ Giving up on {len(failed)} emails after {self.max_retries} retries")
+
+    return {'sent': sent, 'failed': len(failed)}
+
+
+def queue_bulk_emails(messages: List[Dict]) -> int:
+    """
+    Découper une liste d'emails en lots et les envoyer à la queue notifications
+
+    Returns:
+        Nombre de tâches créées
+    """
+    tasks = 0
+    for batch in chunked(messages, BULK_EMAIL_CHUNK_SIZE):
+        send_bulk_emails.delay(messages=batch)
+        tasks += 1
+    return tasks
@@ -0,0 +1,42 @@
+"""
+Tâches Celery pour les recommandations produits
+
+- Mise à jour incrémentale du modèle item-item (co-clics / co-achats)
+- Recalcul complet nocturne du top-K de tous les produits
+"""
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+logger = get_task_logger(__name__)
+
+# ============================================
+# TÂCHES DE RECOMMANDATION
+# ============================================
+
+@shared_task(
+    name='celery_tasks.recommendation_tasks.refresh_product_recommendations',
+    bind=True,
+    max_retries=3
+)
+def refresh_product_recommendations(self, full: bool = False):
+    """
+    Cumuler les nouvelles interactions et recalculer les voisins des produits touchés
+
+    Les workers API rechargent ensuite les lignes modifiées de
+    product_neighbors (ProductRecommendationService.ensure_fresh).
+
+    Args:
+        full: Recalculer le top-K de tous les produits
+    """
+    try:
+        from services.product_recommendation_service import product_recommendations
+
+        logger.info(f"🧮 Refreshing product recommendations (full={full})")
+        result = product_recommendations.refresh(full=full)
+        logger.info(f"✅ Product recommendations refreshed: {result}")
+        return result
+
+    except Exception as exc:
+        logger.error(f"❌ Product recommendations refresh failed: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
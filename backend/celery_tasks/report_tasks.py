@@ -10,11 +10,11 @@ Rapports générés:
 from celery import shared_task
 from celery.utils.log import get_task_logger
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import json
 
 from database import get_db_connection
-from celery_tasks.notification_tasks import send_email_task
+from celery_tasks.notification_tasks import send_email_task, queue_bulk_emails
 
 logger = get_task_logger(__name__)
 
@@ -54,7 +54,7 @@ def send_weekly_social_reports(self):
 
         logger.info(f"Found {len(influencers)} influencers to send reports to")
 
-        reports_sent = 0
+        messages = []
 
         for user_id, email, full_name in influencers:
             try:
@@ -62,13 +62,12 @@ def send_weekly_social_reports(self):
                 report_data = generate_weekly_report(user_id, cursor)
 
                 if report_data:
-                    # Envoyer l'email
-                    send_weekly_report_email.delay(
-                        email=email,
-                        full_name=full_name,
-                        report_data=report_data
-                    )
-                    reports_sent += 1
+                    subject, html_body = render_weekly_report_email(full_name, report_data)
+                    messages.append({
+                        'to_email': email,
+                        'subject': subject,
+                        'html_body': html_body
+                    })
 
             except Exception as e:
                 logger.error(f"Failed to generate report for user {user_id}: {str(e)}")
@@ -76,7 +75,11 @@ def send_weekly_social_reports(self):
         cursor.close()
         conn.close()
 
-        logger.info(f"✅ Sent {reports_sent} weekly reports")
+        # Envoi par lots (une tâche par 100 emails, connexions SMTP réutilisées)
+        reports_sent = len(messages)
+        batches = queue_bulk_emails(messages)
+
+        logger.info(f"✅ Queued {reports_sent} weekly reports in {batches} batches")
 
         return {
             'total_influencers': len(influencers),
@@ -204,145 +207,157 @@ def generate_weekly_report(user_id: str, cursor) -> Dict:
         return None
 
 
-@shared_task(
-    name='celery_tasks.report_tasks.send_weekly_report_email',
-    rate_limit='20/m'
-)
-def send_weekly_report_email(email: str, full_name: str, report_data: Dict):
+def render_weekly_report_email(full_name: str, report_data: Dict) -> Tuple[str, str]:
     """
-    Envoyer l'email du rapport hebdomadaire
+    Construire le sujet et le HTML du rapport hebdomadaire
+
+    Returns:
+        (subject, html_body)
     """
-    try:
-        subject = f"📊 Votre rapport hebdomadaire ShareYourSales"
-
-        # Construire le HTML des plateformes
-        platforms_html = ""
-        for platform in report_data['platforms']:
-            growth_icon = "📈" if platform['followers_growth'] >= 0 else "📉"
-            growth_color = "#10b981" if platform['followers_growth'] >= 0 else "#ef4444"
-
-            engagement_icon = "🔥" if platform['engagement_change'] >= 0 else "⚠️"
-            engagement_color = "#10b981" if platform['engagement_change'] >= 0 else "#ef4444"
-
-            platforms_html += f"""
-            <div style="background: white; padding: 20px; border-radius: 10px; margin-bottom: 15px; border-left: 4px solid #667eea;">
-                <h3 style="margin: 0 0 10px 0; color: #667eea; text-transform: capitalize;">
-                    {platform['name']} (@{platform['username']})
-                </h3>
-                <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px;">
-                    <div>
-                        <p style="margin: 5px 0; color: #6b7280; font-size: 14px;">Followers</p>
-                        <p style="margin: 5px 0; font-size: 24px; font-weight: bold; color: #111827;">
-                            {platform['followers']:,}
-                        </p>
-                        <p style="margin: 5px 0; color: {growth_color}; font-size: 14px;">
-                            {growth_icon} {platform['followers_growth']:+,} cette semaine
-                        </p>
-                    </div>
-                    <div>
-                        <p style="margin: 5px 0; color: #6b7280; font-size: 14px;">Engagement</p>
-                        <p style="margin: 5px 0; font-size: 24px; font-weight: bold; color: #111827;">
-                            {platform['engagement_rate']:.1f}%
-                        </p>
-                        <p style="margin: 5px 0; color: {engagement_color}; font-size: 14px;">
-                            {engagement_icon} {platform['engagement_change']:+.1f}% cette semaine
-                        </p>
-                    </div>
+    subject = f"📊 Votre rapport hebdomadaire ShareYourSales"
+
+    # Construire le HTML des plateformes
+    platforms_html = ""
+    for platform in report_data['platforms']:
+        growth_icon = "📈" if platform['followers_growth'] >= 0 else "📉"
+        growth_color = "#10b981" if platform['followers_growth'] >= 0 else "#ef4444"
+
+        engagement_icon = "🔥" if platform['engagement_change'] >= 0 else "⚠️"
+        engagement_color = "#10b981" if platform['engagement_change'] >= 0 else "#ef4444"
+
+        platforms_html += f"""
+        <div style="background: white; padding: 20px; border-radius: 10px; margin-bottom: 15px; border-left: 4px solid #667eea;">
+            <h3 style="margin: 0 0 10px 0; color: #667eea; text-transform: capitalize;">
+                {platform['name']} (@{platform['username']})
+            </h3>
+            <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px;">
+                <div>
+                    <p style="margin: 5px 0; color: #6b7280; font-size: 14px;">Followers</p>
+                    <p style="margin: 5px 0; font-size: 24px; font-weight: bold; color: #111827;">
+                        {platform['followers']:,}
+                    </p>
+                    <p style="margin: 5px 0; color: {growth_color}; font-size: 14px;">
+                        {growth_icon} {platform['followers_growth']:+,} cette semaine
+                    </p>
                 </div>
-            </div>
-            """
-
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; background: #f3f4f6; }}
-                .container {{ max-width: 700px; margin: 0 auto; padding: 20px; }}
-                .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 40px 30px; text-align: center; border-radius: 10px 10px 0 0; }}
-                .content {{ background: #f9fafb; padding: 30px; border-radius: 0 0 10px 10px; }}
-                .summary {{ background: white; padding: 25px; border-radius: 10px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
-                .stat-card {{ display: inline-block; width: 48%; padding: 15px; background: #f3f4f6; border-radius: 8px; margin: 5px 1%; vertical-align: top; }}
-                .button {{ display: inline-block; background: #667eea; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1 style="margin: 0 0 10px 0;">📊 Rapport Hebdomadaire</h1>
-                    <p style="margin: 0; opacity: 0.9;">
-                        {report_data['period']['start']} - {report_data['period']['end']}
+                <div>
+                    <p style="margin: 5px 0; color: #6b7280; font-size: 14px;">Engagement</p>
+                    <p style="margin: 5px 0; font-size: 24px; font-weight: bold; color: #111827;">
+                        {platform['engagement_rate']:.1f}%
+                    </p>
+                    <p style="margin: 5px 0; color: {engagement_color}; font-size: 14px;">
+                        {engagement_icon} {platform['engagement_change']:+.1f}% cette semaine
                     </p>
                 </div>
+            </div>
+        </div>
+        """
 
-                <div class="content">
-                    <p>Bonjour {full_name},</p>
-
-                    <p>Voici le résumé de vos performances sur les réseaux sociaux cette semaine:</p>
-
-                    <!-- Summary -->
-                    <div class="summary">
-                        <h2 style="margin: 0 0 20px 0; color: #111827;">Résumé</h2>
-                        <div style="text-align: center;">
-                            <div class="stat-card">
-                                <p style="margin: 0; color: #6b7280; font-size: 14px;">Total Followers</p>
-                                <p style="margin: 5px 0; font-size: 32px; font-weight: bold; color: #667eea;">
-                                    {report_data['summary']['total_followers']:,}
-                                </p>
-                            </div>
-                            <div class="stat-card">
-                                <p style="margin: 0; color: #6b7280; font-size: 14px;">Croissance</p>
-                                <p style="margin: 5px 0; font-size: 32px; font-weight: bold; color: {'#10b981' if report_data['summary']['total_growth'] >= 0 else '#ef4444'};">
-                                    {report_data['summary']['total_growth']:+,}
-                                </p>
-                            </div>
-                            <div class="stat-card">
-                                <p style="margin: 0; color: #6b7280; font-size: 14px;">Engagement Moyen</p>
-                                <p style="margin: 5px 0; font-size: 32px; font-weight: bold; color: #667eea;">
-                                    {report_data['summary']['avg_engagement']:.1f}%
-                                </p>
-                            </div>
-                            <div class="stat-card">
-                                <p style="margin: 0; color: #6b7280; font-size: 14px;">Meilleure Plateforme</p>
-                                <p style="margin: 5px 0; font-size: 24px; font-weight: bold; color: #667eea; text-transform: capitalize;">
-                                    {report_data['summary']['best_platform'] or 'N/A'}
-                                </p>
-                            </div>
-                        </div>
-                    </div>
+    html_body = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; background: #f3f4f6; }}
+            .container {{ max-width: 700px; margin: 0 auto; padding: 20px; }}
+            .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 40px 30px; text-align: center; border-radius: 10px 10px 0 0; }}
+            .content {{ background: #f9fafb; padding: 30px; border-radius: 0 0 10px 10px; }}
+            .summary {{ background: white; padding: 25px; border-radius: 10px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }}
+            .stat-card {{ display: inline-block; width: 48%; padding: 15px; background: #f3f4f6; border-radius: 8px; margin: 5px 1%; vertical-align: top; }}
+            .button {{ display: inline-block; background: #667eea; color: white; padding: 12px 30px; text-decoration: none; border-radius: 5px; margin: 20px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1 style="margin: 0 0 10px 0;">📊 Rapport Hebdomadaire</h1>
+                <p style="margin: 0; opacity: 0.9;">
+                    {report_data['period']['start']} - {report_data['period']['end']}
+                </p>
+            </div>
 
-                    <!-- Détails par plateforme -->
-                    <h2 style="color: #111827; margin: 30px 0 15px 0;">Détails par Plateforme</h2>
-                    {platforms_html}
-
-                    <!-- CTA -->
-                    <center>
-                        <a href="https://shareyoursales.ma/influencer/social-media/history" class="button">
-                            Voir mon historique complet
-                        </a>
-                    </center>
-
-                    <!-- Conseils -->
-                    <div style="background: #dbeafe; border-left: 4px solid #3b82f6; padding: 15px; margin: 30px 0; border-radius: 5px;">
-                        <p style="margin: 0 0 10px 0; font-weight: bold; color: #1e40af;">💡 Conseil de la semaine</p>
-                        <p style="margin: 0; color: #1e3a8a; font-size: 14px;">
-                            Continuez à créer du contenu engageant et interagissez régulièrement avec votre audience
-                            pour maintenir un bon taux d'engagement. Les marchands recherchent des influenceurs actifs !
-                        </p>
-                    </div>
+            <div class="content">
+                <p>Bonjour {full_name},</p>
 
-                    <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
+                <p>Voici le résumé de vos performances sur les réseaux sociaux cette semaine:</p>
 
-                    <p style="font-size: 12px; color: #6b7280; text-align: center;">
-                        Vous recevez cet email car vous avez des comptes sociaux connectés sur ShareYourSales.
-                        <br>
-                        Pour ne plus recevoir ces rapports, désactivez-les dans vos paramètres.
+                <!-- Summary -->
+                <div class="summary">
+                    <h2 style="margin: 0 0 20px 0; color: #111827;">Résumé</h2>
+                    <div style="text-align: center;">
+                        <div class="stat-card">
+                            <p style="margin: 0; color: #6b7280; font-size: 14px;">Total Followers</p>
+                            <p style="margin: 5px 0; font-size: 32px; font-weight: bold; color: #667eea;">
+                                {report_data['summary']['total_followers']:,}
+                            </p>
+                        </div>
+                        <div class="stat-card">
+                            <p style="margin: 0; color: #6b7280; font-size: 14px;">Croissance</p>
+                            <p style="margin: 5px 0; font-size: 32px; font-weight: bold; color: {'#10b981' if report_data['summary']['total_growth'] >= 0 else '#ef4444'};">
+                                {report_data['summary']['total_growth']:+,}
+                            </p>
+                        </div>
+                        <div class="stat-card">
+                            <p style="margin: 0; color: #6b7280; font-size: 14px;">Engagement Moyen</p>
+                            <p style="margin: 5px 0; font-size: 32px; font-weight: bold; color: #667eea;">
+                                {report_data['summary']['avg_engagement']:.1f}%
+                            </p>
+                        </div>
+                        <div class="stat-card">
+                            <p style="margin: 0; color: #6b7280; font-size: 14px;">Meilleure Plateforme</p>
+                            <p style="margin: 5px 0; font-size: 24px; font-weight: bold; color: #667eea; text-transform: capitalize;">
+                                {report_data['summary']['best_platform'] or 'N/A'}
+                            </p>
+                        </div>
+                    </div>
+                </div>
+
+                <!-- Détails par plateforme -->
+                <h2 style="color: #111827; margin: 30px 0 15px 0;">Détails par Plateforme</h2>
+                {platforms_html}
+
+                <!-- CTA -->
+                <center>
+                    <a href="https://shareyoursales.ma/influencer/social-media/history" class="button">
+                        Voir mon historique complet
+                    </a>
+                </center>
+
+                <!-- Conseils -->
+                <div style="background: #dbeafe; border-left: 4px solid #3b82f6; padding: 15px; margin: 30px 0; border-radius: 5px;">
+                    <p style="margin: 0 0 10px 0; font-weight: bold; color: #1e40af;">💡 Conseil de la semaine</p>
+                    <p style="margin: 0; color: #1e3a8a; font-size: 14px;">
+                        Continuez à créer du contenu engageant et interagissez régulièrement avec votre audience
+                        pour maintenir un bon taux d'engagement. Les marchands recherchent des influenceurs actifs !
                     </p>
                 </div>
+
+                <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 30px 0;">
+
+                <p style="font-size: 12px; color: #6b7280; text-align: center;">
+                    Vous recevez cet email car vous avez des comptes sociaux connectés sur ShareYourSales.
+                    <br>
+                    Pour ne plus recevoir ces rapports, désactivez-les dans vos paramètres.
+                </p>
             </div>
-        </body>
-        </html>
-        """
+        </div>
+    </body>
+    </html>
+    """
+
+    return subject, html_body
+
+
+@shared_task(
+    name='celery_tasks.report_tasks.send_weekly_report_email',
+    rate_limit='20/m'
+)
+def send_weekly_report_email(email: str, full_name: str, report_data: Dict):
+    """
+    Envoyer l'email du rapport hebdomadaire
+    """
+    try:
+        subject, html_body = render_weekly_report_email(full_name, report_data)
 
         send_email_task.delay(
             to_email=email,
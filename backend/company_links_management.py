@@ -15,14 +15,15 @@ Cette approche garantit:
 - Suivi précis des performances par membre
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from supabase import create_client, Client
 import os
-import secrets
 from auth import get_current_user
+from services.short_code_service import short_code_allocator, is_reserved_code
+from services.qr_code_service import qr_code_url, short_link_url
 
 router = APIRouter(prefix="/api/company/links", tags=["Company Links Management"])
 
@@ -42,6 +43,14 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
+# ============================================
+# BULK LIMITS
+# ============================================
+
+BULK_LINKS_MAX = 1000          # Produits / membres par requête (catalogue entier)
+BULK_QUERY_CHUNK_SIZE = 200    # Ids par requête IN (longueur d'URL PostgREST)
+BULK_INSERT_CHUNK_SIZE = 500   # Lignes par INSERT groupé
+
 # ============================================
 # PYDANTIC MODELS
 # ============================================
@@ -61,7 +70,7 @@ class AssignLinkToMemberRequest(BaseModel):
 
 class BulkGenerateLinksRequest(BaseModel):
     """Génération en masse de liens pour plusieurs produits"""
-    product_ids: List[str] = Field(..., min_items=1, max_items=50)
+    product_ids: List[str] = Field(..., min_items=1, max_items=BULK_LINKS_MAX)
     commission_rate: Optional[float] = Field(None, ge=0, le=100)
 
 # ============================================
@@ -69,16 +78,8 @@ class BulkGenerateLinksRequest(BaseModel):
 # ============================================
 
 def generate_unique_short_code() -> str:
-    """Générer un code court unique"""
-    while True:
-        short_code = secrets.token_urlsafe(6)[:8]
-        existing = supabase.from_("affiliate_links") \
-            .select("id") \
-            .eq("short_code", short_code) \
-            .execute()
-
-        if not existing.data:
-            return short_code
+    """Générer un code court unique (séquence encodée, sans SELECT)"""
+    return short_code_allocator.allocate()
 
 async def verify_company_owns_product(company_id: str, product_id: str) -> bool:
     """Vérifier que le produit appartient à l'entreprise"""
@@ -111,6 +112,81 @@ async def verify_member_in_team(company_id: str, member_id: str) -> bool:
     except Exception:
         return False
 
+# ============================================
+# BULK LINK ENGINE (requêtes ensemblistes)
+# ============================================
+
+def _chunks(items: List[Any], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def fetch_owned_product_ids(company_id: str, product_ids: List[str]) -> set:
+    """Produits appartenant à l'entreprise (une requête par lot de 200 ids)"""
+    owned = set()
+    for chunk in _chunks(product_ids, BULK_QUERY_CHUNK_SIZE):
+        result = supabase.from_("products") \
+            .select("id") \
+            .eq("merchant_id", company_id) \
+            .in_("id", chunk) \
+            .execute()
+        owned.update(row["id"] for row in (result.data or []))
+    return owned
+
+def fetch_active_member_ids(company_id: str, member_ids: List[str]) -> set:
+    """Membres actifs de l'équipe parmi `member_ids`"""
+    active = set()
+    for chunk in _chunks(member_ids, BULK_QUERY_CHUNK_SIZE):
+        result = supabase.from_("team_members") \
+            .select("member_id") \
+            .eq("company_id", company_id) \
+            .eq("status", "active") \
+            .in_("member_id", chunk) \
+            .execute()
+        active.update(row["member_id"] for row in (result.data or []))
+    return active
+
+def fetch_existing_links(
+    company_id: str,
+    field: str,
+    values: List[str],
+    **filters
+) -> Dict[str, Dict]:
+    """
+    Liens actifs existants indexés par `field`
+
+    field="product_id" + influencer_id=None: liens de base des produits
+    field="influencer_id" + product_id=...: liens des membres pour un produit
+    """
+    existing: Dict[str, Dict] = {}
+    for chunk in _chunks(values, BULK_QUERY_CHUNK_SIZE):
+        query = supabase.from_("affiliate_links") \
+            .select("*") \
+            .eq("merchant_id", company_id) \
+            .eq("is_active", True) \
+            .in_(field, chunk)
+        for key, value in filters.items():
+            query = query.is_(key, "null") if value is None else query.eq(key, value)
+        result = query.execute()
+        for row in result.data or []:
+            existing.setdefault(row[field], row)
+    return existing
+
+def bulk_insert_links(rows: List[Dict], key: str) -> tuple:
+    """
+    Insérer des liens par lots
+
+    Returns:
+        (liens créés, erreurs [{key: ..., error: ...}] pour les lots en échec)
+    """
+    created, errors = [], []
+    for chunk in _chunks(rows, BULK_INSERT_CHUNK_SIZE):
+        try:
+            result = supabase.from_("affiliate_links").insert(chunk).execute()
+            created.extend(result.data or [])
+        except Exception as e:
+            errors.extend({key: row[key], "error": str(e)} for row in chunk)
+    return created, errors
+
 # ============================================
 # ENDPOINTS - LINK GENERATION (Company Only)
 # ============================================
@@ -118,6 +194,7 @@ async def verify_member_in_team(company_id: str, member_id: str) -> bool:
 @router.post("/generate", status_code=status.HTTP_201_CREATED)
 async def generate_company_affiliate_link(
     request: GenerateCompanyLinkRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -167,13 +244,19 @@ async def generate_company_affiliate_link(
                 "message": "Company link already exists for this product",
                 "link": {
                     **link,
-                    "full_url": f"https://shareyoursales.ma/r/{link['short_code']}",
-                    "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{link['short_code']}"
+                    "full_url": short_link_url(link['short_code']),
+                    "qr_code_url": qr_code_url(link['short_code'], http_request.base_url)
                 }
             }
 
         # Générer le code court
         if request.custom_slug:
+            if is_reserved_code(request.custom_slug):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Custom slug format is reserved for generated codes"
+                )
+
             # Vérifier disponibilité
             slug_check = supabase.from_("affiliate_links") \
                 .select("id") \
@@ -226,8 +309,8 @@ async def generate_company_affiliate_link(
             "message": "Affiliate link generated successfully",
             "link": {
                 **link,
-                "full_url": f"https://shareyoursales.ma/r/{short_code}",
-                "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{short_code}"
+                "full_url": short_link_url(short_code),
+                "qr_code_url": qr_code_url(short_code, http_request.base_url)
             }
         }
 
@@ -255,50 +338,39 @@ async def bulk_generate_links(
             )
 
         company_id = current_user["id"]
-        generated_links = []
-        errors = []
-
-        for product_id in request.product_ids:
-            try:
-                # Vérifier la propriété
-                owns = await verify_company_owns_product(company_id, product_id)
-                if not owns:
-                    errors.append({"product_id": product_id, "error": "Not your product"})
-                    continue
-
-                # Vérifier si existe déjà
-                existing = supabase.from_("affiliate_links") \
-                    .select("*") \
-                    .eq("merchant_id", company_id) \
-                    .eq("product_id", product_id) \
-                    .eq("is_active", True) \
-                    .is_("influencer_id", "null") \
-                    .execute()
-
-                if existing.data:
-                    generated_links.append(existing.data[0])
-                    continue
-
-                # Créer nouveau lien
-                short_code = generate_unique_short_code()
-
-                link_data = {
-                    "merchant_id": company_id,
-                    "product_id": product_id,
-                    "short_code": short_code,
-                    "commission_rate": request.commission_rate or 15.0,
-                    "is_active": True
-                }
-
-                result = supabase.from_("affiliate_links") \
-                    .insert(link_data) \
-                    .execute()
-
-                if result.data:
-                    generated_links.append(result.data[0])
+        product_ids = list(dict.fromkeys(request.product_ids))
+
+        # 1. Propriété de tous les produits en une requête
+        owned = fetch_owned_product_ids(company_id, product_ids)
+        errors = [
+            {"product_id": product_id, "error": "Not your product"}
+            for product_id in product_ids if product_id not in owned
+        ]
+        product_ids = [product_id for product_id in product_ids if product_id in owned]
+
+        # 2. Liens de base existants en une requête
+        existing = fetch_existing_links(
+            company_id, "product_id", product_ids, influencer_id=None
+        )
+        generated_links = [existing[p] for p in product_ids if p in existing]
+        to_create = [p for p in product_ids if p not in existing]
+
+        # 3. Codes alloués d'un coup + INSERT groupé
+        codes = short_code_allocator.allocate_many(len(to_create))
+        rows = [
+            {
+                "merchant_id": company_id,
+                "product_id": product_id,
+                "short_code": short_code,
+                "commission_rate": request.commission_rate or 15.0,
+                "is_active": True
+            }
+            for product_id, short_code in zip(to_create, codes)
+        ]
 
-            except Exception as e:
-                errors.append({"product_id": product_id, "error": str(e)})
+        created, insert_errors = bulk_insert_links(rows, "product_id")
+        generated_links.extend(created)
+        errors.extend(insert_errors)
 
         return {
             "success": True,
@@ -322,6 +394,7 @@ async def bulk_generate_links(
 @router.post("/assign", status_code=status.HTTP_201_CREATED)
 async def assign_link_to_team_member(
     request: AssignLinkToMemberRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -403,8 +476,8 @@ async def assign_link_to_team_member(
             "message": f"Link assigned to team member successfully",
             "assigned_link": {
                 **assigned_link,
-                "full_url": f"https://shareyoursales.ma/r/{short_code}",
-                "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{short_code}"
+                "full_url": short_link_url(short_code),
+                "qr_code_url": qr_code_url(short_code, http_request.base_url)
             }
         }
 
@@ -422,7 +495,11 @@ async def bulk_assign_links(
     member_ids: List[str],
     current_user: dict = Depends(get_current_user)
 ):
-    """[ENTREPRISE] Attribuer un lien à plusieurs membres en masse"""
+    """
+    [ENTREPRISE] Attribuer un lien à plusieurs membres en masse
+
+    Les membres ayant déjà un lien actif pour ce produit le conservent.
+    """
     try:
         if current_user.get("role") != "merchant":
             raise HTTPException(
@@ -430,6 +507,12 @@ async def bulk_assign_links(
                 detail="Only companies can assign links"
             )
 
+        if len(member_ids) > BULK_LINKS_MAX:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {BULK_LINKS_MAX} members per request"
+            )
+
         company_id = current_user["id"]
 
         # Vérifier que le lien existe
@@ -443,41 +526,47 @@ async def bulk_assign_links(
         if not link.data:
             raise HTTPException(status_code=404, detail="Link not found")
 
-        assigned = []
-        errors = []
-
-        for member_id in member_ids:
-            try:
-                is_member = await verify_member_in_team(company_id, member_id)
-                if not is_member:
-                    errors.append({"member_id": member_id, "error": "Not in team"})
-                    continue
-
-                short_code = generate_unique_short_code()
-
-                member_link_data = {
-                    "merchant_id": company_id,
-                    "influencer_id": member_id,
-                    "product_id": link.data["product_id"],
-                    "short_code": short_code,
-                    "commission_rate": link.data["commission_rate"],
-                    "is_active": True,
-                    "metadata": {
-                        "assigned_by": company_id,
-                        "parent_link_id": link_id,
-                        "assigned_at": datetime.now().isoformat()
-                    }
-                }
+        member_ids = list(dict.fromkeys(member_ids))
+        product_id = link.data["product_id"]
 
-                result = supabase.from_("affiliate_links") \
-                    .insert(member_link_data) \
-                    .execute()
+        # 1. Appartenance à l'équipe en une requête
+        active = fetch_active_member_ids(company_id, member_ids)
+        errors = [
+            {"member_id": member_id, "error": "Not in team"}
+            for member_id in member_ids if member_id not in active
+        ]
+        member_ids = [member_id for member_id in member_ids if member_id in active]
 
-                if result.data:
-                    assigned.append(result.data[0])
+        # 2. Liens déjà attribués pour ce produit en une requête
+        existing = fetch_existing_links(
+            company_id, "influencer_id", member_ids, product_id=product_id
+        )
+        assigned = [existing[m] for m in member_ids if m in existing]
+        to_assign = [m for m in member_ids if m not in existing]
+
+        # 3. Codes alloués d'un coup + INSERT groupé
+        assigned_at = datetime.now().isoformat()
+        codes = short_code_allocator.allocate_many(len(to_assign))
+        rows = [
+            {
+                "merchant_id": company_id,
+                "influencer_id": member_id,
+                "product_id": product_id,
+                "short_code": short_code,
+                "commission_rate": link.data["commission_rate"],
+                "is_active": True,
+                "metadata": {
+                    "assigned_by": company_id,
+                    "parent_link_id": link_id,
+                    "assigned_at": assigned_at
+                }
+            }
+            for member_id, short_code in zip(to_assign, codes)
+        ]
 
-            except Exception as e:
-                errors.append({"member_id": member_id, "error": str(e)})
+        created, insert_errors = bulk_insert_links(rows, "influencer_id")
+        assigned.extend(created)
+        errors.extend({"member_id": e["influencer_id"], "error": e["error"]} for e in insert_errors)
 
         return {
             "success": True,
@@ -500,6 +589,7 @@ async def bulk_assign_links(
 
 @router.get("/my-company-links")
 async def get_company_links(
+    http_request: Request,
     product_id: Optional[str] = None,
     assigned_only: bool = False,
     current_user: dict = Depends(get_current_user)
@@ -525,8 +615,8 @@ async def get_company_links(
         for link in response.data:
             links.append({
                 **link,
-                "full_url": f"https://shareyoursales.ma/r/{link['short_code']}",
-                "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{link['short_code']}"
+                "full_url": short_link_url(link['short_code']),
+                "qr_code_url": qr_code_url(link['short_code'], http_request.base_url)
             })
 
         return {
@@ -578,7 +668,10 @@ async def deactivate_link(
 # ============================================
 
 @router.get("/assigned-to-me")
-async def get_my_assigned_links(current_user: dict = Depends(get_current_user)):
+async def get_my_assigned_links(
+    http_request: Request,
+    current_user: dict = Depends(get_current_user)
+):
     """
     [MEMBRE D'ÉQUIPE] Voir les liens qui m'ont été attribués
 
@@ -601,8 +694,8 @@ async def get_my_assigned_links(current_user: dict = Depends(get_current_user)):
         for link in response.data:
             links.append({
                 **link,
-                "full_url": f"https://shareyoursales.ma/r/{link['short_code']}",
-                "qr_code_url": f"https://api.qrserver.com/v1/create-qr-code/?size=200x200&data=https://shareyoursales.ma/r/{link['short_code']}"
+                "full_url": short_link_url(link['short_code']),
+                "qr_code_url": qr_code_url(link['short_code'], http_request.base_url)
             })
 
         return {
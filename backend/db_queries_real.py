@@ -5,6 +5,12 @@ Remplace toutes les données statiques par des requêtes Supabase réelles
 from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
 from supabase_client import get_supabase_client
+from services.timeseries_service import (
+    TimeSeriesEngine,
+    SALES_SOURCE,
+    COMMISSIONS_SOURCE,
+    bucket_label,
+)
 
 # ============================================
 # ANALYTICS - INFLUENCER
@@ -92,35 +98,20 @@ async def get_influencer_earnings_chart(user_id: str, weeks: int = 4) -> List[Di
         
         influencer_id = influencer_response.data["id"]
         
-        # Date de début (X semaines en arrière)
-        start_date = datetime.now() - timedelta(weeks=weeks)
-        
-        # Récupérer les commissions des dernières semaines
-        commissions_response = supabase.table("commissions") \
-            .select("amount, created_at") \
-            .eq("influencer_id", influencer_id) \
-            .gte("created_at", start_date.isoformat()) \
-            .order("created_at") \
-            .execute()
-        
-        # Agréger par semaine
-        weekly_data = {}
-        for commission in commissions_response.data:
-            created_at = datetime.fromisoformat(commission["created_at"].replace("Z", "+00:00"))
-            week_num = created_at.isocalendar()[1]  # Numéro de semaine
-            week_label = f"Sem {week_num}"
-            
-            if week_label not in weekly_data:
-                weekly_data[week_label] = 0.0
-            
-            weekly_data[week_label] += float(commission["amount"])
-        
-        # Formater pour le graphique
+        # Une requête groupée par semaine ISO, semaines vides à 0
+        series = TimeSeriesEngine(supabase).series(
+            COMMISSIONS_SOURCE,
+            bucket="week",
+            periods=weeks,
+            scope="influencer",
+            scope_id=influencer_id
+        )
+
         chart_data = [
-            {"week": week, "earnings": round(amount, 2)}
-            for week, amount in sorted(weekly_data.items())
+            {"week": bucket_label(point["bucket"], "week"), "earnings": round(point["amount"], 2)}
+            for point in series
         ]
-        
+
         return chart_data if chart_data else [{"week": "Sem 1", "earnings": 0}]
     
     except Exception as e:
@@ -151,39 +142,22 @@ async def get_merchant_sales_chart(user_id: str, days: int = 7) -> List[Dict[str
         
         merchant_id = merchant_response.data["id"]
         
-        # Date de début
-        start_date = datetime.now() - timedelta(days=days-1)
-        
-        # Récupérer les ventes
-        sales_response = supabase.table("sales") \
-            .select("amount, sale_timestamp") \
-            .eq("merchant_id", merchant_id) \
-            .gte("sale_timestamp", start_date.isoformat()) \
-            .execute()
-        
-        # Agréger par jour
-        daily_data = {}
-        for i in range(days):
-            date = start_date + timedelta(days=i)
-            date_str = date.strftime("%d/%m")
-            daily_data[date_str] = {"ventes": 0, "revenus": 0.00}
-        
-        for sale in sales_response.data:
-            sale_date = datetime.fromisoformat(sale["sale_timestamp"].replace("Z", "+00:00"))
-            date_str = sale_date.strftime("%d/%m")
-            
-            if date_str in daily_data:
-                daily_data[date_str]["ventes"] += 1
-                daily_data[date_str]["revenus"] += float(sale["amount"])
-        
-        # Formater pour le graphique
+        # Une requête groupée par jour sur sale_timestamp, jours vides à 0
+        series = TimeSeriesEngine(supabase).series(
+            SALES_SOURCE._replace(time_column="sale_timestamp", value_columns=("amount",)),
+            bucket="day",
+            periods=days,
+            scope="merchant",
+            scope_id=merchant_id
+        )
+
         chart_data = [
             {
-                "date": date,
-                "ventes": data["ventes"],
-                "revenus": round(data["revenus"], 2)
+                "date": bucket_label(point["bucket"], "day"),
+                "ventes": point["count"],
+                "revenus": round(point["amount"], 2)
             }
-            for date, data in daily_data.items()
+            for point in series
         ]
         
         return chart_data
@@ -6,13 +6,16 @@ Auteur: ShareYourSales Platform
 Date: 2025-10-23
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime, timedelta
 from decimal import Decimal
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from supabase_client import supabase
+from utils.rpc import is_missing_function
+import html
 import logging
+import os
 from io import BytesIO
-import base64
 
 # Pour génération PDF
 try:
@@ -30,6 +33,25 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Pipeline de facturation mensuelle
+INVOICE_TOTALS_RPC = "get_invoice_totals"
+INVOICE_LINES_PAGE_SIZE = int(os.getenv("INVOICE_LINES_PAGE_SIZE", "1000"))  # Ventes lues / lignes écrites par page
+INVOICE_PDF_WORKERS = int(os.getenv("INVOICE_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+INVOICE_MAX_PENDING_PDFS = INVOICE_PDF_WORKERS * 2  # Factures en attente de PDF (borne la mémoire)
+INVOICE_EMAIL_BATCH_SIZE = 100
+INVOICE_MERCHANTS_CHUNK_SIZE = 200
+INVOICE_PDF_BUCKET = os.getenv("INVOICE_PDF_BUCKET", "invoices")  # Bucket Supabase Storage des PDF
+
+# Statuts servant de checkpoint: draft (lignes en cours) -> pending (lignes complètes) -> sent
+INVOICE_RESUMABLE_STATUSES = ("draft", "pending")
+
+TAX_RATE = Decimal("0.20")  # TVA (20% au Maroc)
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 
 class InvoicingService:
     """Service de gestion des factures plateforme"""
@@ -49,6 +71,15 @@ class InvoicingService:
         """
         Génère toutes les factures pour le mois donné
 
+        Pipeline:
+        1. Totaux par merchant en une requête groupée (aucune vente chargée)
+        2. Pour chaque merchant, lignes de facture écrites page par page
+        3. PDF rendus dans un pool de processus
+        4. Emails confiés à la queue notifications par lots
+
+        Chaque facture sert de checkpoint (draft -> pending -> sent): relancer
+        le même mois reprend là où le run précédent s'est arrêté.
+
         Args:
             year: Année (ex: 2025)
             month: Mois (1-12)
@@ -61,53 +92,75 @@ class InvoicingService:
             # Calculer période
             period_start = datetime(year, month, 1)
             if month == 12:
-                period_end = datetime(year + 1, 1, 1) - timedelta(days=1)
+                next_period = datetime(year + 1, 1, 1)
             else:
-                period_end = datetime(year, month + 1, 1) - timedelta(days=1)
+                next_period = datetime(year, month + 1, 1)
+            period_end = next_period - timedelta(days=1)
 
             logger.info(f"Generating invoices for {period_start.strftime('%B %Y')}")
 
-            # Récupérer toutes les ventes du mois (status = completed)
-            sales_result = (
-                supabase.table("sales")
-                .select("*, merchants(id, company_name, email, address, ice, payment_gateway)")
-                .eq("status", "completed")
-                .gte("created_at", period_start.isoformat())
-                .lte("created_at", period_end.isoformat())
-                .execute()
-            )
+            totals = self._fetch_merchant_totals(period_start, next_period)
 
-            if not sales_result.data:
+            if not totals:
                 logger.info("No completed sales found for this period")
                 return {"success": True, "invoices_created": 0, "message": "No sales to invoice"}
 
-            # Grouper par merchant
-            sales_by_merchant = {}
-            for sale in sales_result.data:
-                merchant_id = sale["merchant_id"]
-                if merchant_id not in sales_by_merchant:
-                    sales_by_merchant[merchant_id] = {"merchant": sale["merchants"], "sales": []}
-                sales_by_merchant[merchant_id]["sales"].append(sale)
+            merchants = self._fetch_merchants(list(totals))
+            checkpoints = self._fetch_existing_invoices(list(totals), period_start, period_end)
 
-            # Créer facture pour chaque merchant
             invoices_created = []
+            resumed = 0
+            skipped = 0
+            emails = []
+
+            with ProcessPoolExecutor(max_workers=INVOICE_PDF_WORKERS) as pool:
+                pending = {}
+
+                for merchant_id, merchant_totals in totals.items():
+                    merchant = merchants.get(merchant_id)
+                    if not merchant:
+                        logger.error(f"Merchant {merchant_id} not found, skipping invoice")
+                        continue
+
+                    invoice = checkpoints.get(merchant_id)
+                    if invoice and invoice.get("status") not in INVOICE_RESUMABLE_STATUSES:
+                        skipped += 1
+                        continue
+                    if invoice:
+                        resumed += 1
+
+                    try:
+                        invoice, line_items = self._prepare_invoice(
+                            merchant, merchant_totals, invoice, period_start, period_end, next_period
+                        )
+                    except Exception as e:
+                        logger.error(f"Error creating invoice for merchant {merchant_id}: {e}")
+                        continue
+
+                    future = pool.submit(
+                        render_invoice_pdf, self.company_info, invoice, merchant, line_items
+                    )
+                    pending[future] = (invoice, merchant)
+
+                    if len(pending) >= INVOICE_MAX_PENDING_PDFS:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._finish_invoice(future, *pending.pop(future), emails, invoices_created)
+
+                for future in list(pending):
+                    self._finish_invoice(future, *pending.pop(future), emails, invoices_created)
+
+            self._flush_invoice_emails(emails)
 
-            for merchant_id, data in sales_by_merchant.items():
-                invoice = self._create_invoice_for_merchant(
-                    merchant=data["merchant"],
-                    sales=data["sales"],
-                    period_start=period_start,
-                    period_end=period_end,
-                )
-
-                if invoice:
-                    invoices_created.append(invoice)
-
-            logger.info(f"Created {len(invoices_created)} invoices")
+            logger.info(
+                f"Created {len(invoices_created)} invoices ({resumed} resumed, {skipped} already sent)"
+            )
 
             return {
                 "success": True,
                 "invoices_created": len(invoices_created),
+                "invoices_resumed": resumed,
+                "invoices_skipped": skipped,
                 "invoices": invoices_created,
             }
 
@@ -115,296 +168,374 @@ class InvoicingService:
             logger.error(f"Error generating monthly invoices: {e}")
             return {"success": False, "error": str(e)}
 
-    def _create_invoice_for_merchant(
-        self, merchant: Dict, sales: List[Dict], period_start: datetime, period_end: datetime
-    ) -> Optional[Dict]:
-        """Crée une facture pour un merchant"""
+    # ============================================
+    # PIPELINE - ÉTAPES
+    # ============================================
 
-        try:
-            # Calculer totaux
-            total_sales_amount = sum(Decimal(str(sale.get("total_amount", 0))) for sale in sales)
-            platform_commission = sum(
-                Decimal(str(sale.get("platform_commission", 0))) for sale in sales
-            )
-
-            # TVA (20% au Maroc)
-            tax_rate = Decimal("0.20")
-            tax_amount = platform_commission * tax_rate
-            total_amount = platform_commission + tax_amount
-
-            # Générer numéro de facture
-            invoice_number = self._generate_invoice_number()
-
-            # Date d'échéance (30 jours)
-            due_date = datetime.now() + timedelta(days=30)
-
-            # Créer facture
-            invoice_data = {
-                "merchant_id": merchant["id"],
-                "invoice_number": invoice_number,
-                "invoice_date": datetime.now().date().isoformat(),
-                "due_date": due_date.date().isoformat(),
-                "period_start": period_start.date().isoformat(),
-                "period_end": period_end.date().isoformat(),
-                "total_sales_amount": float(total_sales_amount),
-                "platform_commission": float(platform_commission),
-                "tax_amount": float(tax_amount),
-                "total_amount": float(total_amount),
-                "currency": "MAD",
-                "status": "pending",
-                "payment_method": merchant.get("payment_gateway", "manual"),
-            }
-
-            invoice_result = supabase.table("platform_invoices").insert(invoice_data).execute()
-
-            if not invoice_result.data:
-                logger.error(f"Failed to create invoice for merchant {merchant['id']}")
-                return None
-
-            invoice = invoice_result.data[0]
-            invoice_id = invoice["id"]
-
-            # Créer lignes de facture
-            line_items = []
-            for sale in sales:
-                line_item = {
-                    "invoice_id": invoice_id,
-                    "sale_id": sale["id"],
-                    "description": f"Vente #{sale.get('order_id', 'N/A')} - {sale.get('product_name', 'Produit')}",
-                    "sale_date": sale.get("created_at", "").split("T")[0],
-                    "sale_amount": float(sale.get("total_amount", 0)),
-                    "commission_rate": float(sale.get("platform_commission_rate", 5.0)),
-                    "commission_amount": float(sale.get("platform_commission", 0)),
-                }
-                line_items.append(line_item)
-
-            supabase.table("invoice_line_items").insert(line_items).execute()
-
-            # Générer PDF
-            pdf_url = self._generate_pdf(invoice, merchant, line_items)
-            if pdf_url:
-                supabase.table("platform_invoices").update({"pdf_url": pdf_url}).eq(
-                    "id", invoice_id
-                ).execute()
-
-            # Envoyer email
-            self._send_invoice_email(invoice, merchant, pdf_url)
-
-            # Mettre à jour status
-            supabase.table("platform_invoices").update({"status": "sent"}).eq(
-                "id", invoice_id
-            ).execute()
-
-            logger.info(f"Invoice {invoice_number} created for {merchant.get('company_name')}")
-
-            return invoice
-
-        except Exception as e:
-            logger.error(f"Error creating invoice for merchant: {e}")
-            return None
+    def _fetch_merchant_totals(self, period_start: datetime, next_period: datetime) -> Dict[str, Dict]:
+        """
+        Totaux facturables par merchant
 
-    def _generate_invoice_number(self) -> str:
-        """Génère un numéro de facture unique"""
+        RPC groupée (migration 011); si elle n'est pas déployée, lecture
+        paginée des seules colonnes de montants, sommées au fil de l'eau.
+        Les autres erreurs remontent: le run échoue et sera relancé plutôt
+        que de balayer toute la table des ventes.
+        """
+        totals: Dict[str, Dict] = {}
 
         try:
-            # Utiliser la fonction SQL
-            result = supabase.rpc("generate_invoice_number").execute()
-            if result.data:
-                return result.data
-            else:
-                # Fallback
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                return f"INV-{timestamp}"
+            result = supabase.rpc(INVOICE_TOTALS_RPC, {
+                "p_start": period_start.isoformat(),
+                "p_end": next_period.isoformat(),
+            }).execute()
+            rows = result.data or []
         except Exception as e:
-            logger.error(f"Error generating invoice number: {e}")
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            return f"INV-{timestamp}"
+            if not is_missing_function(str(e)):
+                raise
+            logger.warning(f"{INVOICE_TOTALS_RPC} unavailable, aggregating by pages: {e}")
+            rows = self._aggregate_totals_by_pages(period_start, next_period)
+
+        for row in rows:
+            totals[str(row["merchant_id"])] = {
+                "sales_count": int(row.get("sales_count") or 0),
+                "total_sales_amount": Decimal(str(row.get("total_sales_amount") or 0)),
+                "platform_commission": Decimal(str(row.get("platform_commission") or 0)),
+            }
+        return totals
+
+    def _aggregate_totals_by_pages(self, period_start: datetime, next_period: datetime) -> List[Dict]:
+        aggregated: Dict[str, Dict] = {}
+        for sale in self._iter_sales(
+            period_start, next_period, "id, merchant_id, total_amount, platform_commission"
+        ):
+            merchant_id = sale.get("merchant_id")
+            if not merchant_id:
+                continue
+            row = aggregated.setdefault(merchant_id, {
+                "merchant_id": merchant_id,
+                "sales_count": 0,
+                "total_sales_amount": Decimal("0"),
+                "platform_commission": Decimal("0"),
+            })
+            row["sales_count"] += 1
+            row["total_sales_amount"] += Decimal(str(sale.get("total_amount") or 0))
+            row["platform_commission"] += Decimal(str(sale.get("platform_commission") or 0))
+        return list(aggregated.values())
+
+    def _iter_sales(
+        self,
+        period_start: datetime,
+        next_period: datetime,
+        columns: str,
+        merchant_id: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """Ventes complétées de la période, par pages keyset sur id (`columns` inclut id)"""
+        last_id = None
+        while True:
+            query = (
+                supabase.table("sales")
+                .select(columns)
+                .eq("status", "completed")
+                .gte("created_at", period_start.isoformat())
+                .lt("created_at", next_period.isoformat())
+            )
+            if merchant_id:
+                query = query.eq("merchant_id", merchant_id)
+            if last_id:
+                query = query.gt("id", last_id)
 
-    def _generate_pdf(self, invoice: Dict, merchant: Dict, line_items: List[Dict]) -> Optional[str]:
-        """Génère le PDF de la facture"""
+            page = query.order("id").limit(INVOICE_LINES_PAGE_SIZE).execute().data or []
+            yield from page
 
-        if not REPORTLAB_AVAILABLE:
-            logger.warning("ReportLab not available, skipping PDF generation")
-            return None
+            if len(page) < INVOICE_LINES_PAGE_SIZE:
+                return
+            last_id = page[-1]["id"]
 
-        try:
-            # Créer buffer
-            buffer = BytesIO()
-
-            # Créer document
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            elements = []
-
-            # Styles
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                "CustomTitle",
-                parent=styles["Heading1"],
-                fontSize=24,
-                textColor=colors.HexColor("#1a56db"),
-                spaceAfter=30,
-                alignment=TA_CENTER,
+    def _fetch_merchants(self, merchant_ids: List[str]) -> Dict[str, Dict]:
+        merchants = {}
+        for chunk in _chunks(merchant_ids, INVOICE_MERCHANTS_CHUNK_SIZE):
+            result = (
+                supabase.table("merchants")
+                .select("id, company_name, email, address, ice, payment_gateway")
+                .in_("id", chunk)
+                .execute()
             )
+            merchants.update({row["id"]: row for row in result.data or []})
+        return merchants
+
+    def _fetch_existing_invoices(
+        self, merchant_ids: List[str], period_start: datetime, period_end: datetime
+    ) -> Dict[str, Dict]:
+        """Factures déjà créées pour la période (checkpoints d'un run précédent)"""
+        invoices = {}
+        for chunk in _chunks(merchant_ids, INVOICE_MERCHANTS_CHUNK_SIZE):
+            result = (
+                supabase.table("platform_invoices")
+                .select("*")
+                .in_("merchant_id", chunk)
+                .eq("period_start", period_start.date().isoformat())
+                .eq("period_end", period_end.date().isoformat())
+                .neq("status", "cancelled")
+                .execute()
+            )
+            invoices.update({row["merchant_id"]: row for row in result.data or []})
+        return invoices
+
+    def _prepare_invoice(
+        self,
+        merchant: Dict,
+        totals: Dict,
+        invoice: Optional[Dict],
+        period_start: datetime,
+        period_end: datetime,
+        next_period: datetime,
+    ) -> tuple:
+        """
+        Facture + lignes d'un merchant, jusqu'au checkpoint `pending`
 
-            # Titre
-            elements.append(Paragraph(f"FACTURE {invoice['invoice_number']}", title_style))
-            elements.append(Spacer(1, 20))
+        Returns:
+            (facture, lignes pour le PDF)
+        """
+        if invoice is None:
+            invoice = self._create_draft_invoice(merchant, totals, period_start, period_end)
 
-            # Informations entreprise et client (2 colonnes)
-            info_data = [
-                [
-                    Paragraph(
-                        f"<b>{self.company_info['name']}</b><br/>{self.company_info['address']}<br/>{self.company_info['email']}<br/>{self.company_info['phone']}<br/>ICE: {self.company_info['ice']}",
-                        styles["Normal"],
-                    ),
-                    Paragraph(
-                        f"<b>FACTURÉ À:</b><br/><b>{merchant.get('company_name', 'N/A')}</b><br/>{merchant.get('address', 'N/A')}<br/>{merchant.get('email', 'N/A')}<br/>ICE: {merchant.get('ice', 'N/A')}",
-                        styles["Normal"],
-                    ),
-                ]
-            ]
+        if invoice["status"] == "draft":
+            line_items = self._write_line_items(invoice["id"], merchant["id"], period_start, next_period)
+            supabase.table("platform_invoices").update({"status": "pending"}).eq(
+                "id", invoice["id"]
+            ).execute()
+            invoice["status"] = "pending"
+        else:
+            line_items = self._read_line_items(invoice["id"])
 
-            info_table = Table(info_data, colWidths=[250, 250])
-            info_table.setStyle(
-                TableStyle(
-                    [
-                        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-                        ("ALIGN", (0, 0), (0, 0), "LEFT"),
-                        ("ALIGN", (1, 0), (1, 0), "RIGHT"),
-                    ]
-                )
-            )
+        return invoice, line_items
 
-            elements.append(info_table)
-            elements.append(Spacer(1, 30))
+    def _create_draft_invoice(
+        self, merchant: Dict, totals: Dict, period_start: datetime, period_end: datetime
+    ) -> Dict:
+        """Crée l'en-tête de facture à partir des totaux agrégés"""
+
+        platform_commission = totals["platform_commission"]
+        tax_amount = platform_commission * TAX_RATE
+        total_amount = platform_commission + tax_amount
+
+        # Date d'échéance (30 jours)
+        due_date = datetime.now() + timedelta(days=30)
+
+        invoice_data = {
+            "merchant_id": merchant["id"],
+            "invoice_number": self._generate_invoice_number(),
+            "invoice_date": datetime.now().date().isoformat(),
+            "due_date": due_date.date().isoformat(),
+            "period_start": period_start.date().isoformat(),
+            "period_end": period_end.date().isoformat(),
+            "total_sales_amount": float(totals["total_sales_amount"]),
+            "platform_commission": float(platform_commission),
+            "tax_amount": float(tax_amount),
+            "total_amount": float(total_amount),
+            "currency": "MAD",
+            "status": "draft",
+            "payment_method": merchant.get("payment_gateway", "manual"),
+        }
 
-            # Dates
-            dates_data = [
-                ["Date de facture:", invoice["invoice_date"]],
-                ["Période:", f"{invoice['period_start']} au {invoice['period_end']}"],
-                ["Date d'échéance:", invoice["due_date"]],
-            ]
+        invoice_result = supabase.table("platform_invoices").insert(invoice_data).execute()
 
-            dates_table = Table(dates_data, colWidths=[150, 150])
-            dates_table.setStyle(
-                TableStyle(
-                    [
-                        ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                        ("ALIGN", (0, 0), (-1, -1), "LEFT"),
-                    ]
-                )
-            )
+        if not invoice_result.data:
+            raise RuntimeError(f"Failed to create invoice for merchant {merchant['id']}")
 
-            elements.append(dates_table)
-            elements.append(Spacer(1, 30))
+        return invoice_result.data[0]
 
-            # Lignes de facture
-            lines_data = [["Description", "Montant vente", "Taux (%)", "Commission"]]
+    def _write_line_items(
+        self, invoice_id: str, merchant_id: str, period_start: datetime, next_period: datetime
+    ) -> List[Dict]:
+        """
+        Écrit les lignes de facture page par page
 
-            for item in line_items:
-                lines_data.append(
-                    [
-                        item["description"],
-                        f"{item['sale_amount']:.2f} MAD",
-                        f"{item['commission_rate']:.1f}%",
-                        f"{item['commission_amount']:.2f} MAD",
-                    ]
-                )
+        Upsert sur (invoice_id, sale_id): une page rejouée après reprise ne
+        crée pas de doublon.
+        """
+        line_items = []
+        page = []
+        columns = "id, order_id, product_name, created_at, total_amount, platform_commission_rate, platform_commission"
+
+        for sale in self._iter_sales(period_start, next_period, columns, merchant_id=merchant_id):
+            page.append(self._line_item(invoice_id, sale))
+            if len(page) >= INVOICE_LINES_PAGE_SIZE:
+                self._upsert_line_items(page)
+                line_items.extend(page)
+                page = []
+
+        if page:
+            self._upsert_line_items(page)
+            line_items.extend(page)
+
+        return line_items
+
+    @staticmethod
+    def _line_item(invoice_id: str, sale: Dict) -> Dict:
+        return {
+            "invoice_id": invoice_id,
+            "sale_id": sale["id"],
+            "description": f"Vente #{sale.get('order_id', 'N/A')} - {sale.get('product_name', 'Produit')}",
+            "sale_date": (sale.get("created_at") or "").split("T")[0],
+            "sale_amount": float(sale.get("total_amount") or 0),
+            "commission_rate": float(sale.get("platform_commission_rate") or 5.0),
+            "commission_amount": float(sale.get("platform_commission") or 0),
+        }
 
-            # Totaux
-            lines_data.append(["", "", "Sous-total:", f"{invoice['platform_commission']:.2f} MAD"])
-            lines_data.append(["", "", f"TVA (20%):", f"{invoice['tax_amount']:.2f} MAD"])
-            lines_data.append(["", "", "TOTAL À PAYER:", f"{invoice['total_amount']:.2f} MAD"])
-
-            lines_table = Table(lines_data, colWidths=[250, 80, 80, 90])
-            lines_table.setStyle(
-                TableStyle(
-                    [
-                        # Header
-                        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a56db")),
-                        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                        ("FONTSIZE", (0, 0), (-1, 0), 12),
-                        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                        # Body
-                        ("FONTNAME", (0, 1), (-1, -4), "Helvetica"),
-                        ("FONTSIZE", (0, 1), (-1, -4), 10),
-                        ("GRID", (0, 0), (-1, -4), 0.5, colors.grey),
-                        # Totaux
-                        ("FONTNAME", (0, -3), (-1, -1), "Helvetica-Bold"),
-                        ("FONTSIZE", (0, -1), (-1, -1), 14),
-                        ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#f0f0f0")),
-                        ("ALIGN", (2, -3), (-1, -1), "RIGHT"),
-                        ("ALIGN", (0, 1), (1, -4), "LEFT"),
-                        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-                    ]
-                )
+    def _upsert_line_items(self, line_items: List[Dict]):
+        supabase.table("invoice_line_items").upsert(
+            line_items, on_conflict="invoice_id,sale_id", ignore_duplicates=True
+        ).execute()
+
+    def _read_line_items(self, invoice_id: str) -> List[Dict]:
+        """Lignes d'une facture déjà écrites (reprise au checkpoint `pending`)"""
+        line_items = []
+        offset = 0
+        while True:
+            page = (
+                supabase.table("invoice_line_items")
+                .select("*")
+                .eq("invoice_id", invoice_id)
+                .order("sale_date")
+                .order("sale_id")
+                .range(offset, offset + INVOICE_LINES_PAGE_SIZE - 1)
+                .execute()
+                .data
+                or []
             )
+            line_items.extend(page)
+            if len(page) < INVOICE_LINES_PAGE_SIZE:
+                return line_items
+            offset += INVOICE_LINES_PAGE_SIZE
+
+    def _finish_invoice(
+        self, future, invoice: Dict, merchant: Dict, emails: List[Dict], invoices_created: List[Dict]
+    ):
+        """PDF rendu: le stocker, enregistrer son URL et mettre l'email en file"""
+        try:
+            pdf_url = self._store_pdf(invoice, future.result())
+        except Exception as e:
+            logger.error(f"Error generating PDF for invoice {invoice['invoice_number']}: {e}")
+            pdf_url = None
 
-            elements.append(lines_table)
-            elements.append(Spacer(1, 30))
+        if pdf_url:
+            supabase.table("platform_invoices").update({"pdf_url": pdf_url}).eq(
+                "id", invoice["id"]
+            ).execute()
+            invoice["pdf_url"] = pdf_url
 
-            # Notes de paiement
-            payment_notes = f"""
-            <b>Modalités de paiement:</b><br/>
-            Paiement à effectuer avant le {invoice['due_date']}<br/>
-            Mode de paiement: {invoice.get('payment_method', 'Virement bancaire').upper()}<br/>
-            <br/>
-            En cas de question, contactez-nous à {self.company_info['email']}
-            """
+        emails.append((invoice, merchant))
+        invoices_created.append(invoice)
 
-            elements.append(Paragraph(payment_notes, styles["Normal"]))
+        if len(emails) >= INVOICE_EMAIL_BATCH_SIZE:
+            self._flush_invoice_emails(emails)
 
-            # Générer PDF
-            doc.build(elements)
+        logger.info(f"Invoice {invoice['invoice_number']} created for {merchant.get('company_name')}")
 
-            # Convertir en base64 pour stockage
-            pdf_base64 = base64.b64encode(buffer.getvalue()).decode()
+    def _store_pdf(self, invoice: Dict, pdf: Optional[bytes]) -> Optional[str]:
+        """Dépose le PDF dans Supabase Storage et retourne son URL de téléchargement"""
+        if not pdf:
+            return None
 
-            # Dans un vrai système, uploader vers Supabase Storage
-            # Pour l'instant, retourner data URL
-            pdf_url = f"data:application/pdf;base64,{pdf_base64}"
+        path = f"{invoice['merchant_id']}/{invoice['invoice_number']}.pdf"
+        bucket = supabase.storage.from_(INVOICE_PDF_BUCKET)
+        bucket.upload(
+            path=path,
+            file=pdf,
+            file_options={"content-type": "application/pdf", "upsert": "true"},
+        )
+        return bucket.get_public_url(path)
 
-            logger.info(f"PDF generated for invoice {invoice['invoice_number']}")
+    def _flush_invoice_emails(self, emails: List[tuple]):
+        """
+        Confie un lot d'emails à la queue notifications puis passe les
+        factures au statut `sent` (dernier checkpoint)
 
-            return pdf_url
+        Seules les factures effectivement confiées à la queue passent à
+        `sent`; les autres (merchant sans email, queue indisponible) restent
+        `pending` et sont reprises au prochain run.
+        """
+        if not emails:
+            return
 
-        except Exception as e:
-            logger.error(f"Error generating PDF: {e}")
-            return None
+        batch = list(emails)
+        emails.clear()
 
-    def _send_invoice_email(self, invoice: Dict, merchant: Dict, pdf_url: Optional[str] = None):
-        """Envoie la facture par email"""
+        deliverable = [(invoice, merchant) for invoice, merchant in batch if merchant.get("email")]
+        for invoice, merchant in batch:
+            if not merchant.get("email"):
+                logger.warning(
+                    f"Merchant {merchant.get('id')} has no email, invoice {invoice['invoice_number']} left pending"
+                )
+        if not deliverable:
+            return
+
+        messages = [
+            {
+                "to_email": merchant["email"],
+                "subject": f"Facture {invoice['invoice_number']} - {self.company_info['name']}",
+                "html_body": self._invoice_email_html(invoice, merchant),
+            }
+            for invoice, merchant in deliverable
+        ]
 
         try:
-            # TODO: Intégrer service email (SendGrid, AWS SES, etc.)
-
-            email_body = f"""
-            Bonjour {merchant.get('company_name')},
-            
-            Veuillez trouver ci-joint votre facture pour la période du {invoice['period_start']} au {invoice['period_end']}.
-            
-            Numéro de facture: {invoice['invoice_number']}
-            Montant total: {invoice['total_amount']:.2f} MAD
-            Date d'échéance: {invoice['due_date']}
-            
-            Vous pouvez payer cette facture via votre dashboard merchant ou par virement bancaire.
-            
-            Cordialement,
-            L'équipe ShareYourSales
+            self._queue_emails(messages)
+        except Exception as e:
+            logger.error(f"Email queue unavailable, {len(deliverable)} invoices left pending: {e}")
+            return
+
+        invoice_ids = [invoice["id"] for invoice, _ in deliverable]
+        supabase.table("platform_invoices").update({"status": "sent"}).in_(
+            "id", invoice_ids
+        ).execute()
+        for invoice, _ in deliverable:
+            invoice["status"] = "sent"
+
+    def _queue_emails(self, messages: List[Dict]):
+        from celery_tasks.notification_tasks import queue_bulk_emails
+
+        queue_bulk_emails(messages)
+
+    def _invoice_email_html(self, invoice: Dict, merchant: Dict) -> str:
+        pdf_link = (
+            f'<p><a href="{html.escape(invoice["pdf_url"], quote=True)}">Télécharger la facture (PDF)</a></p>'
+            if invoice.get("pdf_url") else ""
+        )
+        return f"""
+            <p>Bonjour {html.escape(merchant.get('company_name') or '')},</p>
+            <p>Votre facture pour la période du {invoice['period_start']} au {invoice['period_end']} est disponible.</p>
+            <p>
+                Numéro de facture: <b>{invoice['invoice_number']}</b><br/>
+                Montant total: <b>{invoice['total_amount']:.2f} MAD</b><br/>
+                Date d'échéance: {invoice['due_date']}
+            </p>
+            {pdf_link}
+            <p>Vous pouvez la télécharger et la payer depuis votre dashboard merchant ou par virement bancaire.</p>
+            <p>Cordialement,<br/>L'équipe ShareYourSales</p>
             """
 
-            logger.info(
-                f"Email sent to {merchant.get('email')} for invoice {invoice['invoice_number']}"
-            )
-
-            # Ici, intégrer vraiment l'envoi d'email
-            # import sendgrid
-            # sg = sendgrid.SendGridAPIClient(api_key=os.environ.get('SENDGRID_API_KEY'))
-            # ...
+    def _generate_invoice_number(self) -> str:
+        """Génère un numéro de facture unique"""
 
+        try:
+            # Utiliser la fonction SQL
+            result = supabase.rpc("generate_invoice_number").execute()
+            if result.data:
+                return result.data
+            else:
+                # Fallback
+                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+                return f"INV-{timestamp}"
         except Exception as e:
-            logger.error(f"Error sending invoice email: {e}")
+            logger.error(f"Error generating invoice number: {e}")
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            return f"INV-{timestamp}"
+
+    def _generate_pdf(self, invoice: Dict, merchant: Dict, line_items: List[Dict]) -> Optional[str]:
+        """Génère le PDF de la facture et retourne son URL de téléchargement"""
+        return self._store_pdf(invoice, render_invoice_pdf(self.company_info, invoice, merchant, line_items))
 
     def mark_invoice_paid(
         self, invoice_id: str, payment_method: str, payment_reference: Optional[str] = None
@@ -549,5 +680,164 @@ class InvoicingService:
             return None
 
 
+# ============================================
+# RENDU PDF
+# ============================================
+
+def render_invoice_pdf(
+    company_info: Dict, invoice: Dict, merchant: Dict, line_items: List[Dict]
+) -> Optional[bytes]:
+    """
+    Génère le PDF de la facture
+
+    Fonction de module (picklable): exécutée dans le pool de processus du
+    run mensuel. Retourne le contenu du PDF, stocké ensuite par le processus
+    principal (InvoicingService._store_pdf).
+    """
+
+    if not REPORTLAB_AVAILABLE:
+        logger.warning("ReportLab not available, skipping PDF generation")
+        return None
+
+    try:
+        # Créer buffer
+        buffer = BytesIO()
+
+        # Créer document
+        doc = SimpleDocTemplate(buffer, pagesize=A4)
+        elements = []
+
+        # Styles
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            "CustomTitle",
+            parent=styles["Heading1"],
+            fontSize=24,
+            textColor=colors.HexColor("#1a56db"),
+            spaceAfter=30,
+            alignment=TA_CENTER,
+        )
+
+        # Titre
+        elements.append(Paragraph(f"FACTURE {invoice['invoice_number']}", title_style))
+        elements.append(Spacer(1, 20))
+
+        # Informations entreprise et client (2 colonnes)
+        info_data = [
+            [
+                Paragraph(
+                    f"<b>{company_info['name']}</b><br/>{company_info['address']}<br/>{company_info['email']}<br/>{company_info['phone']}<br/>ICE: {company_info['ice']}",
+                    styles["Normal"],
+                ),
+                Paragraph(
+                    f"<b>FACTURÉ À:</b><br/><b>{merchant.get('company_name', 'N/A')}</b><br/>{merchant.get('address', 'N/A')}<br/>{merchant.get('email', 'N/A')}<br/>ICE: {merchant.get('ice', 'N/A')}",
+                    styles["Normal"],
+                ),
+            ]
+        ]
+
+        info_table = Table(info_data, colWidths=[250, 250])
+        info_table.setStyle(
+            TableStyle(
+                [
+                    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                    ("ALIGN", (0, 0), (0, 0), "LEFT"),
+                    ("ALIGN", (1, 0), (1, 0), "RIGHT"),
+                ]
+            )
+        )
+
+        elements.append(info_table)
+        elements.append(Spacer(1, 30))
+
+        # Dates
+        dates_data = [
+            ["Date de facture:", invoice["invoice_date"]],
+            ["Période:", f"{invoice['period_start']} au {invoice['period_end']}"],
+            ["Date d'échéance:", invoice["due_date"]],
+        ]
+
+        dates_table = Table(dates_data, colWidths=[150, 150])
+        dates_table.setStyle(
+            TableStyle(
+                [
+                    ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+                    ("ALIGN", (0, 0), (-1, -1), "LEFT"),
+                ]
+            )
+        )
+
+        elements.append(dates_table)
+        elements.append(Spacer(1, 30))
+
+        # Lignes de facture
+        lines_data = [["Description", "Montant vente", "Taux (%)", "Commission"]]
+
+        for item in line_items:
+            lines_data.append(
+                [
+                    item["description"],
+                    f"{item['sale_amount']:.2f} MAD",
+                    f"{item['commission_rate']:.1f}%",
+                    f"{item['commission_amount']:.2f} MAD",
+                ]
+            )
+
+        # Totaux
+        lines_data.append(["", "", "Sous-total:", f"{invoice['platform_commission']:.2f} MAD"])
+        lines_data.append(["", "", f"TVA (20%):", f"{invoice['tax_amount']:.2f} MAD"])
+        lines_data.append(["", "", "TOTAL À PAYER:", f"{invoice['total_amount']:.2f} MAD"])
+
+        lines_table = Table(lines_data, colWidths=[250, 80, 80, 90])
+        lines_table.setStyle(
+            TableStyle(
+                [
+                    # Header
+                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a56db")),
+                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                    ("FONTSIZE", (0, 0), (-1, 0), 12),
+                    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+                    # Body
+                    ("FONTNAME", (0, 1), (-1, -4), "Helvetica"),
+                    ("FONTSIZE", (0, 1), (-1, -4), 10),
+                    ("GRID", (0, 0), (-1, -4), 0.5, colors.grey),
+                    # Totaux
+                    ("FONTNAME", (0, -3), (-1, -1), "Helvetica-Bold"),
+                    ("FONTSIZE", (0, -1), (-1, -1), 14),
+                    ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#f0f0f0")),
+                    ("ALIGN", (2, -3), (-1, -1), "RIGHT"),
+                    ("ALIGN", (0, 1), (1, -4), "LEFT"),
+                    ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+                ]
+            )
+        )
+
+        elements.append(lines_table)
+        elements.append(Spacer(1, 30))
+
+        # Notes de paiement
+        payment_notes = f"""
+        <b>Modalités de paiement:</b><br/>
+        Paiement à effectuer avant le {invoice['due_date']}<br/>
+        Mode de paiement: {invoice.get('payment_method', 'Virement bancaire').upper()}<br/>
+        <br/>
+        En cas de question, contactez-nous à {company_info['email']}
+        """
+
+        elements.append(Paragraph(payment_notes, styles["Normal"]))
+
+        # Générer PDF
+        doc.build(elements)
+
+        logger.info(f"PDF generated for invoice {invoice['invoice_number']}")
+
+        return buffer.getvalue()
+
+    except Exception as e:
+        logger.error(f"Error generating PDF: {e}")
+        return None
+
+
 # Instance globale
 invoicing_service = InvoicingService()
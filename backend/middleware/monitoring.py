@@ -5,7 +5,7 @@ Intégrations:
 1. Sentry - Error tracking & Performance monitoring
 2. Structured Logging - JSON logs pour analytics
 3. Health Checks
-4. Metrics
+4. Metrics (Prometheus, voir services/metrics_service.py)
 """
 
 import sentry_sdk
@@ -21,6 +21,7 @@ from typing import Callable
 import psutil
 import sys
 
+
 # Configuration
 SENTRY_DSN = os.getenv("SENTRY_DSN", "")
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
@@ -348,58 +349,8 @@ async def liveness_check() -> dict:
 # METRICS
 # ============================================
 
-class Metrics:
-    """
-    Collecteur de métriques basique
-
-    En production, remplacer par Prometheus/Datadog
-    """
-
-    def __init__(self):
-        self.request_count = 0
-        self.error_count = 0
-        self.response_times = []
-
-    def record_request(self, duration: float, status: int):
-        """Enregistrer une requête"""
-        self.request_count += 1
-        self.response_times.append(duration)
-
-        if status >= 500:
-            self.error_count += 1
-
-        # Garder seulement les 1000 dernières
-        if len(self.response_times) > 1000:
-            self.response_times = self.response_times[-1000:]
-
-    def get_stats(self) -> dict:
-        """Récupérer statistiques"""
-        if not self.response_times:
-            return {
-                "request_count": self.request_count,
-                "error_count": self.error_count,
-                "avg_response_time": 0,
-                "p95_response_time": 0,
-                "p99_response_time": 0
-            }
-
-        sorted_times = sorted(self.response_times)
-        p95_index = int(len(sorted_times) * 0.95)
-        p99_index = int(len(sorted_times) * 0.99)
-
-        return {
-            "request_count": self.request_count,
-            "error_count": self.error_count,
-            "error_rate": self.error_count / self.request_count if self.request_count > 0 else 0,
-            "avg_response_time": sum(sorted_times) / len(sorted_times),
-            "p95_response_time": sorted_times[p95_index],
-            "p99_response_time": sorted_times[p99_index],
-            "min_response_time": min(sorted_times),
-            "max_response_time": max(sorted_times)
-        }
-
-
-metrics = Metrics()
+# Collecteur Prometheus (histogrammes par route, Supabase, cache, rate limit, Celery):
+# voir services/metrics_service.py
 
 
 # ============================================
@@ -19,6 +19,7 @@ from typing import Callable, Optional
 import structlog
 import os
 from functools import wraps
+from services.metrics_service import metrics
 
 logger = structlog.get_logger()
 
@@ -169,6 +170,7 @@ async def rate_limit_middleware(request: Request, call_next: Callable):
     )
 
     if not allowed:
+        metrics.record_rate_limited(endpoint if limits is not DEFAULT_LIMITS else "default")
         logger.warning(
             "rate_limit_exceeded",
             identifier=identifier,
@@ -202,15 +204,16 @@ async def rate_limit_middleware(request: Request, call_next: Callable):
     return response
 
 
+# Limites par défaut
+DEFAULT_LIMITS = {"limit": 100, "window": 60}  # 100 req/min
+
+
 def get_endpoint_limits(endpoint: str) -> dict:
     """
     Récupérer les limites spécifiques à un endpoint
 
     Endpoints critiques = limites plus strictes
     """
-    # Limites par défaut
-    default = {"limit": 100, "window": 60}  # 100 req/min
-
     # Limites personnalisées
     custom_limits = {
         # Auth endpoints - très strict
@@ -232,9 +235,10 @@ def get_endpoint_limits(endpoint: str) -> dict:
 
         # Bot IA - modéré
         "/api/bot/chat": {"limit": 30, "window": 60},  # 30 msg/min
+        "/api/bot/chat/stream": {"limit": 30, "window": 60},
     }
 
-    return custom_limits.get(endpoint, default)
+    return custom_limits.get(endpoint, DEFAULT_LIMITS)
 
 
 # ============================================
@@ -270,6 +274,7 @@ def rate_limit(limit: int, window: int):
             )
 
             if not allowed:
+                metrics.record_rate_limited(func.__name__)
                 raise RateLimitExceeded(retry_after=retry_after)
 
             return await func(*args, **kwargs)
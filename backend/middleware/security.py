@@ -16,6 +16,9 @@ import structlog
 import os
 from datetime import datetime, timedelta
 
+from services.http_pipeline import security_headers
+from services.ip_reputation_service import IPReputationService, ip_reputation
+
 logger = structlog.get_logger()
 
 # Configuration
@@ -143,61 +146,9 @@ async def security_headers_middleware(request: Request, call_next: Callable):
     """
     response = await call_next(request)
 
-    # Content Security Policy (CSP)
-    # Définit les sources autorisées pour scripts, styles, images, etc.
-    csp_directives = [
-        "default-src 'self'",
-        "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://js.stripe.com https://cdn.jsdelivr.net",
-        "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com",
-        "font-src 'self' https://fonts.gstatic.com",
-        "img-src 'self' data: https: blob:",
-        "connect-src 'self' https://api.stripe.com https://api.anthropic.com https://api.openai.com",
-        "frame-src 'self' https://js.stripe.com",
-        "object-src 'none'",
-        "base-uri 'self'",
-        "form-action 'self'",
-        "frame-ancestors 'none'",  # Équivalent à X-Frame-Options: DENY
-        "upgrade-insecure-requests"  # Force HTTPS
-    ]
-    response.headers["Content-Security-Policy"] = "; ".join(csp_directives)
-
-    # HSTS - Force HTTPS (seulement en production)
-    if ENVIRONMENT == "production":
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
-
-    # Empêche MIME-type sniffing
-    response.headers["X-Content-Type-Options"] = "nosniff"
-
-    # Protection contre clickjacking
-    response.headers["X-Frame-Options"] = "DENY"
-
-    # XSS Protection (legacy, mais toujours utile pour vieux navigateurs)
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-
-    # Referrer Policy - Contrôle les infos envoyées dans l'en-tête Referer
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-
-    # Permissions Policy (anciennement Feature-Policy)
-    # Désactive features navigateur potentiellement dangereuses
-    permissions = [
-        "geolocation=()",
-        "microphone=()",
-        "camera=()",
-        "payment=(self)",
-        "usb=()",
-        "magnetometer=()",
-        "gyroscope=()",
-        "speaker=(self)"
-    ]
-    response.headers["Permissions-Policy"] = ", ".join(permissions)
-
-    # Cache Control pour données sensibles
-    if "/api/auth" in request.url.path or "/api/stripe" in request.url.path:
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, private"
-        response.headers["Pragma"] = "no-cache"
-
-    # Server header (masquer la version)
-    response.headers["Server"] = "ShareYourSales"
+    # Valeurs partagées avec le pipeline ASGI (services/http_pipeline.py)
+    for name, value in security_headers(request.url.path):
+        response.headers[name] = value
 
     return response
 
@@ -272,38 +223,32 @@ class IPFilter:
     """
     Filtrage IP (blacklist/whitelist)
 
-    Utile pour bloquer des IPs malveillantes ou restreindre l'accès
+    Utile pour bloquer des IPs malveillantes ou restreindre l'accès.
+    Accepte des IPs ou des plages CIDR (IPv4/IPv6); les listes sont partagées
+    entre workers via le service de réputation IP.
     """
 
-    def __init__(self):
-        self.blacklist = set()
-        self.whitelist = set()
+    def __init__(self, reputation: IPReputationService = None):
+        self.reputation = reputation or ip_reputation
 
     def add_to_blacklist(self, ip: str):
-        """Ajouter IP à la blacklist"""
-        self.blacklist.add(ip)
+        """Ajouter IP ou plage CIDR à la blacklist"""
+        self.reputation.add(ip, "blacklist")
         logger.info("ip_blacklisted", ip=ip)
 
     def remove_from_blacklist(self, ip: str):
-        """Retirer IP de la blacklist"""
-        self.blacklist.discard(ip)
+        """Retirer IP ou plage CIDR de la blacklist (une entrée whitelist est conservée)"""
+        if self.reputation.remove(ip, "blacklist"):
+            logger.info("ip_unblacklisted", ip=ip)
 
     def add_to_whitelist(self, ip: str):
-        """Ajouter IP à la whitelist"""
-        self.whitelist.add(ip)
+        """Ajouter IP ou plage CIDR à la whitelist"""
+        self.reputation.add(ip, "whitelist")
         logger.info("ip_whitelisted", ip=ip)
 
     def is_allowed(self, ip: str) -> bool:
-        """Vérifier si IP est autorisée"""
-        # Whitelist prioritaire
-        if self.whitelist and ip in self.whitelist:
-            return True
-
-        # Blacklist
-        if ip in self.blacklist:
-            return False
-
-        return True
+        """Vérifier si IP est autorisée (whitelist prioritaire)"""
+        return self.reputation.is_allowed(ip)
 
 
 ip_filter = IPFilter()
@@ -0,0 +1,46 @@
+-- Migration: statistiques groupées des liens d'affiliation
+-- Utilisé par services/link_stats_service.py (GET /api/affiliate/my-links)
+
+-- ============================================
+-- INDEX (agrégation par lien)
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_tracking_events_link ON tracking_events(link_id);
+CREATE INDEX IF NOT EXISTS idx_conversions_link ON conversions(link_id);
+CREATE INDEX IF NOT EXISTS idx_commissions_link_status ON commissions(link_id, status);
+
+-- ============================================
+-- FONCTION: Stats de plusieurs liens en une requête
+-- ============================================
+CREATE OR REPLACE FUNCTION get_link_stats_bulk(p_link_ids UUID[])
+RETURNS TABLE (
+    link_id UUID,
+    clicks BIGINT,
+    conversions BIGINT,
+    total_commissions DECIMAL
+) AS $$
+    SELECT
+        l.id AS link_id,
+        COALESCE(t.clicks, 0) AS clicks,
+        COALESCE(c.conversions, 0) AS conversions,
+        COALESCE(m.total_commissions, 0) AS total_commissions
+    FROM unnest(p_link_ids) AS l(id)
+    LEFT JOIN (
+        SELECT te.link_id, COUNT(*) AS clicks
+        FROM tracking_events te
+        WHERE te.link_id = ANY(p_link_ids)
+        GROUP BY te.link_id
+    ) t ON t.link_id = l.id
+    LEFT JOIN (
+        SELECT cv.link_id, COUNT(*) AS conversions
+        FROM conversions cv
+        WHERE cv.link_id = ANY(p_link_ids)
+        GROUP BY cv.link_id
+    ) c ON c.link_id = l.id
+    LEFT JOIN (
+        SELECT cm.link_id, SUM(cm.amount) AS total_commissions
+        FROM commissions cm
+        WHERE cm.link_id = ANY(p_link_ids) AND cm.status = 'approved'
+        GROUP BY cm.link_id
+    ) m ON m.link_id = l.id;
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,31 @@
+-- Migration: séquence des codes courts (liens d'affiliation et liens trackés)
+-- Utilisé par services/short_code_service.py
+
+-- ============================================
+-- SÉQUENCE
+-- ============================================
+
+CREATE SEQUENCE IF NOT EXISTS short_code_seq AS BIGINT MINVALUE 0 START 0;
+
+-- ============================================
+-- FONCTION: Réserver un bloc de valeurs consécutives
+-- ============================================
+-- Retourne la première valeur du bloc [start, start + p_size)
+CREATE OR REPLACE FUNCTION reserve_short_code_block(p_size INTEGER)
+RETURNS BIGINT AS $$
+DECLARE
+    v_start BIGINT;
+BEGIN
+    IF p_size IS NULL OR p_size < 1 THEN
+        RAISE EXCEPTION 'p_size must be positive';
+    END IF;
+
+    -- Sérialiser les réservations (nextval + setval atomiques)
+    PERFORM pg_advisory_xact_lock(hashtext('short_code_seq'));
+
+    v_start := nextval('short_code_seq');
+    PERFORM setval('short_code_seq', v_start + p_size - 1);
+
+    RETURN v_start;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,124 @@
+-- Migration: read model de la boîte de réception (messagerie)
+-- Utilisé par services/messaging_service.py (GET /api/messages/conversations)
+
+-- ============================================
+-- COLONNES DÉNORMALISÉES
+-- ============================================
+
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_preview TEXT;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_message_sender_id UUID;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS user1_unread_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS user2_unread_count INTEGER NOT NULL DEFAULT 0;
+
+-- Rattrapage des conversations existantes
+UPDATE conversations c
+SET last_message_at = m.created_at,
+    last_message_preview = LEFT(m.content, 200),
+    last_message_sender_id = m.sender_id
+FROM (
+    SELECT DISTINCT ON (conversation_id) conversation_id, created_at, content, sender_id
+    FROM messages
+    ORDER BY conversation_id, created_at DESC
+) m
+WHERE m.conversation_id = c.id;
+
+UPDATE conversations c
+SET user1_unread_count = (
+        SELECT COUNT(*) FROM messages m
+        WHERE m.conversation_id = c.id AND m.is_read = FALSE AND m.sender_id <> c.user1_id
+    ),
+    user2_unread_count = (
+        SELECT COUNT(*) FROM messages m
+        WHERE m.conversation_id = c.id AND m.is_read = FALSE AND m.sender_id <> c.user2_id
+    );
+
+UPDATE conversations SET last_message_at = created_at WHERE last_message_at IS NULL;
+
+-- ============================================
+-- INDEX (pagination keyset par participant)
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_conversations_user1_inbox ON conversations(user1_id, last_message_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_conversations_user2_inbox ON conversations(user2_id, last_message_at DESC, id DESC);
+
+-- ============================================
+-- TRIGGER: maintenir le read model à chaque message
+-- ============================================
+CREATE OR REPLACE FUNCTION update_conversation_last_message()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE conversations
+    SET last_message_at = NEW.created_at,
+        last_message_preview = LEFT(NEW.content, 200),
+        last_message_sender_id = NEW.sender_id,
+        user1_unread_count = user1_unread_count + CASE WHEN user1_id <> NEW.sender_id THEN 1 ELSE 0 END,
+        user2_unread_count = user2_unread_count + CASE WHEN user2_id <> NEW.sender_id THEN 1 ELSE 0 END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = NEW.conversation_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_conversation_last_message ON messages;
+CREATE TRIGGER trigger_update_conversation_last_message
+    AFTER INSERT ON messages
+    FOR EACH ROW
+    EXECUTE FUNCTION update_conversation_last_message();
+
+-- ============================================
+-- FONCTION: Boîte de réception paginée (keyset)
+-- ============================================
+-- Curseur = (last_message_at, id) de la dernière conversation de la page précédente
+CREATE OR REPLACE FUNCTION get_conversation_inbox(
+    p_user_id UUID,
+    p_limit INTEGER DEFAULT 50,
+    p_before_at TIMESTAMP DEFAULT NULL,
+    p_before_id UUID DEFAULT NULL
+)
+RETURNS SETOF conversations AS $$
+    SELECT * FROM (
+        (
+            SELECT c.* FROM conversations c
+            WHERE c.user1_id = p_user_id
+              AND (p_before_at IS NULL OR (c.last_message_at, c.id) < (p_before_at, p_before_id))
+            ORDER BY c.last_message_at DESC, c.id DESC
+            LIMIT p_limit
+        )
+        UNION ALL
+        (
+            SELECT c.* FROM conversations c
+            WHERE c.user2_id = p_user_id
+              AND c.user1_id <> p_user_id
+              AND (p_before_at IS NULL OR (c.last_message_at, c.id) < (p_before_at, p_before_id))
+            ORDER BY c.last_message_at DESC, c.id DESC
+            LIMIT p_limit
+        )
+    ) inbox
+    ORDER BY last_message_at DESC, id DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================
+-- FONCTION: Marquer une conversation comme lue
+-- ============================================
+-- Retourne le nombre de messages marqués comme lus
+CREATE OR REPLACE FUNCTION mark_conversation_read(p_conversation_id UUID, p_user_id UUID)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE messages
+    SET is_read = TRUE, read_at = CURRENT_TIMESTAMP
+    WHERE conversation_id = p_conversation_id
+      AND sender_id <> p_user_id
+      AND is_read = FALSE;
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+
+    UPDATE conversations
+    SET user1_unread_count = CASE WHEN user1_id = p_user_id THEN 0 ELSE user1_unread_count END,
+        user2_unread_count = CASE WHEN user2_id = p_user_id THEN 0 ELSE user2_unread_count END
+    WHERE id = p_conversation_id;
+
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,5 @@
+-- Migration: index de pagination de l'historique des messages
+-- Utilisé par services/messaging_service.py (GET /api/messages/{conversation_id})
+
+-- Pagination keyset (created_at, id) par conversation, dans les deux sens
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_history ON messages(conversation_id, created_at DESC, id DESC);
@@ -0,0 +1,63 @@
+-- Migration: séries temporelles groupées des graphiques analytics
+-- Utilisé par services/timeseries_service.py (GET /api/analytics/*-chart)
+
+-- ============================================
+-- INDEX (plages de dates par périmètre)
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_sales_created_at ON sales(created_at);
+CREATE INDEX IF NOT EXISTS idx_sales_merchant_created_at ON sales(merchant_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_sales_affiliate_created_at ON sales(affiliate_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_commissions_influencer_created_at ON commissions(influencer_id, created_at);
+
+-- ============================================
+-- FONCTION: Série temporelle en une requête
+-- ============================================
+-- Un GROUP BY date_trunc sur [p_start, p_end). Les buckets vides sont
+-- complétés à zéro côté Python. totals[i] = SUM(p_value_columns[i]).
+CREATE OR REPLACE FUNCTION get_timeseries(
+    p_table TEXT,
+    p_time_column TEXT,
+    p_value_columns TEXT[],
+    p_bucket TEXT,
+    p_start TIMESTAMP,
+    p_end TIMESTAMP,
+    p_scope_column TEXT DEFAULT NULL,
+    p_scope_id TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    bucket DATE,
+    row_count BIGINT,
+    totals DECIMAL[]
+) AS $$
+DECLARE
+    v_sums TEXT;
+    v_scope TEXT := '';
+BEGIN
+    IF p_table NOT IN ('sales', 'commissions') THEN
+        RAISE EXCEPTION 'Unsupported table: %', p_table;
+    END IF;
+    IF p_bucket NOT IN ('day', 'week', 'month') THEN
+        RAISE EXCEPTION 'Unsupported bucket: %', p_bucket;
+    END IF;
+
+    SELECT COALESCE(string_agg(format('COALESCE(SUM(%I), 0)', c), ', '), '')
+    INTO v_sums
+    FROM unnest(p_value_columns) AS c;
+
+    IF p_scope_column IS NOT NULL THEN
+        v_scope := format(' AND %I::text = %L', p_scope_column, p_scope_id);
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT date_trunc(%L, %I)::date AS bucket, COUNT(*) AS row_count, ARRAY[%s]::DECIMAL[] AS totals
+         FROM %I
+         WHERE %I >= %L AND %I < %L%s
+         GROUP BY 1
+         ORDER BY 1',
+        p_bucket, p_time_column, v_sums,
+        p_table,
+        p_time_column, p_start, p_time_column, p_end, v_scope
+    );
+END;
+$$ LANGUAGE plpgsql STABLE;
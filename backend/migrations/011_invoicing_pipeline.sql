@@ -0,0 +1,44 @@
+-- Migration: pipeline de facturation mensuelle
+-- Utilisé par invoicing_service.py (InvoicingService.generate_monthly_invoices)
+
+-- ============================================
+-- INDEX
+-- ============================================
+
+-- Ventes d'un marchand sur une période, parcourues par id (keyset)
+CREATE INDEX IF NOT EXISTS idx_sales_invoicing
+    ON sales(merchant_id, id)
+    WHERE status = 'completed';
+
+-- Une seule facture par marchand et par période: la facture sert de checkpoint
+-- (draft -> pending -> sent) pour reprendre un run interrompu
+CREATE UNIQUE INDEX IF NOT EXISTS idx_platform_invoices_merchant_period
+    ON platform_invoices(merchant_id, period_start, period_end)
+    WHERE status <> 'cancelled';
+
+-- Lignes idempotentes: une page de lignes rejouée après reprise ne duplique rien
+CREATE UNIQUE INDEX IF NOT EXISTS idx_invoice_line_items_invoice_sale
+    ON invoice_line_items(invoice_id, sale_id);
+
+-- ============================================
+-- FONCTION: Totaux facturables par marchand en une requête
+-- ============================================
+CREATE OR REPLACE FUNCTION get_invoice_totals(p_start TIMESTAMP, p_end TIMESTAMP)
+RETURNS TABLE (
+    merchant_id UUID,
+    sales_count BIGINT,
+    total_sales_amount DECIMAL,
+    platform_commission DECIMAL
+) AS $$
+    SELECT
+        s.merchant_id,
+        COUNT(*) AS sales_count,
+        COALESCE(SUM(s.total_amount), 0) AS total_sales_amount,
+        COALESCE(SUM(s.platform_commission), 0) AS platform_commission
+    FROM sales s
+    WHERE s.status = 'completed'
+      AND s.created_at >= p_start
+      AND s.created_at < p_end
+      AND s.merchant_id IS NOT NULL
+    GROUP BY s.merchant_id;
+$$ LANGUAGE sql STABLE;
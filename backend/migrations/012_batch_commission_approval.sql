@@ -0,0 +1,172 @@
+-- Migration: approbation des commissions en lot
+-- Utilisé par services/payments/service.py (PaymentsService.batch_approve_commissions)
+--
+-- Mêmes règles de transition que approve_payout_transaction, appliquées à une
+-- liste d'ids en une seule transaction et en quelques requêtes ensemblistes
+-- (au lieu d'un appel RPC par commission). Chaque id reçoit son propre
+-- résultat: une commission refusée n'empêche pas les autres.
+--
+-- Le contrôle de solde est séquentiel, dans l'ordre de la liste: seule une
+-- commission acceptée consomme le solde de l'influenceur, comme une suite
+-- d'appels approve_payout_transaction (solde 100, [150, 50]: 150 refusée,
+-- 50 approuvée).
+
+-- ============================================
+-- FONCTION: Changement de statut d'une liste de commissions
+-- ============================================
+CREATE OR REPLACE FUNCTION approve_payout_batch(
+    p_commission_ids UUID[],
+    p_status TEXT DEFAULT 'approved'
+)
+RETURNS TABLE (
+    commission_id UUID,
+    success BOOLEAN,
+    error TEXT
+) AS $$
+DECLARE
+    v_row RECORD;
+    v_influencer UUID;
+    v_available NUMERIC;
+BEGIN
+    IF p_status NOT IN ('approved', 'paid', 'rejected', 'pending') THEN
+        RAISE EXCEPTION 'Statut % non supporté', p_status;
+    END IF;
+
+    -- Verrous dans un ordre stable: deux lots concurrents ne peuvent pas s'interbloquer
+    PERFORM 1
+    FROM influencers i
+    WHERE i.id IN (SELECT c.influencer_id FROM commissions c WHERE c.id = ANY(p_commission_ids))
+    ORDER BY i.id
+    FOR UPDATE;
+
+    PERFORM 1
+    FROM commissions c
+    WHERE c.id = ANY(p_commission_ids)
+    ORDER BY c.id
+    FOR UPDATE;
+
+    DROP TABLE IF EXISTS _payout_batch;
+
+    -- Une ligne par id demandé: état actuel + motif de refus éventuel
+    CREATE TEMP TABLE _payout_batch ON COMMIT DROP AS
+    WITH requested AS (
+        SELECT DISTINCT ON (r.id) r.id, r.ord
+        FROM unnest(p_commission_ids) WITH ORDINALITY AS r(id, ord)
+        ORDER BY r.id, r.ord
+    ),
+    current_state AS (
+        SELECT
+            r.id,
+            r.ord,
+            c.id IS NOT NULL AS found,
+            c.status AS old_status,
+            c.amount,
+            c.influencer_id,
+            i.balance,
+            s.merchant_id
+        FROM requested r
+        LEFT JOIN commissions c ON c.id = r.id
+        LEFT JOIN influencers i ON i.id = c.influencer_id
+        LEFT JOIN sales s ON s.id = c.sale_id
+    ),
+    checked AS (
+        SELECT
+            cs.*,
+            CASE
+                WHEN NOT cs.found THEN 'Commission introuvable'
+                WHEN cs.balance IS NULL THEN 'Influenceur introuvable pour la commission'
+                WHEN cs.old_status = 'paid' AND p_status <> 'paid'
+                    THEN 'La commission a déjà été réglée et ne peut pas changer de statut.'
+                WHEN cs.old_status = p_status THEN NULL
+                WHEN cs.amount <= 0 THEN 'Montant invalide pour la commission'
+                WHEN p_status = 'paid' AND cs.old_status <> 'approved'
+                    THEN 'La commission doit être approuvée avant d''être payée.'
+            END AS failure
+        FROM current_state cs
+    )
+    SELECT ch.id, ch.ord, ch.old_status, ch.amount, ch.influencer_id, ch.balance, ch.merchant_id, ch.failure
+    FROM checked ch;
+
+    -- Solde disponible par influenceur, dans l'ordre de la liste: une
+    -- commission refusée ne consomme rien
+    IF p_status = 'approved' THEN
+        FOR v_row IN
+            SELECT b.id, b.influencer_id, b.amount, b.balance
+            FROM _payout_batch b
+            WHERE b.failure IS NULL AND b.old_status = 'pending'
+            ORDER BY b.influencer_id, b.ord
+        LOOP
+            IF v_influencer IS DISTINCT FROM v_row.influencer_id THEN
+                v_influencer := v_row.influencer_id;
+                v_available := v_row.balance;
+            END IF;
+
+            IF v_row.amount > v_available THEN
+                UPDATE _payout_batch
+                SET failure = 'Solde insuffisant pour approuver la commission'
+                WHERE id = v_row.id;
+            ELSE
+                v_available := v_available - v_row.amount;
+            END IF;
+        END LOOP;
+    END IF;
+
+    -- Ajustement des soldes: une mise à jour par influenceur
+    UPDATE influencers i
+    SET balance = COALESCE(i.balance, 0) + d.delta
+    FROM (
+        SELECT
+            b.influencer_id,
+            SUM(
+                CASE
+                    WHEN p_status = 'approved' AND b.old_status = 'pending' THEN -b.amount
+                    WHEN p_status IN ('pending', 'rejected') AND b.old_status = 'approved' THEN b.amount
+                    ELSE 0
+                END
+            ) AS delta
+        FROM _payout_batch b
+        WHERE b.failure IS NULL AND b.old_status <> p_status
+        GROUP BY b.influencer_id
+    ) d
+    WHERE i.id = d.influencer_id
+      AND d.delta <> 0;
+
+    -- Commissions payées: une mise à jour par marchand
+    IF p_status = 'paid' THEN
+        UPDATE merchants m
+        SET
+            total_commission_paid = COALESCE(m.total_commission_paid, 0) + d.paid,
+            updated_at = NOW()
+        FROM (
+            SELECT b.merchant_id, SUM(b.amount) AS paid
+            FROM _payout_batch b
+            WHERE b.failure IS NULL AND b.old_status = 'approved' AND b.merchant_id IS NOT NULL
+            GROUP BY b.merchant_id
+        ) d
+        WHERE m.id = d.merchant_id;
+    END IF;
+
+    UPDATE commissions c
+    SET
+        status = p_status,
+        approved_at = CASE
+            WHEN p_status = 'approved' AND b.old_status = 'pending' THEN NOW()
+            WHEN p_status IN ('pending', 'rejected') THEN NULL
+            ELSE c.approved_at
+        END,
+        paid_at = CASE
+            WHEN p_status = 'paid' THEN NOW()
+            WHEN p_status IN ('pending', 'rejected') THEN NULL
+            ELSE c.paid_at
+        END
+    FROM _payout_batch b
+    WHERE c.id = b.id
+      AND b.failure IS NULL
+      AND b.old_status <> p_status;
+
+    RETURN QUERY
+    SELECT b.id, b.failure IS NULL, b.failure
+    FROM _payout_batch b
+    ORDER BY b.ord;
+END;
+$$ LANGUAGE plpgsql;
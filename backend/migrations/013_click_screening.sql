@@ -0,0 +1,21 @@
+-- Migration: signalement anti-fraude des clics
+-- Utilisé par tracking_service.py (TrackingService.track_click) via
+-- services/click_screening_service.py
+
+-- ============================================
+-- COLONNES
+-- ============================================
+
+-- Verdict calculé à l'ingestion: le clic est redirigé normalement mais marqué
+ALTER TABLE click_logs ADD COLUMN IF NOT EXISTS country VARCHAR(2);
+ALTER TABLE click_logs ADD COLUMN IF NOT EXISTS is_suspicious BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE click_logs ADD COLUMN IF NOT EXISTS fraud_flags TEXT[] NOT NULL DEFAULT '{}';
+
+-- ============================================
+-- INDEX
+-- ============================================
+
+-- Revue des clics signalés d'un influenceur (partiel: une faible part des clics)
+CREATE INDEX IF NOT EXISTS idx_click_logs_suspicious
+    ON click_logs(influencer_id, clicked_at DESC)
+    WHERE is_suspicious;
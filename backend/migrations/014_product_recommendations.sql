@@ -0,0 +1,163 @@
+-- Migration: recommandations produits item-item (filtrage collaboratif)
+-- Utilisé par services/product_recommendation_service.py et la tâche Celery
+-- celery_tasks.recommendation_tasks.refresh_product_recommendations
+
+-- Paniers:
+-- - visiteur (click_logs, même ip_address, clics non suspects): co-clic
+-- - client (sales, même customer_email, ventes non annulées): co-achat
+-- Deux produits d'un même panier co-occurrent une fois, avec le poids du
+-- type de panier (achat > clic). Les paniers de plus de p_max_basket produits
+-- (IP partagée, CGNAT, proxy d'entreprise) sont ignorés: peu de signal, et
+-- un coût quadratique en nombre de produits.
+
+-- ============================================
+-- TABLES
+-- ============================================
+
+-- Co-occurrences, stockées dans les deux sens (lecture par produit)
+CREATE TABLE IF NOT EXISTS product_cooccurrence (
+    product_a UUID NOT NULL,
+    product_b UUID NOT NULL,
+    weight REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (product_a, product_b)
+);
+
+-- Poids total des paniers contenant chaque produit (normalisation cosinus)
+CREATE TABLE IF NOT EXISTS product_interaction_totals (
+    product_id UUID PRIMARY KEY,
+    weight REAL NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Index servi en mémoire: top-K voisins par produit, une ligne par produit
+CREATE TABLE IF NOT EXISTS product_neighbors (
+    product_id UUID PRIMARY KEY,
+    neighbor_ids UUID[] NOT NULL,
+    scores REAL[] NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Curseur du calcul incrémental (une seule ligne)
+CREATE TABLE IF NOT EXISTS product_cooccurrence_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    processed_until TIMESTAMP NOT NULL
+);
+
+-- ============================================
+-- INDEX
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_product_neighbors_updated_at ON product_neighbors(updated_at, product_id);
+CREATE INDEX IF NOT EXISTS idx_product_interaction_totals_weight ON product_interaction_totals(weight DESC);
+CREATE INDEX IF NOT EXISTS idx_click_logs_clicked_at ON click_logs(clicked_at);
+CREATE INDEX IF NOT EXISTS idx_click_logs_ip_address ON click_logs(ip_address);
+CREATE INDEX IF NOT EXISTS idx_sales_customer_email ON sales(customer_email) WHERE customer_email IS NOT NULL;
+
+-- ============================================
+-- TRIGGER: updated_at attribué par la base
+-- ============================================
+-- Horodatage par ligne (clock_timestamp, pas NOW()): une tranche d'upsert
+-- écrite après un rechargement des workers a un updated_at postérieur au
+-- dernier lu, le rechargement incrémental (updated_at >=) ne la manque pas.
+CREATE OR REPLACE FUNCTION set_product_neighbors_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_product_neighbors_updated_at ON product_neighbors;
+CREATE TRIGGER trigger_product_neighbors_updated_at
+    BEFORE INSERT OR UPDATE ON product_neighbors
+    FOR EACH ROW
+    EXECUTE FUNCTION set_product_neighbors_updated_at();
+
+-- ============================================
+-- FONCTION: Cumul incrémental des co-occurrences
+-- ============================================
+-- Traite les interactions de [processed_until, p_until): seuls les paniers
+-- ayant une interaction dans cette fenêtre sont relus (historique complet).
+-- Une paire (a, b) d'un panier est comptée quand la plus récente des deux
+-- premières interactions tombe dans la fenêtre: chaque paire n'est comptée
+-- qu'une fois, quel que soit le découpage des exécutions.
+--
+-- Retourne les produits dont les co-occurrences ont changé (à recalculer).
+CREATE OR REPLACE FUNCTION accumulate_product_cooccurrence(
+    p_until TIMESTAMP DEFAULT NOW(),
+    p_click_weight REAL DEFAULT 1.0,
+    p_sale_weight REAL DEFAULT 3.0,
+    p_max_basket INTEGER DEFAULT 50
+)
+RETURNS TABLE (product_id UUID) AS $$
+DECLARE
+    v_since TIMESTAMP;
+BEGIN
+    SELECT s.processed_until INTO v_since FROM product_cooccurrence_state s WHERE s.id FOR UPDATE;
+    v_since := COALESCE(v_since, '-infinity'::TIMESTAMP);
+    IF v_since >= p_until THEN
+        RETURN;
+    END IF;
+
+    -- Paniers touchés dans la fenêtre
+    CREATE TEMP TABLE _reco_visitors ON COMMIT DROP AS
+        SELECT DISTINCT cl.ip_address
+        FROM click_logs cl
+        WHERE cl.clicked_at >= v_since AND cl.clicked_at < p_until
+          AND NOT cl.is_suspicious AND cl.ip_address IS NOT NULL;
+
+    CREATE TEMP TABLE _reco_customers ON COMMIT DROP AS
+        SELECT DISTINCT s.customer_email
+        FROM sales s
+        WHERE s.created_at >= v_since AND s.created_at < p_until
+          AND s.customer_email IS NOT NULL AND s.status IN ('pending', 'completed');
+
+    -- Première interaction de chaque (panier, produit), sur tout l'historique du panier
+    CREATE TEMP TABLE _reco_interactions ON COMMIT DROP AS
+        SELECT 'v:' || cl.ip_address::TEXT AS basket, tl.product_id, MIN(cl.clicked_at) AS first_at, p_click_weight AS weight
+        FROM _reco_visitors v
+        JOIN click_logs cl ON cl.ip_address = v.ip_address
+        JOIN tracking_links tl ON tl.id = cl.link_id
+        WHERE NOT cl.is_suspicious AND cl.clicked_at < p_until AND tl.product_id IS NOT NULL
+        GROUP BY 1, 2
+        UNION ALL
+        SELECT 'c:' || s.customer_email, s.product_id, MIN(s.created_at), p_sale_weight
+        FROM _reco_customers c
+        JOIN sales s ON s.customer_email = c.customer_email
+        WHERE s.status IN ('pending', 'completed') AND s.created_at < p_until AND s.product_id IS NOT NULL
+        GROUP BY 1, 2;
+
+    -- Paniers trop grands: ni paires ni totaux (avant l'auto-jointure)
+    DELETE FROM _reco_interactions i
+    WHERE i.basket IN (
+        SELECT x.basket FROM _reco_interactions x GROUP BY x.basket HAVING COUNT(*) > p_max_basket
+    );
+
+    CREATE TEMP TABLE _reco_pairs ON COMMIT DROP AS
+        SELECT a.product_id AS product_a, b.product_id AS product_b, SUM(a.weight) AS weight
+        FROM _reco_interactions a
+        JOIN _reco_interactions b ON b.basket = a.basket AND b.product_id <> a.product_id
+        WHERE GREATEST(a.first_at, b.first_at) >= v_since
+        GROUP BY 1, 2;
+
+    INSERT INTO product_cooccurrence (product_a, product_b, weight)
+    SELECT p.product_a, p.product_b, p.weight FROM _reco_pairs p
+    ON CONFLICT (product_a, product_b)
+    DO UPDATE SET weight = product_cooccurrence.weight + EXCLUDED.weight;
+
+    INSERT INTO product_interaction_totals (product_id, weight)
+    SELECT i.product_id, SUM(i.weight) FROM _reco_interactions i
+    WHERE i.first_at >= v_since
+    GROUP BY 1
+    ON CONFLICT (product_id)
+    DO UPDATE SET weight = product_interaction_totals.weight + EXCLUDED.weight, updated_at = NOW();
+
+    INSERT INTO product_cooccurrence_state (id, processed_until) VALUES (TRUE, p_until)
+    ON CONFLICT (id) DO UPDATE SET processed_until = EXCLUDED.processed_until;
+
+    RETURN QUERY
+        SELECT i.product_id FROM _reco_interactions i WHERE i.first_at >= v_since
+        UNION
+        SELECT p.product_a FROM _reco_pairs p;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,138 @@
+-- Migration: prévisions de ventes par influenceur et par marchand
+-- Utilisé par services/forecast_service.py (dashboard prédictif) et la tâche
+-- Celery celery_tasks.forecast_tasks.fit_sales_forecasts
+
+-- ============================================
+-- TABLES
+-- ============================================
+
+-- Paramètres compacts du modèle (tendance linéaire + saisonnalité hebdomadaire),
+-- une ligne par (entité, métrique), réajustés chaque nuit
+CREATE TABLE IF NOT EXISTS sales_forecasts (
+    entity_type VARCHAR(20) NOT NULL CHECK (entity_type IN ('influencer', 'merchant')),
+    entity_id UUID NOT NULL,
+    metric VARCHAR(20) NOT NULL CHECK (metric IN ('revenue', 'conversions', 'clicks')),
+    level REAL NOT NULL,            -- niveau de tendance au dernier jour ajusté
+    slope REAL NOT NULL,            -- pente par jour
+    seasonal REAL[] NOT NULL,       -- 7 écarts additifs, lundi..dimanche
+    sigma REAL NOT NULL,            -- écart-type des résidus (jour)
+    recent_totals REAL[] NOT NULL,  -- totaux des 7, 30, 90 et 365 derniers jours
+    fitted_through DATE NOT NULL,   -- dernier jour complet utilisé
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (entity_type, entity_id, metric)
+);
+
+-- Séries de l'ajustement nocturne, calculées une fois par
+-- stage_entity_daily_series puis lues par pages (clé primaire). Table de
+-- travail reconstruite à chaque ajustement: non journalisée.
+CREATE UNLOGGED TABLE IF NOT EXISTS entity_daily_series (
+    entity_type TEXT NOT NULL,
+    entity_id UUID NOT NULL,
+    days INTEGER[] NOT NULL,
+    revenue REAL[] NOT NULL,
+    conversions REAL[] NOT NULL,
+    clicks REAL[] NOT NULL,
+    PRIMARY KEY (entity_type, entity_id)
+);
+
+-- ============================================
+-- INDEX
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_sales_influencer_created_at ON sales(influencer_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_click_logs_influencer_clicked_at ON click_logs(influencer_id, clicked_at);
+
+-- ============================================
+-- FONCTION: Séries journalières par entité
+-- ============================================
+-- Une ligne par entité active sur [p_start, p_end): jours (décalage depuis
+-- p_start) et valeurs en tableaux parallèles, jours sans activité omis.
+-- Sans filtre: toutes les entités (ajustement nocturne, via
+-- stage_entity_daily_series); avec filtre: une seule entité (mise à jour du
+-- jour par le dashboard). Le filtre est appliqué dans chaque branche de
+-- l'UNION pour que les index (influencer_id, created_at / clicked_at) servent.
+CREATE OR REPLACE FUNCTION get_entity_daily_series(
+    p_start DATE,
+    p_end TIMESTAMP,
+    p_entity_type TEXT DEFAULT NULL,
+    p_entity_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    entity_type TEXT,
+    entity_id UUID,
+    days INTEGER[],
+    revenue REAL[],
+    conversions REAL[],
+    clicks REAL[]
+) AS $$
+    WITH events AS (
+        SELECT 'influencer' AS entity_type, s.influencer_id AS entity_id, s.created_at::DATE AS day,
+               s.amount AS revenue, 1 AS conversions, 0 AS clicks
+        FROM sales s
+        WHERE (p_entity_type IS NULL OR p_entity_type = 'influencer')
+          AND (p_entity_id IS NULL OR s.influencer_id = p_entity_id)
+          AND s.influencer_id IS NOT NULL AND s.status IN ('pending', 'completed')
+          AND s.created_at >= p_start AND s.created_at < p_end
+        UNION ALL
+        SELECT 'merchant', s.merchant_id, s.created_at::DATE, s.amount, 1, 0
+        FROM sales s
+        WHERE (p_entity_type IS NULL OR p_entity_type = 'merchant')
+          AND (p_entity_id IS NULL OR s.merchant_id = p_entity_id)
+          AND s.merchant_id IS NOT NULL AND s.status IN ('pending', 'completed')
+          AND s.created_at >= p_start AND s.created_at < p_end
+        UNION ALL
+        SELECT 'influencer', cl.influencer_id, cl.clicked_at::DATE, 0, 0, 1
+        FROM click_logs cl
+        WHERE (p_entity_type IS NULL OR p_entity_type = 'influencer')
+          AND (p_entity_id IS NULL OR cl.influencer_id = p_entity_id)
+          AND cl.influencer_id IS NOT NULL AND NOT cl.is_suspicious
+          AND cl.clicked_at >= p_start AND cl.clicked_at < p_end
+        UNION ALL
+        SELECT 'merchant', p.merchant_id, cl.clicked_at::DATE, 0, 0, 1
+        FROM click_logs cl
+        JOIN tracking_links tl ON tl.id = cl.link_id
+        JOIN products p ON p.id = tl.product_id
+        WHERE (p_entity_type IS NULL OR p_entity_type = 'merchant')
+          AND (p_entity_id IS NULL OR p.merchant_id = p_entity_id)
+          AND NOT cl.is_suspicious
+          AND cl.clicked_at >= p_start AND cl.clicked_at < p_end
+    ),
+    daily AS (
+        SELECT e.entity_type, e.entity_id, e.day,
+               SUM(e.revenue)::REAL AS revenue, SUM(e.conversions)::REAL AS conversions, SUM(e.clicks)::REAL AS clicks
+        FROM events e
+        GROUP BY 1, 2, 3
+    )
+    SELECT d.entity_type, d.entity_id,
+           array_agg(d.day - p_start ORDER BY d.day),
+           array_agg(d.revenue ORDER BY d.day),
+           array_agg(d.conversions ORDER BY d.day),
+           array_agg(d.clicks ORDER BY d.day)
+    FROM daily d
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================
+-- FONCTION: Séries de toutes les entités (ajustement nocturne)
+-- ============================================
+-- Agrégation calculée une seule fois dans entity_daily_series; le service
+-- lit ensuite la table par pages au lieu de relancer l'agrégation complète
+-- pour chaque page. Retourne le nombre d'entités.
+CREATE OR REPLACE FUNCTION stage_entity_daily_series(
+    p_start DATE,
+    p_end TIMESTAMP
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    TRUNCATE entity_daily_series;
+
+    INSERT INTO entity_daily_series (entity_type, entity_id, days, revenue, conversions, clicks)
+    SELECT * FROM get_entity_daily_series(p_start, p_end);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql;
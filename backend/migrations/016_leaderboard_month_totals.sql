@@ -0,0 +1,48 @@
+-- Migration: agrégats mensuels des classements influenceurs
+-- Utilisé par services/leaderboard_service.py (LeaderboardService.rebuild) et la
+-- tâche Celery celery_tasks.leaderboard_tasks.rebuild_leaderboards
+
+-- ============================================
+-- INDEX
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_commissions_approved_at ON commissions(approved_at)
+    WHERE status IN ('approved', 'paid');
+
+-- ============================================
+-- FONCTION: Totaux du mois par influenceur
+-- ============================================
+-- Mêmes règles que les mises à jour au fil de l'eau: commissions validées
+-- (approved puis éventuellement paid) datées par approved_at, clics non
+-- suspects datés par clicked_at.
+CREATE OR REPLACE FUNCTION get_leaderboard_month_totals(
+    p_start TIMESTAMP,
+    p_end TIMESTAMP
+)
+RETURNS TABLE (
+    influencer_id UUID,
+    earnings NUMERIC,
+    sales BIGINT,
+    clicks BIGINT
+) AS $$
+    WITH earned AS (
+        SELECT c.influencer_id, SUM(c.amount) AS earnings, COUNT(*) AS sales
+        FROM commissions c
+        WHERE c.status IN ('approved', 'paid')
+          AND c.approved_at >= p_start AND c.approved_at < p_end
+        GROUP BY c.influencer_id
+    ),
+    clicked AS (
+        SELECT cl.influencer_id, COUNT(*) AS clicks
+        FROM click_logs cl
+        WHERE cl.influencer_id IS NOT NULL AND NOT cl.is_suspicious
+          AND cl.clicked_at >= p_start AND cl.clicked_at < p_end
+        GROUP BY cl.influencer_id
+    )
+    SELECT COALESCE(e.influencer_id, k.influencer_id),
+           COALESCE(e.earnings, 0),
+           COALESCE(e.sales, 0),
+           COALESCE(k.clicks, 0)
+    FROM earned e
+    FULL OUTER JOIN clicked k ON k.influencer_id = e.influencer_id;
+$$ LANGUAGE sql STABLE;
@@ -18,6 +18,7 @@ from mobile_payment_service import (
 from auth import get_current_user
 # from db_helpers import log_user_activity, get_user_balance  # TODO: Implémenter dans db_helpers
 from supabase_client import supabase
+from services.user_context_service import user_context_service
 
 router = APIRouter(prefix="/api/mobile-payments", tags=["Mobile Payments"])
 
@@ -115,6 +116,7 @@ async def request_payout(
             supabase.table("users").update({
                 "balance": user_balance - request.amount
             }).eq("id", current_user["id"]).execute()
+            user_context_service.invalidate(current_user["id"])
 
         # Logger l'activité
         await log_user_activity(
@@ -12,7 +12,7 @@ from datetime import datetime
 import os
 
 from auth import get_current_user, role_checker
-from moderation_service import moderate_product, ModerationStats
+from moderation_service import moderate_product, moderate_products, ModerationStats
 
 # Configuration Supabase
 from supabase import create_client, Client
@@ -56,6 +56,24 @@ class BulkModerationRequest(BaseModel):
             raise ValueError("Decision must be 'approve' or 'reject'")
         return v
 
+class ProductToModerate(BaseModel):
+    """Produit à modérer (import de catalogue)"""
+    product_name: str
+    description: str
+    category: Optional[str] = None
+    price: Optional[float] = None
+    images_urls: Optional[List[str]] = None
+
+class BatchModerationTestRequest(BaseModel):
+    """Request pour modérer un lot de produits"""
+    products: List[ProductToModerate]
+    
+    @validator('products')
+    def validate_products(cls, v):
+        if len(v) > 500:
+            raise ValueError("Maximum 500 products per batch")
+        return v
+
 # ============================================
 # ENDPOINTS ADMIN
 # ============================================
@@ -440,3 +458,30 @@ async def test_moderation_service(
     except Exception as e:
         print(f"❌ Error in test moderation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/test-moderation/batch")
+async def test_batch_moderation(
+    request: BatchModerationTestRequest,
+    current_user: dict = Depends(role_checker(["admin"]))
+):
+    """
+    Modérer un lot de produits (pré-filtre + cache + IA par lots)
+    """
+    try:
+        results = await moderate_products([p.dict() for p in request.products], use_ai=True)
+        
+        methods: Dict[str, int] = {}
+        for result in results:
+            method = result.get("moderation_method", "unknown")
+            methods[method] = methods.get(method, 0) + 1
+        
+        return {
+            "results": results,
+            "total": len(results),
+            "approved": sum(1 for r in results if r["approved"]),
+            "by_method": methods
+        }
+        
+    except Exception as e:
+        print(f"❌ Error in batch moderation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
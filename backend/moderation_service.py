@@ -3,12 +3,24 @@
 SERVICE DE MODÉRATION IA POUR PRODUITS
 Utilise OpenAI pour détecter contenu inapproprié
 ============================================
+
+Pipeline en deux étapes:
+1. Pré-filtre mots-clés compilé (une seule regex) → rejet immédiat des cas évidents
+2. IA par lots → plusieurs produits par appel OpenAI
+
+Les verdicts sont mis en cache par empreinte du contenu normalisé:
+une ré-édition sans changement ou un doublon ne repasse pas par l'IA.
 """
 
 import os
-from typing import Dict, Any, Optional
-from openai import OpenAI
+import re
 import json
+import asyncio
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+from services.llm_gateway import llm_gateway
 
 # Configuration OpenAI
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -17,7 +29,22 @@ if not OPENAI_API_KEY:
     print("⚠️ Warning: OpenAI API key not configured for content moderation")
     client = None
 else:
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    # Client SDK sur le pool de connexions partagé de la passerelle LLM
+    client = llm_gateway.openai_client(OPENAI_API_KEY)
+
+MODERATION_MODEL = "gpt-4o-mini"  # Modèle rapide et économique
+
+# Lots IA: nombre max de produits par appel et attente max avant envoi
+AI_BATCH_SIZE = int(os.getenv("MODERATION_AI_BATCH_SIZE", "20"))
+AI_BATCH_WAIT_SECONDS = float(os.getenv("MODERATION_AI_BATCH_WAIT", "0.05"))
+AI_MAX_CONCURRENT_BATCHES = int(os.getenv("MODERATION_AI_MAX_CONCURRENT", "4"))
+
+# Approuver sans IA un contenu sans aucun mot-clé suspect
+PREFILTER_APPROVE_CLEAN = os.getenv("MODERATION_PREFILTER_APPROVE_CLEAN", "false").lower() == "true"
+
+# Cache des verdicts
+VERDICT_CACHE_SIZE = int(os.getenv("MODERATION_VERDICT_CACHE_SIZE", "10000"))
+VERDICT_CACHE_TTL = 30 * 24 * 3600  # 30 jours (Redis)
 
 # ============================================
 # CATÉGORIES INTERDITES
@@ -45,6 +72,26 @@ PROHIBITED_CATEGORIES = {
 # MODÉRATION IA
 # ============================================
 
+MODERATION_CRITERIA = """CRITÈRES D'INTERDICTION:
+1. Contenu sexuel, adulte ou +18
+2. Armes, explosifs, munitions
+3. Drogues ou substances illicites
+4. Jeux d'argent illégaux
+5. Produits contrefaits ou faux documents
+6. Contenu haineux ou discriminatoire
+7. Contenu violent ou gore
+8. Services illégaux (piratage, fraude, blanchiment)
+9. Tabac ou cigarettes électroniques non autorisées
+10. Alcool sans licence de vente
+11. Médicaments non autorisés ou fausses promesses médicales
+12. Schémas pyramidaux ou MLM frauduleux
+13. Biens volés ou recel
+14. Espèces animales protégées
+15. Vente de données personnelles"""
+
+MODERATION_SYSTEM_PROMPT = "Tu es un expert en modération de contenu e-commerce. Tu réponds UNIQUEMENT en JSON valide, sans markdown ni texte supplémentaire."
+
+
 async def moderate_product_with_ai(
     product_name: str,
     description: str,
@@ -83,22 +130,7 @@ async def moderate_product_with_ai(
         prompt = f"""Tu es un système de modération de contenu pour une plateforme e-commerce au Maroc.
 Analyse ce produit/service et détermine s'il est ACCEPTABLE ou INACCEPTABLE selon les critères suivants:
 
-CRITÈRES D'INTERDICTION:
-1. Contenu sexuel, adulte ou +18
-2. Armes, explosifs, munitions
-3. Drogues ou substances illicites
-4. Jeux d'argent illégaux
-5. Produits contrefaits ou faux documents
-6. Contenu haineux ou discriminatoire
-7. Contenu violent ou gore
-8. Services illégaux (piratage, fraude, blanchiment)
-9. Tabac ou cigarettes électroniques non autorisées
-10. Alcool sans licence de vente
-11. Médicaments non autorisés ou fausses promesses médicales
-12. Schémas pyramidaux ou MLM frauduleux
-13. Biens volés ou recel
-14. Espèces animales protégées
-15. Vente de données personnelles
+{MODERATION_CRITERIA}
 
 PRODUIT À ANALYSER:
 - Nom: {product_name}
@@ -124,12 +156,12 @@ FORMAT DE RÉPONSE (JSON STRICT):
 }}"""
 
         # Appel à l'API OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Modèle rapide et économique
+        response = await client.chat.completions.create(
+            model=MODERATION_MODEL,
             messages=[
                 {
                     "role": "system",
-                    "content": "Tu es un expert en modération de contenu e-commerce. Tu réponds UNIQUEMENT en JSON valide, sans markdown ni texte supplémentaire."
+                    "content": MODERATION_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
@@ -153,12 +185,7 @@ FORMAT DE RÉPONSE (JSON STRICT):
             result = json.loads(result_text)
         
         # Validation et enrichissement
-        result.setdefault("approved", True)
-        result.setdefault("confidence", 0.5)
-        result.setdefault("risk_level", "low")
-        result.setdefault("flags", [])
-        result.setdefault("reason", "")
-        result.setdefault("recommendation", "Approved")
+        _apply_verdict_defaults(result)
         
         # Log pour monitoring
         status = "✅ APPROVED" if result["approved"] else "❌ REJECTED"
@@ -172,14 +199,30 @@ FORMAT DE RÉPONSE (JSON STRICT):
     except Exception as e:
         print(f"❌ Error in AI moderation: {e}")
         # En cas d'erreur, rejeter par précaution
-        return {
-            "approved": False,
-            "confidence": 0.0,
-            "risk_level": "unknown",
-            "flags": ["ai_error"],
-            "reason": f"Erreur de modération IA: {str(e)}. Nécessite révision manuelle.",
-            "recommendation": "Manual review required due to AI error"
-        }
+        return _ai_error_verdict(e)
+
+
+def _apply_verdict_defaults(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Compléter un verdict IA avec les valeurs par défaut"""
+    result.setdefault("approved", True)
+    result.setdefault("confidence", 0.5)
+    result.setdefault("risk_level", "low")
+    result.setdefault("flags", [])
+    result.setdefault("reason", "")
+    result.setdefault("recommendation", "Approved")
+    return result
+
+
+def _ai_error_verdict(error: Exception) -> Dict[str, Any]:
+    """Verdict de rejet par précaution en cas d'erreur IA (jamais mis en cache)"""
+    return {
+        "approved": False,
+        "confidence": 0.0,
+        "risk_level": "unknown",
+        "flags": ["ai_error"],
+        "reason": f"Erreur de modération IA: {str(error)}. Nécessite révision manuelle.",
+        "recommendation": "Manual review required due to AI error"
+    }
 
 # ============================================
 # MODÉRATION PAR MOTS-CLÉS (FALLBACK)
@@ -212,25 +255,62 @@ PROHIBITED_KEYWORDS = {
     ]
 }
 
+# Mots ultra-interdits qui déclenchent un rejet immédiat (sans IA)
+INSTANT_REJECT_KEYWORDS = [
+    "porn", "xxx", "sexe", "drogue", "cannabis", "cocaine",
+    "arme", "pistolet", "explosif", "escort", "casino"
+]
+
+
+def _compile_keyword_pattern(keywords_by_category: Dict[str, List[str]]) -> "re.Pattern":
+    """
+    Compiler tous les mots-clés en une seule regex (un groupe nommé par catégorie)
+
+    Les mots-clés sont des préfixes de mots ("vibr" couvre "vibromasseur"),
+    la frontière de mot à gauche évite les faux positifs ("charme" ≠ "arme").
+    Un seul passage sur le texte, quel que soit le nombre de mots-clés.
+    """
+    groups = []
+    for category, keywords in keywords_by_category.items():
+        alternatives = "|".join(
+            re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True)
+        )
+        groups.append(f"(?P<{category}>{alternatives})")
+    return re.compile(r"\b(?:" + "|".join(groups) + ")", re.IGNORECASE)
+
+
+PROHIBITED_KEYWORDS_PATTERN = _compile_keyword_pattern(PROHIBITED_KEYWORDS)
+INSTANT_REJECT_PATTERN = _compile_keyword_pattern({"instant_reject": INSTANT_REJECT_KEYWORDS})
+
+
+def scan_prohibited_keywords(text: str) -> Tuple[List[str], bool]:
+    """
+    Scanner un texte avec la regex compilée
+
+    Returns:
+        (catégories détectées, rejet immédiat)
+    """
+    flags = []
+    for match in PROHIBITED_KEYWORDS_PATTERN.finditer(text):
+        if match.lastgroup not in flags:
+            flags.append(match.lastgroup)
+
+    instant_reject = bool(flags) and INSTANT_REJECT_PATTERN.search(text) is not None
+    return flags, instant_reject
+
+
 def moderate_product_keywords(product_name: str, description: str) -> Dict[str, Any]:
     """
     Modération basique par mots-clés (fallback si pas d'IA)
     """
-    text = f"{product_name} {description}".lower()
-    flags = []
-    
-    for category, keywords in PROHIBITED_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in text:
-                flags.append(category)
-                break
+    flags, _ = scan_prohibited_keywords(f"{product_name} {description}")
     
     if flags:
         return {
             "approved": False,
             "confidence": 0.7,
             "risk_level": "high",
-            "flags": list(set(flags)),
+            "flags": flags,
             "reason": f"Mots-clés interdits détectés: {', '.join(flags)}",
             "recommendation": "Manual review required - keyword match"
         }
@@ -244,6 +324,234 @@ def moderate_product_keywords(product_name: str, description: str) -> Dict[str,
         "recommendation": "Approved by keyword filter"
     }
 
+# ============================================
+# CACHE DES VERDICTS
+# ============================================
+
+def normalize_content(*parts: Optional[str]) -> str:
+    """
+    Normaliser un contenu pour le hash: minuscules, sans accents,
+    sans ponctuation, espaces compactés
+    """
+    text = " ".join(p for p in parts if p).lower()
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w]+", " ", text)
+    return " ".join(text.split())
+
+
+def content_hash(product_name: str, description: str, category: Optional[str] = None) -> str:
+    """Empreinte SHA-256 du contenu normalisé d'un produit"""
+    normalized = normalize_content(product_name, description, category)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """
+    Cache des verdicts de modération
+
+    LRU en mémoire devant le cache Redis partagé (services.cache_service),
+    si disponible. Les verdicts d'erreur IA ne sont jamais mis en cache.
+    """
+
+    def __init__(self, max_size: int = VERDICT_CACHE_SIZE):
+        self.max_size = max_size
+        self._local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._shared = None
+
+        try:
+            from services.cache_service import cache
+            self._shared = cache
+        except Exception:
+            self._shared = None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        verdict = self._local.get(key)
+        if verdict is not None:
+            self._local.move_to_end(key)
+            return dict(verdict)
+
+        if self._shared is not None:
+            verdict = self._shared.get(f"moderation:{key}")
+            if verdict is not None:
+                self._remember(key, verdict)
+                return dict(verdict)
+
+        return None
+
+    def set(self, key: str, verdict: Dict[str, Any]):
+        if "ai_error" in verdict.get("flags", []):
+            return
+
+        self._remember(key, verdict)
+        if self._shared is not None:
+            self._shared.set(f"moderation:{key}", verdict, ttl=VERDICT_CACHE_TTL)
+
+    def _remember(self, key: str, verdict: Dict[str, Any]):
+        self._local[key] = dict(verdict)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_size:
+            self._local.popitem(last=False)
+
+    def clear(self):
+        self._local.clear()
+
+
+verdict_cache = VerdictCache()
+
+# ============================================
+# MODÉRATION IA PAR LOTS
+# ============================================
+
+async def moderate_products_batch_with_ai(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Analyser plusieurs produits en un seul appel OpenAI
+
+    Args:
+        products: Liste de dicts {product_name, description, category, price, images_urls}
+
+    Returns:
+        Verdicts dans l'ordre des produits
+    """
+    items = [
+        {
+            "id": i,
+            "nom": p["product_name"],
+            "description": p["description"],
+            "categorie": p.get("category") or "Non spécifiée",
+            "prix_mad": p.get("price"),
+            "images": bool(p.get("images_urls")),
+        }
+        for i, p in enumerate(products)
+    ]
+
+    prompt = f"""Tu es un système de modération de contenu pour une plateforme e-commerce au Maroc.
+Analyse CHAQUE produit/service ci-dessous et détermine s'il est ACCEPTABLE ou INACCEPTABLE selon les critères suivants:
+
+{MODERATION_CRITERIA}
+
+PRODUITS À ANALYSER (JSON):
+{json.dumps(items, ensure_ascii=False)}
+
+INSTRUCTIONS:
+1. Analyse le nom et la description de chaque produit indépendamment
+2. Vérifie les termes cachés, euphémismes ou codes
+3. Évalue le risque selon le contexte marocain et la loi islamique
+4. Retourne UNIQUEMENT un JSON valide (pas de markdown, pas de texte avant/après)
+
+FORMAT DE RÉPONSE (JSON STRICT), un résultat par id:
+{{
+    "results": [
+        {{
+            "id": 0,
+            "approved": true/false,
+            "confidence": 0.0-1.0,
+            "risk_level": "low"|"medium"|"high"|"critical",
+            "flags": ["categorie1", ...],
+            "reason": "Explication détaillée si rejeté",
+            "recommendation": "Action recommandée"
+        }}
+    ]
+}}"""
+
+    try:
+        response = await client.chat.completions.create(
+            model=MODERATION_MODEL,
+            messages=[
+                {"role": "system", "content": MODERATION_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.1,
+            max_tokens=200 + 250 * len(products),
+            response_format={"type": "json_object"}
+        )
+
+        result_text = response.choices[0].message.content.strip()
+        result_text = result_text.replace("```json", "").replace("```", "").strip()
+        results_by_id = {
+            r.get("id"): r for r in json.loads(result_text).get("results", [])
+        }
+
+    except Exception as e:
+        print(f"❌ Error in AI batch moderation ({len(products)} products): {e}")
+        return [_ai_error_verdict(e) for _ in products]
+
+    verdicts = []
+    for i in range(len(products)):
+        verdict = results_by_id.get(i)
+        if verdict is None:
+            verdicts.append(_ai_error_verdict(ValueError("résultat manquant dans la réponse IA")))
+            continue
+        verdict.pop("id", None)
+        verdicts.append(_apply_verdict_defaults(verdict))
+
+    print(f"🤖 AI batch moderation: {len(products)} products in 1 call")
+    return verdicts
+
+
+class ModerationBatcher:
+    """
+    Regroupe les vérifications IA en attente
+
+    Les appels concurrents (endpoints, imports de catalogue) sont accumulés
+    pendant au plus `max_wait` secondes ou jusqu'à `batch_size` produits,
+    puis envoyés en un seul appel OpenAI.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AI_BATCH_SIZE,
+        max_wait: float = AI_BATCH_WAIT_SECONDS,
+        max_concurrent: int = AI_MAX_CONCURRENT_BATCHES
+    ):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_concurrent = max_concurrent
+        self._pending: List[Tuple[Dict[str, Any], "asyncio.Future"]] = []
+        self._flush_handle: Optional["asyncio.TimerHandle"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def submit(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """Ajouter un produit au prochain lot et attendre son verdict"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((product, future))
+
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+        if self._pending:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    async def _run(self, batch: List[Tuple[Dict[str, Any], "asyncio.Future"]]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async with self._semaphore:
+            try:
+                verdicts = await moderate_products_batch_with_ai([p for p, _ in batch])
+            except Exception as e:
+                verdicts = [_ai_error_verdict(e) for _ in batch]
+
+        for (_, future), verdict in zip(batch, verdicts):
+            if not future.done():
+                future.set_result(verdict)
+
+
+moderation_batcher = ModerationBatcher()
+
 # ============================================
 # FONCTION PRINCIPALE
 # ============================================
@@ -282,20 +590,114 @@ async def moderate_product(
             "recommendation": "Reject - incomplete product information"
         }
     
-    # Modération par IA si disponible
-    if use_ai and client:
-        result = await moderate_product_with_ai(
-            product_name, description, category, price, images_urls
-        )
-    else:
-        # Fallback sur mots-clés
-        result = moderate_product_keywords(product_name, description)
-    
-    # Ajouter metadata
-    result["moderation_method"] = "ai" if (use_ai and client) else "keywords"
-    result["product_name"] = product_name
-    
-    return result
+    product = {
+        "product_name": product_name,
+        "description": description,
+        "category": category,
+        "price": price,
+        "images_urls": images_urls,
+    }
+
+    return (await moderate_products([product], use_ai=use_ai))[0]
+
+
+async def moderate_products(
+    products: List[Dict[str, Any]],
+    use_ai: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Modérer une liste de produits (imports de catalogue)
+
+    Étape 1: pré-filtre mots-clés + cache des verdicts (sans appel réseau)
+    Étape 2: produits restants envoyés à l'IA par lots
+
+    Args:
+        products: Liste de dicts {product_name, description, category, price, images_urls}
+        use_ai: Utiliser l'IA OpenAI (si False, utilise mots-clés)
+
+    Returns:
+        Verdicts dans l'ordre des produits
+    """
+    ai_enabled = bool(use_ai and client)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(products)
+    pending: List[Tuple[int, str]] = []
+
+    for i, product in enumerate(products):
+        name = product.get("product_name")
+        description = product.get("description")
+
+        if not name or not description:
+            result = {
+                "approved": False,
+                "confidence": 1.0,
+                "risk_level": "critical",
+                "flags": ["incomplete_data"],
+                "reason": "Nom ou description manquant",
+                "recommendation": "Reject - incomplete product information",
+                "moderation_method": "validation"
+            }
+        elif not ai_enabled:
+            result = moderate_product_keywords(name, description)
+            result["moderation_method"] = "keywords"
+        else:
+            result = _prefilter_verdict(name, description)
+            if result is None:
+                key = content_hash(name, description, product.get("category"))
+                result = verdict_cache.get(key)
+                if result is not None:
+                    result["moderation_method"] = "cache"
+                else:
+                    pending.append((i, key))
+
+        if result is not None:
+            result["product_name"] = name
+            results[i] = result
+
+    # Étape 2: IA par lots (les appels concurrents sont regroupés)
+    if pending:
+        verdicts = await asyncio.gather(*[
+            moderation_batcher.submit(products[i]) for i, _ in pending
+        ])
+
+        for (i, key), verdict in zip(pending, verdicts):
+            verdict_cache.set(key, verdict)
+            verdict = dict(verdict)
+            verdict["moderation_method"] = "ai"
+            verdict["product_name"] = products[i]["product_name"]
+            results[i] = verdict
+
+    return results
+
+
+def _prefilter_verdict(product_name: str, description: str) -> Optional[Dict[str, Any]]:
+    """
+    Verdict immédiat pour les cas évidents, None si l'IA doit trancher
+    """
+    flags, instant_reject = scan_prohibited_keywords(f"{product_name} {description}")
+
+    if instant_reject:
+        return {
+            "approved": False,
+            "confidence": 0.95,
+            "risk_level": "critical",
+            "flags": flags,
+            "reason": f"Mots-clés interdits détectés: {', '.join(flags)}",
+            "recommendation": "Reject - prohibited keyword",
+            "moderation_method": "prefilter"
+        }
+
+    if not flags and PREFILTER_APPROVE_CLEAN:
+        return {
+            "approved": True,
+            "confidence": 0.6,
+            "risk_level": "low",
+            "flags": [],
+            "reason": "",
+            "recommendation": "Approved by keyword prefilter",
+            "moderation_method": "prefilter"
+        }
+
+    return None
 
 # ============================================
 # VÉRIFICATION RAPIDE
@@ -306,19 +708,7 @@ def quick_check_prohibited_keywords(text: str) -> bool:
     Vérification rapide pour rejeter immédiatement les contenus évidents
     Retourne True si contenu suspect détecté
     """
-    text_lower = text.lower()
-    
-    # Liste de mots ultra-interdits qui déclenchent un rejet immédiat
-    instant_reject_words = [
-        "porn", "xxx", "sexe", "drogue", "cannabis", "cocaine",
-        "arme", "pistolet", "explosif", "escort", "casino"
-    ]
-    
-    for word in instant_reject_words:
-        if word in text_lower:
-            return True
-    
-    return False
+    return INSTANT_REJECT_PATTERN.search(text) is not None
 
 # ============================================
 # STATISTIQUES DE MODÉRATION
@@ -10,6 +10,12 @@ from predictive_dashboard_service import (
     DashboardData,
     PredictionTimeframe
 )
+from services.leaderboard_service import (
+    BOARD_CONVERSION,
+    BOARD_EARNINGS,
+    BOARD_SALES,
+    leaderboard_service,
+)
 from auth import get_current_user
 # from db_helpers import log_user_activity  # TODO: Implémenter log_user_activity dans db_helpers
 from supabase_client import supabase
@@ -84,7 +90,9 @@ async def get_predictions_only(
 
         predictions = await dashboard_service._generate_predictions(
             campaign_history=campaign_history,
-            timeframe=timeframe
+            timeframe=timeframe,
+            user_id=current_user["id"],
+            role=current_user.get("role")
         )
 
         return {
@@ -177,36 +185,17 @@ async def get_all_leaderboards(
     """
     Récupère tous les leaderboards
 
-    Catégories:
+    Catégories (mois en cours):
     - Top Earners
     - Best Conversion Rates
-    - Most Campaigns
-    - Highest Trust Score
+    - Most Sales
     """
 
     try:
-        # TODO: Implémenter avec vraies données
+        member = leaderboard_service.member_for_user(current_user["id"])
         leaderboards = [
-            {
-                "category": "Top Earners (Ce mois)",
-                "user_rank": 45,
-                "total_users": 500,
-                "top_users": [
-                    {"rank": 1, "username": "TopInfluencer1", "value": 25000, "avatar": None},
-                    {"rank": 2, "username": "ProMarketer", "value": 22000, "avatar": None},
-                    {"rank": 3, "username": "EliteAffiliate", "value": 20000, "avatar": None}
-                ]
-            },
-            {
-                "category": "Meilleurs Taux de Conversion",
-                "user_rank": 23,
-                "total_users": 500,
-                "top_users": [
-                    {"rank": 1, "username": "ConversionKing", "value": 8.5, "avatar": None},
-                    {"rank": 2, "username": "SalesPro", "value": 7.2, "avatar": None},
-                    {"rank": 3, "username": "MarketingGuru", "value": 6.8, "avatar": None}
-                ]
-            }
+            leaderboard_service.leaderboard(board, member)
+            for board in (BOARD_EARNINGS, BOARD_CONVERSION, BOARD_SALES)
         ]
 
         return {"leaderboards": leaderboards}
@@ -233,7 +222,9 @@ async def get_smart_insights(
         current_stats = dashboard_service._calculate_current_stats(campaign_history)
         predictions = await dashboard_service._generate_predictions(
             campaign_history,
-            PredictionTimeframe.MONTH
+            PredictionTimeframe.MONTH,
+            user_id=current_user["id"],
+            role=current_user.get("role")
         )
 
         insights = await dashboard_service._generate_insights(
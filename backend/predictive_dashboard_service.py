@@ -7,8 +7,20 @@ from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from enum import Enum
+import asyncio
 import statistics
 import random
+import structlog
+
+from services.forecast_service import FORECAST_METRICS, ForecastModel, forecast_service
+from services.leaderboard_service import (
+    BOARD_CONVERSION,
+    BOARD_EARNINGS,
+    BOARD_SALES,
+    leaderboard_service,
+)
+
+logger = structlog.get_logger()
 
 # ============================================
 # MODELS
@@ -20,6 +32,14 @@ class PredictionTimeframe(str, Enum):
     QUARTER = "quarter"
     YEAR = "year"
 
+# Horizon de prévision (jours) par période
+HORIZON_DAYS = {
+    PredictionTimeframe.WEEK: 7,
+    PredictionTimeframe.MONTH: 30,
+    PredictionTimeframe.QUARTER: 90,
+    PredictionTimeframe.YEAR: 365
+}
+
 class Achievement(BaseModel):
     id: str
     title: str
@@ -87,7 +107,13 @@ class DashboardData(BaseModel):
 class PredictiveDashboardService:
     """Service de dashboard prédictif avec ML et gamification"""
 
-    def __init__(self):
+    def __init__(self, leaderboards=None, forecasts=None):
+        # Classements mensuels (sorted sets)
+        self.leaderboards = leaderboards or leaderboard_service
+
+        # Modèles de prévision ajustés chaque nuit (sales_forecasts)
+        self.forecasts = forecasts or forecast_service
+
         # Niveaux et XP
         self.xp_per_level = 1000
         self.level_multiplier = 1.5
@@ -105,7 +131,9 @@ class PredictiveDashboardService:
         current_stats = self._calculate_current_stats(campaign_history)
 
         # 2. Prédictions ML
-        predictions = await self._generate_predictions(campaign_history, timeframe)
+        predictions = await self._generate_predictions(
+            campaign_history, timeframe, user_id=user_id, role=user_data.get("role")
+        )
 
         # 3. Comparaisons avec autres utilisateurs
         comparisons = await self._generate_comparisons(user_id, current_stats)
@@ -188,9 +216,21 @@ class PredictiveDashboardService:
     async def _generate_predictions(
         self,
         campaign_history: List[Dict[str, Any]],
-        timeframe: PredictionTimeframe
+        timeframe: PredictionTimeframe,
+        user_id: Optional[str] = None,
+        role: Optional[str] = None
     ) -> List[Prediction]:
-        """Génère des prédictions ML basées sur l'historique"""
+        """
+        Génère des prédictions ML
+
+        Modèles ajustés chaque nuit quand ils existent (lecture + mise à jour
+        du jour), sinon estimation sur l'historique de campagnes.
+        """
+
+        if user_id:
+            predictions = await self._forecast_predictions(user_id, role, timeframe)
+            if predictions:
+                return predictions
 
         predictions = []
 
@@ -212,6 +252,87 @@ class PredictiveDashboardService:
 
         return predictions
 
+    async def _forecast_predictions(
+        self,
+        user_id: str,
+        role: Optional[str],
+        timeframe: PredictionTimeframe
+    ) -> List[Prediction]:
+        """Prédictions depuis les modèles de l'utilisateur (vide si pas encore ajustés)"""
+
+        def _load():
+            entity = self.forecasts.entity_for_user(user_id, role)
+            return self.forecasts.models(*entity) if entity else {}
+
+        try:
+            models = await asyncio.to_thread(_load)
+        except Exception as e:
+            logger.warning("dashboard_forecast_unavailable", user_id=user_id, error=str(e))
+            return []
+
+        if any(metric not in models for metric in FORECAST_METRICS):
+            return []
+
+        horizon = HORIZON_DAYS.get(timeframe, 30)
+        today = datetime.utcnow().date()
+
+        def _totals(model: ForecastModel):
+            return model.recent_total(horizon), model.forecast(horizon, after=today)
+
+        def _confidence(model: ForecastModel, predicted: float) -> float:
+            # Erreur relative du total prévu (résidus journaliers indépendants)
+            if predicted <= 0:
+                return 30.0
+            relative_error = model.sigma * horizon ** 0.5 / predicted
+            return round(min(max(100 - relative_error * 50, 30), 95), 2)
+
+        def _trend(current: float, predicted: float, threshold: float) -> str:
+            delta = predicted - current
+            return "up" if delta > threshold else "down" if delta < -threshold else "stable"
+
+        def _change(current: float, predicted: float) -> float:
+            return round((predicted - current) / current * 100, 2) if current > 0 else 0
+
+        revenue_current, revenue_predicted = _totals(models["revenue"])
+        conversions_current, conversions_predicted = _totals(models["conversions"])
+        clicks_current, clicks_predicted = _totals(models["clicks"])
+
+        rate_current = conversions_current / clicks_current * 100 if clicks_current > 0 else 0
+        rate_predicted = conversions_predicted / clicks_predicted * 100 if clicks_predicted > 0 else 0
+
+        return [
+            Prediction(
+                metric="revenue",
+                current_value=round(revenue_current, 2),
+                predicted_value=round(revenue_predicted, 2),
+                timeframe=timeframe,
+                confidence=_confidence(models["revenue"], revenue_predicted),
+                trend=_trend(revenue_current, revenue_predicted, 0.05 * revenue_current),
+                change_percentage=_change(revenue_current, revenue_predicted)
+            ),
+            Prediction(
+                metric="conversions",
+                current_value=round(conversions_current),
+                predicted_value=int(conversions_predicted),
+                timeframe=timeframe,
+                confidence=_confidence(models["conversions"], conversions_predicted),
+                trend=_trend(conversions_current, conversions_predicted, 0.05 * conversions_current),
+                change_percentage=_change(conversions_current, conversions_predicted)
+            ),
+            Prediction(
+                metric="conversion_rate",
+                current_value=round(rate_current, 2),
+                predicted_value=round(rate_predicted, 2),
+                timeframe=timeframe,
+                confidence=min(
+                    _confidence(models["conversions"], conversions_predicted),
+                    _confidence(models["clicks"], clicks_predicted)
+                ),
+                trend=_trend(rate_current, rate_predicted, 0.1),
+                change_percentage=_change(rate_current, rate_predicted)
+            ),
+        ]
+
     def _predict_revenue(
         self,
         campaign_history: List[Dict[str, Any]],
@@ -381,16 +502,14 @@ class PredictiveDashboardService:
         user_id: str,
         current_stats: Dict[str, Any]
     ) -> Dict[str, Any]:
-        """Compare les stats de l'utilisateur avec la moyenne"""
+        """Compare les stats de l'utilisateur avec la moyenne de la plateforme (mois en cours)"""
 
-        # À implémenter avec de vraies données de la DB
-        # Pour l'instant, on utilise des moyennes fictives
+        def _load():
+            member = self.leaderboards.member_for_user(user_id)
+            return self.leaderboards.platform_averages(), self.leaderboards.position(BOARD_EARNINGS, member)
 
-        platform_averages = {
-            "avg_conversion_rate": 2.5,
-            "avg_monthly_revenue": 1500,
-            "avg_campaigns_per_month": 5
-        }
+        # Redis et Supabase (clients synchrones): hors de la boucle d'événements
+        platform_averages, earnings_position = await asyncio.to_thread(_load)
 
         user_conversion_rate = current_stats.get("avg_conversion_rate", 0)
         user_monthly_revenue = current_stats.get("monthly_revenue", 0)
@@ -417,7 +536,8 @@ class PredictiveDashboardService:
                 ),
                 "is_above_average": user_monthly_revenue > platform_averages["avg_monthly_revenue"]
             },
-            "percentile_rank": random.randint(50, 99)  # À calculer avec vraies données
+            "percentile_rank": earnings_position["top_percentile"],
+            "ranked_users": platform_averages["ranked_users"]
         }
 
     async def _calculate_achievements(
@@ -512,37 +632,16 @@ class PredictiveDashboardService:
         user_id: str,
         current_stats: Dict[str, Any]
     ) -> List[Leaderboard]:
-        """Génère les leaderboards pour différentes catégories"""
-
-        # À implémenter avec vraies données de la DB
-        # Pour l'instant, on retourne des données fictives
-
-        leaderboards = [
-            Leaderboard(
-                category="Top Earners (Ce mois)",
-                user_rank=random.randint(10, 100),
-                total_users=500,
-                top_percentile=random.randint(80, 99),
-                top_users=[
-                    {"rank": 1, "username": "TopInfluencer1", "value": 25000},
-                    {"rank": 2, "username": "ProMarketer", "value": 22000},
-                    {"rank": 3, "username": "EliteAffiliate", "value": 20000}
-                ]
-            ),
-            Leaderboard(
-                category="Meilleurs Taux de Conversion",
-                user_rank=random.randint(5, 50),
-                total_users=500,
-                top_percentile=random.randint(85, 99),
-                top_users=[
-                    {"rank": 1, "username": "ConversionKing", "value": 8.5},
-                    {"rank": 2, "username": "SalesPro", "value": 7.2},
-                    {"rank": 3, "username": "MarketingGuru", "value": 6.8}
-                ]
-            )
-        ]
+        """Génère les leaderboards du mois (gains, conversion, ventes)"""
+
+        def _load():
+            member = self.leaderboards.member_for_user(user_id)
+            return [
+                self.leaderboards.leaderboard(board, member)
+                for board in (BOARD_EARNINGS, BOARD_CONVERSION, BOARD_SALES)
+            ]
 
-        return leaderboards
+        return [Leaderboard(**board) for board in await asyncio.to_thread(_load)]
 
     async def _generate_insights(
         self,
@@ -18,6 +18,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime, timedelta
+import asyncio
 import jwt
 import os
 import logging
@@ -242,11 +243,28 @@ from scheduler import start_scheduler, stop_scheduler
 from auto_payment_service import AutoPaymentService
 from tracking_service import tracking_service
 from webhook_service import webhook_service
+from services.messaging_service import (
+    MessagingService,
+    INBOX_DEFAULT_LIMIT,
+    INBOX_MAX_LIMIT,
+    MESSAGES_DEFAULT_LIMIT,
+    MESSAGES_MAX_LIMIT,
+)
+from services.timeseries_service import TimeSeriesEngine, bucket_label
+from services.metrics_service import metrics, metrics_access_allowed
+from services.http_pipeline import HTTPPipelineMiddleware
+from services.llm_gateway import llm_gateway
 
 # Initialiser les services
 payment_service = AutoPaymentService()
+messaging_service = MessagingService(supabase)
+timeseries_engine = TimeSeriesEngine(supabase)
+
+# Pipeline ASGI: filtrage IP, validation, security headers, métriques Prometheus,
+# trace Supabase (Server-Timing, budgets, N+1) et logs, en un seul passage
+app.add_middleware(HTTPPipelineMiddleware)
 
-# CORS configuration - Allow all localhost origins
+# CORS configuration - Allow all localhost origins (ajouté en dernier = exécuté en premier)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all origins in development
@@ -428,6 +446,14 @@ async def health_check():
         "database": "Supabase Connected"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Métriques au format texte Prometheus (agrégées sur tous les workers)"""
+    if not metrics_access_allowed(request):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 @app.post("/api/auth/login")
 async def login(login_data: LoginRequest):
     """Login avec email et mot de passe"""
@@ -937,129 +963,100 @@ async def get_clicks_endpoint(payload: dict = Depends(verify_token)):
 # ============================================
 
 @app.get("/api/analytics/merchant/sales-chart")
-async def get_merchant_sales_chart(payload: dict = Depends(verify_token)):
+async def get_merchant_sales_chart(
+    payload: dict = Depends(verify_token),
+    period: int = Query(7, ge=1, le=366),
+    bucket: str = Query("day", regex="^(day|week|month)$")
+):
     """
-    Données de ventes des 7 derniers jours pour le marchand
+    Données de ventes du marchand par jour / semaine / mois (7 derniers jours par défaut)
     Format: [{date: '01/06', ventes: 12, revenus: 3500}, ...]
     """
     try:
-        from datetime import datetime, timedelta
-        
         user_id = payload.get("user_id")
         role = payload.get("role")
-        
-        # Calculer les 7 derniers jours
-        today = datetime.now()
-        days_data = []
-        
-        for i in range(6, -1, -1):  # 6 jours en arrière jusqu'à aujourd'hui
-            target_date = today - timedelta(days=i)
-            date_str = target_date.strftime('%Y-%m-%d')
-            
-            # Query: ventes du jour pour ce marchand
-            query = supabase.table('sales').select('amount, commission, status')
-            
-            # Filtrer par merchant_id si pas admin
-            if role != 'admin':
-                query = query.eq('merchant_id', user_id)
-            
-            # Filtrer par date (créées ce jour-là)
-            query = query.gte('created_at', f'{date_str}T00:00:00').lt('created_at', f'{date_str}T23:59:59')
-            
-            response = query.execute()
-            sales = response.data if response.data else []
-            
-            # Calculer les totaux
-            ventes_count = len(sales)
-            revenus_total = sum(float(s.get('amount', 0)) for s in sales)
-            
-            days_data.append({
-                'date': target_date.strftime('%d/%m'),
-                'ventes': ventes_count,
-                'revenus': round(revenus_total, 2)
-            })
-        
-        return {"data": days_data}
-        
+
+        # Une seule requête groupée pour toute la plage (admin: toute la plateforme)
+        series = timeseries_engine.series(
+            bucket=bucket,
+            periods=period,
+            scope=None if role == 'admin' else 'merchant',
+            scope_id=None if role == 'admin' else user_id
+        )
+
+        return {"data": [
+            {
+                'date': bucket_label(point['bucket'], bucket),
+                'ventes': point['count'],
+                'revenus': round(point['amount'], 2)
+            }
+            for point in series
+        ]}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching merchant sales chart: {e}")
         # Retourner des données vides en cas d'erreur
         return {"data": [{"date": f"0{i}/01", "ventes": 0, "revenus": 0} for i in range(1, 8)]}
 
 @app.get("/api/analytics/influencer/earnings-chart")
-async def get_influencer_earnings_chart(payload: dict = Depends(verify_token)):
+async def get_influencer_earnings_chart(
+    payload: dict = Depends(verify_token),
+    period: int = Query(7, ge=1, le=366),
+    bucket: str = Query("day", regex="^(day|week|month)$")
+):
     """
-    Données de revenus des 7 derniers jours pour l'influenceur
+    Données de revenus de l'influenceur par jour / semaine / mois (7 derniers jours par défaut)
     Format: [{date: '01/06', gains: 450}, ...]
     """
     try:
-        from datetime import datetime, timedelta
-        
         user_id = payload.get("user_id")
-        today = datetime.now()
-        days_data = []
-        
-        for i in range(6, -1, -1):
-            target_date = today - timedelta(days=i)
-            date_str = target_date.strftime('%Y-%m-%d')
-            
-            # Query: commissions gagnées ce jour
-            query = supabase.table('sales').select('commission').eq('affiliate_id', user_id)
-            query = query.gte('created_at', f'{date_str}T00:00:00').lt('created_at', f'{date_str}T23:59:59')
-            
-            response = query.execute()
-            sales = response.data if response.data else []
-            
-            gains_total = sum(float(s.get('commission', 0)) for s in sales)
-            
-            days_data.append({
-                'date': target_date.strftime('%d/%m'),
-                'gains': round(gains_total, 2)
-            })
-        
-        return {"data": days_data}
-        
+
+        series = timeseries_engine.series(
+            bucket=bucket, periods=period, scope='influencer', scope_id=user_id
+        )
+
+        return {"data": [
+            {
+                'date': bucket_label(point['bucket'], bucket),
+                'gains': round(point['commission'], 2)
+            }
+            for point in series
+        ]}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching influencer earnings chart: {e}")
         return {"data": [{"date": f"0{i}/01", "gains": 0} for i in range(1, 8)]}
 
 @app.get("/api/analytics/admin/revenue-chart")
-async def get_admin_revenue_chart(payload: dict = Depends(verify_token)):
+async def get_admin_revenue_chart(
+    payload: dict = Depends(verify_token),
+    period: int = Query(7, ge=1, le=366),
+    bucket: str = Query("day", regex="^(day|week|month)$")
+):
     """
-    Données de revenus des 7 derniers jours pour l'admin (toute la plateforme)
+    Données de revenus de toute la plateforme par jour / semaine / mois (admin)
     Format: [{date: '01/06', revenus: 8500}, ...]
     """
+    if payload.get("role") != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+
     try:
-        from datetime import datetime, timedelta
-        
-        role = payload.get("role")
-        
-        if role != 'admin':
-            raise HTTPException(status_code=403, detail="Admin access required")
-        
-        today = datetime.now()
-        days_data = []
-        
-        for i in range(6, -1, -1):
-            target_date = today - timedelta(days=i)
-            date_str = target_date.strftime('%Y-%m-%d')
-            
-            # Query: toutes les ventes du jour
-            query = supabase.table('sales').select('amount')
-            query = query.gte('created_at', f'{date_str}T00:00:00').lt('created_at', f'{date_str}T23:59:59')
-            
-            response = query.execute()
-            sales = response.data if response.data else []
-            
-            revenus_total = sum(float(s.get('amount', 0)) for s in sales)
-            
-            days_data.append({
-                'date': target_date.strftime('%d/%m'),
-                'revenus': round(revenus_total, 2)
-            })
-        
-        return {"data": days_data}
-        
+        series = timeseries_engine.series(bucket=bucket, periods=period)
+
+        return {"data": [
+            {
+                'date': bucket_label(point['bucket'], bucket),
+                'revenus': round(point['amount'], 2)
+            }
+            for point in series
+        ]}
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching admin revenue chart: {e}")
         return {"data": [{"date": f"0{i}/01", "revenus": 0} for i in range(1, 8)]}
@@ -1426,47 +1423,43 @@ async def send_message(message_data: MessageCreate, payload: dict = Depends(veri
         raise HTTPException(status_code=500, detail=f"Error sending message: {str(e)}")
 
 @app.get("/api/messages/conversations")
-async def get_conversations(payload: dict = Depends(verify_token)):
+async def get_conversations(
+    limit: int = Query(INBOX_DEFAULT_LIMIT, ge=1, le=INBOX_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    payload: dict = Depends(verify_token)
+):
     """
-    Récupère toutes les conversations de l'utilisateur
+    Récupère les conversations de l'utilisateur (plus récentes d'abord)
+    
+    Une seule requête indexée sur le read model dénormalisé
+    (last_message, last_message_at, compteurs de non-lus).
+    Pagination: passer `next_cursor` comme `cursor` pour la page suivante.
     """
     try:
         user_id = payload.get("user_id")
+        return messaging_service.get_inbox(user_id, limit=limit, cursor=cursor)
         
-        # Chercher conversations où user est participant
-        query1 = supabase.table('conversations').select('*').eq('user1_id', user_id)
-        query2 = supabase.table('conversations').select('*').eq('user2_id', user_id)
-        
-        conv1 = query1.execute()
-        conv2 = query2.execute()
-        
-        conversations = (conv1.data or []) + (conv2.data or [])
-        
-        # Enrichir avec derniers messages
-        for conv in conversations:
-            # Récupérer dernier message
-            msg_query = supabase.table('messages').select('*').eq('conversation_id', conv['id']).order('created_at', desc=True).limit(1)
-            msg_response = msg_query.execute()
-            conv['last_message'] = msg_response.data[0] if msg_response.data else None
-            
-            # Compter messages non lus
-            unread_query = supabase.table('messages').select('id', count='exact').eq('conversation_id', conv['id']).eq('is_read', False).neq('sender_id', user_id)
-            unread_response = unread_query.execute()
-            conv['unread_count'] = unread_response.count if hasattr(unread_response, 'count') else 0
-        
-        # Trier par dernière activité
-        conversations.sort(key=lambda x: x.get('last_message_at', ''), reverse=True)
-        
-        return {"conversations": conversations}
-        
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         print(f"Error fetching conversations: {e}")
-        return {"conversations": []}
+        return {"conversations": [], "next_cursor": None}
 
 @app.get("/api/messages/{conversation_id}")
-async def get_messages(conversation_id: str, payload: dict = Depends(verify_token)):
+async def get_messages(
+    conversation_id: str,
+    limit: int = Query(MESSAGES_DEFAULT_LIMIT, ge=1, le=MESSAGES_MAX_LIMIT),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    since: Optional[str] = None,
+    payload: dict = Depends(verify_token)
+):
     """
-    Récupère tous les messages d'une conversation
+    Récupère les messages d'une conversation (paginés)
+    
+    - Sans paramètre: page la plus récente
+    - before=<before_cursor>: page précédente (plus ancienne)
+    - after=<after_cursor> ou since=<ISO datetime>: nouveaux messages (polling)
     """
     try:
         user_id = payload.get("user_id")
@@ -1480,20 +1473,19 @@ async def get_messages(conversation_id: str, payload: dict = Depends(verify_toke
         if conversation['user1_id'] != user_id and conversation['user2_id'] != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Récupérer les messages
-        messages_query = supabase.table('messages').select('*').eq('conversation_id', conversation_id).order('created_at', desc=False)
-        messages_response = messages_query.execute()
-        
-        # Marquer comme lu les messages reçus
-        supabase.table('messages').update({'is_read': True, 'read_at': datetime.utcnow().isoformat()}).eq('conversation_id', conversation_id).neq('sender_id', user_id).eq('is_read', False).execute()
-        
-        return {
-            "conversation": conversation,
-            "messages": messages_response.data or []
-        }
+        return messaging_service.get_messages(
+            conversation,
+            user_id,
+            limit=limit,
+            before=before,
+            after=after,
+            since=since
+        )
         
     except HTTPException:
         raise
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         print(f"Error fetching messages: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching messages: {str(e)}")
@@ -1906,6 +1898,7 @@ async def shutdown_event():
     print("🛑 Arrêt du serveur...")
     stop_scheduler()
     print("✅ Scheduler arrêté")
+    await llm_gateway.aclose()
 
 # ============================================
 # ENDPOINTS PAIEMENTS AUTOMATIQUES
@@ -2767,6 +2760,10 @@ async def generate_monthly_invoices(
 ):
     """
     Génère toutes les factures pour un mois donné (Admin uniquement)
+
+    Le run est confié à la queue Celery `reports`; suivre son avancement
+    via GET /api/admin/invoices/jobs/{job_id}. Sans worker disponible, il
+    s'exécute dans un thread (hors boucle d'événements).
     
     Body:
     {
@@ -2777,8 +2774,8 @@ async def generate_monthly_invoices(
     Returns:
     {
       "success": true,
-      "invoices_created": 15,
-      "invoices": [...]
+      "job_id": "3f2b...",
+      "status": "queued"
     }
     """
     try:
@@ -2791,9 +2788,15 @@ async def generate_monthly_invoices(
         year = body.get('year', datetime.now().year)
         month = body.get('month', datetime.now().month)
         
-        result = invoicing_service.generate_monthly_invoices(year, month)
-        
-        return result
+        try:
+            from celery_tasks.invoicing_tasks import generate_monthly_invoices as invoicing_task
+
+            job = invoicing_task.delay(int(year), int(month))
+            return {"success": True, "job_id": job.id, "status": "queued"}
+        except Exception as e:
+            logger.warning(f"Invoice queue unavailable, generating in a thread: {e}")
+
+        return await asyncio.to_thread(invoicing_service.generate_monthly_invoices, int(year), int(month))
         
     except HTTPException:
         raise
@@ -2802,6 +2805,31 @@ async def generate_monthly_invoices(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/admin/invoices/jobs/{job_id}")
+async def get_invoice_job(job_id: str, payload: dict = Depends(verify_token)):
+    """Statut d'un run de facturation confié à la queue (Admin uniquement)"""
+    user = get_user_by_id(payload["sub"])
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Admin uniquement")
+
+    try:
+        from celery.result import AsyncResult
+        from celery_app import app as celery_app
+    except ImportError:
+        raise HTTPException(status_code=503, detail="Queue de facturation indisponible")
+
+    def job_state():
+        job = AsyncResult(job_id, app=celery_app)
+        return {
+            "job_id": job_id,
+            "status": job.status,
+            "result": job.result if job.successful() else None,
+            "error": str(job.result) if job.failed() else None,
+        }
+
+    return await asyncio.to_thread(job_state)
+
+
 @app.get("/api/admin/invoices")
 async def get_all_invoices(
     status: Optional[str] = None,
@@ -22,6 +22,8 @@ from dotenv import load_dotenv
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from services.metrics_service import metrics, metrics_access_allowed
+from services.http_pipeline import HTTPPipelineMiddleware
 
 # Load environment variables FIRST
 load_dotenv()
@@ -71,7 +73,7 @@ except ImportError as e:
 
 # Translation service with OpenAI and DB cache
 try:
-    from translation_service import init_translation_service, translation_service
+    from translation_service import SUPPORTED_LANGUAGES, init_translation_service, translation_service
     TRANSLATION_SERVICE_AVAILABLE = True
     print("✅ Translation service with OpenAI loaded")
 except ImportError as e:
@@ -233,7 +235,11 @@ app = FastAPI(
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:8000").split(",")
 print(f"🔐 CORS Origins configurés: {cors_origins}")
 
-# CORS Configuration - Must be added FIRST
+# Pipeline ASGI: filtrage IP, validation, security headers, métriques Prometheus,
+# trace Supabase (Server-Timing, budgets, N+1) et logs, en un seul passage
+app.add_middleware(HTTPPipelineMiddleware)
+
+# CORS Configuration - Ajouté en dernier = exécuté en premier
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # En développement, autoriser toutes les origins
@@ -245,12 +251,18 @@ app.add_middleware(
 
 # Rate Limiter
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    """Réponse 429 de slowapi + compteur rate_limit_rejections_total"""
+    metrics.record_rate_limited(str(exc.detail))
+    return _rate_limit_exceeded_handler(request, exc)
+
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
 
 # Initialize Translation Service with Supabase
 print(f"🔍 DEBUG: TRANSLATION_SERVICE_AVAILABLE={TRANSLATION_SERVICE_AVAILABLE}, SUPABASE_ENABLED={SUPABASE_ENABLED}")
 if TRANSLATION_SERVICE_AVAILABLE and SUPABASE_ENABLED:
-    init_translation_service(supabase)
+    translation_service = init_translation_service(supabase)
     print("✅ Translation service initialized with Supabase")
 else:
     print(f"⚠️ Translation service initialization skipped (Translation: {TRANSLATION_SERVICE_AVAILABLE}, Supabase: {SUPABASE_ENABLED})")
@@ -932,6 +944,14 @@ async def root():
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Métriques au format texte Prometheus (agrégées sur tous les workers)"""
+    if not metrics_access_allowed(request):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/api/health")
 async def health_check():
     """Vérification de santé du service"""
@@ -6377,26 +6397,46 @@ async def check_feature_access(feature_name: str, payload: dict = Depends(verify
 # ============================================
 
 @app.get("/api/translations/{language}")
-async def get_all_translations(language: str):
+async def get_all_translations(
+    language: str,
+    request: Request,
+    v: Optional[str] = Query(None, description="ETag du bundle (URL versionnée)")
+):
     """
     Récupère toutes les traductions pour une langue
     Utilisé au chargement initial de l'application
+    
+    Servi depuis le bundle en mémoire (aucune requête DB après le premier
+    chargement). ETag = hash du contenu; If-None-Match -> 304.
+    Avec ?v=<etag> courant, la réponse est immuable et cachable 1 an.
     """
-    if not TRANSLATION_SERVICE_AVAILABLE:
+    if not TRANSLATION_SERVICE_AVAILABLE or translation_service is None:
         raise HTTPException(status_code=503, detail="Translation service not available")
     
+    if language not in SUPPORTED_LANGUAGES:
+        raise HTTPException(status_code=404, detail=f"Unsupported language: {language}")
+    
     try:
-        translations = await translation_service.get_all_translations(language)
-        
-        return {
-            "success": True,
-            "language": language,
-            "translations": translations,
-            "count": len(translations)
-        }
+        bundle = await translation_service.get_bundle(language)
     except Exception as e:
         print(f"❌ Error loading translations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="Translations unavailable")
+    
+    if v and v.strip('"') == bundle.etag.strip('"'):
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, max-age=0, must-revalidate"
+    
+    headers = {"ETag": bundle.etag, "Cache-Control": cache_control}
+    
+    if_none_match = request.headers.get("if-none-match", "")
+    if bundle.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=bundle.body, media_type="application/json", headers=headers)
 
 
 @app.post("/api/translations/translate")
@@ -6466,6 +6506,8 @@ async def batch_translate(
         "target_language": "ar",
         "context": "Navigation menu"
     }
+    
+    Ou plusieurs langues en parallèle: "target_languages": ["ar", "darija", "en"]
     """
     if not TRANSLATION_SERVICE_AVAILABLE:
         raise HTTPException(status_code=503, detail="Translation service not available")
@@ -6473,11 +6515,31 @@ async def batch_translate(
     try:
         keys = request.get("keys", [])
         target_language = request.get("target_language")
+        target_languages = request.get("target_languages")
         context = request.get("context")
         
-        if not keys or not target_language:
+        if not keys or not (target_language or target_languages):
             raise HTTPException(status_code=400, detail="keys and target_language required")
         
+        if target_languages:
+            results = await translation_service.translate_languages(
+                keys=keys,
+                languages=target_languages,
+                context=context
+            )
+            return {
+                "success": True,
+                "requested": len(keys),
+                "languages": {
+                    language: {
+                        "translations": translations,
+                        "count": len(translations),
+                        "missing": [k for k in keys if k not in translations]
+                    }
+                    for language, translations in results.items()
+                }
+            }
+        
         translations = await translation_service.batch_translate(
             keys=keys,
             target_language=target_language,
@@ -6493,6 +6555,8 @@ async def batch_translate(
             "missing": [k for k in keys if k not in translations]
         }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Batch translation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
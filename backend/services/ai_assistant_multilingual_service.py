@@ -15,17 +15,19 @@ Fonctionnalités Complètes:
 Impact: +30% de valeur perçue avec "Powered by AI"
 """
 
-from typing import Dict, List, Optional, Tuple, Any
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple, Any
 from datetime import datetime, timedelta
 from enum import Enum
 from dataclasses import dataclass
+import asyncio
 import json
-import httpx
 import logging
 import re
 from collections import Counter
-import statistics
+import numpy as np
 from supabase_client import supabase
+from services.llm_gateway import llm_gateway
+from services.product_recommendation_service import product_recommendations
 
 logger = logging.getLogger(__name__)
 
@@ -144,12 +146,33 @@ class AIAssistantMultilingualService:
         self.demo_mode = demo_mode or not api_key
         self.supabase = supabase
 
-        # Configuration API
-        self.anthropic_api_url = "https://api.anthropic.com/v1/messages"
-
         if self.demo_mode:
             logger.warning("⚠️ AI Assistant en mode DEMO (pas de clés API)")
 
+    async def _call_claude(
+        self,
+        system: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        cache: bool = False
+    ) -> str:
+        """
+        Appel Claude via la passerelle LLM partagée (pool de connexions, retries)
+
+        cache=True pour les prompts déterministes (descriptions, SEO, traductions):
+        un prompt identique est servi depuis le cache sans rappeler l'API.
+        """
+        response = await llm_gateway.complete(
+            "anthropic",
+            messages,
+            model=self.model,
+            system=system,
+            max_tokens=max_tokens,
+            cache=cache,
+            api_key=self.api_key
+        )
+        return response.text
+
     # ============================================
     # 1. CHATBOT IA MULTILINGUE
     # ============================================
@@ -177,9 +200,79 @@ class AIAssistantMultilingualService:
             return self._demo_chat_response(message, language)
 
         try:
-            # Préparer le prompt système selon la langue
-            system_prompts = {
-                Language.FRENCH: """Tu es un assistant IA pour ShareYourSales, une plateforme d'affiliation au Maroc.
+            # Appeler l'API Claude
+            bot_response = await self._call_claude(
+                self._chat_system_prompt(language, context),
+                [{"role": "user", "content": message}],
+                max_tokens=1024
+            )
+
+            return {
+                "success": True,
+                "response": bot_response,
+                "language": language.value,
+                "model": self.model,
+                "suggested_actions": self._extract_suggested_actions(bot_response)
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Erreur chatbot: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "fallback_response": self._get_fallback_response(language)
+            }
+
+    async def chat_stream(
+        self,
+        message: str,
+        language: Language = Language.FRENCH,
+        context: Optional[Dict] = None,
+        user_id: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Variante streaming de chat(): tokens transmis au fil de la génération
+
+        Yields:
+            ("token", {"text": ...}) puis ("done", {...}) avec les actions
+            suggérées, extraites une fois la réponse complète; ou
+            ("error", {"error", "fallback_response"})
+        """
+        if self.demo_mode:
+            demo = self._demo_chat_response(message, language)
+            yield "token", {"text": demo["response"]}
+            yield "done", {"language": language.value, "demo_mode": True, "suggested_actions": []}
+            return
+
+        parts: List[str] = []
+        try:
+            async for chunk in llm_gateway.stream(
+                "anthropic",
+                [{"role": "user", "content": message}],
+                model=self.model,
+                system=self._chat_system_prompt(language, context),
+                max_tokens=1024,
+                api_key=self.api_key
+            ):
+                parts.append(chunk)
+                yield "token", {"text": chunk}
+
+        except Exception as e:
+            logger.error(f"❌ Erreur chatbot (streaming): {str(e)}")
+            yield "error", {"error": str(e), "fallback_response": self._get_fallback_response(language)}
+            return
+
+        yield "done", {
+            "language": language.value,
+            "model": self.model,
+            "suggested_actions": self._extract_suggested_actions("".join(parts))
+        }
+
+    def _chat_system_prompt(self, language: Language, context: Optional[Dict]) -> str:
+        """Prompt système du chatbot selon la langue, avec le contexte utilisateur"""
+        # Préparer le prompt système selon la langue
+        system_prompts = {
+            Language.FRENCH: """Tu es un assistant IA pour ShareYourSales, une plateforme d'affiliation au Maroc.
 Tu aides les influenceurs et marchands avec leurs questions sur:
 - Création de liens d'affiliation
 - Statistiques et performances
@@ -189,7 +282,7 @@ Tu aides les influenceurs et marchands avec leurs questions sur:
 
 Réponds de manière concise, amicale et professionnelle.""",
 
-                Language.ARABIC: """أنت مساعد ذكاء اصطناعي لـ ShareYourSales، منصة التسويق بالعمولة في المغرب.
+            Language.ARABIC: """أنت مساعد ذكاء اصطناعي لـ ShareYourSales، منصة التسويق بالعمولة في المغرب.
 أنت تساعد المؤثرين والتجار في:
 - إنشاء روابط الإحالة
 - الإحصائيات والأداء
@@ -199,7 +292,7 @@ Réponds de manière concise, amicale et professionnelle.""",
 
 أجب بطريقة موجزة وودية ومهنية.""",
 
-                Language.ENGLISH: """You are an AI assistant for ShareYourSales, an affiliate platform in Morocco.
+            Language.ENGLISH: """You are an AI assistant for ShareYourSales, an affiliate platform in Morocco.
 You help influencers and merchants with:
 - Creating affiliate links
 - Statistics and performance
@@ -208,54 +301,14 @@ You help influencers and merchants with:
 - Content optimization
 
 Reply concisely, friendly, and professionally."""
-            }
-
-            # Ajouter contexte utilisateur si disponible
-            user_context = ""
-            if context:
-                user_context = f"\n\nContexte utilisateur: {json.dumps(context, ensure_ascii=False)}"
-
-            # Appeler l'API Claude
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.anthropic_api_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 1024,
-                        "system": system_prompts[language] + user_context,
-                        "messages": [{
-                            "role": "user",
-                            "content": message
-                        }]
-                    },
-                    timeout=30.0
-                )
-
-                response.raise_for_status()
-                result = response.json()
-
-                bot_response = result["content"][0]["text"]
+        }
 
-                return {
-                    "success": True,
-                    "response": bot_response,
-                    "language": language.value,
-                    "model": self.model,
-                    "suggested_actions": self._extract_suggested_actions(bot_response)
-                }
+        # Ajouter contexte utilisateur si disponible
+        user_context = ""
+        if context:
+            user_context = f"\n\nContexte utilisateur: {json.dumps(context, ensure_ascii=False)}"
 
-        except Exception as e:
-            logger.error(f"❌ Erreur chatbot: {str(e)}")
-            return {
-                "success": False,
-                "error": str(e),
-                "fallback_response": self._get_fallback_response(language)
-            }
+        return system_prompts[language] + user_context
 
     def _demo_chat_response(self, message: str, language: Language) -> Dict[str, Any]:
         """Réponse démo du chatbot"""
@@ -328,29 +381,15 @@ Reply concisely, friendly, and professionally."""
                 product_name, category, price, key_features, language, tone
             )
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.anthropic_api_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 2048,
-                        "system": "Tu es un expert en rédaction de descriptions produits e-commerce optimisées pour le SEO.",
-                        "messages": [{"role": "user", "content": prompt}]
-                    },
-                    timeout=30.0
-                )
-
-                response.raise_for_status()
-                result = response.json()
-                content = result["content"][0]["text"]
+            content = await self._call_claude(
+                "Tu es un expert en rédaction de descriptions produits e-commerce optimisées pour le SEO.",
+                [{"role": "user", "content": prompt}],
+                max_tokens=2048,
+                cache=True
+            )
 
-                # Parser la réponse structurée
-                return self._parse_product_description(content, language)
+            # Parser la réponse structurée
+            return self._parse_product_description(content, language)
 
         except Exception as e:
             logger.error(f"❌ Erreur génération description: {str(e)}")
@@ -500,6 +539,10 @@ Optimise pour le marché marocain et le SEO Google."""
         - Tendances actuelles
         - Comportement similaire d'autres utilisateurs
 
+        Filtrage collaboratif item-item: les voisins (co-clics / co-achats)
+        des produits de l'historique sont lus dans l'index en mémoire de
+        product_recommendations, complété par les produits populaires.
+
         Returns:
             Liste de produits recommandés avec scores
         """
@@ -512,31 +555,35 @@ Optimise pour le marché marocain et le SEO Google."""
                 user_profile, browsing_history, purchase_history
             )
 
-            # TODO: Implémenter ML collaborative filtering
-            # Pour l'instant, logique basée sur règles
-
-            suggestions = []
+            seeds = self._history_seeds(browsing_history, purchase_history)
 
-            # Exemple de suggestions basées sur profil
-            if user_profile.get("age", 30) < 25:
-                suggestions.extend(self._get_trending_youth_products())
+            if product_recommendations.stale():
+                await asyncio.to_thread(product_recommendations.ensure_fresh)
 
-            if user_profile.get("gender") == "female":
-                suggestions.extend(self._get_beauty_fashion_products())
+            # Produits souvent associés à l'historique, puis les plus populaires
+            pool = max_suggestions * 3
+            collaborative = dict(product_recommendations.recommend(seeds, pool))
+            popular = product_recommendations.popular(
+                pool - len(collaborative), exclude=set(seeds) | set(collaborative)
+            )
+            if not collaborative and not popular:
+                return []
 
-            # Basé sur historique
-            if purchase_history:
-                last_category = purchase_history[-1].get("category")
-                suggestions.extend(self._get_similar_category_products(last_category))
+            products = await asyncio.to_thread(self._fetch_products, list(collaborative) + popular)
 
-            # Trier par score de pertinence
+            # Score = similarité item-item normalisée (70%) + centres d'intérêt (30%)
+            top_score = max(collaborative.values(), default=0) or 1.0
             scored_suggestions = [
                 {
                     **prod,
-                    "relevance_score": self._calculate_relevance(prod, user_interests),
-                    "reason": self._get_recommendation_reason(prod, user_profile)
+                    "relevance_score": round(
+                        0.7 * collaborative.get(prod["id"], 0) / top_score
+                        + 0.3 * self._calculate_relevance(prod, user_interests),
+                        4
+                    ),
+                    "reason": self._get_recommendation_reason(prod["id"] in collaborative)
                 }
-                for prod in suggestions
+                for prod in products
             ]
 
             scored_suggestions.sort(key=lambda x: x["relevance_score"], reverse=True)
@@ -547,6 +594,25 @@ Optimise pour le marché marocain et le SEO Google."""
             logger.error(f"❌ Erreur suggestions produits: {str(e)}")
             return self._demo_product_suggestions(max_suggestions)
 
+    def _history_seeds(
+        self, browsing: Optional[List[Dict]], purchases: Optional[List[Dict]]
+    ) -> Dict[str, float]:
+        """Produits de l'historique pondérés (achat > consultation)"""
+        seeds: Dict[str, float] = {}
+        for items, weight in ((browsing, 1.0), (purchases, 3.0)):
+            for item in items or []:
+                product_id = item.get("product_id") or item.get("id")
+                if product_id:
+                    seeds[str(product_id)] = seeds.get(str(product_id), 0) + weight
+        return seeds
+
+    def _fetch_products(self, product_ids: List[str]) -> List[Dict]:
+        """Produits disponibles parmi les candidats (une requête)"""
+        result = supabase.table("products").select(
+            "id, name, category, price, currency, commission_rate, images"
+        ).in_("id", product_ids).eq("is_available", True).execute()
+        return result.data or []
+
     def _extract_user_interests(
         self, profile, browsing, purchases
     ) -> Dict[str, float]:
@@ -588,16 +654,9 @@ Optimise pour le marché marocain et le SEO Google."""
 
         return min(base_score, 1.0)
 
-    def _get_recommendation_reason(self, product: Dict, profile: Dict) -> str:
-        """Génère une raison pour la recommandation"""
-        reasons = [
-            "Basé sur vos achats récents",
-            "Tendance actuellement",
-            "Recommandé pour vous",
-            "Très populaire au Maroc",
-            "Nouveauté exclusive"
-        ]
-        return reasons[hash(product.get("id", "")) % len(reasons)]
+    def _get_recommendation_reason(self, collaborative: bool) -> str:
+        """Raison affichée pour la recommandation"""
+        return "Souvent associé à vos achats récents" if collaborative else "Très populaire au Maroc"
 
     def _demo_product_suggestions(self, max_suggestions: int) -> List[Dict]:
         """Suggestions démo"""
@@ -616,18 +675,6 @@ Optimise pour le marché marocain et le SEO Google."""
         ]
         return demo_products
 
-    def _get_trending_youth_products(self) -> List[Dict]:
-        """Produits tendance jeunes"""
-        return []  # TODO: Implémenter avec vraie DB
-
-    def _get_beauty_fashion_products(self) -> List[Dict]:
-        """Produits beauté/mode"""
-        return []  # TODO: Implémenter
-
-    def _get_similar_category_products(self, category: str) -> List[Dict]:
-        """Produits de catégorie similaire"""
-        return []  # TODO: Implémenter
-
     # ============================================
     # 4. OPTIMISATION SEO AUTOMATIQUE
     # ============================================
@@ -665,28 +712,14 @@ Optimise pour le marché marocain et le SEO Google."""
                 content, target_keywords, language, content_type, current_analysis
             )
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.anthropic_api_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 2048,
-                        "system": "Tu es un expert SEO spécialisé dans le e-commerce marocain.",
-                        "messages": [{"role": "user", "content": prompt}]
-                    },
-                    timeout=30.0
-                )
-
-                response.raise_for_status()
-                result = response.json()
-                ai_suggestions = result["content"][0]["text"]
+            ai_suggestions = await self._call_claude(
+                "Tu es un expert SEO spécialisé dans le e-commerce marocain.",
+                [{"role": "user", "content": prompt}],
+                max_tokens=2048,
+                cache=True
+            )
 
-                return self._parse_seo_optimization(ai_suggestions, target_keywords, language)
+            return self._parse_seo_optimization(ai_suggestions, target_keywords, language)
 
         except Exception as e:
             logger.error(f"❌ Erreur optimisation SEO: {str(e)}")
@@ -846,35 +879,21 @@ Optimise pour Google Maroc et le marché francophone/arabophone."""
         try:
             prompt = self._build_translation_prompt(text, source_language, target_language, context)
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.anthropic_api_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 1024,
-                        "system": "Tu es un traducteur expert spécialisé dans le e-commerce marocain et les dialectes locaux.",
-                        "messages": [{"role": "user", "content": prompt}]
-                    },
-                    timeout=30.0
-                )
+            translation = await self._call_claude(
+                "Tu es un traducteur expert spécialisé dans le e-commerce marocain et les dialectes locaux.",
+                [{"role": "user", "content": prompt}],
+                max_tokens=1024,
+                cache=True
+            )
 
-                response.raise_for_status()
-                result = response.json()
-                translation = result["content"][0]["text"]
-
-                return {
-                    "success": True,
-                    "translation": translation,
-                    "source_language": source_language.value,
-                    "target_language": target_language.value,
-                    "confidence": 0.95,
-                    "context": context
-                }
+            return {
+                "success": True,
+                "translation": translation,
+                "source_language": source_language.value,
+                "target_language": target_language.value,
+                "confidence": 0.95,
+                "context": context
+            }
 
         except Exception as e:
             logger.error(f"❌ Erreur traduction: {str(e)}")
@@ -984,28 +1003,13 @@ Fournis une réponse JSON structurée avec:
 
 Analyse en profondeur pour insights actionnables."""
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.anthropic_api_url,
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 1536,
-                        "system": "Tu es un expert en analyse de sentiment et NLP.",
-                        "messages": [{"role": "user", "content": prompt}]
-                    },
-                    timeout=30.0
-                )
-
-                response.raise_for_status()
-                result = response.json()
-                analysis = result["content"][0]["text"]
+            analysis = await self._call_claude(
+                "Tu es un expert en analyse de sentiment et NLP.",
+                [{"role": "user", "content": prompt}],
+                max_tokens=1536
+            )
 
-                return self._parse_sentiment_analysis(analysis)
+            return self._parse_sentiment_analysis(analysis)
 
         except Exception as e:
             logger.error(f"❌ Erreur analyse sentiment: {str(e)}")
@@ -1125,11 +1129,11 @@ Analyse en profondeur pour insights actionnables."""
 
         try:
             # Analyser les données historiques
-            sales_data = [d.get("sales", 0) for d in historical_data]
-            prices = [d.get("price", 0) for d in historical_data]
+            sales_data = np.array([d.get("sales") or 0 for d in historical_data], dtype=np.float64)
+            prices = np.array([d.get("price") or 0 for d in historical_data], dtype=np.float64)
 
             # Calculs statistiques de base
-            avg_sales = statistics.mean(sales_data) if sales_data else 0
+            avg_sales = float(sales_data.mean())
             sales_trend = self._calculate_trend(sales_data)
             price_elasticity = self._calculate_price_elasticity(sales_data, prices)
 
@@ -1177,49 +1181,37 @@ Analyse en profondeur pour insights actionnables."""
             logger.error(f"❌ Erreur prédiction ventes: {str(e)}")
             return self._demo_sales_prediction(time_period)
 
-    def _calculate_trend(self, sales_data: List[float]) -> float:
+    def _calculate_trend(self, sales_data: Sequence[float]) -> float:
         """Calcule la tendance de vente"""
-        if len(sales_data) < 2:
+        sales = np.asarray(sales_data, dtype=np.float64)
+        if sales.size < 2:
             return 1.0
 
         # Comparer première moitié vs deuxième moitié
-        mid = len(sales_data) // 2
-        first_half_avg = statistics.mean(sales_data[:mid])
-        second_half_avg = statistics.mean(sales_data[mid:])
+        mid = sales.size // 2
+        first_half_avg = sales[:mid].mean()
 
         if first_half_avg == 0:
             return 1.0
 
-        return second_half_avg / first_half_avg
+        return float(sales[mid:].mean() / first_half_avg)
 
     def _calculate_price_elasticity(
-        self, sales_data: List[float], prices: List[float]
+        self, sales_data: Sequence[float], prices: Sequence[float]
     ) -> float:
-        """Calcule l'élasticité prix (corrélation ventes/prix)"""
-        if len(sales_data) != len(prices) or len(sales_data) < 2:
+        """Calcule l'élasticité prix (pente ventes/prix, moindres carrés)"""
+        sales = np.asarray(sales_data, dtype=np.float64)
+        price = np.asarray(prices, dtype=np.float64)
+        if sales.shape != price.shape or sales.size < 2:
             return 0.0
 
-        # Calcul simple de corrélation
-        try:
-            # Variation moyenne des prix
-            price_changes = [prices[i+1] - prices[i] for i in range(len(prices)-1)]
-            sales_changes = [sales_data[i+1] - sales_data[i] for i in range(len(sales_data)-1)]
-
-            if not price_changes or not sales_changes:
-                return 0.0
-
-            avg_price_change = statistics.mean(price_changes)
-            avg_sales_change = statistics.mean(sales_changes)
-
-            if avg_price_change == 0:
-                return 0.0
-
-            elasticity = avg_sales_change / avg_price_change
-            return round(elasticity, 2)
-
-        except:
+        price_variance = price.var()
+        if price_variance == 0:
             return 0.0
 
+        elasticity = ((price - price.mean()) * (sales - sales.mean())).mean() / price_variance
+        return round(float(elasticity), 2)
+
     def _generate_sales_recommendations(
         self, trend: str, elasticity: float, seasonality: float
     ) -> List[str]:
@@ -13,14 +13,15 @@ Fonctionnalités:
 - RAG (Retrieval-Augmented Generation) pour doc
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
-import json
-import httpx
 import structlog
 from dataclasses import dataclass, asdict
-import re
+
+from services.intent_detector import IntentDetector
+from services.llm_gateway import llm_gateway
+from services.user_context_service import compact_json, user_context_service
 
 logger = structlog.get_logger()
 
@@ -81,6 +82,165 @@ class BotAction:
     error: Optional[str] = None
 
 
+# ============================================
+# INTENTIONS
+# ============================================
+
+# Patterns par intention, toutes langues confondues, en minuscules. Ceux qui
+# commencent par \b sont ancrés en début de mot; les patterns arabes, sans \b,
+# correspondent aussi après l'article collé « ال » (voir
+# services/intent_detector.py). Ordre = priorité à score égal.
+INTENT_PATTERNS: Dict[IntentType, List[str]] = {
+    IntentType.GREETING: [
+        r'\b(bonjour|salut|hello|hi|hey|salam)\b',
+        r'\b(bonsoir|good morning|good evening)\b',
+        r'(مرحبا|السلام عليكم|أهلا|اهلا)'
+    ],
+    IntentType.CREATE_AFFILIATION: [
+        r'\b(créer|générer|demander).{0,30}(lien|affiliation)\b',
+        r'\b(create|generate).{0,30}(link|affiliation)\b',
+        r'\b(je veux|i want).{0,30}(promouvoir|promote)\b',
+        r'(إنشاء|انشاء).{0,30}(رابط|انتساب)'
+    ],
+    IntentType.CHECK_STATS: [
+        r'\b(statistiques?|stats?|performances?)\b',
+        r'\b(combien|how (much|many)).{0,30}(ventes?|sales?|commissions?)\b',
+        r'\b(followers?|abonnés?|engagement)\b',
+        r'(إحصائيات|احصائيات|مبيعات|عمولات?)'
+    ],
+    IntentType.CONNECT_SOCIAL: [
+        r'\b(connecter|connect|lier|link).{0,30}(instagram|tiktok|facebook)\b',
+        r'\b(réseaux sociaux|social media)\b',
+        r'(وسائل التواصل)'
+    ],
+    IntentType.SUBSCRIPTION: [
+        r'\b(abonnement|subscription|plan|pricing)\b',
+        r'\b(upgrade|downgrade|cancel)\b',
+        r'(اشتراك)'
+    ],
+    IntentType.PAYMENT: [
+        r'\b(paiement|payment|payer|pay)\b',
+        r'\b(retrait|withdraw|transfer)\b',
+        r'\b(solde|balance|argent|money)\b',
+        r'(دفع|سحب|رصيد)'
+    ],
+    IntentType.COMPLAINT: [
+        r'\b(problème|problem|bug|erreur|error)\b',
+        r'\b(ne fonctionne pas|doesn\'t work|broken)\b',
+        r'\b(plainte|complaint|insatisfait)\b',
+        r'(مشكلة|شكوى)'
+    ],
+    IntentType.GOODBYE: [
+        r'\b(au revoir|bye|goodbye|adieu|à bientôt)\b',
+        r'\b(merci|thank you|thanks)\b.*\b(bye|au revoir)\b',
+        r'(مع السلامة|وداعا)'
+    ]
+}
+
+intent_detector = IntentDetector(INTENT_PATTERNS)
+
+
+# ============================================
+# RÉPONSES PRÉ-DÉFINIES
+# ============================================
+
+STATS_PLACEHOLDER = "{stats}"
+
+PREDEFINED_RESPONSES: Dict[IntentType, Dict[BotLanguage, str]] = {
+    IntentType.GREETING: {
+        BotLanguage.FRENCH: "👋 Bonjour! Je suis ShareBot, votre assistant intelligent ShareYourSales.\n\nComment puis-je vous aider aujourd'hui?",
+        BotLanguage.ENGLISH: "👋 Hello! I'm ShareBot, your ShareYourSales intelligent assistant.\n\nHow can I help you today?",
+        BotLanguage.ARABIC: "👋 مرحبا! أنا ShareBot، مساعدك الذكي في ShareYourSales.\n\nكيف يمكنني مساعدتك اليوم؟"
+    },
+    IntentType.HELP: {
+        BotLanguage.FRENCH: """🤖 Je peux vous aider avec:
+
+📊 **Statistiques** - Vérifier vos ventes et commissions
+🔗 **Affiliation** - Créer des liens d'affiliation
+📱 **Réseaux Sociaux** - Connecter Instagram, TikTok
+💰 **Paiements** - Vérifier votre solde
+📦 **Produits** - Trouver des produits à promouvoir
+
+Que souhaitez-vous faire?""",
+        BotLanguage.ENGLISH: """🤖 I can help you with:
+
+📊 **Statistics** - Check your sales and commissions
+🔗 **Affiliation** - Create affiliation links
+📱 **Social Media** - Connect Instagram, TikTok
+💰 **Payments** - Check your balance
+📦 **Products** - Find products to promote
+
+What would you like to do?""",
+        BotLanguage.ARABIC: """🤖 يمكنني مساعدتك في:
+
+📊 **الإحصائيات** - تحقق من مبيعاتك وعمولاتك
+🔗 **الانتساب** - إنشاء روابط الانتساب
+📱 **وسائل التواصل** - ربط Instagram و TikTok
+💰 **المدفوعات** - تحقق من رصيدك
+📦 **المنتجات** - ابحث عن منتجات للترويج
+
+ماذا تريد أن تفعل؟"""
+    },
+    IntentType.CHECK_STATS: {
+        BotLanguage.FRENCH: """📊 **Vos Statistiques**
+
+{stats}
+
+Voulez-vous plus de détails sur une métrique spécifique?""",
+        BotLanguage.ENGLISH: """📊 **Your Statistics**
+
+{stats}
+
+Would you like more details on a specific metric?"""
+    },
+    IntentType.CONNECT_SOCIAL: {
+        BotLanguage.FRENCH: """📱 **Connexion Réseaux Sociaux**
+
+Connectez vos comptes pour:
+✅ Synchronisation automatique des stats
+✅ Profil plus attractif pour les marchands
+✅ Suivi de votre croissance
+
+Plateformes disponibles:
+• Instagram
+• TikTok
+• Facebook
+
+👉 [Connecter mes réseaux sociaux](/influencer/social-media)""",
+        BotLanguage.ENGLISH: """📱 **Social Media Connection**
+
+Connect your accounts to:
+✅ Automatic stats synchronization
+✅ More attractive profile for merchants
+✅ Track your growth
+
+Available platforms:
+• Instagram
+• TikTok
+• Facebook
+
+👉 [Connect my social media](/influencer/social-media)"""
+    },
+    IntentType.GOODBYE: {
+        BotLanguage.FRENCH: "👋 À bientôt! N'hésitez pas si vous avez d'autres questions.",
+        BotLanguage.ENGLISH: "👋 See you soon! Don't hesitate if you have other questions.",
+        BotLanguage.ARABIC: "👋 أراك قريبا! لا تتردد إذا كان لديك أسئلة أخرى."
+    }
+}
+
+
+# Résolues une fois pour chaque (intention, langue): langue ou intention sans
+# réponse -> aide en français
+_PREDEFINED_BY_LANGUAGE: Dict[Tuple[IntentType, BotLanguage], str] = {
+    (intent, language): PREDEFINED_RESPONSES.get(intent, {}).get(
+        language,
+        PREDEFINED_RESPONSES[IntentType.HELP][BotLanguage.FRENCH]
+    )
+    for intent in IntentType
+    for language in BotLanguage
+}
+
+
 class AIBotService:
     """
     Service principal du bot IA
@@ -97,51 +257,17 @@ class AIBotService:
         self,
         api_key: str = None,
         model: str = "claude-3-5-sonnet-20241022",
-        max_context_messages: int = 20
+        max_context_messages: int = 20,
+        context_service=None
     ):
         self.api_key = api_key
         self.model = model
         self.max_context_messages = max_context_messages
+        self.context_service = context_service or user_context_service
 
-        # Intent patterns (regex)
-        self.intent_patterns = {
-            IntentType.GREETING: [
-                r'\b(bonjour|salut|hello|hi|hey|salam)\b',
-                r'\b(bonsoir|good morning|good evening)\b'
-            ],
-            IntentType.CREATE_AFFILIATION: [
-                r'\b(créer|générer|demander).{0,30}(lien|affiliation)\b',
-                r'\b(create|generate).{0,30}(link|affiliation)\b',
-                r'\b(je veux|i want).{0,30}(promouvoir|promote)\b'
-            ],
-            IntentType.CHECK_STATS: [
-                r'\b(statistiques?|stats?|performances?)\b',
-                r'\b(combien|how (much|many)).{0,30}(ventes?|sales?|commissions?)\b',
-                r'\b(followers?|abonnés?|engagement)\b'
-            ],
-            IntentType.CONNECT_SOCIAL: [
-                r'\b(connecter|connect|lier|link).{0,30}(instagram|tiktok|facebook)\b',
-                r'\b(réseaux sociaux|social media)\b'
-            ],
-            IntentType.SUBSCRIPTION: [
-                r'\b(abonnement|subscription|plan|pricing)\b',
-                r'\b(upgrade|downgrade|cancel)\b'
-            ],
-            IntentType.PAYMENT: [
-                r'\b(paiement|payment|payer|pay)\b',
-                r'\b(retrait|withdraw|transfer)\b',
-                r'\b(solde|balance|argent|money)\b'
-            ],
-            IntentType.COMPLAINT: [
-                r'\b(problème|problem|bug|erreur|error)\b',
-                r'\b(ne fonctionne pas|doesn\'t work|broken)\b',
-                r'\b(plainte|complaint|insatisfait)\b'
-            ],
-            IntentType.GOODBYE: [
-                r'\b(au revoir|bye|goodbye|adieu|à bientôt)\b',
-                r'\b(merci|thank you|thanks)\b.*\b(bye|au revoir)\b'
-            ]
-        }
+        # Patterns compilés une fois au chargement du module (INTENT_PATTERNS)
+        self.intent_patterns = INTENT_PATTERNS
+        self.intent_detector = intent_detector
 
     async def chat(
         self,
@@ -159,27 +285,7 @@ class AIBotService:
             Tuple (réponse du bot, action exécutée)
         """
         try:
-            # 1. Détecter l'intention
-            intent = self._detect_intent(user_message, context.language)
-            logger.info("intent_detected", intent=intent.value, user_id=context.user_id)
-
-            # 2. Enrichir le contexte avec données DB
-            enriched_context = await self._enrich_context(context)
-
-            # 3. Ajouter le message utilisateur
-            enriched_context.messages.append(Message(
-                role=MessageRole.USER,
-                content=user_message,
-                timestamp=datetime.utcnow(),
-                metadata={"intent": intent.value}
-            ))
-
-            # 4. Limiter historique conversation
-            if len(enriched_context.messages) > self.max_context_messages:
-                # Garder le message système + les N derniers messages
-                system_msg = [m for m in enriched_context.messages if m.role == MessageRole.SYSTEM]
-                recent_msgs = enriched_context.messages[-self.max_context_messages:]
-                enriched_context.messages = system_msg + recent_msgs
+            intent, enriched_context = await self._prepare_turn(user_message, context)
 
             # 5. Générer réponse via LLM
             bot_response = await self._generate_response(
@@ -187,85 +293,150 @@ class AIBotService:
                 intent
             )
 
-            # 6. Exécuter action si nécessaire
-            action = await self._execute_action(
-                intent,
-                user_message,
-                enriched_context
-            )
-
-            # 7. Ajouter réponse bot à l'historique
-            enriched_context.messages.append(Message(
-                role=MessageRole.ASSISTANT,
-                content=bot_response,
-                timestamp=datetime.utcnow(),
-                metadata={"action": asdict(action) if action else None}
-            ))
-
-            # 8. Sauvegarder contexte
-            await self._save_conversation(enriched_context)
-
-            logger.info(
-                "bot_response_generated",
-                user_id=context.user_id,
-                intent=intent.value,
-                action_executed=action is not None
-            )
-
+            action = await self._finish_turn(intent, user_message, bot_response, enriched_context)
             return bot_response, action
 
         except Exception as e:
             logger.error("bot_error", error=str(e), user_id=context.user_id)
             return self._get_error_response(context.language), None
 
-    def _detect_intent(self, message: str, language: BotLanguage) -> IntentType:
+    async def chat_stream(
+        self,
+        user_message: str,
+        context: ConversationContext
+    ) -> AsyncIterator[Tuple[str, Dict]]:
         """
-        Détecte l'intention de l'utilisateur via regex patterns
+        Variante streaming de chat(): la réponse est transmise au fil de la génération
 
-        Returns:
-            IntentType détecté
+        Yields:
+            ("token", {"text": ...}) pour chaque fragment, puis
+            ("done", {"intent": ..., "action": ...}) une fois la réponse complète,
+            ou ("error", {"message": ...}) si le fournisseur coupe en cours de réponse
+
+        L'action et la sauvegarde n'ont lieu qu'à la fin du flux: une réponse
+        interrompue (erreur, client déconnecté) n'est pas ajoutée à la conversation.
         """
-        message_lower = message.lower()
+        try:
+            intent, enriched_context = await self._prepare_turn(user_message, context)
+        except Exception as e:
+            logger.error("bot_error", error=str(e), user_id=context.user_id)
+            yield "token", {"text": self._get_error_response(context.language)}
+            yield "done", {"intent": None, "action": None}
+            return
+
+        user_turn = enriched_context.messages[-1]
+        parts: List[str] = []
+        completed = False
+        try:
+            async for chunk in self._stream_response(enriched_context, intent):
+                parts.append(chunk)
+                yield "token", {"text": chunk}
+
+            action = await self._finish_turn(intent, user_message, "".join(parts), enriched_context)
+            completed = True
+            yield "done", {"intent": intent.value, "action": asdict(action) if action else None}
+
+        except Exception as e:
+            logger.error("bot_stream_error", error=str(e), user_id=context.user_id)
+            yield "error", {"message": self._get_error_response(context.language)}
+
+        finally:
+            if not completed and user_turn in enriched_context.messages:
+                enriched_context.messages.remove(user_turn)
+
+    async def _prepare_turn(
+        self,
+        user_message: str,
+        context: ConversationContext
+    ) -> Tuple[IntentType, ConversationContext]:
+        """Étapes 1 à 4: intention, contexte enrichi, message utilisateur ajouté"""
+        # 1. Détecter l'intention
+        intent = self._detect_intent(user_message, context.language)
+        logger.info("intent_detected", intent=intent.value, user_id=context.user_id)
+
+        # 2. Enrichir le contexte avec données DB
+        enriched_context = await self._enrich_context(context)
+
+        # 3. Ajouter le message utilisateur
+        enriched_context.messages.append(Message(
+            role=MessageRole.USER,
+            content=user_message,
+            timestamp=datetime.utcnow(),
+            metadata={"intent": intent.value}
+        ))
+
+        # 4. Limiter historique conversation
+        if len(enriched_context.messages) > self.max_context_messages:
+            # Garder le message système + les N derniers messages
+            system_msg = [m for m in enriched_context.messages if m.role == MessageRole.SYSTEM]
+            recent_msgs = enriched_context.messages[-self.max_context_messages:]
+            enriched_context.messages = system_msg + recent_msgs
+
+        return intent, enriched_context
+
+    async def _finish_turn(
+        self,
+        intent: IntentType,
+        user_message: str,
+        bot_response: str,
+        context: ConversationContext
+    ) -> Optional[BotAction]:
+        """Étapes 6 à 8, une fois la réponse complète: action, historique, sauvegarde"""
+        # 6. Exécuter action si nécessaire
+        action = await self._execute_action(
+            intent,
+            user_message,
+            context
+        )
+
+        # 7. Ajouter réponse bot à l'historique
+        context.messages.append(Message(
+            role=MessageRole.ASSISTANT,
+            content=bot_response,
+            timestamp=datetime.utcnow(),
+            metadata={"action": asdict(action) if action else None}
+        ))
+
+        # 8. Sauvegarder contexte
+        await self._save_conversation(context)
+
+        logger.info(
+            "bot_response_generated",
+            user_id=context.user_id,
+            intent=intent.value,
+            action_executed=action is not None
+        )
 
-        # Parcourir tous les patterns
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower, re.IGNORECASE):
-                    return intent
+        return action
 
-        # Par défaut: question générale
-        return IntentType.QUESTION
+    def _detect_intent(self, message: str, language: BotLanguage) -> IntentType:
+        """
+        Détecte l'intention de l'utilisateur (une passe sur le message, voir
+        services/intent_detector.py)
+
+        Returns:
+            IntentType au meilleur score, QUESTION si aucun pattern ne correspond
+        """
+        return self.intent_detector.detect(message, default=IntentType.QUESTION)
 
     async def _enrich_context(self, context: ConversationContext) -> ConversationContext:
         """
         Enrichit le contexte avec données de la base de données
 
-        Récupère:
+        Récupère (en parallèle, voir services/user_context_service.py):
         - Profil utilisateur
         - Statistiques récentes
-        - Dernières affiliations
+        - Liens actifs, demandes d'affiliation en attente
         - Solde/paiements
+
+        L'instantané est en cache quelques secondes: les tours suivants de la
+        conversation ne relisent pas la base.
         """
-        # TODO: Implémenter récupération DB
-        # Pour l'instant, retourner contexte inchangé
-
-        # Exemple de ce qu'il faut récupérer:
-        # if context.user_role == "influencer":
-        #     context.user_data = {
-        #         "total_sales": 1250,
-        #         "commission_earned": 375.50,
-        #         "active_links": 5,
-        #         "followers": 25000,
-        #         "engagement_rate": 4.2,
-        #         "pending_affiliations": 2
-        #     }
-        # elif context.user_role == "merchant":
-        #     context.user_data = {
-        #         "total_products": 15,
-        #         "active_influencers": 8,
-        #         "total_sales": 5600,
-        #         "pending_requests": 3
-        #     }
+        try:
+            context.user_data = await self.context_service.snapshot(context.user_id, context.user_role)
+        except Exception as e:
+            # Le bot répond quand même, sans données personnalisées
+            logger.warning("context_enrichment_failed", error=str(e), user_id=context.user_id)
 
         return context
 
@@ -286,44 +457,60 @@ class AIBotService:
         # Construire le prompt système
         system_prompt = self._build_system_prompt(context)
 
-        # Construire l'historique de conversation
-        messages = []
-        for msg in context.messages:
-            messages.append({
-                "role": msg.role.value,
-                "content": msg.content
-            })
-
         try:
-            # Appel à l'API Claude (ou GPT-4)
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.anthropic.com/v1/messages",
-                    headers={
-                        "x-api-key": self.api_key,
-                        "anthropic-version": "2023-06-01",
-                        "content-type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "max_tokens": 1024,
-                        "system": system_prompt,
-                        "messages": messages
-                    },
-                    timeout=30.0
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    return data["content"][0]["text"]
-                else:
-                    logger.error("llm_api_error", status=response.status_code)
-                    return self._get_predefined_response(intent, context)
+            # Appel à l'API Claude via la passerelle partagée (pool, retries)
+            response = await llm_gateway.complete(
+                "anthropic",
+                self._llm_messages(context),
+                model=self.model,
+                system=system_prompt,
+                max_tokens=1024,
+                api_key=self.api_key
+            )
+            return response.text
 
         except Exception as e:
             logger.error("llm_generation_error", error=str(e))
             return self._get_predefined_response(intent, context)
 
+    async def _stream_response(
+        self,
+        context: ConversationContext,
+        intent: IntentType
+    ) -> AsyncIterator[str]:
+        """
+        Comme _generate_response, fragment par fragment
+
+        Si le fournisseur échoue avant le premier fragment, la réponse
+        pré-définie est envoyée d'un bloc; après, l'erreur est propagée.
+        """
+        if not self.api_key:
+            yield self._get_predefined_response(intent, context)
+            return
+
+        started = False
+        try:
+            async for chunk in llm_gateway.stream(
+                "anthropic",
+                self._llm_messages(context),
+                model=self.model,
+                system=self._build_system_prompt(context),
+                max_tokens=1024,
+                api_key=self.api_key
+            ):
+                started = True
+                yield chunk
+
+        except Exception as e:
+            logger.error("llm_generation_error", error=str(e), streaming=True)
+            if started:
+                raise
+            yield self._get_predefined_response(intent, context)
+
+    def _llm_messages(self, context: ConversationContext) -> List[Dict[str, str]]:
+        """Historique de conversation au format de l'API"""
+        return [{"role": msg.role.value, "content": msg.content} for msg in context.messages]
+
     def _build_system_prompt(self, context: ConversationContext) -> str:
         """
         Construit le prompt système pour le LLM
@@ -365,8 +552,8 @@ RÈGLES IMPORTANTES:
 - Propose des actions concrètes (boutons, liens)
 - Utilise les données utilisateur pour personnaliser les réponses
 
-DONNÉES UTILISATEUR:
-{json.dumps(context.user_data or {}, indent=2, ensure_ascii=False)}
+DONNÉES UTILISATEUR (montants en MAD, *_30d = 30 derniers jours):
+{compact_json(context.user_data)}
 
 CAPACITÉS:
 - Créer des demandes d'affiliation
@@ -385,94 +572,10 @@ CAPACITÉS:
         """
         Réponses pré-définies si pas d'API LLM disponible
         """
-        lang = context.language
-
-        responses = {
-            IntentType.GREETING: {
-                BotLanguage.FRENCH: f"👋 Bonjour! Je suis ShareBot, votre assistant intelligent ShareYourSales.\n\nComment puis-je vous aider aujourd'hui?",
-                BotLanguage.ENGLISH: f"👋 Hello! I'm ShareBot, your ShareYourSales intelligent assistant.\n\nHow can I help you today?",
-                BotLanguage.ARABIC: f"👋 مرحبا! أنا ShareBot، مساعدك الذكي في ShareYourSales.\n\nكيف يمكنني مساعدتك اليوم؟"
-            },
-            IntentType.HELP: {
-                BotLanguage.FRENCH: """🤖 Je peux vous aider avec:
-
-📊 **Statistiques** - Vérifier vos ventes et commissions
-🔗 **Affiliation** - Créer des liens d'affiliation
-📱 **Réseaux Sociaux** - Connecter Instagram, TikTok
-💰 **Paiements** - Vérifier votre solde
-📦 **Produits** - Trouver des produits à promouvoir
-
-Que souhaitez-vous faire?""",
-                BotLanguage.ENGLISH: """🤖 I can help you with:
-
-📊 **Statistics** - Check your sales and commissions
-🔗 **Affiliation** - Create affiliation links
-📱 **Social Media** - Connect Instagram, TikTok
-💰 **Payments** - Check your balance
-📦 **Products** - Find products to promote
-
-What would you like to do?""",
-                BotLanguage.ARABIC: """🤖 يمكنني مساعدتك في:
-
-📊 **الإحصائيات** - تحقق من مبيعاتك وعمولاتك
-🔗 **الانتساب** - إنشاء روابط الانتساب
-📱 **وسائل التواصل** - ربط Instagram و TikTok
-💰 **المدفوعات** - تحقق من رصيدك
-📦 **المنتجات** - ابحث عن منتجات للترويج
-
-ماذا تريد أن تفعل؟"""
-            },
-            IntentType.CHECK_STATS: {
-                BotLanguage.FRENCH: f"""📊 **Vos Statistiques**
-
-{self._format_stats(context)}
-
-Voulez-vous plus de détails sur une métrique spécifique?""",
-                BotLanguage.ENGLISH: f"""📊 **Your Statistics**
-
-{self._format_stats(context)}
-
-Would you like more details on a specific metric?"""
-            },
-            IntentType.CONNECT_SOCIAL: {
-                BotLanguage.FRENCH: """📱 **Connexion Réseaux Sociaux**
-
-Connectez vos comptes pour:
-✅ Synchronisation automatique des stats
-✅ Profil plus attractif pour les marchands
-✅ Suivi de votre croissance
-
-Plateformes disponibles:
-• Instagram
-• TikTok
-• Facebook
-
-👉 [Connecter mes réseaux sociaux](/influencer/social-media)""",
-                BotLanguage.ENGLISH: """📱 **Social Media Connection**
-
-Connect your accounts to:
-✅ Automatic stats synchronization
-✅ More attractive profile for merchants
-✅ Track your growth
-
-Available platforms:
-• Instagram
-• TikTok
-• Facebook
-
-👉 [Connect my social media](/influencer/social-media)"""
-            },
-            IntentType.GOODBYE: {
-                BotLanguage.FRENCH: "👋 À bientôt! N'hésitez pas si vous avez d'autres questions.",
-                BotLanguage.ENGLISH: "👋 See you soon! Don't hesitate if you have other questions.",
-                BotLanguage.ARABIC: "👋 أراك قريبا! لا تتردد إذا كان لديك أسئلة أخرى."
-            }
-        }
-
-        return responses.get(intent, {}).get(
-            lang,
-            responses[IntentType.HELP][BotLanguage.FRENCH]
-        )
+        response = _PREDEFINED_BY_LANGUAGE[(intent, context.language)]
+        if STATS_PLACEHOLDER in response:
+            response = response.replace(STATS_PLACEHOLDER, self._format_stats(context))
+        return response
 
     def _format_stats(self, context: ConversationContext) -> str:
         """Formate les statistiques pour affichage"""
@@ -20,6 +20,7 @@ from functools import wraps
 from datetime import timedelta
 import structlog
 import os
+from services.metrics_service import metrics
 from contextlib import asynccontextmanager
 
 logger = structlog.get_logger()
@@ -66,10 +67,12 @@ class RedisCache:
 
             if value is None:
                 self.stats["misses"] += 1
+                metrics.record_cache("miss")
                 logger.debug("cache_miss", key=key)
                 return None
 
             self.stats["hits"] += 1
+            metrics.record_cache("hit")
             logger.debug("cache_hit", key=key)
 
             # Tenter de désérialiser JSON, sinon pickle
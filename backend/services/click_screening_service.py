@@ -0,0 +1,296 @@
+"""
+Click Screening Service - Analyse anti-fraude des clics à la redirection
+
+Chaque clic passe par un contrôle en mémoire avant la redirection:
+- user-agent de bot / outil d'automatisation (regex compilée une fois)
+- rafale d'un même IP (fenêtre glissante par IP)
+- clics répétés d'un même IP sur un même lien (fenêtre glissante IP + lien)
+- rafale sur un lien (fenêtre glissante par lien)
+- IP appartenant à une plage signalée (datacenter, VPN...) du service de réputation IP
+
+Les fenêtres sont bornées (nombre de clés et d'événements par clé): la
+mémoire reste constante quel que soit le trafic. Elles sont locales au
+process; avec plusieurs workers, chaque worker voit sa part du trafic.
+
+Les agrégats par influenceur et par mois (clics, clics signalés, IPs
+suspectes, patterns, pays) sont tenus dans un hash Redis et alimentent les
+signaux de trafic du Trust Score (suspicious_ip_percentage,
+click_pattern_score, geo_consistency). Après une erreur Redis, les agrégats
+passent en mémoire pendant REDIS_RETRY_SECONDS, puis Redis est retenté et
+reçoit les compteurs accumulés entre-temps.
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+import structlog
+
+from services.ip_reputation_service import IPReputationService, ip_reputation
+
+logger = structlog.get_logger()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SCREENING_PREFIX = "click_screening:"
+SCREENING_TTL = 60 * 60 * 24 * 70  # Mois courant + mois précédent
+REDIS_RETRY_SECONDS = float(os.getenv("CLICK_SCREENING_REDIS_RETRY_SECONDS", "30"))
+# Délai max d'un appel Redis: le filtrage est sur le chemin de chaque redirection
+REDIS_TIMEOUT = float(os.getenv("CLICK_SCREENING_REDIS_TIMEOUT", "0.5"))
+GEO_COUNTRY_HEADER = os.getenv("GEO_COUNTRY_HEADER", "cf-ipcountry")
+
+# Seuils (clics dans la fenêtre, fenêtre en secondes)
+IP_CLICKS_LIMIT, IP_WINDOW = 20, 60
+IP_LINK_CLICKS_LIMIT, IP_LINK_WINDOW = 5, 3600
+LINK_BURST_LIMIT, LINK_BURST_WINDOW = 30, 10
+
+MAX_TRACKED_KEYS = int(os.getenv("CLICK_SCREENING_MAX_KEYS", "50000"))
+
+# Signaux -> catégories d'agrégat
+FLAG_BOT = "bot_user_agent"
+FLAG_IP_FLOOD = "ip_flood"
+FLAG_DUPLICATE = "duplicate_click"
+FLAG_BURST = "link_burst"
+FLAG_IP_REPUTATION = "ip_reputation"
+
+SUSPICIOUS_IP_FLAGS = {FLAG_IP_FLOOD, FLAG_DUPLICATE, FLAG_IP_REPUTATION}
+PATTERN_FLAGS = {FLAG_DUPLICATE, FLAG_BURST}
+
+BOT_USER_AGENT = re.compile(
+    r"bot|crawl|spider|slurp|scrape|headless|phantomjs|selenium|puppeteer|playwright|"
+    r"curl|wget|python-requests|python-urllib|httpx|aiohttp|go-http-client|okhttp|"
+    r"java/|libwww|apache-httpclient|postman|^$|^unknown$",
+    re.IGNORECASE,
+)
+
+
+class ClickVerdict(NamedTuple):
+    flags: Tuple[str, ...]
+    country: Optional[str]
+
+    @property
+    def suspicious(self) -> bool:
+        return bool(self.flags)
+
+
+# ============================================
+# FENÊTRES GLISSANTES
+# ============================================
+
+class SlidingWindowCounter:
+    """
+    Compteur de clics sur une fenêtre glissante, par clé
+
+    Borné: au plus `max_keys` clés (les moins récemment vues sont évincées)
+    et `max_events` horodatages par clé (un compte plafonné suffit pour
+    comparer à un seuil inférieur).
+    """
+
+    def __init__(self, window: float, max_events: int, max_keys: int = MAX_TRACKED_KEYS):
+        self.window = window
+        self.max_events = max_events
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, deque]" = OrderedDict()
+
+    def hit(self, key: str, now: float) -> int:
+        """Enregistre un clic et retourne le nombre de clics dans la fenêtre"""
+        events = self._events.get(key)
+        if events is None:
+            if len(self._events) >= self.max_keys:
+                self._events.popitem(last=False)
+            events = self._events[key] = deque(maxlen=self.max_events)
+        else:
+            self._events.move_to_end(key)
+
+        cutoff = now - self.window
+        while events and events[0] <= cutoff:
+            events.popleft()
+        events.append(now)
+        return len(events)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class ClickScreeningService:
+    """Contrôle des clics à l'ingestion + agrégats d'authenticité par influenceur"""
+
+    def __init__(self, redis_client=None, reputation: IPReputationService = None):
+        self.reputation = reputation or ip_reputation
+        self.per_ip = SlidingWindowCounter(IP_WINDOW, IP_CLICKS_LIMIT + 1)
+        self.per_ip_link = SlidingWindowCounter(IP_LINK_WINDOW, IP_LINK_CLICKS_LIMIT + 1)
+        self.per_link = SlidingWindowCounter(LINK_BURST_WINDOW, LINK_BURST_LIMIT + 1)
+        self._redis = redis_client
+        self._redis_retry_at = 0.0  # Redis ignoré jusqu'à cet instant (monotonic) après une erreur
+        self._memory: Dict[str, Dict[str, int]] = {}
+
+    def screen(
+        self,
+        link_id: str,
+        influencer_id: Optional[str],
+        ip: str,
+        user_agent: str,
+        country: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> ClickVerdict:
+        """Analyse un clic (O(1) amorti) et met à jour les agrégats de l'influenceur"""
+        now = time.monotonic() if now is None else now
+        flags = []
+
+        if BOT_USER_AGENT.search(user_agent or ""):
+            flags.append(FLAG_BOT)
+        if self.reputation.flags(ip):
+            flags.append(FLAG_IP_REPUTATION)
+        if self.per_ip.hit(ip, now) > IP_CLICKS_LIMIT:
+            flags.append(FLAG_IP_FLOOD)
+        if self.per_ip_link.hit(f"{ip}|{link_id}", now) > IP_LINK_CLICKS_LIMIT:
+            flags.append(FLAG_DUPLICATE)
+        if self.per_link.hit(link_id, now) > LINK_BURST_LIMIT:
+            flags.append(FLAG_BURST)
+
+        # "XX" = pays inconnu pour Cloudflare
+        country = (country or "").upper()[:2]
+        country = country if country and country != "XX" else None
+        verdict = ClickVerdict(tuple(flags), country)
+
+        if flags:
+            logger.info("click_flagged", link_id=link_id, ip=ip, flags=flags)
+        if influencer_id:
+            self._record(influencer_id, verdict)
+        return verdict
+
+    def screen_request(self, link: Dict, request) -> ClickVerdict:
+        """Analyse un clic à partir de la requête de redirection"""
+        return self.screen(
+            link_id=link["id"],
+            influencer_id=link.get("influencer_id"),
+            ip=request.client.host if request.client else "unknown",
+            user_agent=request.headers.get("user-agent", "unknown"),
+            country=request.headers.get(GEO_COUNTRY_HEADER),
+        )
+
+    # ---------- Agrégats ----------
+
+    def _key(self, influencer_id: str, month: str) -> str:
+        return f"{SCREENING_PREFIX}{influencer_id}:{month}"
+
+    def _record(self, influencer_id: str, verdict: ClickVerdict):
+        fields = {"clicks": 1}
+        if verdict.flags:
+            fields["flagged"] = 1
+        if FLAG_BOT in verdict.flags:
+            fields["bot"] = 1
+        if SUSPICIOUS_IP_FLAGS.intersection(verdict.flags):
+            fields["suspicious_ip"] = 1
+        if PATTERN_FLAGS.intersection(verdict.flags):
+            fields["pattern"] = 1
+        if verdict.country:
+            fields[f"country:{verdict.country}"] = 1
+
+        key = self._key(influencer_id, datetime.now().strftime("%Y-%m"))
+        client = self._client()
+        if client is not None:
+            # Compteurs accumulés en mémoire pendant une coupure: envoyés avec ce clic
+            backlog, self._memory = self._memory, {}
+            try:
+                pipe = client.pipeline()
+                for backlog_key, counts in backlog.items():
+                    for field, amount in counts.items():
+                        pipe.hincrby(backlog_key, field, amount)
+                    pipe.expire(backlog_key, SCREENING_TTL)
+                for field, amount in fields.items():
+                    pipe.hincrby(key, field, amount)
+                pipe.expire(key, SCREENING_TTL)
+                pipe.execute()
+                return
+            except Exception as e:
+                self._suspend_redis(e)
+                for backlog_key, counts in backlog.items():
+                    self._add_to_memory(backlog_key, counts)
+
+        self._add_to_memory(key, fields)
+
+    def _add_to_memory(self, key: str, fields: Dict[str, int]):
+        counts = self._memory.setdefault(key, {})
+        for field, amount in fields.items():
+            counts[field] = counts.get(field, 0) + amount
+
+    def _read(self, key: str) -> Dict[str, int]:
+        client = self._client()
+        if client is not None:
+            try:
+                return {field: int(value) for field, value in client.hgetall(key).items()}
+            except Exception as e:
+                self._suspend_redis(e)
+        return dict(self._memory.get(key, {}))
+
+    def traffic_signals(self, influencer_id: str, at: Optional[datetime] = None) -> Dict:
+        """
+        Signaux de trafic du Trust Score (mois courant + mois précédent)
+
+        Returns:
+            {total_clicks, flagged_click_percentage, bot_percentage,
+             suspicious_ip_percentage, click_pattern_score, geo_consistency?}
+        """
+        at = at or datetime.now()
+        previous = (at.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+
+        totals: Dict[str, int] = {}
+        for month in (previous, at.strftime("%Y-%m")):
+            for field, value in self._read(self._key(influencer_id, month)).items():
+                totals[field] = totals.get(field, 0) + value
+
+        clicks = totals.get("clicks", 0)
+        if not clicks:
+            return {"total_clicks": 0}
+
+        def percentage(field: str) -> float:
+            return round(totals.get(field, 0) / clicks * 100, 2)
+
+        signals = {
+            "total_clicks": clicks,
+            "flagged_click_percentage": percentage("flagged"),
+            "bot_percentage": percentage("bot"),
+            "suspicious_ip_percentage": percentage("suspicious_ip"),
+            "click_pattern_score": round(100 - percentage("pattern"), 2),
+        }
+
+        # Cohérence géo: part du pays dominant parmi les clics géolocalisés
+        countries = [value for field, value in totals.items() if field.startswith("country:")]
+        if countries:
+            signals["geo_consistency"] = round(max(countries) / sum(countries) * 100, 2)
+
+        return signals
+
+    # ---------- Redis ----------
+
+    def _client(self):
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+
+                self._redis = redis.from_url(
+                    REDIS_URL,
+                    decode_responses=True,
+                    socket_timeout=REDIS_TIMEOUT,
+                    socket_connect_timeout=REDIS_TIMEOUT,
+                )
+            except Exception as e:
+                self._suspend_redis(e)
+                return None
+        return self._redis
+
+    def _suspend_redis(self, error: Exception):
+        """Redis ignoré pendant REDIS_RETRY_SECONDS; le client redis-py se reconnecte ensuite"""
+        logger.warning("click_screening_redis_unavailable", error=str(error), retry_in=REDIS_RETRY_SECONDS)
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+click_screening_service = ClickScreeningService()
@@ -29,8 +29,8 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 from enum import Enum
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
-import httpx
 from supabase_client import supabase
+from services.llm_gateway import llm_gateway
 
 logger = logging.getLogger(__name__)
 
@@ -152,32 +152,26 @@ class ContentStudioService:
 
         enhanced_prompt = f"{style_prefixes.get(style, '')} {prompt}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.openai.com/v1/images/generations",
-                headers={
-                    "Authorization": f"Bearer {self.openai_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "dall-e-3",
-                    "prompt": enhanced_prompt,
-                    "size": size,
-                    "quality": quality,
-                    "n": 1
-                },
-                timeout=60.0
-            )
-
-            response.raise_for_status()
-            result = response.json()
+        result = await llm_gateway.request(
+            "openai",
+            "/v1/images/generations",
+            {
+                "model": "dall-e-3",
+                "prompt": enhanced_prompt,
+                "size": size,
+                "quality": quality,
+                "n": 1
+            },
+            api_key=self.openai_api_key,
+            timeout=60.0
+        )
 
-            return {
-                "success": True,
-                "image_url": result["data"][0]["url"],
-                "revised_prompt": result["data"][0].get("revised_prompt"),
-                "model": "dall-e-3"
-            }
+        return {
+            "success": True,
+            "image_url": result["data"][0]["url"],
+            "revised_prompt": result["data"][0].get("revised_prompt"),
+            "model": "dall-e-3"
+        }
 
     async def _generate_with_stable_diffusion(
         self,
@@ -0,0 +1,317 @@
+"""
+Email Delivery Pipeline - Envoi en masse
+Infrastructure partagée par EmailService (SMTP) et ResendEmailService (API)
+
+Features:
+1. Pool de connexions SMTP persistantes (STARTTLS + login une seule fois)
+2. Session HTTP keep-alive partagée pour l'API Resend
+3. Envoi groupé via l'API batch Resend (100 emails par requête)
+4. Cache de rendu des templates (LRU, clé = template + contexte)
+5. Rate limiting par provider (token bucket)
+"""
+
+import os
+import json
+import time
+import hashlib
+import smtplib
+import threading
+from queue import LifoQueue, Empty, Full
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Callable, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+import structlog
+
+logger = structlog.get_logger()
+
+# Configuration
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "500"))
+SMTP_MAX_IDLE_SECONDS = int(os.getenv("SMTP_MAX_IDLE_SECONDS", "60"))
+SMTP_RATE_LIMIT_PER_SEC = float(os.getenv("SMTP_RATE_LIMIT_PER_SEC", "200"))
+
+RESEND_BATCH_API_URL = "https://api.resend.com/emails/batch"
+RESEND_BATCH_SIZE = 100  # Limite de l'API Resend
+RESEND_RATE_LIMIT_PER_SEC = float(os.getenv("RESEND_RATE_LIMIT_PER_SEC", "2"))
+
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+TEMPLATE_CACHE_SIZE = int(os.getenv("EMAIL_TEMPLATE_CACHE_SIZE", "512"))
+
+
+# ============================================
+# RATE LIMITING
+# ============================================
+
+class TokenBucket:
+    """
+    Token bucket thread-safe
+
+    Autorise des rafales jusqu'à `capacity` puis un débit moyen de `rate` jetons/s.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Consommer des jetons sans attendre"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0):
+        """Consommer des jetons en attendant si nécessaire"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Un bucket par provider (partagé par tous les threads du worker)
+rate_limiters: Dict[str, TokenBucket] = {
+    "smtp": TokenBucket(SMTP_RATE_LIMIT_PER_SEC),
+    "resend": TokenBucket(RESEND_RATE_LIMIT_PER_SEC),
+}
+
+
+# ============================================
+# SMTP CONNECTION POOL
+# ============================================
+
+class _PooledConnection:
+    """Connexion SMTP + métadonnées d'usage"""
+
+    __slots__ = ("server", "sent", "last_used")
+
+    def __init__(self, server: smtplib.SMTP):
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Pool de connexions SMTP réutilisables
+
+    Chaque connexion fait STARTTLS + login une seule fois, puis envoie jusqu'à
+    `max_messages` emails avant d'être recyclée. Les connexions inactives depuis
+    plus de `max_idle` secondes sont vérifiées par NOOP avant réutilisation.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], smtplib.SMTP],
+        max_size: int = SMTP_POOL_SIZE,
+        max_messages: int = SMTP_MAX_MESSAGES_PER_CONNECTION,
+        max_idle: int = SMTP_MAX_IDLE_SECONDS
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_messages = max_messages
+        self.max_idle = max_idle
+        self._idle: LifoQueue = LifoQueue(maxsize=max_size)
+        self.stats = {"created": 0, "reused": 0, "discarded": 0}
+
+    def _is_alive(self, conn: _PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used < self.max_idle:
+            return True
+        try:
+            return conn.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _close(self, conn: _PooledConnection):
+        self.stats["discarded"] += 1
+        try:
+            conn.server.quit()
+        except Exception:
+            try:
+                conn.server.close()
+            except Exception:
+                pass
+
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            if self._is_alive(conn):
+                self.stats["reused"] += 1
+                return conn
+            self._close(conn)
+
+        self.stats["created"] += 1
+        return _PooledConnection(self.factory())
+
+    def _checkin(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        if conn.sent >= self.max_messages:
+            self._close(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[_PooledConnection]:
+        """
+        Emprunter une connexion du pool
+
+        Une connexion qui lève une erreur SMTP n'est pas remise dans le pool.
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+        except Exception:
+            self._close(conn)
+            raise
+        else:
+            self._checkin(conn)
+
+    def send_message(self, msg) -> None:
+        """
+        Envoyer un message MIME via une connexion du pool (1 reconnexion si coupée)
+
+        Seules les coupures de connexion sont retentées: un refus du serveur
+        (SMTPRecipientsRefused, SMTPDataError...) est relevé tel quel, le
+        message a pu être accepté ou le rejet est définitif.
+        """
+        try:
+            self._send(msg)
+        except smtplib.SMTPServerDisconnected:
+            self._send(msg)
+        except smtplib.SMTPException:
+            raise
+        except (ConnectionError, OSError):
+            self._send(msg)
+
+    def _send(self, msg) -> None:
+        with self.connection() as conn:
+            conn.server.send_message(msg)
+            conn.sent += 1
+
+    def close_all(self):
+        """Fermer toutes les connexions inactives"""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except Empty:
+                return
+
+
+# ============================================
+# HTTP SESSION (keep-alive)
+# ============================================
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Session HTTP partagée avec pool de connexions persistantes
+
+    Évite un handshake TLS par email envoyé via une API.
+    """
+    global _http_session
+
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _http_session = session
+
+    return _http_session
+
+
+# ============================================
+# TEMPLATE RENDER CACHE
+# ============================================
+
+class TemplateRenderCache:
+    """
+    Cache LRU des rendus de templates
+
+    Les templates Jinja2 compilés sont déjà mis en cache par l'Environment;
+    ce cache évite en plus de re-rendre un même template avec le même contexte
+    (annonces, rapports identiques envoyés à plusieurs destinataires).
+    """
+
+    def __init__(self, max_size: int = TEMPLATE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(template_name: str, context: Dict[str, Any]) -> str:
+        payload = json.dumps(context, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{template_name}:{digest}"
+
+    def get_or_render(
+        self,
+        template_name: str,
+        context: Dict[str, Any],
+        render: Callable[[], str]
+    ) -> str:
+        """Retourner le rendu en cache ou appeler `render()`"""
+        key = self.make_key(template_name, context)
+
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return html
+
+        html = render()
+
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# ============================================
+# UTILITAIRES BATCH
+# ============================================
+
+def chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    """Découper une liste en lots de `size` éléments"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
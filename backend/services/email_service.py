@@ -23,6 +23,12 @@ import structlog
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pathlib import Path
 
+from services.email_delivery_service import (
+    SMTPConnectionPool,
+    TemplateRenderCache,
+    rate_limiters,
+)
+
 logger = structlog.get_logger()
 
 # Configuration SMTP
@@ -59,6 +65,11 @@ class EmailService:
             loader=FileSystemLoader(str(template_dir)),
             autoescape=select_autoescape(['html', 'xml'])
         )
+        self.render_cache = TemplateRenderCache()
+
+        # Connexions SMTP persistantes (STARTTLS + login une seule fois)
+        self.smtp_pool = SMTPConnectionPool(factory=self._create_smtp_connection)
+        self.rate_limiter = rate_limiters["smtp"]
 
     def _create_smtp_connection(self):
         """Créer connexion SMTP sécurisée"""
@@ -99,23 +110,7 @@ class EmailService:
             True si envoyé avec succès
         """
         try:
-            # Créer message
-            msg = MIMEMultipart('alternative')
-            msg['From'] = f"{self.from_name} <{self.from_address}>"
-            msg['To'] = to_email
-            msg['Subject'] = subject
-
-            if reply_to:
-                msg['Reply-To'] = reply_to
-
-            # Ajouter version texte
-            if text_content:
-                part1 = MIMEText(text_content, 'plain')
-                msg.attach(part1)
-
-            # Ajouter version HTML
-            part2 = MIMEText(html_content, 'html')
-            msg.attach(part2)
+            msg = self._build_message(to_email, subject, html_content, text_content, reply_to)
 
             # Ajouter pièces jointes
             if attachments:
@@ -123,9 +118,9 @@ class EmailService:
                     # TODO: Implémenter attachments
                     pass
 
-            # Envoyer
-            with self._create_smtp_connection() as server:
-                server.send_message(msg)
+            # Envoyer via une connexion du pool
+            self.rate_limiter.acquire()
+            self.smtp_pool.send_message(msg)
 
             logger.info("email_sent", to=to_email, subject=subject)
             return True
@@ -134,6 +129,66 @@ class EmailService:
             logger.error("email_send_failed", to=to_email, error=str(e))
             return False
 
+    def send_bulk(self, messages: List[Dict]) -> List[Dict]:
+        """
+        Envoyer plusieurs emails en réutilisant les connexions SMTP du pool
+
+        Args:
+            messages: Liste de dicts (to_email, subject, html_content, text_content, reply_to)
+
+        Returns:
+            Liste de résultats {to_email, success, error} dans l'ordre des messages
+        """
+        results = []
+
+        for message in messages:
+            to_email = message["to_email"]
+            try:
+                msg = self._build_message(
+                    to_email,
+                    message["subject"],
+                    message["html_content"],
+                    message.get("text_content"),
+                    message.get("reply_to")
+                )
+                self.rate_limiter.acquire()
+                self.smtp_pool.send_message(msg)
+                results.append({"to_email": to_email, "success": True})
+
+            except Exception as e:
+                logger.error("email_send_failed", to=to_email, error=str(e))
+                results.append({"to_email": to_email, "success": False, "error": str(e)})
+
+        sent = sum(1 for r in results if r["success"])
+        logger.info("email_bulk_sent", total=len(messages), sent=sent)
+        return results
+
+    def _build_message(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+        reply_to: Optional[str] = None
+    ) -> MIMEMultipart:
+        """Construire le message MIME"""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = f"{self.from_name} <{self.from_address}>"
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        if reply_to:
+            msg['Reply-To'] = reply_to
+
+        # Ajouter version texte
+        if text_content:
+            msg.attach(MIMEText(text_content, 'plain'))
+
+        # Ajouter version HTML
+        msg.attach(MIMEText(html_content, 'html'))
+
+        return msg
+
     def render_template(self, template_name: str, context: Dict) -> str:
         """
         Rendre un template email
@@ -147,7 +202,11 @@ class EmailService:
         """
         try:
             template = self.jinja_env.get_template(template_name)
-            return template.render(**context)
+            return self.render_cache.get_or_render(
+                template_name,
+                context,
+                lambda: template.render(**context)
+            )
 
         except Exception as e:
             logger.error("template_render_failed", template=template_name, error=str(e))
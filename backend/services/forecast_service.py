@@ -0,0 +1,357 @@
+"""
+Forecast Service - Prévisions de ventes par influenceur et par marchand
+
+Ajustement nocturne en lot (tâche Celery fit_sales_forecasts):
+1. La RPC `stage_entity_daily_series` (migration 015) calcule une fois, par
+   entité, les jours actifs et les valeurs (revenus, conversions, clics) en
+   tableaux dans entity_daily_series, lue ensuite par pages
+2. Les séries sont rangées dans une matrice numpy (entités × jours)
+3. Un seul moindres carrés ajuste toutes les entités à la fois: la matrice
+   de conception (tendance linéaire + effets jour de semaine) est commune,
+   sa pseudo-inverse est calculée une fois
+4. Les paramètres compacts (niveau, pente, 7 effets, sigma, totaux récents)
+   sont écrits dans sales_forecasts
+
+Au dashboard: lecture des paramètres de l'entité, puis mise à jour Holt
+avec les données depuis l'ajustement (jours complets manqués et journée en
+cours au prorata de l'heure), sans relire l'historique: un appel à
+`get_entity_daily_series` filtré sur l'entité (une ligne au plus).
+"""
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+FORECAST_SERIES_RPC = "get_entity_daily_series"
+FORECAST_STAGE_RPC = "stage_entity_daily_series"
+FORECAST_SERIES_TABLE = "entity_daily_series"
+
+FORECAST_METRICS = ("revenue", "conversions", "clicks")
+ENTITY_TYPES = ("influencer", "merchant")
+
+# Historique lu (totaux récents) et fenêtre d'ajustement de la tendance
+FORECAST_HISTORY_DAYS = 365
+FORECAST_FIT_DAYS = int(os.getenv("FORECAST_FIT_DAYS", "182"))
+RECENT_WINDOWS = (7, 30, 90, 365)
+
+# Lissage de la mise à jour incrémentale (niveau, pente)
+FORECAST_ALPHA = 0.3
+FORECAST_BETA = 0.1
+
+FORECAST_PAGE_SIZE = 1000
+
+
+# ============================================
+# MODÈLE (NUMPY)
+# ============================================
+
+def daily_matrix(days: Sequence[Sequence[int]], values: Sequence[Sequence[float]], periods: int) -> np.ndarray:
+    """
+    Séries creuses (jours actifs, valeurs) -> matrice dense (entités × jours)
+
+    Les jours sont des décalages depuis le début de l'historique; les jours
+    hors de [0, periods) sont ignorés.
+    """
+    matrix = np.zeros((len(days), periods))
+    if not len(days):
+        return matrix
+
+    rows = np.repeat(np.arange(len(days)), [len(d) for d in days])
+    cols = np.concatenate([np.asarray(d, dtype=np.int64) for d in days])
+    vals = np.concatenate([np.asarray(v, dtype=np.float64) for v in values])
+    keep = (cols >= 0) & (cols < periods)
+    matrix[rows[keep], cols[keep]] = vals[keep]
+    return matrix
+
+
+def _design(periods: int, last_day: date) -> np.ndarray:
+    """
+    Matrice de conception commune: constante, temps, effets jour de semaine
+
+    Temps compté depuis le dernier jour (t=0): la constante est directement le
+    niveau de tendance au dernier jour. Effets en codage somme-nulle (dimanche
+    = -somme des six autres jours).
+    """
+    t = np.arange(periods) - (periods - 1)
+    weekdays = (last_day.weekday() + t) % 7
+    effects = (weekdays[:, None] == np.arange(6)).astype(np.float64)
+    effects[weekdays == 6] = -1.0
+    return np.column_stack([np.ones(periods), t, effects])
+
+
+def fit_batch(matrix: np.ndarray, last_day: date, fit_days: int = FORECAST_FIT_DAYS) -> Dict[str, np.ndarray]:
+    """
+    Ajuste tendance + saisonnalité hebdomadaire de toutes les séries en une fois
+
+    Args:
+        matrix: (entités × jours), dernier jour = `last_day`
+        fit_days: jours les plus récents utilisés pour la tendance
+
+    Returns:
+        {level (n), slope (n), seasonal (n, 7), sigma (n), recent_totals (n, 4)}
+    """
+    fit_days = min(fit_days, matrix.shape[1])
+    design = _design(fit_days, last_day)
+    observed = matrix[:, -fit_days:]
+
+    coefficients = np.linalg.pinv(design) @ observed.T
+    residuals = observed - (design @ coefficients).T
+    dof = max(fit_days - design.shape[1], 1)
+
+    effects = coefficients[2:].T
+    return {
+        "level": coefficients[0],
+        "slope": coefficients[1],
+        "seasonal": np.column_stack([effects, -effects.sum(axis=1)]),
+        "sigma": np.sqrt((residuals ** 2).sum(axis=1) / dof),
+        "recent_totals": np.column_stack([matrix[:, -window:].sum(axis=1) for window in RECENT_WINDOWS]),
+    }
+
+
+@dataclass(frozen=True)
+class ForecastModel:
+    """Paramètres d'une série (entité, métrique)"""
+    level: float
+    slope: float
+    seasonal: Tuple[float, ...]
+    sigma: float
+    recent_totals: Tuple[float, ...]
+    fitted_through: date
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "ForecastModel":
+        fitted_through = row["fitted_through"]
+        if isinstance(fitted_through, str):
+            fitted_through = date.fromisoformat(fitted_through[:10])
+        return cls(
+            level=float(row["level"]),
+            slope=float(row["slope"]),
+            seasonal=tuple(float(s) for s in row["seasonal"]),
+            sigma=float(row["sigma"]),
+            recent_totals=tuple(float(t) for t in row["recent_totals"]),
+            fitted_through=fitted_through
+        )
+
+    def recent_total(self, days: int) -> float:
+        """Total observé sur la plus petite fenêtre récente couvrant `days` jours"""
+        for window, total in zip(RECENT_WINDOWS, self.recent_totals):
+            if days <= window:
+                return total * days / window
+        return self.recent_totals[-1] * days / RECENT_WINDOWS[-1]
+
+    def daily(self, start: int, horizon: int) -> np.ndarray:
+        """Prévisions journalières des jours fitted_through + start .. + start + horizon - 1"""
+        h = np.arange(start, start + horizon)
+        weekdays = (self.fitted_through.weekday() + h) % 7
+        values = self.level + self.slope * h + np.asarray(self.seasonal)[weekdays]
+        return np.clip(values, 0, None)
+
+    def forecast(self, horizon: int, after: date) -> float:
+        """Total prévu sur les `horizon` jours suivant `after`"""
+        return float(self.daily((after - self.fitted_through).days + 1, horizon).sum())
+
+    def updated(
+        self,
+        values: Dict[date, float],
+        today: date,
+        day_fraction: float,
+        alpha: float = FORECAST_ALPHA,
+        beta: float = FORECAST_BETA
+    ) -> "ForecastModel":
+        """
+        Mise à jour Holt avec les données postérieures à l'ajustement
+
+        Jours complets manqués (ajustement en retard): une étape chacun.
+        Journée en cours: valeur extrapolée à la journée entière, pondérée
+        par la fraction de journée écoulée (niveau seulement).
+        """
+        level, slope = self.level, self.slope
+        day = self.fitted_through + timedelta(days=1)
+        while day < today:
+            new_level = alpha * (values.get(day, 0.0) - self.seasonal[day.weekday()]) + (1 - alpha) * (level + slope)
+            slope = beta * (new_level - level) + (1 - beta) * slope
+            level = new_level
+            day += timedelta(days=1)
+
+        if day == today and day_fraction > 0:
+            expected = level + slope + self.seasonal[today.weekday()]
+            level += alpha * day_fraction * (values.get(today, 0.0) / day_fraction - expected)
+
+        return replace(self, level=level, slope=slope, fitted_through=max(self.fitted_through, today - timedelta(days=1)))
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class ForecastService:
+    """Ajustement en lot (Celery) et prévisions du dashboard"""
+
+    def __init__(
+        self,
+        supabase=None,
+        history_days: int = FORECAST_HISTORY_DAYS,
+        fit_days: int = FORECAST_FIT_DAYS
+    ):
+        self._supabase = supabase
+        self.history_days = history_days
+        self.fit_days = fit_days
+        self._entities: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            from supabase_client import supabase
+            self._supabase = supabase
+        return self._supabase
+
+    # ---------- Ajustement nocturne ----------
+
+    def fit_all(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Réajuste toutes les entités actives sur l'historique jusqu'à hier"""
+        today = today or datetime.utcnow().date()
+        last_day = today - timedelta(days=1)
+        start = today - timedelta(days=self.history_days)
+
+        series = self._staged_series(start, datetime.combine(today, time.min))
+        if not series:
+            return {"entities": 0, "rows": 0}
+
+        updated_at = datetime.utcnow().isoformat()
+        rows = []
+        for metric in FORECAST_METRICS:
+            matrix = daily_matrix([s["days"] for s in series], [s[metric] for s in series], self.history_days)
+            params = fit_batch(matrix, last_day, self.fit_days)
+            rows.extend(
+                {
+                    "entity_type": s["entity_type"],
+                    "entity_id": s["entity_id"],
+                    "metric": metric,
+                    "level": round(float(params["level"][i]), 4),
+                    "slope": round(float(params["slope"][i]), 6),
+                    "seasonal": np.round(params["seasonal"][i], 4).tolist(),
+                    "sigma": round(float(params["sigma"][i]), 4),
+                    "recent_totals": np.round(params["recent_totals"][i], 2).tolist(),
+                    "fitted_through": last_day.isoformat(),
+                    "updated_at": updated_at,
+                }
+                for i, s in enumerate(series)
+            )
+
+        for start_row in range(0, len(rows), FORECAST_PAGE_SIZE):
+            self.supabase.table("sales_forecasts").upsert(rows[start_row:start_row + FORECAST_PAGE_SIZE]).execute()
+
+        # Entités sans activité sur l'historique: plus de prévision
+        self.supabase.table("sales_forecasts").delete().lt("fitted_through", last_day.isoformat()).execute()
+
+        logger.info("sales_forecasts_fitted", entities=len(series), rows=len(rows), fitted_through=last_day.isoformat())
+        return {"entities": len(series), "rows": len(rows)}
+
+    def _staged_series(self, start: date, end: datetime) -> List[Dict[str, Any]]:
+        """
+        Séries de toutes les entités: agrégation calculée une fois en base
+        (entity_daily_series), puis lue par pages sur la clé primaire
+        """
+        self.supabase.rpc(FORECAST_STAGE_RPC, {"p_start": start.isoformat(), "p_end": end.isoformat()}).execute()
+
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = (
+                self.supabase.table(FORECAST_SERIES_TABLE)
+                .select("entity_type, entity_id, days, revenue, conversions, clicks")
+                .order("entity_type")
+                .order("entity_id")
+                .range(offset, offset + FORECAST_PAGE_SIZE - 1)
+                .execute()
+                .data or []
+            )
+            rows.extend(page)
+            if len(page) < FORECAST_PAGE_SIZE:
+                return rows
+            offset += FORECAST_PAGE_SIZE
+
+    def _series(self, start: date, end: datetime, entity_type: str, entity_id: str) -> List[Dict[str, Any]]:
+        """Série d'une entité (une ligne au plus, sans pagination)"""
+        params = {
+            "p_start": start.isoformat(),
+            "p_end": end.isoformat(),
+            "p_entity_type": entity_type,
+            "p_entity_id": entity_id,
+        }
+        return self.supabase.rpc(FORECAST_SERIES_RPC, params).execute().data or []
+
+    # ---------- Dashboard ----------
+
+    def entity_for_user(self, user_id: str, role: Optional[str]) -> Optional[Tuple[str, str]]:
+        """
+        (entity_type, entity_id) d'un utilisateur
+
+        Mis en cache pour le process; un utilisateur sans fiche n'est pas mis
+        en cache (la fiche peut être créée après la première visite).
+        """
+        entity_type = "merchant" if role == "merchant" else "influencer"
+        key = f"{entity_type}:{user_id}"
+        if key in self._entities:
+            return self._entities[key]
+
+        table = "merchants" if entity_type == "merchant" else "influencers"
+        result = self.supabase.table(table).select("id").eq("user_id", user_id).limit(1).execute()
+        if not result.data:
+            return None
+        entity = (entity_type, result.data[0]["id"])
+        with self._lock:
+            self._entities[key] = entity
+        return entity
+
+    def models(
+        self,
+        entity_type: str,
+        entity_id: str,
+        now: Optional[datetime] = None
+    ) -> Dict[str, ForecastModel]:
+        """
+        Modèles d'une entité, mis à jour avec les données depuis l'ajustement
+
+        Deux requêtes: paramètres (clé primaire), puis séries de l'entité
+        depuis le lendemain du dernier jour ajusté.
+        """
+        rows = (
+            self.supabase.table("sales_forecasts")
+            .select("metric, level, slope, seasonal, sigma, recent_totals, fitted_through")
+            .eq("entity_type", entity_type)
+            .eq("entity_id", entity_id)
+            .execute()
+            .data or []
+        )
+        models = {row["metric"]: ForecastModel.from_row(row) for row in rows}
+        if not models:
+            return {}
+
+        now = now or datetime.utcnow()
+        today = now.date()
+        since = min(model.fitted_through for model in models.values()) + timedelta(days=1)
+        if since > today:
+            return models
+
+        recent = self._series(since, now, entity_type, entity_id)
+        day_fraction = (now - datetime.combine(today, time.min)).total_seconds() / 86400
+        for metric, model in models.items():
+            values = {}
+            for row in recent:
+                values.update({
+                    since + timedelta(days=int(offset)): float(value)
+                    for offset, value in zip(row["days"], row[metric])
+                })
+            models[metric] = model.updated(values, today, day_fraction)
+        return models
+
+
+forecast_service = ForecastService()
@@ -0,0 +1,347 @@
+"""
+HTTP Pipeline - Middleware ASGI unique pour toutes les requêtes
+
+Remplace la pile de middlewares `@app.middleware("http")` (chaque couche
+BaseHTTPMiddleware ajoute une tâche et un wrapping de la réponse) par un seul
+passage ASGI:
+
+Avant l'application:   filtrage IP, taille du body, content-type, CSRF, rate limit
+Autour:                trace des appels Supabase (contextvar)
+Début de la réponse:   security headers, X-Request-ID, X-Response-Time, Server-Timing
+Fin de la requête:     métriques Prometheus, rapport de trace, log de la requête
+
+Chaque étape peut être désactivée par route (ROUTE_OPT_OUTS): la redirection
+/r/{short_code} et les webhooks ne passent ni par le CSRF ni par le contrôle
+du content-type.
+
+CSRF et rate limit Redis sont activables par variable d'environnement
+(HTTP_PIPELINE_CSRF, HTTP_PIPELINE_RATE_LIMIT): l'API est appelée avec un
+Bearer token et server_complete.py limite déjà via slowapi. Le plafond de
+taille du body l'est aussi (HTTP_PIPELINE_BODY_SIZE); même activé, il ne
+s'applique pas aux routes d'upload, qui limitent la taille par fichier.
+
+Le filtrage IP lit des tries en mémoire; la synchronisation périodique avec
+Redis (ip_reputation.sync) est exécutée dans un thread, hors de la boucle.
+"""
+
+import asyncio
+import os
+import time
+from typing import FrozenSet, List, Optional, Tuple
+import structlog
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from services.ip_reputation_service import ip_reputation
+from services.metrics_service import metrics, scope_route_template
+from services.query_trace_service import report_trace, start_trace, stop_trace
+
+logger = structlog.get_logger()
+
+ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
+MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", str(10 * 1024 * 1024)))  # 10 MB
+CSRF_ENFORCED = os.getenv("HTTP_PIPELINE_CSRF", "false").lower() == "true"
+RATE_LIMIT_ENABLED = os.getenv("HTTP_PIPELINE_RATE_LIMIT", "false").lower() == "true"
+BODY_SIZE_ENFORCED = os.getenv("HTTP_PIPELINE_BODY_SIZE", "false").lower() == "true"
+
+# Étapes
+STAGE_IP_FILTER = "ip_filter"
+STAGE_BODY_SIZE = "body_size"
+STAGE_CONTENT_TYPE = "content_type"
+STAGE_CSRF = "csrf"
+STAGE_RATE_LIMIT = "rate_limit"
+STAGE_SECURITY_HEADERS = "security_headers"
+STAGE_LOGGING = "logging"
+STAGE_METRICS = "metrics"
+STAGE_QUERY_TRACE = "query_trace"
+
+NO_CSRF_NO_CONTENT_TYPE = frozenset({STAGE_CSRF, STAGE_CONTENT_TYPE})
+
+# Opt-out par préfixe de chemin
+ROUTE_OPT_OUTS: Tuple[Tuple[str, FrozenSet[str]], ...] = (
+    ("/r/", NO_CSRF_NO_CONTENT_TYPE),
+    ("/api/webhook", NO_CSRF_NO_CONTENT_TYPE),
+    ("/api/stripe/webhook", NO_CSRF_NO_CONTENT_TYPE),
+    ("/api/social-media/webhooks", NO_CSRF_NO_CONTENT_TYPE),
+    ("/api/auth/login", frozenset({STAGE_CSRF})),
+    # Plusieurs fichiers par requête, limite par fichier dans upload_endpoints.py
+    ("/api/upload", frozenset({STAGE_BODY_SIZE})),
+    # Swagger / ReDoc chargent leurs assets depuis un CDN (CSP trop stricte)
+    ("/docs", frozenset({STAGE_CSRF, STAGE_SECURITY_HEADERS})),
+    ("/redoc", frozenset({STAGE_CSRF, STAGE_SECURITY_HEADERS})),
+    ("/openapi.json", frozenset({STAGE_CSRF})),
+    ("/metrics", frozenset({STAGE_LOGGING})),
+)
+
+ALLOWED_CONTENT_TYPES = (
+    "application/json",
+    "multipart/form-data",
+    "application/x-www-form-urlencoded",
+)
+
+NO_CACHE_PREFIXES = ("/api/auth", "/api/stripe")
+
+
+def route_opt_outs(path: str) -> FrozenSet[str]:
+    skipped = frozenset()
+    for prefix, stages in ROUTE_OPT_OUTS:
+        if path.startswith(prefix):
+            skipped |= stages
+    return skipped
+
+
+# ============================================
+# SECURITY HEADERS
+# ============================================
+
+CSP_DIRECTIVES = [
+    "default-src 'self'",
+    "script-src 'self' 'unsafe-inline' 'unsafe-eval' https://js.stripe.com https://cdn.jsdelivr.net",
+    "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com",
+    "font-src 'self' https://fonts.gstatic.com",
+    "img-src 'self' data: https: blob:",
+    "connect-src 'self' https://api.stripe.com https://api.anthropic.com https://api.openai.com",
+    "frame-src 'self' https://js.stripe.com",
+    "object-src 'none'",
+    "base-uri 'self'",
+    "form-action 'self'",
+    "frame-ancestors 'none'",  # Équivalent à X-Frame-Options: DENY
+    "upgrade-insecure-requests"  # Force HTTPS
+]
+
+PERMISSIONS = [
+    "geolocation=()",
+    "microphone=()",
+    "camera=()",
+    "payment=(self)",
+    "usb=()",
+    "magnetometer=()",
+    "gyroscope=()",
+    "speaker=(self)"
+]
+
+# Calculés une fois: ajoutés tels quels à chaque réponse
+SECURITY_HEADERS: List[Tuple[str, str]] = [
+    ("Content-Security-Policy", "; ".join(CSP_DIRECTIVES)),
+    ("X-Content-Type-Options", "nosniff"),
+    ("X-Frame-Options", "DENY"),
+    ("X-XSS-Protection", "1; mode=block"),
+    ("Referrer-Policy", "strict-origin-when-cross-origin"),
+    ("Permissions-Policy", ", ".join(PERMISSIONS)),
+    ("Server", "ShareYourSales"),
+]
+if ENVIRONMENT == "production":
+    SECURITY_HEADERS.append(("Strict-Transport-Security", "max-age=31536000; includeSubDomains; preload"))
+
+NO_CACHE_HEADERS = [
+    ("Cache-Control", "no-store, no-cache, must-revalidate, private"),
+    ("Pragma", "no-cache"),
+]
+
+
+def security_headers(path: str) -> List[Tuple[str, str]]:
+    """Security headers d'une réponse (données sensibles: pas de cache)"""
+    if path.startswith(NO_CACHE_PREFIXES):
+        return SECURITY_HEADERS + NO_CACHE_HEADERS
+    return SECURITY_HEADERS
+
+
+# ============================================
+# MIDDLEWARE ASGI
+# ============================================
+
+class HTTPPipelineMiddleware:
+    """Toutes les étapes transverses en un seul middleware ASGI"""
+
+    def __init__(
+        self,
+        app,
+        csrf: bool = CSRF_ENFORCED,
+        rate_limit: bool = RATE_LIMIT_ENABLED,
+        body_size: bool = BODY_SIZE_ENFORCED,
+        max_request_size: int = MAX_REQUEST_SIZE
+    ):
+        self.app = app
+        self.disabled = frozenset(
+            stage
+            for stage, enabled in (
+                (STAGE_CSRF, csrf),
+                (STAGE_RATE_LIMIT, rate_limit),
+                (STAGE_BODY_SIZE, body_size),
+            )
+            if not enabled
+        )
+        self.max_request_size = max_request_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        method = scope["method"]
+        path = scope["path"]
+        skipped = self.disabled | route_opt_outs(path)
+        headers = Headers(scope=scope)
+        client_ip = scope["client"][0] if scope.get("client") else "unknown"
+        request_id = headers.get("x-request-id") or f"req_{int(time.time() * 1000)}"
+
+        extra_headers: List[Tuple[str, str]] = []
+        rejection = await self._screen(scope, method, path, headers, client_ip, skipped, extra_headers)
+
+        trace = token = None
+        if rejection is None and STAGE_QUERY_TRACE not in skipped:
+            trace, token = start_trace()
+
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = MutableHeaders(scope=message)
+                if STAGE_SECURITY_HEADERS not in skipped:
+                    for name, value in security_headers(path):
+                        response_headers[name] = value
+                for name, value in extra_headers:
+                    response_headers.append(name, value)
+                if STAGE_LOGGING not in skipped:
+                    response_headers["X-Request-ID"] = request_id
+                    response_headers["X-Response-Time"] = f"{time.perf_counter() - start:.3f}s"
+                if trace is not None and trace.count:
+                    response_headers.append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            if rejection is not None:
+                await rejection(scope, receive, send_with_headers)
+            else:
+                await self.app(scope, receive, send_with_headers)
+        except Exception as e:
+            if STAGE_LOGGING not in skipped:
+                logger.error(
+                    "request_failed",
+                    request_id=request_id,
+                    method=method,
+                    path=path,
+                    ip=client_ip,
+                    error=str(e),
+                    error_type=type(e).__name__,
+                    duration=f"{time.perf_counter() - start:.3f}s"
+                )
+            raise
+        finally:
+            if token is not None:
+                stop_trace(token)
+            duration = time.perf_counter() - start
+            if STAGE_METRICS not in skipped:
+                metrics.record_request(method, scope_route_template(scope), status, duration)
+            if trace is not None:
+                report_trace(trace, method, path, duration)
+
+        if STAGE_LOGGING not in skipped:
+            logger.info(
+                "request_completed",
+                request_id=request_id,
+                method=method,
+                path=path,
+                ip=client_ip,
+                status=status,
+                duration=f"{duration:.3f}s"
+            )
+
+    async def _screen(
+        self,
+        scope,
+        method: str,
+        path: str,
+        headers: Headers,
+        client_ip: str,
+        skipped: FrozenSet[str],
+        extra_headers: List[Tuple[str, str]]
+    ) -> Optional[Response]:
+        """Contrôles avant l'application: une réponse d'erreur, ou None pour continuer"""
+        if STAGE_IP_FILTER not in skipped:
+            if ip_reputation.sync_due():
+                # Appel Redis bloquant: dans un thread
+                await asyncio.to_thread(ip_reputation.sync)
+            if not ip_reputation.is_allowed(client_ip):
+                logger.warning("ip_blocked", ip=client_ip, path=path)
+                return JSONResponse({"detail": "Access denied"}, status_code=403)
+
+        if STAGE_BODY_SIZE not in skipped:
+            content_length = headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_request_size:
+                logger.warning(
+                    "request_too_large", size=content_length, max_size=self.max_request_size, ip=client_ip
+                )
+                return JSONResponse(
+                    {"detail": f"Request body too large. Max size: {self.max_request_size} bytes"},
+                    status_code=413,
+                )
+
+        if STAGE_CONTENT_TYPE not in skipped and method in ("POST", "PUT", "PATCH"):
+            content_type = headers.get("content-type", "")
+            if not any(allowed in content_type for allowed in ALLOWED_CONTENT_TYPES):
+                # Signalé, pas bloqué (certains clients légitimes envoient autre chose)
+                logger.warning("invalid_content_type", content_type=content_type, path=path)
+
+        if STAGE_CSRF not in skipped:
+            rejection = self._check_csrf(scope, method, path, client_ip, extra_headers)
+            if rejection is not None:
+                return rejection
+
+        if STAGE_RATE_LIMIT not in skipped:
+            return await self._check_rate_limit(path, client_ip, extra_headers)
+
+        return None
+
+    def _check_csrf(self, scope, method, path, client_ip, extra_headers) -> Optional[Response]:
+        """Double Submit Cookie (voir middleware/security.py)"""
+        from middleware.security import csrf_protection
+
+        if method in ("GET", "HEAD", "OPTIONS"):
+            if method == "GET":
+                cookie = Response()
+                csrf_protection.set_csrf_cookie(cookie, csrf_protection.generate_token())
+                extra_headers.append(("set-cookie", cookie.headers["set-cookie"]))
+            return None
+
+        if not csrf_protection.validate_csrf_token(Request(scope)):
+            logger.warning("csrf_validation_failed", path=path, method=method, ip=client_ip)
+            return JSONResponse({"detail": "CSRF token validation failed"}, status_code=403)
+        return None
+
+    async def _check_rate_limit(self, path, client_ip, extra_headers) -> Optional[Response]:
+        """Fenêtre glissante Redis (voir middleware/rate_limiting.py)"""
+        from middleware.rate_limiting import DEFAULT_LIMITS, get_endpoint_limits, rate_limiter
+
+        limits = get_endpoint_limits(path)
+        allowed, remaining, retry_after = await rate_limiter.check_rate_limit(
+            identifier=f"ip:{client_ip}", endpoint=path, limit=limits["limit"], window=limits["window"]
+        )
+        if not allowed:
+            metrics.record_rate_limited(path if limits is not DEFAULT_LIMITS else "default")
+            logger.warning("rate_limit_exceeded", identifier=client_ip, endpoint=path, retry_after=retry_after)
+            return JSONResponse(
+                {
+                    "error": "Rate limit exceeded",
+                    "retry_after": retry_after,
+                    "message": f"Too many requests. Please retry after {retry_after} seconds."
+                },
+                status_code=429,
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(limits["limit"]),
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(int(time.time()) + retry_after)
+                },
+            )
+
+        extra_headers.extend([
+            ("X-RateLimit-Limit", str(limits["limit"])),
+            ("X-RateLimit-Remaining", str(remaining)),
+            ("X-RateLimit-Reset", str(int(time.time()) + limits["window"])),
+        ])
+        return None
@@ -0,0 +1,84 @@
+"""
+Intent Detector - Détection d'intentions multi-patterns en une passe
+
+Tous les patterns de toutes les intentions (et de toutes les langues) sont
+compilés une seule fois, au chargement, en une expression unique:
+
+    \\b(?=(?:pattern0(?P<p0>)|...))|(?=(?:patternN(?P<pN>)|...))
+
+La première alternance regroupe les patterns commençant par \\b, la seconde
+les autres, qui gardent la sémantique de re.search: ils correspondent aussi
+au milieu d'un mot (ex. l'article arabe collé: « الإحصائيات »).
+
+Un seul finditer() parcourt le message (mis en minuscules); chaque position
+où un pattern correspond donne un match, dont le marqueur nommé (lastgroup)
+indique le pattern et donc l'intention. Le lookahead (largeur nulle) compte
+aussi les patterns qui se chevauchent; à une même position, seul le premier
+pattern de l'alternance est retenu.
+
+Pour que le moteur `re` écarte vite les positions sans match:
+- le \\b des patterns ancrés est mis en facteur: leur alternance n'est
+  essayée qu'en début de mot
+- les groupes capturants des patterns deviennent non capturants et le
+  marqueur est en fin d'alternative: chaque alternative commence par un
+  littéral, rejeté au premier caractère
+- patterns en minuscules, message en minuscules: pas de re.IGNORECASE
+
+Score d'une intention = nombre de matches. Classement: score décroissant,
+puis ordre de déclaration des intentions (priorité en cas d'égalité).
+"""
+
+import re
+from typing import Dict, Hashable, List, Sequence, Tuple
+
+_CAPTURING_GROUP = re.compile(r"(?<!\\)\((?!\?)")
+
+
+def _alternative(pattern: str, group: str) -> Tuple[bool, str]:
+    """(pattern ancré en début de mot ?, alternative sans \\b initial)"""
+    pattern = _CAPTURING_GROUP.sub("(?:", pattern)
+    anchored = pattern.startswith(r"\b")
+    if anchored:
+        pattern = pattern[2:]
+    return anchored, f"{pattern}(?P<{group}>)"
+
+
+class IntentDetector:
+    """Classifieur d'intentions par expressions régulières, compilé une fois"""
+
+    def __init__(self, patterns: Dict[Hashable, Sequence[str]]):
+        self.intents: List[Hashable] = list(patterns)
+        self._group_intent: Dict[str, int] = {}
+
+        anchored, unanchored = [], []
+        for rank, intent in enumerate(self.intents):
+            for pattern in patterns[intent]:
+                group = f"p{len(self._group_intent)}"
+                self._group_intent[group] = rank
+                is_anchored, alternative = _alternative(pattern, group)
+                (anchored if is_anchored else unanchored).append(alternative)
+
+        branches = []
+        if anchored:
+            branches.append(r"\b(?=(?:" + "|".join(anchored) + "))")
+        if unanchored:
+            branches.append(r"(?=(?:" + "|".join(unanchored) + "))")
+        self._regex = re.compile("|".join(branches)) if branches else None
+
+    def scores(self, text: str) -> List[Tuple[Hashable, int]]:
+        """Intentions détectées avec leur score, la plus probable en premier"""
+        if self._regex is None or not text:
+            return []
+
+        counts: Dict[int, int] = {}
+        for match in self._regex.finditer(text.lower()):
+            rank = self._group_intent[match.lastgroup]
+            counts[rank] = counts.get(rank, 0) + 1
+
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.intents[rank], count) for rank, count in ranked]
+
+    def detect(self, text: str, default: Hashable = None) -> Hashable:
+        """Intention la plus probable, ou `default` si aucun pattern ne correspond"""
+        scores = self.scores(text)
+        return scores[0][0] if scores else default
@@ -0,0 +1,307 @@
+"""
+IP Reputation Service - Listes d'IPs et de plages CIDR (IPv4 / IPv6)
+
+Chaque liste a une action:
+- allow: jamais bloquée (prioritaire), ex: whitelist
+- deny:  bloquée par le middleware de filtrage IP, ex: blacklist
+- flag:  non bloquée, mais signalée à l'analyse anti-fraude des clics,
+         ex: datacenter, vpn, tor
+
+Sources:
+- fichiers `<liste>.txt` de IP_REPUTATION_DIR (un réseau par ligne, `#` = commentaire),
+  ex: datacenter.txt, vpn.txt
+- entrées ajoutées à chaud (admin, API) dans un hash Redis partagé par tous
+  les workers; chaque worker recharge quand le compteur de version change
+  (vérifié au plus toutes les IP_REPUTATION_SYNC_SECONDS). Après une erreur
+  Redis, les entrées locales restent en vigueur et Redis est retenté au bout
+  de IP_REPUTATION_REDIS_RETRY_SECONDS; les écritures faites entre-temps
+  sont alors publiées.
+
+Lookup: trie binaire par famille d'adresses (au plus 32 / 128 niveaux),
+quelques microsecondes, sans appel réseau.
+"""
+
+import ipaddress
+import os
+import time
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+import structlog
+
+logger = structlog.get_logger()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+IP_REPUTATION_DIR = os.getenv(
+    "IP_REPUTATION_DIR", str(Path(__file__).resolve().parent.parent / "data" / "ip_reputation")
+)
+IP_REPUTATION_SYNC_SECONDS = float(os.getenv("IP_REPUTATION_SYNC_SECONDS", "5"))
+IP_REPUTATION_REDIS_RETRY_SECONDS = float(os.getenv("IP_REPUTATION_REDIS_RETRY_SECONDS", "30"))
+# Délai max d'un appel Redis: sync() est appelé sur le chemin des requêtes
+IP_REPUTATION_REDIS_TIMEOUT = float(os.getenv("IP_REPUTATION_REDIS_TIMEOUT", "0.5"))
+
+ENTRIES_KEY = "ip_reputation:entries"
+VERSION_KEY = "ip_reputation:version"
+
+ACTION_ALLOW = "allow"
+ACTION_DENY = "deny"
+ACTION_FLAG = "flag"
+
+LIST_ACTIONS = {
+    "whitelist": ACTION_ALLOW,
+    "blacklist": ACTION_DENY,
+    "datacenter": ACTION_FLAG,
+    "vpn": ACTION_FLAG,
+    "tor": ACTION_FLAG,
+}
+
+EMPTY: FrozenSet[str] = frozenset()
+
+
+def list_action(list_name: str) -> str:
+    return LIST_ACTIONS.get(list_name, ACTION_FLAG)
+
+
+# ============================================
+# TRIE
+# ============================================
+
+class PrefixTrie:
+    """
+    Trie binaire de préfixes pour une famille d'adresses
+
+    Noeud = [enfant 0, enfant 1, listes]. Un lookup parcourt les bits de
+    l'adresse et cumule les listes des préfixes traversés: une IP dans un
+    /32 whitelisté d'un /16 datacenter appartient aux deux listes.
+    """
+
+    __slots__ = ("bits", "root", "size")
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root = [None, None, EMPTY]
+        self.size = 0
+
+    def insert(self, network: int, prefixlen: int, list_name: str):
+        node = self.root
+        for shift in range(self.bits - 1, self.bits - 1 - prefixlen, -1):
+            bit = (network >> shift) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, EMPTY]
+            node = node[bit]
+        if list_name not in node[2]:
+            node[2] = node[2] | {list_name}
+            self.size += 1
+
+    def lookup(self, address: int) -> FrozenSet[str]:
+        node = self.root
+        found = node[2]
+        for shift in range(self.bits - 1, -1, -1):
+            node = node[(address >> shift) & 1]
+            if node is None:
+                break
+            if node[2]:
+                found = found | node[2]
+        return found
+
+
+def parse_network(value: str) -> Union[ipaddress.IPv4Network, ipaddress.IPv6Network]:
+    """IP ou CIDR -> réseau (bits d'hôte tolérés: 10.0.0.1/8 = 10.0.0.0/8)"""
+    return ipaddress.ip_network(value.strip(), strict=False)
+
+
+def read_list_file(path: Path) -> List[str]:
+    entries = []
+    for line in path.read_text().splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            entries.append(line)
+    return entries
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class IPReputationService:
+    """Listes d'IPs / CIDR partagées entre workers"""
+
+    def __init__(self, list_dir: Optional[str] = IP_REPUTATION_DIR, redis_client=None):
+        self.list_dir = Path(list_dir) if list_dir else None
+        self._redis = redis_client
+        self._redis_retry_at = 0.0  # Redis ignoré jusqu'à cet instant (monotonic) après une erreur
+        self._static: List[Tuple[str, str]] = []
+        self._dynamic: Dict[str, str] = {}
+        self._unpublished: Dict[str, Optional[str]] = {}  # Écritures en attente de Redis (None = suppression)
+        self._version: Optional[str] = None
+        self._next_sync = 0.0
+        self._tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        self.load_lists()
+
+    # ---------- Chargement ----------
+
+    def load_lists(self) -> int:
+        """Charger les fichiers de listes et reconstruire les tries"""
+        self._static = []
+        if self.list_dir and self.list_dir.is_dir():
+            for path in sorted(self.list_dir.glob("*.txt")):
+                self._static.extend((entry, path.stem) for entry in read_list_file(path))
+        self._rebuild()
+        return len(self._static)
+
+    def _rebuild(self):
+        tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        entries = self._static + list(self._dynamic.items())
+        for value, list_name in entries:
+            try:
+                network = parse_network(value)
+            except ValueError:
+                logger.warning("ip_reputation_invalid_entry", entry=value, list=list_name)
+                continue
+            tries[network.version].insert(int(network.network_address), network.prefixlen, list_name)
+        # Remplacement atomique: les lookups en cours gardent l'ancien trie
+        self._tries = tries
+        logger.info("ip_reputation_loaded", ipv4=tries[4].size, ipv6=tries[6].size)
+
+    # ---------- Entrées dynamiques (Redis) ----------
+
+    def add(self, network: str, list_name: str):
+        """Ajouter une IP ou une plage à une liste (propagé à tous les workers)"""
+        key = str(parse_network(network))
+        self._dynamic[key] = list_name
+        self._write(key, list_name)
+
+    def remove(self, network: str, list_name: Optional[str] = None) -> bool:
+        """
+        Retirer une IP ou une plage
+
+        Avec list_name, l'entrée n'est retirée que si elle appartient à cette
+        liste. Returns: True si une entrée a été retirée
+        """
+        key = str(parse_network(network))
+        self.sync(force=True)
+        if key not in self._dynamic or list_name not in (None, self._dynamic[key]):
+            return False
+        del self._dynamic[key]
+        self._write(key, None)
+        return True
+
+    def _write(self, key: str, list_name: Optional[str]):
+        self._unpublished[key] = list_name
+        if not self._publish():
+            self._rebuild()
+
+    def _publish(self) -> bool:
+        """Écrire dans Redis + incrémenter la version, puis recharger tout le hash"""
+        client = self._client()
+        if client is None:
+            return False
+        try:
+            self._push(client)
+        except Exception as e:
+            self._suspend_redis(e)
+            return False
+        # Rechargement complet: inclut les entrées publiées par les autres workers
+        self.sync(force=True)
+        return True
+
+    def _push(self, client):
+        changes = dict(self._unpublished)
+        pipe = client.pipeline()
+        for key, list_name in changes.items():
+            if list_name is None:
+                pipe.hdel(ENTRIES_KEY, key)
+            else:
+                pipe.hset(ENTRIES_KEY, key, list_name)
+        pipe.incr(VERSION_KEY)
+        pipe.execute()
+        for key in changes:
+            self._unpublished.pop(key, None)
+
+    def sync_due(self) -> bool:
+        """Une synchronisation est à faire (pour l'exécuter hors de la boucle asyncio)"""
+        return time.monotonic() >= self._next_sync
+
+    def sync(self, force: bool = False):
+        """Recharger les entrées dynamiques si un autre worker les a modifiées"""
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        self._next_sync = now + IP_REPUTATION_SYNC_SECONDS
+
+        client = self._client()
+        if client is None:
+            return
+        try:
+            if self._unpublished:
+                # Écritures faites pendant une coupure Redis
+                self._push(client)
+            version = client.get(VERSION_KEY)
+            if version is not None:
+                version = str(version)
+            if version == self._version and not force:
+                return
+            self._dynamic = dict(client.hgetall(ENTRIES_KEY))
+            self._version = version
+        except Exception as e:
+            # Les entrées locales restent en vigueur
+            self._suspend_redis(e)
+        self._rebuild()
+
+    # ---------- Lookups ----------
+
+    def lookup(self, ip: str) -> FrozenSet[str]:
+        """Listes contenant l'IP (ensemble vide si aucune ou IP invalide)"""
+        self.sync()
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return EMPTY
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        return self._tries[address.version].lookup(int(address))
+
+    def is_allowed(self, ip: str) -> bool:
+        """allow prioritaire, puis deny; les listes flag ne bloquent pas"""
+        actions = {list_action(name) for name in self.lookup(ip)}
+        return ACTION_ALLOW in actions or ACTION_DENY not in actions
+
+    def flags(self, ip: str) -> FrozenSet[str]:
+        """Listes signalant l'IP pour l'anti-fraude (vide si l'IP est whitelistée)"""
+        lists = self.lookup(ip)
+        if any(list_action(name) == ACTION_ALLOW for name in lists):
+            return EMPTY
+        return lists
+
+    def entries(self, list_name: Optional[str] = None) -> Iterable[str]:
+        """Entrées dynamiques (optionnellement d'une seule liste)"""
+        return [network for network, name in self._dynamic.items() if list_name in (None, name)]
+
+    # ---------- Redis ----------
+
+    def _client(self):
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+
+                self._redis = redis.from_url(
+                    REDIS_URL,
+                    decode_responses=True,
+                    socket_timeout=IP_REPUTATION_REDIS_TIMEOUT,
+                    socket_connect_timeout=IP_REPUTATION_REDIS_TIMEOUT,
+                )
+            except Exception as e:
+                self._suspend_redis(e)
+                return None
+        return self._redis
+
+    def _suspend_redis(self, error: Exception):
+        """Redis ignoré pendant IP_REPUTATION_REDIS_RETRY_SECONDS; le client redis-py se reconnecte ensuite"""
+        logger.warning(
+            "ip_reputation_redis_unavailable", error=str(error), retry_in=IP_REPUTATION_REDIS_RETRY_SECONDS
+        )
+        self._redis_retry_at = time.monotonic() + IP_REPUTATION_REDIS_RETRY_SECONDS
+
+
+ip_reputation = IPReputationService()
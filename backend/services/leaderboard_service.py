@@ -0,0 +1,479 @@
+"""
+Leaderboard Service - Classements mensuels des influenceurs
+
+Classements tenus dans des sorted sets Redis, mis à jour au fil de l'eau:
+- earnings:   commissions validées du mois (à la validation des ventes)
+- sales:      ventes validées du mois
+- conversion: ventes / clics du mois en % (classé à partir de MIN_CLICKS_FOR_CONVERSION clics)
+
+Rang, percentile et top N en O(log n) (ZREVRANK, ZCARD, ZREVRANGE): le
+dashboard prédictif affiche la vraie position de chaque influenceur sans
+parcourir la table sales. Les totaux plateforme du mois (moyennes des
+comparaisons) sont tenus dans un hash à côté.
+
+Une vente ou un clic = un pipeline Redis (compteurs, totaux, lecture du
+compteur complémentaire), plus la mise à jour du taux de conversion.
+
+Si Redis est indisponible, chaque appel échoue vite (socket_timeout) sans
+bloquer l'appelant (erreur journalisée, classement vide) et le store Redis
+est conservé: les appels suivants le retentent. Une mise à jour perdue est
+rattrapée par la reconstruction nocturne du mois (tâche
+celery_tasks.leaderboard_tasks), qui remplace les clés du mois d'un bloc.
+"""
+
+import os
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LEADERBOARD_REDIS_TIMEOUT = float(os.getenv("LEADERBOARD_REDIS_TIMEOUT", "0.5"))  # Secondes (chemin /r/)
+LEADERBOARD_PREFIX = "leaderboard:"
+LEADERBOARD_TTL = 60 * 60 * 24 * 400  # Classements mensuels conservés ~13 mois
+MIN_CLICKS_FOR_CONVERSION = int(os.getenv("LEADERBOARD_MIN_CLICKS", "50"))
+LEADERBOARD_TOP_N = 3
+LEADERBOARD_TOTALS_RPC = "get_leaderboard_month_totals"
+
+BOARD_EARNINGS = "earnings"
+BOARD_SALES = "sales"
+BOARD_CONVERSION = "conversion"
+BOARD_CLICKS = "clicks"  # Compteur interne pour le taux de conversion (non affiché)
+
+BOARD_LABELS = {
+    BOARD_EARNINGS: "Top Earners (Ce mois)",
+    BOARD_CONVERSION: "Meilleurs Taux de Conversion",
+    BOARD_SALES: "Plus de Ventes (Ce mois)",
+}
+
+
+# Résultat d'un appel au store quand Redis est injoignable
+STORE_FALLBACKS = {
+    "score": None,
+    "rank": None,
+    "count": 0,
+    "top": [],
+    "totals": {},
+    "record": None,
+}
+
+
+def month_key(at: Optional[datetime] = None) -> str:
+    return (at or datetime.now()).strftime("%Y-%m")
+
+
+def month_bounds(month: str) -> Tuple[datetime, datetime]:
+    """[début, fin) d'un mois au format YYYY-MM"""
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+# ============================================
+# STORES
+# ============================================
+
+class RedisLeaderboardStore:
+    """Sorted sets + hash Redis"""
+
+    def __init__(self, client=None):
+        if client is None:
+            import redis
+
+            client = redis.from_url(
+                REDIS_URL,
+                decode_responses=True,
+                socket_timeout=LEADERBOARD_REDIS_TIMEOUT,
+                socket_connect_timeout=LEADERBOARD_REDIS_TIMEOUT,
+            )
+        self.redis = client
+
+    def incr(self, key: str, member: str, amount: float) -> float:
+        pipe = self.redis.pipeline()
+        pipe.zincrby(key, amount, member)
+        pipe.expire(key, LEADERBOARD_TTL)
+        return float(pipe.execute()[0])
+
+    def set(self, key: str, member: str, score: float):
+        pipe = self.redis.pipeline()
+        pipe.zadd(key, {member: score})
+        pipe.expire(key, LEADERBOARD_TTL)
+        pipe.execute()
+
+    def remove(self, key: str, member: str):
+        self.redis.zrem(key, member)
+
+    def score(self, key: str, member: str) -> Optional[float]:
+        value = self.redis.zscore(key, member)
+        return float(value) if value is not None else None
+
+    def rank(self, key: str, member: str) -> Optional[int]:
+        """Rang 0-based, score décroissant"""
+        return self.redis.zrevrank(key, member)
+
+    def count(self, key: str) -> int:
+        return int(self.redis.zcard(key))
+
+    def top(self, key: str, n: int) -> List[Tuple[str, float]]:
+        return [(m, float(s)) for m, s in self.redis.zrevrange(key, 0, n - 1, withscores=True)]
+
+    def totals(self, key: str) -> Dict[str, float]:
+        return {field: float(value) for field, value in self.redis.hgetall(key).items()}
+
+    def record(
+        self,
+        member: str,
+        increments: Dict[str, float],
+        totals_key: str,
+        totals: Dict[str, float],
+        read_keys: List[str],
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[float]]]:
+        """
+        Incréments d'un membre, totaux du mois et lectures en un aller-retour
+
+        Returns:
+            (nouveau score par clé incrémentée, score par clé lue)
+        """
+        pipe = self.redis.pipeline()
+        for key, amount in increments.items():
+            pipe.zincrby(key, amount, member)
+            pipe.expire(key, LEADERBOARD_TTL)
+        for field, amount in totals.items():
+            pipe.hincrbyfloat(totals_key, field, amount)
+        pipe.expire(totals_key, LEADERBOARD_TTL)
+        for key in read_keys:
+            pipe.zscore(key, member)
+        results = pipe.execute()
+
+        scores = {key: float(results[2 * i]) for i, key in enumerate(increments)}
+        reads = results[len(results) - len(read_keys):] if read_keys else []
+        return scores, {
+            key: float(value) if value is not None else None for key, value in zip(read_keys, reads)
+        }
+
+    def replace(self, sorted_sets: Dict[str, Dict[str, float]], hashes: Dict[str, Dict[str, float]]):
+        """
+        Remplacer des clés d'un bloc
+
+        Les nouvelles valeurs sont écrites dans des clés temporaires puis
+        renommées sur les clés live dans la même transaction (MULTI/EXEC):
+        un lecteur voit l'ancien classement ou le nouveau, jamais un
+        classement partiel. Une clé sans valeurs est supprimée.
+        """
+        suffix = f":rebuild:{uuid.uuid4().hex}"
+        pipe = self.redis.pipeline(transaction=True)
+        for key, mapping in list(sorted_sets.items()) + list(hashes.items()):
+            if not mapping:
+                pipe.delete(key)
+                continue
+            if key in sorted_sets:
+                pipe.zadd(key + suffix, mapping)
+            else:
+                pipe.hset(key + suffix, mapping=mapping)
+            pipe.expire(key + suffix, LEADERBOARD_TTL)
+            pipe.rename(key + suffix, key)
+        pipe.execute()
+
+
+class MemoryLeaderboardStore:
+    """
+    Équivalent local (un process): score par membre + liste triée
+
+    Lectures en O(log n) par bisect; une mise à jour déplace l'entrée dans la
+    liste triée.
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, Dict[str, float]] = {}
+        self._sorted: Dict[str, List[Tuple[float, str]]] = {}
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def _discard(self, key: str, member: str) -> Optional[float]:
+        previous = self._scores.setdefault(key, {}).pop(member, None)
+        if previous is not None:
+            entries = self._sorted[key]
+            del entries[bisect_left(entries, (-previous, member))]
+        return previous
+
+    def set(self, key: str, member: str, score: float):
+        self._discard(key, member)
+        self._scores[key][member] = score
+        insort(self._sorted.setdefault(key, []), (-score, member))
+
+    def incr(self, key: str, member: str, amount: float) -> float:
+        score = (self._discard(key, member) or 0.0) + amount
+        self._scores[key][member] = score
+        insort(self._sorted.setdefault(key, []), (-score, member))
+        return score
+
+    def remove(self, key: str, member: str):
+        self._discard(key, member)
+
+    def score(self, key: str, member: str) -> Optional[float]:
+        return self._scores.get(key, {}).get(member)
+
+    def rank(self, key: str, member: str) -> Optional[int]:
+        score = self.score(key, member)
+        if score is None:
+            return None
+        return bisect_left(self._sorted[key], (-score, member))
+
+    def count(self, key: str) -> int:
+        return len(self._scores.get(key, {}))
+
+    def top(self, key: str, n: int) -> List[Tuple[str, float]]:
+        return [(member, -score) for score, member in self._sorted.get(key, [])[:n]]
+
+    def totals(self, key: str) -> Dict[str, float]:
+        return dict(self._totals.get(key, {}))
+
+    def record(
+        self,
+        member: str,
+        increments: Dict[str, float],
+        totals_key: str,
+        totals: Dict[str, float],
+        read_keys: List[str],
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[float]]]:
+        scores = {key: self.incr(key, member, amount) for key, amount in increments.items()}
+        month_totals = self._totals.setdefault(totals_key, {})
+        for field, amount in totals.items():
+            month_totals[field] = month_totals.get(field, 0.0) + amount
+        return scores, {key: self.score(key, member) for key in read_keys}
+
+    def replace(self, sorted_sets: Dict[str, Dict[str, float]], hashes: Dict[str, Dict[str, float]]):
+        for key, mapping in sorted_sets.items():
+            self._scores[key] = dict(mapping)
+            self._sorted[key] = sorted((-score, member) for member, score in mapping.items())
+        for key, mapping in hashes.items():
+            self._totals[key] = dict(mapping)
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class LeaderboardService:
+    """Classements mensuels mis à jour de façon incrémentale"""
+
+    def __init__(self, store=None, supabase=None):
+        self.store = store if store is not None else RedisLeaderboardStore()
+        self.supabase = supabase
+        self._member_ids: Dict[str, str] = {}
+
+    def _key(self, board: str, month: str) -> str:
+        return f"{LEADERBOARD_PREFIX}{board}:{month}"
+
+    def _totals_key(self, month: str) -> str:
+        return f"{LEADERBOARD_PREFIX}totals:{month}"
+
+    def _call(self, method: str, *args):
+        """
+        Appel au store; en cas d'erreur, résultat vide pour cet appel seulement
+
+        Le store n'est pas remplacé: le prochain appel retente Redis.
+        """
+        try:
+            return getattr(self.store, method)(*args)
+        except Exception as e:
+            logger.error("leaderboard_store_call_failed", method=method, error=str(e))
+            fallback = STORE_FALLBACKS.get(method)
+            return fallback.copy() if isinstance(fallback, (list, dict)) else fallback
+
+    # ---------- Mises à jour ----------
+
+    def record_sale(self, influencer_id: str, commission: float, at: Optional[datetime] = None):
+        """Vente validée: gains, nombre de ventes et taux de conversion du mois"""
+        if not influencer_id:
+            return
+        month = month_key(at)
+        commission = float(commission or 0)
+        sales_key, clicks_key = self._key(BOARD_SALES, month), self._key(BOARD_CLICKS, month)
+        recorded = self._call(
+            "record", influencer_id,
+            {self._key(BOARD_EARNINGS, month): commission, sales_key: 1},
+            self._totals_key(month), {"earnings": commission, "sales": 1},
+            [clicks_key],
+        )
+        if recorded is not None:
+            scores, reads = recorded
+            self._update_conversion(influencer_id, month, scores[sales_key], reads[clicks_key] or 0)
+
+    def record_click(self, influencer_id: str, at: Optional[datetime] = None):
+        """Clic (chemin de redirection /r/): un pipeline + la mise à jour de la conversion"""
+        if not influencer_id:
+            return
+        month = month_key(at)
+        sales_key, clicks_key = self._key(BOARD_SALES, month), self._key(BOARD_CLICKS, month)
+        recorded = self._call(
+            "record", influencer_id,
+            {clicks_key: 1},
+            self._totals_key(month), {"clicks": 1},
+            [sales_key],
+        )
+        if recorded is not None:
+            scores, reads = recorded
+            self._update_conversion(influencer_id, month, reads[sales_key] or 0, scores[clicks_key])
+
+    def _update_conversion(self, influencer_id: str, month: str, sales: float, clicks: float):
+        key = self._key(BOARD_CONVERSION, month)
+        if clicks >= MIN_CLICKS_FOR_CONVERSION:
+            self._call("set", key, influencer_id, round(sales / clicks * 100, 2))
+        else:
+            self._call("remove", key, influencer_id)
+
+    def rebuild_month(self, month: str, rows: List[Dict]):
+        """
+        Reconstruire un mois à partir d'agrégats
+        rows: [{influencer_id, earnings, sales, clicks}]
+
+        Toutes les clés du mois sont remplacées d'un bloc (store.replace).
+        Les mises à jour incrémentales arrivées entre la lecture des agrégats
+        et le remplacement sont rattrapées à la reconstruction suivante. Une
+        erreur Redis remonte à l'appelant (la tâche Celery est retentée).
+        """
+        boards = {board: {} for board in (BOARD_EARNINGS, BOARD_SALES, BOARD_CLICKS, BOARD_CONVERSION)}
+        totals = {"earnings": 0.0, "sales": 0.0, "clicks": 0.0}
+
+        for row in rows:
+            member = row["influencer_id"]
+            for board, field in ((BOARD_EARNINGS, "earnings"), (BOARD_SALES, "sales"), (BOARD_CLICKS, "clicks")):
+                value = float(row.get(field) or 0)
+                if value:
+                    boards[board][member] = value
+                    totals[field] += value
+            clicks = boards[BOARD_CLICKS].get(member, 0.0)
+            if clicks >= MIN_CLICKS_FOR_CONVERSION:
+                boards[BOARD_CONVERSION][member] = round(boards[BOARD_SALES].get(member, 0.0) / clicks * 100, 2)
+
+        self.store.replace(
+            {self._key(board, month): members for board, members in boards.items()},
+            {self._totals_key(month): {field: value for field, value in totals.items() if value}},
+        )
+
+    def rebuild(self, month: Optional[str] = None) -> Dict:
+        """
+        Reconstruire un mois depuis la base (commissions validées et clics)
+
+        Rattrape les mises à jour incrémentales perdues (Redis indisponible,
+        vente validée hors auto_payment_service).
+        """
+        month = month or month_key()
+        if self.supabase is None:
+            raise RuntimeError("Supabase client not configured")
+
+        start, end = month_bounds(month)
+        result = self.supabase.rpc(
+            LEADERBOARD_TOTALS_RPC,
+            {"p_start": start.isoformat(), "p_end": end.isoformat()},
+        ).execute()
+        rows = [{**row, "influencer_id": str(row["influencer_id"])} for row in result.data or []]
+
+        self.rebuild_month(month, rows)
+        logger.info("leaderboard_rebuilt", month=month, influencers=len(rows))
+        return {"month": month, "influencers": len(rows)}
+
+    # ---------- Lectures ----------
+
+    def position(self, board: str, member: str, month: Optional[str] = None) -> Dict:
+        """
+        Position d'un influenceur
+
+        Returns:
+            {rank (1-based, None si non classé), total, top_percentile, value}
+        """
+        key = self._key(board, month or month_key())
+        total = self._call("count", key)
+        rank = self._call("rank", key, member) if member else None
+
+        if rank is None:
+            return {"rank": None, "total": total, "top_percentile": 0.0, "value": 0.0}
+
+        return {
+            "rank": rank + 1,
+            "total": total,
+            # Part des classés que l'influenceur devance ou égale (100 = premier)
+            "top_percentile": round((total - rank) / total * 100, 2),
+            "value": self._call("score", key, member) or 0.0,
+        }
+
+    def top(self, board: str, n: int = LEADERBOARD_TOP_N, month: Optional[str] = None) -> List[Dict]:
+        entries = self._call("top", self._key(board, month or month_key()), n)
+        usernames = self._usernames([member for member, _ in entries])
+        return [
+            {
+                "rank": i + 1,
+                "influencer_id": member,
+                "username": usernames.get(member, member),
+                "value": round(score, 2),
+                "avatar": None,
+            }
+            for i, (member, score) in enumerate(entries)
+        ]
+
+    def leaderboard(self, board: str, member: Optional[str], month: Optional[str] = None) -> Dict:
+        """Format du modèle Leaderboard du dashboard prédictif"""
+        position = self.position(board, member, month)
+        return {
+            "category": BOARD_LABELS[board],
+            "user_rank": position["rank"] or 0,
+            "total_users": position["total"],
+            "top_percentile": position["top_percentile"],
+            "top_users": self.top(board, month=month),
+        }
+
+    def platform_averages(self, month: Optional[str] = None) -> Dict[str, float]:
+        """Moyennes plateforme du mois (O(1): totaux + cardinalité)"""
+        month = month or month_key()
+        totals = self._call("totals", self._totals_key(month))
+        earners = self._call("count", self._key(BOARD_EARNINGS, month))
+        clicks = totals.get("clicks", 0.0)
+
+        return {
+            "avg_monthly_revenue": round(totals.get("earnings", 0.0) / earners, 2) if earners else 0.0,
+            "avg_conversion_rate": round(totals.get("sales", 0.0) / clicks * 100, 2) if clicks else 0.0,
+            "ranked_users": earners,
+        }
+
+    # ---------- Identités ----------
+
+    def member_for_user(self, user_id: str) -> Optional[str]:
+        """influencer_id d'un utilisateur (mis en cache pour le process)"""
+        if user_id in self._member_ids:
+            return self._member_ids[user_id]
+        if self.supabase is None:
+            return user_id
+        try:
+            result = self.supabase.table("influencers").select("id").eq("user_id", user_id).limit(1).execute()
+            member = result.data[0]["id"] if result.data else None
+        except Exception as e:
+            logger.error("leaderboard_member_lookup_failed", user_id=user_id, error=str(e))
+            return None
+        if member:
+            self._member_ids[user_id] = member
+        return member
+
+    def _usernames(self, members: List[str]) -> Dict[str, str]:
+        if not members or self.supabase is None:
+            return {}
+        try:
+            result = self.supabase.table("influencers").select("id, username").in_("id", members).execute()
+            return {row["id"]: row.get("username") or row["id"] for row in result.data or []}
+        except Exception as e:
+            logger.error("leaderboard_usernames_failed", error=str(e))
+            return {}
+
+
+def _default_supabase():
+    try:
+        from supabase_client import supabase
+
+        return supabase
+    except Exception:
+        return None
+
+
+leaderboard_service = LeaderboardService(supabase=_default_supabase())
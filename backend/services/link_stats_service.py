@@ -0,0 +1,140 @@
+"""
+Link Stats Resolver - Statistiques de liens d'affiliation en masse
+
+Remplace les 3 requêtes par lien (clics, conversions, commissions) par:
+1. Un appel RPC groupé `get_link_stats_bulk` (migration 006)
+2. À défaut, des comptages exacts par lien (aucune ligne transférée) et la
+   somme des commissions lue par pages
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Iterable
+import structlog
+
+from utils.rpc import is_missing_function
+
+logger = structlog.get_logger()
+
+LINK_STATS_RPC = "get_link_stats_bulk"
+LINK_STATS_PAGE_SIZE = 1000  # Fallback: commissions lues par page (sous le max-rows PostgREST)
+
+
+def build_link_stats(clicks: int, conversions: int, total_commissions: float) -> Dict:
+    """Format des stats renvoyé par l'API (identique à l'ancien calcul par lien)"""
+    clicks = int(clicks or 0)
+    conversions = int(conversions or 0)
+    total_commissions = float(total_commissions or 0)
+
+    return {
+        'clicks': clicks,
+        'conversions': conversions,
+        'total_commissions': total_commissions,
+        'conversion_rate': round((conversions / clicks * 100), 2) if clicks > 0 else 0.0
+    }
+
+
+class LinkStatsResolver:
+    """
+    Résout les stats de plusieurs liens en une seule passe
+
+    Si la fonction RPC n'est pas déployée, le resolver bascule sur les requêtes
+    groupées et ne retente plus la RPC pour ce processus. Une autre erreur RPC
+    (réseau, timeout) ne bascule que l'appel en cours.
+    """
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+        self._rpc_available = True
+
+    def get_stats(self, link_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Stats par lien
+
+        Returns:
+            {link_id: {clicks, conversions, total_commissions, conversion_rate}}
+            (chaque id demandé est présent, à 0 si aucune activité)
+        """
+        ids = list(dict.fromkeys(i for i in link_ids if i))
+        if not ids:
+            return {}
+
+        rows = None
+        if self._rpc_available:
+            rows = self._fetch_rpc(ids)
+        if rows is None:
+            rows = self._fetch_grouped(ids)
+
+        stats = {link_id: build_link_stats(0, 0, 0) for link_id in ids}
+        for row in rows:
+            stats[str(row['link_id'])] = build_link_stats(
+                row.get('clicks'), row.get('conversions'), row.get('total_commissions')
+            )
+        return stats
+
+    def _fetch_rpc(self, ids: List[str]):
+        try:
+            result = self.supabase.rpc(LINK_STATS_RPC, {'p_link_ids': ids}).execute()
+            return result.data or []
+        except Exception as e:
+            if is_missing_function(str(e)):
+                self._rpc_available = False
+            logger.warning("link_stats_rpc_unavailable", error=str(e), disabled=not self._rpc_available)
+            return None
+
+    def _fetch_grouped(self, ids: List[str]) -> List[Dict]:
+        """
+        Fallback sans RPC
+
+        Clics et conversions: COUNT exact par lien (count="exact", head), donc
+        aucune ligne téléchargée ni tronquée par le max-rows PostgREST.
+        Commissions: seules les approuvées, lues par pages.
+        """
+        commissions = self._sum_commissions(ids)
+
+        return [
+            {
+                'link_id': link_id,
+                'clicks': self._count('tracking_events', link_id),
+                'conversions': self._count('conversions', link_id),
+                'total_commissions': commissions.get(link_id, 0.0)
+            }
+            for link_id in ids
+        ]
+
+    def _count(self, table: str, link_id: str) -> int:
+        try:
+            result = (
+                self.supabase.table(table)
+                .select('link_id', count='exact', head=True)
+                .eq('link_id', link_id)
+                .execute()
+            )
+            return result.count or 0
+        except Exception as e:
+            logger.error("link_stats_query_failed", table=table, error=str(e))
+            return 0
+
+    def _sum_commissions(self, ids: List[str]) -> Dict[str, float]:
+        totals = defaultdict(float)
+        offset = 0
+        try:
+            while True:
+                page = (
+                    self.supabase.table('commissions')
+                    .select('id, link_id, amount')
+                    .in_('link_id', ids)
+                    .eq('status', 'approved')
+                    .order('id')
+                    .range(offset, offset + LINK_STATS_PAGE_SIZE - 1)
+                    .execute()
+                    .data
+                    or []
+                )
+                for row in page:
+                    totals[row['link_id']] += float(row.get('amount') or 0)
+                if len(page) < LINK_STATS_PAGE_SIZE:
+                    return totals
+                offset += LINK_STATS_PAGE_SIZE
+        except Exception as e:
+            logger.error("link_stats_query_failed", table='commissions', error=str(e))
+            return {}
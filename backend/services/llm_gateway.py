@@ -0,0 +1,563 @@
+"""
+LLM Gateway - Client partagé pour tous les appels aux fournisseurs LLM
+
+Les services IA (bot, assistant multilingue, générateur de contenu, studio,
+modération, traduction) passent par une seule passerelle:
+- un httpx.AsyncClient par process: connexions TLS réutilisées (keep-alive)
+  au lieu d'un client créé (et d'un handshake) à chaque appel
+- une limite d'appels simultanés par fournisseur (sémaphore); pour un
+  stream, elle ne couvre que l'ouverture de la connexion, pas la lecture
+- timeouts et retries (erreurs réseau, 429, 5xx) avec backoff exponentiel
+- un cache des réponses adressé par contenu (sha256 du fournisseur, modèle,
+  prompt et paramètres), activé par l'appelant pour les prompts
+  déterministes: SEO, descriptions produits, traductions
+- stream(): réponse token par token (SSE du fournisseur) pour les chats,
+  le premier token arrive après la latence du premier octet du fournisseur
+  au lieu de la génération complète
+
+Fournisseurs: anthropic (Messages API), openai (Chat Completions) et fake,
+un fournisseur local sans réseau pour les tests et le développement
+(LLM_FAKE_PROVIDER=true: tous les appels lui sont envoyés).
+
+Les services qui utilisent le SDK OpenAI obtiennent leur client via
+openai_client(): même pool de connexions, mêmes timeouts.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+import httpx
+import structlog
+
+from services.metrics_service import metrics
+
+logger = structlog.get_logger()
+
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = 0.5  # secondes, doublé à chaque tentative
+LLM_RETRY_AFTER_MAX = 10.0
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_FAKE_PROVIDER = os.getenv("LLM_FAKE_PROVIDER", "false").lower() == "true"
+# Attente maximale d'une place dans la limite du fournisseur (streaming)
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(60 * 60 * 24)))
+LLM_CACHE_LOCAL_SIZE = 512
+LLM_CACHE_PREFIX = "llm:"
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504, 529}
+
+
+class LLMError(Exception):
+    """Échec d'un appel LLM après retries"""
+
+    def __init__(self, message: str, provider: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+
+
+@dataclass
+class LLMRequest:
+    """Requête de complétion, indépendante du fournisseur"""
+    messages: List[Dict[str, str]]
+    model: str
+    system: Optional[str] = None
+    max_tokens: int = 1024
+    temperature: Optional[float] = None
+    json_mode: bool = False
+
+    def cache_key(self, provider: str) -> str:
+        payload = json.dumps(
+            [provider, self.model, self.system, self.messages, self.max_tokens, self.temperature, self.json_mode],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    provider: str
+    model: str
+    usage: Dict[str, int] = field(default_factory=dict)
+    cached: bool = False
+
+
+# ============================================
+# FOURNISSEURS
+# ============================================
+
+class AnthropicProvider:
+    """Messages API (https://api.anthropic.com/v1/messages)"""
+
+    name = "anthropic"
+    base_url = "https://api.anthropic.com"
+    completion_path = "/v1/messages"
+
+    def __init__(self, api_key: Optional[str] = ANTHROPIC_API_KEY, concurrency: int = 8):
+        self.api_key = api_key
+        self.concurrency = int(os.getenv("LLM_ANTHROPIC_CONCURRENCY", str(concurrency)))
+
+    def headers(self, api_key: str) -> Dict[str, str]:
+        return {"x-api-key": api_key, "anthropic-version": "2023-06-01", "content-type": "application/json"}
+
+    def payload(self, request: LLMRequest) -> Dict[str, Any]:
+        payload = {"model": request.model, "max_tokens": request.max_tokens, "messages": request.messages}
+        if request.system:
+            payload["system"] = request.system
+        if request.temperature is not None:
+            payload["temperature"] = request.temperature
+        return payload
+
+    def parse(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        usage = data.get("usage") or {}
+        return data["content"][0]["text"], {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+        }
+
+    def stream_delta(self, event: Dict[str, Any]) -> Optional[str]:
+        """Texte d'un événement SSE (content_block_delta), None pour les autres"""
+        if event.get("type") == "error":
+            error = event.get("error") or {}
+            raise LLMError(f"{error.get('type', 'error')}: {error.get('message', '')}", self.name)
+        if event.get("type") == "content_block_delta":
+            return (event.get("delta") or {}).get("text")
+        return None
+
+
+class OpenAIProvider:
+    """Chat Completions (https://api.openai.com/v1/chat/completions) + autres endpoints (images)"""
+
+    name = "openai"
+    base_url = "https://api.openai.com"
+    completion_path = "/v1/chat/completions"
+
+    def __init__(self, api_key: Optional[str] = OPENAI_API_KEY, concurrency: int = 8):
+        self.api_key = api_key
+        self.concurrency = int(os.getenv("LLM_OPENAI_CONCURRENCY", str(concurrency)))
+
+    def headers(self, api_key: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+    def payload(self, request: LLMRequest) -> Dict[str, Any]:
+        messages = list(request.messages)
+        if request.system:
+            messages.insert(0, {"role": "system", "content": request.system})
+        payload = {"model": request.model, "max_tokens": request.max_tokens, "messages": messages}
+        if request.temperature is not None:
+            payload["temperature"] = request.temperature
+        if request.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+    def parse(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        usage = data.get("usage") or {}
+        return data["choices"][0]["message"]["content"], {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+        }
+
+    def stream_delta(self, event: Dict[str, Any]) -> Optional[str]:
+        choices = event.get("choices") or [{}]
+        return (choices[0].get("delta") or {}).get("content")
+
+
+class FakeProvider:
+    """
+    Fournisseur local, sans réseau (tests, développement sans clé API)
+
+    responses: liste de réponses rendues dans l'ordre, ou fonction
+    LLMRequest -> texte. Par défaut, écho déterministe du dernier message.
+    Les appels reçus sont conservés dans `calls`.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        responses: Optional[Union[List[str], Callable[[LLMRequest], str]]] = None,
+        raw_responses: Optional[Dict[str, Dict[str, Any]]] = None,
+        concurrency: int = 8
+    ):
+        self.responses = list(responses) if isinstance(responses, (list, tuple)) else responses
+        self.raw_responses = raw_responses or {}
+        self.concurrency = concurrency
+        self.api_key = "fake"
+        self.calls: List[LLMRequest] = []
+        self.raw_calls: List[Tuple[str, Dict[str, Any]]] = []
+
+    def complete(self, request: LLMRequest) -> str:
+        self.calls.append(request)
+        if callable(self.responses):
+            return self.responses(request)
+        if self.responses:
+            return self.responses.pop(0)
+        last = request.messages[-1]["content"] if request.messages else ""
+        return f"[fake:{request.model}] {last[:200]}"
+
+    def stream(self, request: LLMRequest) -> List[str]:
+        """Même réponse que complete(), découpée en mots"""
+        return re.findall(r"\S+\s*|\s+", self.complete(request))
+
+    def request(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.raw_calls.append((path, payload))
+        return self.raw_responses.get(path, {"data": [{"url": "https://fake.local/image.png", "revised_prompt": payload.get("prompt")}]})
+
+
+# ============================================
+# GATEWAY
+# ============================================
+
+class LLMGateway:
+    """Passerelle partagée: pool de connexions, limites, retries, cache"""
+
+    def __init__(
+        self,
+        providers: Optional[List[Any]] = None,
+        shared_cache=None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF,
+        fake: Optional[FakeProvider] = None
+    ):
+        self.providers = {p.name: p for p in (providers or [AnthropicProvider(), OpenAIProvider()])}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        # Si défini, reçoit tous les appels quel que soit le fournisseur demandé
+        self.fake = fake
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sdk_clients: Dict[str, Any] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._shared = shared_cache
+
+    # ---------- Connexions ----------
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Client HTTP partagé (créé au premier appel)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                ),
+                transport=self._transport,
+            )
+        return self._client
+
+    def openai_client(self, api_key: Optional[str] = None):
+        """Client SDK OpenAI (AsyncOpenAI) sur le pool de connexions partagé"""
+        api_key = api_key or self.providers["openai"].api_key
+        if not api_key:
+            return None
+        if api_key not in self._sdk_clients:
+            from openai import AsyncOpenAI
+
+            self._sdk_clients[api_key] = AsyncOpenAI(
+                api_key=api_key,
+                http_client=self.http_client(),
+                max_retries=self.max_retries,
+                timeout=self.timeout,
+            )
+        return self._sdk_clients[api_key]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._sdk_clients.clear()
+
+    def _semaphore(self, provider) -> asyncio.Semaphore:
+        if provider.name not in self._semaphores:
+            self._semaphores[provider.name] = asyncio.Semaphore(provider.concurrency)
+        return self._semaphores[provider.name]
+
+    async def _acquire(self, provider):
+        """Place dans la limite du fournisseur, attente bornée par LLM_QUEUE_TIMEOUT"""
+        try:
+            await asyncio.wait_for(self._semaphore(provider).acquire(), LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise LLMError(f"{provider.name} concurrency limit reached", provider.name) from None
+
+    def _provider(self, name: str):
+        if self.fake is not None:
+            return self.fake
+        if name not in self.providers:
+            raise LLMError(f"Unknown LLM provider: {name}", name)
+        return self.providers[name]
+
+    def available(self, name: str) -> bool:
+        """Fournisseur utilisable (clé configurée, ou fake actif)"""
+        return self.fake is not None or bool(getattr(self.providers.get(name), "api_key", None))
+
+    # ---------- Appels ----------
+
+    async def complete(
+        self,
+        provider: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: Optional[float] = None,
+        json_mode: bool = False,
+        cache: bool = False,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """
+        Complétion de texte
+
+        Args:
+            cache: réutiliser une réponse identique déjà obtenue (prompts déterministes)
+
+        Raises:
+            LLMError: échec après retries, ou fournisseur non configuré
+        """
+        backend = self._provider(provider)
+        request = LLMRequest(messages, model, system, max_tokens, temperature, json_mode)
+
+        key = request.cache_key(backend.name) if cache else None
+        if key is not None:
+            hit = self._cache_get(key)
+            if hit is not None:
+                metrics.record_llm_call(backend.name, "cached")
+                return LLMResponse(hit["text"], backend.name, model, hit.get("usage", {}), cached=True)
+
+        start = time.perf_counter()
+        try:
+            if isinstance(backend, FakeProvider):
+                async with self._semaphore(backend):
+                    text, usage = backend.complete(request), {}
+            else:
+                data = await self._post(backend, backend.completion_path, backend.payload(request), api_key, timeout)
+                text, usage = backend.parse(data)
+        except Exception:
+            metrics.record_llm_call(backend.name, "error", time.perf_counter() - start)
+            raise
+
+        metrics.record_llm_call(backend.name, "ok", time.perf_counter() - start)
+        if key is not None:
+            self._cache_set(key, {"text": text, "usage": usage})
+        return LLMResponse(text, backend.name, model, usage)
+
+    async def stream(
+        self,
+        provider: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        system: Optional[str] = None,
+        max_tokens: int = 1024,
+        temperature: Optional[float] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Complétion en streaming: fragments de texte au fil de la génération
+
+        Les retries ne s'appliquent qu'avant le premier fragment: une coupure
+        en cours de réponse lève LLMError (l'appelant a déjà transmis le début).
+
+        Raises:
+            LLMError: échec, ou fournisseur non configuré
+        """
+        backend = self._provider(provider)
+        request = LLMRequest(messages, model, system, max_tokens, temperature)
+
+        start = time.perf_counter()
+        outcome = "error"
+        first = True
+        try:
+            if isinstance(backend, FakeProvider):
+                async with self._semaphore(backend):
+                    chunks = backend.stream(request)
+                source = _iterate(chunks)
+            else:
+                source = self._post_stream(backend, {**backend.payload(request), "stream": True}, api_key, timeout)
+
+            async for chunk in source:
+                if first:
+                    metrics.record_llm_first_token(backend.name, time.perf_counter() - start)
+                    first = False
+                yield chunk
+            outcome = "ok"
+        finally:
+            # Aussi à l'abandon du flux par le client (GeneratorExit)
+            metrics.record_llm_call(backend.name, outcome, time.perf_counter() - start)
+
+    async def request(
+        self,
+        provider: str,
+        path: str,
+        payload: Dict[str, Any],
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Appel brut à un endpoint du fournisseur (ex: /v1/images/generations)"""
+        backend = self._provider(provider)
+        if isinstance(backend, FakeProvider):
+            return backend.request(path, payload)
+        return await self._post(backend, path, payload, api_key, timeout)
+
+    async def _post(self, backend, path: str, payload: Dict[str, Any], api_key, timeout) -> Dict[str, Any]:
+        api_key = api_key or backend.api_key
+        if not api_key:
+            raise LLMError(f"{backend.name} API key not configured", backend.name)
+
+        url = f"{backend.base_url}{path}"
+        headers = backend.headers(api_key)
+        client = self.http_client()
+
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            try:
+                async with self._semaphore(backend):
+                    response = await client.post(url, headers=headers, json=payload, timeout=timeout or self.timeout)
+            except httpx.TransportError as e:
+                # Timeouts inclus (httpx.TimeoutException hérite de TransportError)
+                error = LLMError(f"{type(e).__name__}: {e}", backend.name)
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                error, delay = _http_error(backend, response, delay)
+
+            if attempt < self.max_retries:
+                logger.warning("llm_retry", provider=backend.name, attempt=attempt + 1, error=str(error))
+                await asyncio.sleep(delay)
+
+        logger.error("llm_request_failed", provider=backend.name, error=str(error))
+        raise error
+
+    async def _post_stream(self, backend, payload: Dict[str, Any], api_key, timeout) -> AsyncIterator[str]:
+        """Comme _post, mais lit la réponse SSE au fil de l'eau"""
+        api_key = api_key or backend.api_key
+        if not api_key:
+            raise LLMError(f"{backend.name} API key not configured", backend.name)
+
+        url = f"{backend.base_url}{backend.completion_path}"
+        headers = backend.headers(api_key)
+        client = self.http_client()
+        started = False
+
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            try:
+                # La place n'est tenue que jusqu'aux en-têtes de la réponse: un
+                # flux lent (ou abandonné par le client) ne bloque pas les autres appels
+                await self._acquire(backend)
+                try:
+                    response = await client.send(
+                        client.build_request("POST", url, headers=headers, json=payload, timeout=timeout or self.timeout),
+                        stream=True,
+                    )
+                finally:
+                    self._semaphore(backend).release()
+                try:
+                    if response.status_code < 400:
+                        async for event in _sse_events(response):
+                            text = backend.stream_delta(event)
+                            if text:
+                                started = True
+                                yield text
+                        return
+                    await response.aread()
+                    error, delay = _http_error(backend, response, delay)
+                finally:
+                    await response.aclose()
+            except httpx.TransportError as e:
+                error = LLMError(f"{type(e).__name__}: {e}", backend.name)
+                if started:
+                    raise error
+
+            if attempt < self.max_retries:
+                logger.warning("llm_retry", provider=backend.name, attempt=attempt + 1, error=str(error))
+                await asyncio.sleep(delay)
+
+        logger.error("llm_request_failed", provider=backend.name, error=str(error))
+        raise error
+
+    # ---------- Cache ----------
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._local.get(key)
+        if entry is not None:
+            self._local.move_to_end(key)
+            return entry
+        if self._shared is not None:
+            entry = self._shared.get(f"{LLM_CACHE_PREFIX}{key}")
+            if entry is not None:
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def _cache_set(self, key: str, entry: Dict[str, Any]):
+        self._remember(key, entry)
+        if self._shared is not None:
+            self._shared.set(f"{LLM_CACHE_PREFIX}{key}", entry, ttl=LLM_CACHE_TTL)
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._local[key] = entry
+        self._local.move_to_end(key)
+        while len(self._local) > LLM_CACHE_LOCAL_SIZE:
+            self._local.popitem(last=False)
+
+
+def _http_error(backend, response: httpx.Response, delay: float) -> Tuple[LLMError, float]:
+    """Erreur HTTP du fournisseur: (erreur, délai avant retry), levée si non réessayable"""
+    error = LLMError(f"HTTP {response.status_code}: {response.text[:200]}", backend.name, response.status_code)
+    if response.status_code not in RETRYABLE_STATUSES:
+        raise error
+    retry_after = response.headers.get("retry-after", "")
+    if retry_after.replace(".", "", 1).isdigit():
+        delay = min(float(retry_after), LLM_RETRY_AFTER_MAX)
+    return error, delay
+
+
+async def _sse_events(response: httpx.Response) -> AsyncIterator[Dict[str, Any]]:
+    """Événements JSON d'un flux SSE (lignes `data: ...`, fin sur [DONE])"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield json.loads(data)
+
+
+async def _iterate(chunks: List[str]) -> AsyncIterator[str]:
+    for chunk in chunks:
+        yield chunk
+
+
+def _default_shared_cache():
+    try:
+        from services.cache_service import cache
+        return cache
+    except Exception:
+        return None
+
+
+llm_gateway = LLMGateway(
+    shared_cache=_default_shared_cache(),
+    fake=FakeProvider() if LLM_FAKE_PROVIDER else None,
+)
@@ -0,0 +1,192 @@
+"""
+Messaging Service - Boîte de réception et historique des messages
+
+Le read model de la boîte de réception (dernier message, date, compteurs de
+non-lus par participant) est maintenu sur `conversations` par le trigger de
+la migration 008. La boîte de réception est servie par une seule requête
+indexée, paginée par curseur keyset (last_message_at, id).
+
+L'historique d'une conversation est paginé de la même façon sur
+(created_at, id): page la plus récente d'abord, curseurs `before`/`after`,
+et mode `since` pour la synchronisation incrémentale des clients en polling.
+"""
+
+import base64
+from typing import Dict, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+INBOX_DEFAULT_LIMIT = 50
+INBOX_MAX_LIMIT = 100
+
+MESSAGES_DEFAULT_LIMIT = 50
+MESSAGES_MAX_LIMIT = 200
+
+
+# ============================================
+# CURSEURS
+# ============================================
+
+def encode_cursor(timestamp: str, row_id: str) -> str:
+    """Curseur opaque à partir de (timestamp, id)"""
+    raw = f"{timestamp}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Décoder un curseur
+
+    Raises:
+        ValueError: curseur invalide
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not timestamp or not row_id:
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class MessagingService:
+    """Lecture de la messagerie à partir du read model dénormalisé"""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    @staticmethod
+    def participant_slot(conversation: Dict, user_id: str) -> Optional[str]:
+        """'user1' / 'user2' selon la place de l'utilisateur, None s'il n'en fait pas partie"""
+        if conversation.get('user1_id') == user_id:
+            return 'user1'
+        if conversation.get('user2_id') == user_id:
+            return 'user2'
+        return None
+
+    def unread_count(self, conversation: Dict, user_id: str) -> int:
+        slot = self.participant_slot(conversation, user_id)
+        return int(conversation.get(f'{slot}_unread_count') or 0) if slot else 0
+
+    def to_inbox_item(self, conversation: Dict, user_id: str) -> Dict:
+        """Format de la boîte de réception (compatible avec l'ancien format)"""
+        item = dict(conversation)
+        item['unread_count'] = self.unread_count(conversation, user_id)
+
+        preview = conversation.get('last_message_preview')
+        item['last_message'] = {
+            'content': preview,
+            'sender_id': conversation.get('last_message_sender_id'),
+            'created_at': conversation.get('last_message_at')
+        } if preview is not None else None
+        return item
+
+    def get_inbox(
+        self,
+        user_id: str,
+        limit: int = INBOX_DEFAULT_LIMIT,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Conversations de l'utilisateur, plus récentes d'abord
+
+        Returns:
+            {"conversations": [...], "next_cursor": str | None}
+        """
+        limit = max(1, min(limit, INBOX_MAX_LIMIT))
+        params = {'p_user_id': user_id, 'p_limit': limit + 1}
+
+        if cursor:
+            params['p_before_at'], params['p_before_id'] = decode_cursor(cursor)
+
+        result = self.supabase.rpc('get_conversation_inbox', params).execute()
+        rows: List[Dict] = result.data or []
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = encode_cursor(last['last_message_at'], last['id'])
+
+        return {
+            "conversations": [self.to_inbox_item(row, user_id) for row in rows],
+            "next_cursor": next_cursor
+        }
+
+    def get_messages(
+        self,
+        conversation: Dict,
+        user_id: str,
+        limit: int = MESSAGES_DEFAULT_LIMIT,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        since: Optional[str] = None
+    ) -> Dict:
+        """
+        Page de messages d'une conversation (ordre chronologique)
+
+        - sans curseur: les `limit` messages les plus récents
+        - before: messages plus anciens que le curseur (remonter l'historique)
+        - after: messages plus récents que le curseur
+        - since: messages créés après un horodatage (polling)
+
+        Les messages reçus ne sont marqués comme lus que si le compteur de
+        non-lus de l'utilisateur est positif.
+
+        Raises:
+            ValueError: curseur invalide
+        """
+        limit = max(1, min(limit, MESSAGES_MAX_LIMIT))
+        conversation_id = conversation['id']
+
+        query = self.supabase.table('messages').select('*').eq('conversation_id', conversation_id)
+
+        if after or since:
+            if after:
+                at, row_id = decode_cursor(after)
+                query = query.or_(f"created_at.gt.{at},and(created_at.eq.{at},id.gt.{row_id})")
+            else:
+                query = query.gt('created_at', since)
+            rows = query.order('created_at').order('id').limit(limit + 1).execute().data or []
+            has_more = len(rows) > limit
+            messages = rows[:limit]
+        else:
+            if before:
+                at, row_id = decode_cursor(before)
+                query = query.or_(f"created_at.lt.{at},and(created_at.eq.{at},id.lt.{row_id})")
+            rows = query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute().data or []
+            has_more = len(rows) > limit
+            messages = list(reversed(rows[:limit]))
+
+        page = {
+            "conversation": conversation,
+            "messages": messages,
+            "has_more": has_more,
+            "before_cursor": encode_cursor(messages[0]['created_at'], messages[0]['id']) if messages else before,
+            "after_cursor": encode_cursor(messages[-1]['created_at'], messages[-1]['id']) if messages else after,
+            "marked_read": 0
+        }
+
+        if self.unread_count(conversation, user_id) > 0:
+            page["marked_read"] = self.mark_read(conversation_id, user_id)
+            slot = self.participant_slot(conversation, user_id)
+            conversation[f'{slot}_unread_count'] = 0
+
+        return page
+
+    def mark_read(self, conversation_id: str, user_id: str) -> int:
+        """Marquer les messages reçus comme lus et remettre le compteur à zéro"""
+        result = self.supabase.rpc('mark_conversation_read', {
+            'p_conversation_id': conversation_id,
+            'p_user_id': user_id
+        }).execute()
+        return int(result.data or 0)
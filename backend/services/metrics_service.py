@@ -0,0 +1,358 @@
+"""
+Metrics Service - Exposition Prometheus
+
+Métriques exposées sur /metrics (format texte Prometheus):
+- http_requests_total / http_request_duration_seconds: par méthode, route (template) et statut
+- supabase_requests_total / supabase_request_duration_seconds: par table et opération
+- cache_requests_total: hits / misses / erreurs du cache Redis
+- rate_limit_rejections_total: requêtes refusées (429) par règle
+- celery_task_duration_seconds: durée des tâches Celery par nom et état
+- llm_requests_total / llm_request_duration_seconds: appels LLM par fournisseur et issue (ok, error, cached)
+- llm_time_to_first_token_seconds: délai avant le premier token des réponses en streaming
+
+Histogrammes à buckets fixes: coût constant par observation, agrégeables
+entre instances et percentiles calculés côté Prometheus (histogram_quantile).
+
+Multi-process (plusieurs workers uvicorn / Celery): définir
+PROMETHEUS_MULTIPROC_DIR vers un répertoire vide au démarrage. Chaque process
+écrit ses valeurs dans ce répertoire et /metrics les agrège.
+
+Accès à /metrics: en-tête "Authorization: Bearer <METRICS_TOKEN>" ou adresse
+cliente dans METRICS_ALLOWED_IPS (CIDR séparés par des virgules, loopback par
+défaut). Tout autre appel reçoit 403.
+"""
+
+import hmac
+import ipaddress
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+import structlog
+
+from services.query_trace_service import query_shape, record_query, rows_from_content_range
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = structlog.get_logger()
+
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1/32,::1/128")
+
+# Buckets (secondes)
+HTTP_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SUPABASE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CELERY_DURATION_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+# Routes non résolues (404, fichiers statiques...): un seul label pour borner la cardinalité
+UNMATCHED_ROUTE = "unmatched"
+
+# Opérations PostgREST selon la méthode HTTP
+SUPABASE_OPERATIONS = {
+    "GET": "select",
+    "HEAD": "select",
+    "POST": "insert",
+    "PATCH": "update",
+    "PUT": "upsert",
+    "DELETE": "delete",
+}
+
+
+# ============================================
+# COLLECTEUR
+# ============================================
+
+class Metrics:
+    """
+    Collecteur de métriques Prometheus
+
+    Sans prometheus_client installé, toutes les méthodes sont des no-op.
+    """
+
+    def __init__(self):
+        self.enabled = PROMETHEUS_AVAILABLE
+        if not self.enabled:
+            logger.warning("prometheus_not_installed", message="prometheus_client missing, metrics disabled")
+            return
+
+        self.http_requests = Counter(
+            "http_requests_total",
+            "Requêtes HTTP traitées",
+            ["method", "route", "status"],
+        )
+        self.http_latency = Histogram(
+            "http_request_duration_seconds",
+            "Durée des requêtes HTTP",
+            ["method", "route", "status"],
+            buckets=HTTP_LATENCY_BUCKETS,
+        )
+        self.supabase_requests = Counter(
+            "supabase_requests_total",
+            "Appels PostgREST / RPC Supabase",
+            ["table", "operation", "outcome"],
+        )
+        self.supabase_latency = Histogram(
+            "supabase_request_duration_seconds",
+            "Durée des appels Supabase",
+            ["table", "operation"],
+            buckets=SUPABASE_LATENCY_BUCKETS,
+        )
+        self.cache_requests = Counter(
+            "cache_requests_total",
+            "Lectures du cache Redis",
+            ["result"],
+        )
+        self.rate_limit_rejections = Counter(
+            "rate_limit_rejections_total",
+            "Requêtes refusées par le rate limiting",
+            ["rule"],
+        )
+        self.celery_task_duration = Histogram(
+            "celery_task_duration_seconds",
+            "Durée des tâches Celery",
+            ["task", "state"],
+            buckets=CELERY_DURATION_BUCKETS,
+        )
+        self.llm_requests = Counter(
+            "llm_requests_total",
+            "Appels aux fournisseurs LLM",
+            ["provider", "outcome"],
+        )
+        self.llm_latency = Histogram(
+            "llm_request_duration_seconds",
+            "Durée des appels LLM (hors cache)",
+            ["provider"],
+            buckets=LLM_LATENCY_BUCKETS,
+        )
+        self.llm_first_token = Histogram(
+            "llm_time_to_first_token_seconds",
+            "Délai avant le premier token (streaming)",
+            ["provider"],
+            buckets=LLM_LATENCY_BUCKETS,
+        )
+
+    def record_request(self, method: str, route: str, status: int, duration: float):
+        if not self.enabled:
+            return
+        labels = (method, route, str(status))
+        self.http_requests.labels(*labels).inc()
+        self.http_latency.labels(*labels).observe(duration)
+
+    def record_supabase_call(self, table: str, operation: str, duration: float, ok: bool = True):
+        if not self.enabled:
+            return
+        self.supabase_requests.labels(table, operation, "ok" if ok else "error").inc()
+        self.supabase_latency.labels(table, operation).observe(duration)
+
+    def record_cache(self, result: str):
+        """result: hit | miss | error"""
+        if self.enabled:
+            self.cache_requests.labels(result).inc()
+
+    def record_rate_limited(self, rule: str):
+        if self.enabled:
+            self.rate_limit_rejections.labels(rule).inc()
+
+    def record_celery_task(self, task: str, state: str, duration: float):
+        if self.enabled:
+            self.celery_task_duration.labels(task, state).observe(duration)
+
+    def record_llm_call(self, provider: str, outcome: str, duration: Optional[float] = None):
+        """outcome: ok | error | cached (durée non observée pour les réponses en cache)"""
+        if not self.enabled:
+            return
+        self.llm_requests.labels(provider, outcome).inc()
+        if duration is not None:
+            self.llm_latency.labels(provider).observe(duration)
+
+    def record_llm_first_token(self, provider: str, delay: float):
+        if not self.enabled:
+            return
+        self.llm_first_token.labels(provider).observe(delay)
+
+    def render(self) -> Tuple[bytes, str]:
+        """
+        Exposition au format texte Prometheus
+
+        En mode multi-process, agrège les fichiers de tous les workers.
+        """
+        if not self.enabled:
+            return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+
+        if PROMETHEUS_MULTIPROC_DIR:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry), CONTENT_TYPE_LATEST
+
+        return generate_latest(), CONTENT_TYPE_LATEST
+
+
+metrics = Metrics()
+
+
+# ============================================
+# ACCÈS À /metrics
+# ============================================
+
+def parse_networks(value: str) -> Tuple:
+    """Liste de CIDR séparés par des virgules (entrées invalides ignorées)"""
+    networks = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning("metrics_allowed_ip_invalid", value=item)
+    return tuple(networks)
+
+
+METRICS_NETWORKS = parse_networks(METRICS_ALLOWED_IPS)
+
+
+def metrics_access_allowed(request, token: str = None, networks: Tuple = None) -> bool:
+    """
+    Le scraper peut-il lire /metrics ?
+
+    Jeton Bearer valide (si METRICS_TOKEN est défini) ou adresse du pair TCP
+    dans les réseaux autorisés. X-Forwarded-For n'est pas pris en compte.
+    """
+    token = METRICS_TOKEN if token is None else token
+    networks = METRICS_NETWORKS if networks is None else networks
+
+    if token:
+        header = request.headers.get("authorization", "")
+        if hmac.compare_digest(header.encode(), f"Bearer {token}".encode()):
+            return True
+
+    host = request.client.host if request.client else None
+    try:
+        address = ipaddress.ip_address(host)
+    except (TypeError, ValueError):
+        return False
+    return any(address in network for network in networks)
+
+
+# ============================================
+# MIDDLEWARE HTTP
+# ============================================
+
+def route_template(request) -> str:
+    """Template de la route résolue (/api/products/{product_id}), pas le chemin brut"""
+    return scope_route_template(request.scope)
+
+
+def scope_route_template(scope: Dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+async def metrics_middleware(request, call_next: Callable):
+    """
+    Middleware FastAPI: compteur + histogramme de latence par route et statut
+
+    Le label route est le template FastAPI pour borner la cardinalité.
+    """
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.record_request(
+            request.method, route_template(request), status, time.perf_counter() - start
+        )
+
+
+# ============================================
+# SUPABASE (hooks httpx du client PostgREST)
+# ============================================
+
+def supabase_call_labels(method: str, path: str) -> Tuple[str, str]:
+    """
+    (table, opération) à partir d'une requête PostgREST
+
+    /rest/v1/sales         -> ("sales", "select")
+    /rest/v1/rpc/get_stats -> ("get_stats", "rpc")
+    """
+    parts = [p for p in path.split("/") if p]
+    if "rpc" in parts and parts.index("rpc") + 1 < len(parts):
+        return parts[parts.index("rpc") + 1], "rpc"
+    table = parts[-1] if parts else "unknown"
+    return table, SUPABASE_OPERATIONS.get(method.upper(), method.lower())
+
+
+def instrument_supabase(client) -> bool:
+    """
+    Mesurer chaque appel PostgREST du client Supabase
+
+    Ajoute des hooks à la session httpx du client: aucune modification des
+    appels existants. Chaque appel alimente les métriques Prometheus et la
+    trace de la requête HTTP en cours (services/query_trace_service.py).
+    """
+    try:
+        session = client.postgrest.session
+    except Exception as e:
+        logger.warning("supabase_instrumentation_failed", error=str(e))
+        return False
+
+    def on_request(request):
+        request.extensions["metrics_start"] = time.perf_counter()
+
+    def on_response(response):
+        request = response.request
+        start: Optional[float] = request.extensions.get("metrics_start")
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        table, operation = supabase_call_labels(request.method, request.url.path)
+        metrics.record_supabase_call(table, operation, duration, ok=response.status_code < 400)
+        record_query(
+            table,
+            operation,
+            duration,
+            rows=rows_from_content_range(response.headers.get("content-range")),
+            shape=query_shape(request.method, table, request.url.query.decode("ascii", "replace")),
+        )
+
+    session.event_hooks["request"].append(on_request)
+    session.event_hooks["response"].append(on_response)
+    return True
+
+
+# ============================================
+# CELERY (signaux)
+# ============================================
+
+_task_started_at = {}
+
+
+def connect_celery_metrics():
+    """Durée des tâches Celery via les signaux task_prerun / task_postrun"""
+    from celery.signals import task_prerun, task_postrun
+
+    @task_prerun.connect(weak=False)
+    def _on_task_prerun(task_id=None, **kwargs):
+        _task_started_at[task_id] = time.perf_counter()
+
+    @task_postrun.connect(weak=False)
+    def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+        start = _task_started_at.pop(task_id, None)
+        if start is not None and task is not None:
+            metrics.record_celery_task(task.name, state or "UNKNOWN", time.perf_counter() - start)
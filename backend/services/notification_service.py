@@ -1,19 +1,181 @@
 """
 Service de notifications pour le système LEADS
 Alertes solde bas, dépôt épuisé, arrêt campagne, leads en attente
+
+Outbox:
+- Résolution des user_id en une requête par type de destinataire
+- Insertion groupée des lignes `notifications`
+- Livraison email/SMS/WhatsApp déléguée aux workers Celery
+  (le serveur WebSocket diffuse les lignes insérées)
 """
 
 from typing import Optional, Dict, List, Any
 from datetime import datetime, timedelta
 from decimal import Decimal
+import logging
 from supabase import Client
 
+logger = logging.getLogger(__name__)
+
+# Colonne de résolution user_id par type de destinataire
+RECIPIENT_TABLES = {
+    'influencer_id': 'influencers',
+    'merchant_id': 'merchants',
+}
+
+# Lignes par INSERT (limite raisonnable de taille de requête PostgREST)
+OUTBOX_INSERT_CHUNK_SIZE = 500
+
+DELIVERY_CHANNELS = ('email', 'sms', 'whatsapp')
+
+
+class NotificationOutbox:
+    """
+    Outbox de notifications: N destinataires x N événements en O(1) requêtes
+
+    Chaque notification est un dict avec un destinataire (`user_id`,
+    `influencer_id` ou `merchant_id`) et les colonnes de la table
+    `notifications` (type, title, message, level, metadata, action_url...).
+    """
+
+    def __init__(self, supabase: Client):
+        self.supabase = supabase
+
+    def resolve_user_ids(self, recipient_key: str, ids: List[str]) -> Dict[str, str]:
+        """
+        Résoudre des influencer_id / merchant_id en user_id (une requête)
+
+        Returns:
+            Dict {id: user_id}
+        """
+        table = RECIPIENT_TABLES[recipient_key]
+        unique_ids = list({i for i in ids if i})
+
+        if not unique_ids:
+            return {}
+
+        result = self.supabase.table(table).select('id, user_id').in_('id', unique_ids).execute()
+
+        return {
+            row['id']: row['user_id']
+            for row in (result.data or [])
+            if row.get('user_id')
+        }
+
+    def publish(
+        self,
+        notifications: List[Dict],
+        channels: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Enregistrer des notifications et planifier leur livraison
+
+        Args:
+            notifications: Liste de notifications (voir docstring de la classe)
+            channels: Canaux de livraison en plus de l'in-app
+                      ('email', 'sms', 'whatsapp')
+
+        Returns:
+            Lignes insérées
+        """
+        if not notifications:
+            return []
+
+        # 1. Résoudre les user_id manquants (une requête par type de destinataire)
+        resolved: Dict[str, Dict[str, str]] = {}
+        for recipient_key in RECIPIENT_TABLES:
+            ids = [n[recipient_key] for n in notifications if not n.get('user_id') and n.get(recipient_key)]
+            if ids:
+                resolved[recipient_key] = self.resolve_user_ids(recipient_key, ids)
+
+        rows = []
+        for notification in notifications:
+            row = {k: v for k, v in notification.items() if k not in RECIPIENT_TABLES}
+
+            if not row.get('user_id'):
+                for recipient_key, mapping in resolved.items():
+                    if notification.get(recipient_key) in mapping:
+                        row['user_id'] = mapping[notification[recipient_key]]
+                        break
+
+            if not row.get('user_id'):
+                continue
+
+            row.setdefault('is_read', False)
+            rows.append(row)
+
+        # 2. Insertion groupée (un INSERT par forme de ligne et par lot)
+        inserted = []
+        by_shape: Dict[frozenset, List[Dict]] = {}
+        for row in rows:
+            by_shape.setdefault(frozenset(row.keys()), []).append(row)
+
+        for shape_rows in by_shape.values():
+            for i in range(0, len(shape_rows), OUTBOX_INSERT_CHUNK_SIZE):
+                result = self.supabase.table('notifications').insert(
+                    shape_rows[i:i + OUTBOX_INSERT_CHUNK_SIZE]
+                ).execute()
+                inserted.extend(result.data or [])
+
+        # 3. Livraison hors requête
+        if channels and inserted:
+            self._queue_delivery(inserted, channels)
+
+        return inserted
+
+    def fan_out(
+        self,
+        notification: Dict,
+        recipient_key: str,
+        recipient_ids: List[str],
+        channels: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """
+        Envoyer la même notification à plusieurs destinataires
+
+        Args:
+            notification: Colonnes communes (type, title, message...)
+            recipient_key: 'user_id', 'influencer_id' ou 'merchant_id'
+            recipient_ids: Destinataires (les doublons sont ignorés)
+            channels: Canaux de livraison en plus de l'in-app
+        """
+        unique_ids = list(dict.fromkeys(i for i in recipient_ids if i))
+
+        return self.publish(
+            [{**notification, recipient_key: recipient_id} for recipient_id in unique_ids],
+            channels=channels
+        )
+
+    def _queue_delivery(self, rows: List[Dict], channels: List[str]):
+        """Confier la livraison email/SMS/WhatsApp à la queue notifications"""
+        channels = [c for c in channels if c in DELIVERY_CHANNELS]
+        if not channels:
+            return
+
+        payload = [
+            {
+                'user_id': row['user_id'],
+                'title': row.get('title'),
+                'message': row.get('message'),
+                'action_url': row.get('action_url'),
+            }
+            for row in rows
+        ]
+
+        try:
+            from celery_tasks.notification_tasks import deliver_notifications
+
+            deliver_notifications.delay(notifications=payload, channels=channels)
+        except Exception as e:
+            logger.error(f"Livraison des notifications non planifiée: {e}")
+
 
 class NotificationService:
     """Service pour gérer les notifications du système LEADS"""
     
     def __init__(self, supabase: Client):
         self.supabase = supabase
+        self.outbox = NotificationOutbox(supabase)
     
     
     def send_low_balance_alert(
@@ -71,16 +233,11 @@ class NotificationService:
                 'is_read': False
             }
             
-            self.supabase.table('notifications').insert(notification_data).execute()
-            
-            # Envoyer email si critique
-            if is_critical:
-                self._send_email_alert(
-                    user_id,
-                    title,
-                    message,
-                    company_name
-                )
+            # Email si critique
+            self.outbox.publish(
+                [notification_data],
+                channels=['email'] if is_critical else None
+            )
             
             print(f"✅ Alerte solde envoyée à {company_name}: {current_balance} dhs")
             
@@ -134,15 +291,7 @@ class NotificationService:
                 'is_read': False
             }
             
-            self.supabase.table('notifications').insert(notification_data).execute()
-            
-            # Envoyer email
-            self._send_email_alert(
-                user_id,
-                title,
-                message,
-                company_name
-            )
+            self.outbox.publish([notification_data], channels=['email'])
             
             # Notifier influenceurs si campagne arrêtée
             if campaign_stopped and deposit.get('campaign_id'):
@@ -465,18 +614,10 @@ class NotificationService:
             if not leads.data:
                 return
             
-            influencer_ids = list(set([l['influencer_id'] for l in leads.data if l.get('influencer_id')]))
-            
-            for influencer_id in influencer_ids:
-                influencer = self.supabase.table('influencers').select('user_id').eq('id', influencer_id).single().execute()
-                
-                if not influencer.data:
-                    continue
-                
-                user_id = influencer.data['user_id']
-                
-                notification_data = {
-                    'user_id': user_id,
+            influencer_ids = [l['influencer_id'] for l in leads.data if l.get('influencer_id')]
+            
+            inserted = self.outbox.fan_out(
+                {
                     'type': 'campaign_stopped_influencer',
                     'level': 'warning',
                     'title': '⏸️ Campagne mise en pause',
@@ -486,23 +627,12 @@ class NotificationService:
                         'company_name': company_name
                     },
                     'is_read': False
-                }
-                
-                self.supabase.table('notifications').insert(notification_data).execute()
+                },
+                recipient_key='influencer_id',
+                recipient_ids=influencer_ids
+            )
             
-            print(f"✅ {len(influencer_ids)} influenceurs notifiés de l'arrêt de campagne")
+            print(f"✅ {len(inserted)} influenceurs notifiés de l'arrêt de campagne")
             
         except Exception as e:
             print(f"Erreur _notify_influencers_campaign_stopped: {e}")
-    
-    
-    def _send_email_alert(
-        self,
-        user_id: str,
-        subject: str,
-        message: str,
-        company_name: str
-    ):
-        """Envoyer email d'alerte (à implémenter avec service email)"""
-        # TODO: Intégrer avec service d'envoi d'emails (SendGrid, Mailgun, etc.)
-        print(f"📧 Email envoyé à {company_name}: {subject}")
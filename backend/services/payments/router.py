@@ -12,6 +12,9 @@ from .service import PaymentsService
 
 logger = logging.getLogger(__name__)
 
+# Taille max d'une requête d'approbation en lot (traitée par tranches côté service)
+BATCH_APPROVE_MAX_IDS = 50000
+
 router = APIRouter(prefix="/api/commissions", tags=["Payments & Commissions"])
 
 
@@ -35,7 +38,9 @@ class ApproveCommissionRequest(BaseModel):
 class BatchApproveRequest(BaseModel):
     """Requête d'approbation en lot."""
 
-    commission_ids: List[UUID] = Field(..., description="Liste des IDs de commissions")
+    commission_ids: List[UUID] = Field(
+        ..., max_length=BATCH_APPROVE_MAX_IDS, description="Liste des IDs de commissions"
+    )
     status: str = Field(default="approved", description="Statut à appliquer")
 
     @validator("status")
@@ -209,7 +214,10 @@ async def get_influencer_commission_summary(
     "/batch/approve",
     response_model=BatchApproveResponse,
     summary="Approuver plusieurs commissions en lot",
-    description="Applique un statut à plusieurs commissions simultanément",
+    description=(
+        "Applique un statut à plusieurs commissions via approve_payout_batch "
+        "(une transaction par tranche d'ids, un résultat par commission)"
+    ),
 )
 async def batch_approve_commissions(
     request: BatchApproveRequest, service: PaymentsService = Depends(get_payments_service)
@@ -217,6 +225,9 @@ async def batch_approve_commissions(
     """
     Approuve plusieurs commissions en lot.
     Utile pour les paiements groupés mensuels.
+
+    Une commission refusée (solde insuffisant, déjà payée...) est listée dans
+    `failed` avec son motif sans bloquer les autres.
     """
     result = await service.batch_approve_commissions(request.commission_ids, request.status)
     return result
@@ -3,21 +3,44 @@ Service de gestion des paiements et commissions.
 Contient la logique métier pour l'approbation et le paiement des commissions.
 """
 
+import asyncio
 import logging
 from typing import Optional, List
 from uuid import UUID
 from datetime import datetime
 
 from supabase_client import get_supabase_client
+from utils.rpc import is_missing_function
 
 logger = logging.getLogger(__name__)
 
+# Approbation en lot: une transaction par tranche d'ids
+BATCH_APPROVAL_RPC = "approve_payout_batch"
+BATCH_APPROVAL_CHUNK_SIZE = 1000
+
+
+def _commission_error(error_msg: str) -> Exception:
+    """Traduit une erreur PostgreSQL de approve_payout_transaction"""
+    if "introuvable" in error_msg:
+        return ValueError(f"Commission ou ressource introuvable: {error_msg}")
+    elif "Solde insuffisant" in error_msg:
+        return ValueError("Solde insuffisant pour approuver cette commission")
+    elif "déjà été réglée" in error_msg:
+        return ValueError("Cette commission a déjà été payée et ne peut plus être modifiée")
+    elif "doit être approuvée avant" in error_msg:
+        return ValueError("La commission doit être approuvée avant d'être marquée comme payée")
+    elif "non supporté" in error_msg:
+        return ValueError(f"Statut invalide: {error_msg}")
+    else:
+        return RuntimeError(f"Erreur lors de la mise à jour de la commission: {error_msg}")
+
 
 class PaymentsService:
     """Service pour gérer les commissions et appeler approve_payout_transaction."""
 
     def __init__(self):
         self.supabase = get_supabase_client()
+        self._batch_rpc_available = True
 
     async def approve_commission(self, commission_id: UUID, new_status: str = "approved") -> bool:
         """
@@ -55,23 +78,9 @@ class PaymentsService:
 
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour de la commission: {str(e)}")
-            error_msg = str(e)
 
             # Parser les erreurs PostgreSQL
-            if "introuvable" in error_msg:
-                raise ValueError(f"Commission ou ressource introuvable: {error_msg}")
-            elif "Solde insuffisant" in error_msg:
-                raise ValueError("Solde insuffisant pour approuver cette commission")
-            elif "déjà été réglée" in error_msg:
-                raise ValueError("Cette commission a déjà été payée et ne peut plus être modifiée")
-            elif "doit être approuvée avant" in error_msg:
-                raise ValueError(
-                    "La commission doit être approuvée avant d'être marquée comme payée"
-                )
-            elif "non supporté" in error_msg:
-                raise ValueError(f"Statut invalide: {error_msg}")
-            else:
-                raise RuntimeError(f"Erreur lors de la mise à jour de la commission: {error_msg}")
+            raise _commission_error(str(e))
 
     async def get_commission_by_id(self, commission_id: UUID) -> Optional[dict]:
         """
@@ -212,6 +221,11 @@ class PaymentsService:
         """
         Approuve plusieurs commissions en lot.
 
+        Les ids sont envoyés par tranches de BATCH_APPROVAL_CHUNK_SIZE à
+        approve_payout_batch: une transaction et un aller-retour par tranche,
+        avec un résultat par id. Si la fonction n'est pas déployée, repli sur
+        un appel approve_payout_transaction par commission.
+
         Args:
             commission_ids: Liste des IDs de commissions
             new_status: Nouveau statut à appliquer
@@ -219,16 +233,48 @@ class PaymentsService:
         Returns:
             dict: Résumé des opérations (success, failed)
         """
+        ids = list(dict.fromkeys(str(commission_id) for commission_id in commission_ids))
         success = []
         failed = []
 
-        for commission_id in commission_ids:
-            try:
-                await self.approve_commission(commission_id, new_status)
-                success.append(str(commission_id))
-            except Exception as e:
-                logger.error(f"Échec pour commission {commission_id}: {str(e)}")
-                failed.append({"id": str(commission_id), "error": str(e)})
+        for start in range(0, len(ids), BATCH_APPROVAL_CHUNK_SIZE):
+            chunk = ids[start:start + BATCH_APPROVAL_CHUNK_SIZE]
+
+            if self._batch_rpc_available:
+                try:
+                    rows = await asyncio.to_thread(self._approve_chunk, chunk, new_status)
+                except Exception as e:
+                    error_msg = str(e)
+                    if not is_missing_function(error_msg):
+                        # Tranche annulée en bloc: aucune commission modifiée
+                        logger.error(f"Échec du lot de {len(chunk)} commissions: {error_msg}")
+                        error = str(_commission_error(error_msg))
+                        failed.extend({"id": commission_id, "error": error} for commission_id in chunk)
+                        continue
+                    logger.warning(f"{BATCH_APPROVAL_RPC} indisponible, approbation une par une")
+                    self._batch_rpc_available = False
+                else:
+                    for row in rows:
+                        if row.get("success"):
+                            success.append(str(row["commission_id"]))
+                        else:
+                            failed.append({
+                                "id": str(row["commission_id"]),
+                                "error": str(_commission_error(row.get("error") or "")),
+                            })
+                    continue
+
+            for commission_id in chunk:
+                try:
+                    await self.approve_commission(commission_id, new_status)
+                    success.append(commission_id)
+                except Exception as e:
+                    logger.error(f"Échec pour commission {commission_id}: {str(e)}")
+                    failed.append({"id": commission_id, "error": str(e)})
+
+        logger.info(
+            f"Lot de commissions → {new_status}: {len(success)} succès, {len(failed)} échecs"
+        )
 
         return {
             "success_count": len(success),
@@ -236,3 +282,11 @@ class PaymentsService:
             "success": success,
             "failed": failed,
         }
+
+    def _approve_chunk(self, commission_ids: List[str], new_status: str) -> List[dict]:
+        """Une tranche d'ids en un appel approve_payout_batch (une transaction)"""
+        result = self.supabase.rpc(
+            BATCH_APPROVAL_RPC,
+            {"p_commission_ids": commission_ids, "p_status": new_status},
+        ).execute()
+        return result.data or []
@@ -0,0 +1,411 @@
+"""
+Product Recommendation Service - Filtrage collaboratif item-item
+
+Modèle entraîné hors ligne (migration 014_product_recommendations.sql):
+- co-occurrences co-clic (click_logs, même visiteur) et co-achat (sales,
+  même client) cumulées de façon incrémentale en base par
+  accumulate_product_cooccurrence
+- similarité cosinus, atténuée pour les paires peu observées:
+  w_ab / sqrt(n_a * n_b) * w_ab / (w_ab + RECO_SHRINKAGE)
+- top-K voisins de chaque produit recalculés avec numpy par la tâche Celery
+  refresh_product_recommendations (produits touchés seulement, tous la nuit)
+  et écrits dans product_neighbors, une ligne par produit
+
+Service en ligne: chaque worker garde l'index en mémoire sous forme compacte
+(positions int32 (n, K) + scores float32 (n, K)), complété au plus toutes les
+RECO_RELOAD_INTERVAL secondes avec les seules lignes modifiées depuis le
+dernier chargement. Une recommandation = un bincount numpy sur les voisins
+des produits de l'historique, sans requête.
+
+product_neighbors.updated_at est attribué ligne par ligne par la base
+(trigger, clock_timestamp): une tranche écrite pendant un rechargement a un
+updated_at postérieur au dernier vu. Le rechargement lit updated_at >= dernier
+vu, par (updated_at, product_id), et ignore les lignes déjà chargées à cette
+borne. Un produit qui perd tous ses voisins est réécrit avec des listes vides
+(une suppression ne serait pas vue par le rechargement incrémental).
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+RECO_NEIGHBORS_K = int(os.getenv("RECO_NEIGHBORS_K", "20"))
+RECO_SHRINKAGE = float(os.getenv("RECO_SHRINKAGE", "5"))
+RECO_RELOAD_INTERVAL = int(os.getenv("RECO_RELOAD_INTERVAL", "300"))
+RECO_POPULAR_SIZE = 100
+RECO_PAGE_SIZE = 1000
+RECO_IN_CHUNK = 200  # ids par filtre IN (longueur d'URL PostgREST)
+
+
+def _chunks(items: Sequence, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def top_k_neighbors(
+    product_a: Sequence[str],
+    product_b: Sequence[str],
+    weights: Sequence[float],
+    totals: Dict[str, float],
+    k: int = RECO_NEIGHBORS_K,
+    shrinkage: float = RECO_SHRINKAGE
+) -> Dict[str, Tuple[List[str], List[float]]]:
+    """
+    Top-K voisins de chaque produit de `product_a` (calcul vectorisé)
+
+    Args:
+        product_a, product_b, weights: co-occurrences (a, b, poids)
+        totals: poids total des paniers contenant chaque produit
+
+    Returns:
+        {produit: ([voisins], [scores])}, scores décroissants
+    """
+    if not len(product_a):
+        return {}
+
+    labels, inverse = np.unique(np.concatenate([np.asarray(product_a), np.asarray(product_b)]), return_inverse=True)
+    a, b = inverse[:len(product_a)], inverse[len(product_a):]
+    w = np.asarray(weights, dtype=np.float64)
+    n = np.array([float(totals.get(label, 0) or 0) for label in labels])
+
+    denominator = np.sqrt(n[a] * n[b])
+    similarity = np.divide(w, denominator, out=np.zeros_like(w), where=denominator > 0) * (w / (w + shrinkage))
+
+    keep = similarity > 0
+    a, b, similarity = a[keep], b[keep], similarity[keep]
+    if not len(a):
+        return {}
+
+    # Tri par produit puis similarité décroissante, rang dans chaque groupe
+    order = np.lexsort((-similarity, a))
+    a, b, similarity = a[order], b[order], similarity[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    rank = np.arange(len(a)) - np.repeat(starts, np.diff(np.r_[starts, len(a)]))
+    top = rank < k
+    a, b, similarity = a[top], b[top], similarity[top]
+
+    bounds = np.flatnonzero(np.r_[True, a[1:] != a[:-1], True])
+    return {
+        str(labels[a[start]]): (labels[b[start:end]].astype(str).tolist(), np.round(similarity[start:end], 6).tolist())
+        for start, end in zip(bounds[:-1], bounds[1:])
+    }
+
+
+# ============================================
+# INDEX EN MÉMOIRE
+# ============================================
+
+class ItemNeighborIndex:
+    """
+    Index top-K compact: produit -> position, voisins en positions int32
+
+    Immuable une fois construit: merged() retourne un nouvel index, que le
+    service substitue d'un coup (pas de verrou côté lecture).
+    """
+
+    def __init__(self, rows: Iterable[Dict[str, Any]] = (), popular: Sequence[str] = (), k: int = RECO_NEIGHBORS_K):
+        self.k = k
+        self.item_ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self.neighbors = np.full((0, k), -1, dtype=np.int32)
+        self.scores = np.zeros((0, k), dtype=np.float32)
+        self.popular: List[str] = list(popular)
+        self._apply(list(rows))
+
+    def __len__(self) -> int:
+        return int((self.neighbors[:, 0] >= 0).sum())
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._positions
+
+    def merged(self, rows: Iterable[Dict[str, Any]], popular: Optional[Sequence[str]] = None) -> "ItemNeighborIndex":
+        """Nouvel index: lignes product_neighbors ajoutées ou remplacées"""
+        index = ItemNeighborIndex(k=self.k, popular=self.popular if popular is None else popular)
+        index.item_ids = list(self.item_ids)
+        index._positions = dict(self._positions)
+        index.neighbors = self.neighbors.copy()
+        index.scores = self.scores.copy()
+        index._apply(list(rows))
+        return index
+
+    def _apply(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        for row in rows:
+            self._position(str(row["product_id"]))
+            for neighbor_id in row["neighbor_ids"][:self.k]:
+                self._position(str(neighbor_id))
+
+        missing = len(self.item_ids) - len(self.neighbors)
+        if missing:
+            self.neighbors = np.vstack([self.neighbors, np.full((missing, self.k), -1, dtype=np.int32)])
+            self.scores = np.vstack([self.scores, np.zeros((missing, self.k), dtype=np.float32)])
+
+        for row in rows:
+            position = self._positions[str(row["product_id"])]
+            neighbors = [self._positions[str(n)] for n in row["neighbor_ids"][:self.k]]
+            self.neighbors[position] = -1
+            self.scores[position] = 0
+            self.neighbors[position, :len(neighbors)] = neighbors
+            self.scores[position, :len(neighbors)] = [float(s) for s in row["scores"][:len(neighbors)]]
+
+    def _position(self, item_id: str) -> int:
+        position = self._positions.get(item_id)
+        if position is None:
+            position = self._positions[item_id] = len(self.item_ids)
+            self.item_ids.append(item_id)
+        return position
+
+    def similar(self, item_id: str, limit: int = RECO_NEIGHBORS_K) -> List[Tuple[str, float]]:
+        """Voisins d'un produit"""
+        position = self._positions.get(item_id)
+        if position is None:
+            return []
+        return [
+            (self.item_ids[n], float(s))
+            for n, s in zip(self.neighbors[position], self.scores[position])
+            if n >= 0
+        ][:limit]
+
+    def recommend(
+        self,
+        seeds: Dict[str, float],
+        limit: int,
+        exclude: Iterable[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """
+        Produits les plus proches d'un historique pondéré
+
+        Score d'un candidat = somme, sur les produits de l'historique, de
+        poids * similarité (les produits de l'historique sont exclus).
+        """
+        rows = [(self._positions[item], weight) for item, weight in seeds.items() if item in self._positions]
+        if not rows or limit <= 0:
+            return []
+
+        positions = np.array([position for position, _ in rows], dtype=np.int64)
+        weights = np.array([weight for _, weight in rows], dtype=np.float32)
+        neighbors = self.neighbors[positions]
+        mask = neighbors >= 0
+        contributions = (self.scores[positions] * weights[:, None])[mask]
+        totals = np.bincount(neighbors[mask], weights=contributions, minlength=len(self.item_ids))
+
+        totals[positions] = 0
+        for item in exclude:
+            position = self._positions.get(item)
+            if position is not None:
+                totals[position] = 0
+
+        candidates = np.flatnonzero(totals > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-totals[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-totals[candidates], kind="stable")]
+        return [(self.item_ids[c], round(float(totals[c]), 6)) for c in candidates]
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class ProductRecommendationService:
+    """Entraînement incrémental (Celery) et service en mémoire (API)"""
+
+    def __init__(
+        self,
+        supabase=None,
+        k: int = RECO_NEIGHBORS_K,
+        shrinkage: float = RECO_SHRINKAGE,
+        reload_interval: int = RECO_RELOAD_INTERVAL
+    ):
+        self._supabase = supabase
+        self.k = k
+        self.shrinkage = shrinkage
+        self.reload_interval = reload_interval
+        self.index = ItemNeighborIndex(k=k)
+        self._loaded_until: Optional[str] = None
+        self._loaded_at_boundary: Set[str] = set()  # Produits déjà chargés avec updated_at == _loaded_until
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            from supabase_client import supabase
+            self._supabase = supabase
+        return self._supabase
+
+    # ---------- Service en ligne ----------
+
+    def stale(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.reload_interval
+
+    def ensure_fresh(self) -> ItemNeighborIndex:
+        """
+        Complète l'index avec les lignes modifiées depuis le dernier chargement
+
+        Synchrone (client Supabase): appelé via asyncio.to_thread par l'API.
+        Un seul chargement à la fois; les autres lecteurs gardent l'index courant.
+        """
+        if not self.stale() or not self._lock.acquire(blocking=False):
+            return self.index
+        try:
+            self._reload()
+        except Exception as e:
+            logger.warning("recommendation_index_reload_failed", error=str(e))
+        finally:
+            self._checked_at = time.monotonic()
+            self._lock.release()
+        return self.index
+
+    def _reload(self):
+        start = time.perf_counter()
+        since = self._loaded_until
+
+        def neighbors_query():
+            query = self.supabase.table("product_neighbors").select("product_id, neighbor_ids, scores, updated_at")
+            if since:
+                query = query.gte("updated_at", since)
+            return query.order("updated_at").order("product_id")
+
+        rows = [
+            row for row in self._fetch_all(neighbors_query)
+            if not (str(row["updated_at"]) == since and str(row["product_id"]) in self._loaded_at_boundary)
+        ]
+        popular = (
+            self.supabase.table("product_interaction_totals")
+            .select("product_id")
+            .order("weight", desc=True)
+            .limit(RECO_POPULAR_SIZE)
+            .execute()
+            .data or []
+        )
+
+        self.index = self.index.merged(rows, popular=[str(row["product_id"]) for row in popular])
+        if rows:
+            loaded_until = max(str(row["updated_at"]) for row in rows)
+            at_boundary = {str(row["product_id"]) for row in rows if str(row["updated_at"]) == loaded_until}
+            if loaded_until == since:
+                at_boundary |= self._loaded_at_boundary
+            self._loaded_until, self._loaded_at_boundary = loaded_until, at_boundary
+        logger.info(
+            "recommendation_index_loaded",
+            rows=len(rows),
+            products=len(self.index),
+            incremental=since is not None,
+            duration_ms=round((time.perf_counter() - start) * 1000, 1)
+        )
+
+    def recommend(
+        self,
+        seeds: Dict[str, float],
+        limit: int,
+        exclude: Iterable[str] = ()
+    ) -> List[Tuple[str, float]]:
+        """Recommandations depuis l'index en mémoire (sans rechargement)"""
+        return self.index.recommend(seeds, limit, exclude)
+
+    def popular(self, limit: int, exclude: Iterable[str] = ()) -> List[str]:
+        """Produits les plus présents dans les paniers (démarrage à froid)"""
+        excluded = set(exclude)
+        return [item for item in self.index.popular if item not in excluded][:limit]
+
+    # ---------- Entraînement (Celery) ----------
+
+    def refresh(self, full: bool = False, until: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Met à jour le modèle: cumul incrémental des co-occurrences en base,
+        puis top-K des produits dont les co-occurrences ont changé
+
+        Args:
+            full: recalculer le top-K de tous les produits (normalisation à jour
+                  pour les produits non touchés depuis longtemps)
+        """
+        until = until or datetime.utcnow()
+        touched = self.supabase.rpc(
+            "accumulate_product_cooccurrence", {"p_until": until.isoformat()}
+        ).execute().data or []
+        product_ids = sorted({str(row["product_id"]) for row in touched})
+
+        if full:
+            product_ids = sorted({
+                str(row["product_id"])
+                for row in self._fetch_all(
+                    lambda: self.supabase.table("product_interaction_totals").select("product_id").order("product_id")
+                )
+            })
+        if not product_ids:
+            return {"products": 0, "pairs": 0, "rows": 0}
+
+        pairs = []
+        for chunk in _chunks(product_ids, RECO_IN_CHUNK):
+            pairs.extend(self._fetch_all(
+                lambda chunk=chunk: self.supabase.table("product_cooccurrence")
+                .select("product_a, product_b, weight")
+                .in_("product_a", chunk)
+                .order("product_a")
+                .order("product_b")
+            ))
+
+        involved = sorted(set(product_ids) | {str(pair["product_b"]) for pair in pairs})
+        totals: Dict[str, float] = {}
+        for chunk in _chunks(involved, RECO_IN_CHUNK):
+            result = self.supabase.table("product_interaction_totals").select("product_id, weight").in_("product_id", chunk).execute()
+            totals.update({str(row["product_id"]): float(row["weight"] or 0) for row in result.data or []})
+
+        neighbors = top_k_neighbors(
+            [str(pair["product_a"]) for pair in pairs],
+            [str(pair["product_b"]) for pair in pairs],
+            [float(pair["weight"] or 0) for pair in pairs],
+            totals,
+            k=self.k,
+            shrinkage=self.shrinkage
+        )
+
+        # updated_at attribué par la base (trigger)
+        rows = [
+            {"product_id": product_id, "neighbor_ids": ids, "scores": scores}
+            for product_id, (ids, scores) in neighbors.items()
+        ]
+        rows.extend(
+            {"product_id": product_id, "neighbor_ids": [], "scores": []}
+            for product_id in self._existing_neighbor_rows([p for p in product_ids if p not in neighbors])
+        )
+        for chunk in _chunks(rows, RECO_PAGE_SIZE):
+            self.supabase.table("product_neighbors").upsert(chunk).execute()
+
+        logger.info(
+            "recommendation_model_refreshed",
+            full=full,
+            products=len(product_ids),
+            pairs=len(pairs),
+            rows=len(rows)
+        )
+        return {"products": len(product_ids), "pairs": len(pairs), "rows": len(rows)}
+
+    def _existing_neighbor_rows(self, product_ids: List[str]) -> List[str]:
+        """Produits sans voisins qui ont encore une ligne product_neighbors (à vider)"""
+        existing = []
+        for chunk in _chunks(product_ids, RECO_IN_CHUNK):
+            result = self.supabase.table("product_neighbors").select("product_id").in_("product_id", chunk).execute()
+            existing.extend(str(row["product_id"]) for row in result.data or [])
+        return existing
+
+    def _fetch_all(self, build_query: Callable[[], Any]) -> List[Dict[str, Any]]:
+        """Toutes les lignes d'une requête triée sur une clé unique, par pages de RECO_PAGE_SIZE"""
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            page = build_query().range(offset, offset + RECO_PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < RECO_PAGE_SIZE:
+                return rows
+            offset += RECO_PAGE_SIZE
+
+
+product_recommendations = ProductRecommendationService()
@@ -0,0 +1,62 @@
+"""
+QR Code Service - Rendu local des QR codes de liens courts
+
+Les QR codes sont rendus en PNG par la librairie qrcode (plus d'appel à un
+service tiers) et gardés en cache LRU: le contenu ne dépend que du short code.
+
+Les URLs de QR code sont absolues: API_BASE_URL (origine publique de l'API,
+sans /api) ou, à défaut, l'URL de base de la requête en cours.
+"""
+
+import io
+import os
+import re
+from functools import lru_cache
+from typing import Optional
+
+import qrcode
+
+SHORT_LINK_BASE_URL = "https://shareyoursales.ma/r"
+API_BASE_URL = os.getenv("API_BASE_URL", "").rstrip("/")
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "2048"))
+
+SHORT_CODE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def short_link_url(short_code: str) -> str:
+    """URL publique du lien court"""
+    return f"{SHORT_LINK_BASE_URL}/{short_code}"
+
+
+def qr_code_url(short_code: str, base_url: Optional[str] = None) -> str:
+    """
+    URL absolue du QR code servi par l'API (GET /api/affiliate/qr/{short_code}.png)
+
+    Args:
+        short_code: Code court du lien
+        base_url: URL de base de la requête (request.base_url), utilisée si
+            API_BASE_URL n'est pas configurée
+    """
+    origin = API_BASE_URL or str(base_url or "").rstrip("/")
+    if not origin:
+        raise ValueError("API_BASE_URL non configurée et aucune URL de requête fournie")
+    return f"{origin}/api/affiliate/qr/{short_code}.png"
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr_png(data: str, box_size: int = 8, border: int = 2) -> bytes:
+    """Rendre un QR code PNG (mis en cache par contenu)"""
+    qr = qrcode.QRCode(
+        version=None,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
@@ -0,0 +1,182 @@
+"""
+Query Trace Service - Traçage des appels Supabase par requête HTTP
+
+Chaque appel PostgREST (table, opération, durée, nombre de lignes, forme de
+la requête) est enregistré dans la trace de la requête HTTP en cours
+(contextvar). En fin de requête:
+- header `Server-Timing: db;dur=...;desc="N queries"` (visible dans les devtools)
+- log si la requête dépasse le budget de requêtes ou de temps base de données
+- log des candidats N+1: même forme de requête répétée dans une requête HTTP
+
+La forme d'une requête = méthode + table + filtres sans leurs valeurs:
+`GET sales?merchant_id=eq&select=amount` pour chaque merchant_id différent.
+"""
+
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+import structlog
+
+logger = structlog.get_logger()
+
+QUERY_COUNT_BUDGET = int(os.getenv("QUERY_COUNT_BUDGET", "25"))
+QUERY_TIME_BUDGET_MS = float(os.getenv("QUERY_TIME_BUDGET_MS", "500"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+# Paramètres PostgREST dont la valeur fait partie de la forme (pas des données)
+SHAPE_VALUE_PARAMS = {"select", "order", "on_conflict", "columns"}
+# Paramètres de pagination: ignorés dans la forme
+SHAPE_IGNORED_PARAMS = {"limit", "offset"}
+
+
+# ============================================
+# FORME DES REQUÊTES
+# ============================================
+
+def query_shape(method: str, table: str, query_string: str) -> str:
+    """
+    Forme normalisée d'un appel PostgREST (valeurs des filtres retirées)
+
+    `merchant_id=eq.42&select=id,amount` -> `GET sales?merchant_id=eq&select=id,amount`
+    """
+    parts = []
+    for key, value in parse_qsl(query_string, keep_blank_values=True):
+        if key in SHAPE_IGNORED_PARAMS:
+            continue
+        if key in SHAPE_VALUE_PARAMS:
+            parts.append(f"{key}={value}")
+        else:
+            # Filtre: garder l'opérateur (eq, in, gte...) sans la valeur
+            operator = value.split(".", 1)[0] if "." in value else ""
+            if operator == "not":
+                operator = ".".join(value.split(".", 2)[:2])
+            parts.append(f"{key}={operator}")
+    return f"{method.upper()} {table}?{'&'.join(sorted(parts))}"
+
+
+def rows_from_content_range(content_range: Optional[str]) -> Optional[int]:
+    """
+    Nombre de lignes d'après le header Content-Range de PostgREST
+
+    `0-24/*` -> 25, `*/0` -> 0, absent ou `*/*` -> None
+    """
+    if not content_range:
+        return None
+    span = content_range.split("/", 1)[0]
+    if span == "*":
+        total = content_range.split("/", 1)[-1]
+        return int(total) if total.isdigit() else None
+    try:
+        start, end = span.split("-", 1)
+        return int(end) - int(start) + 1
+    except ValueError:
+        return None
+
+
+# ============================================
+# TRACE
+# ============================================
+
+class QueryTrace:
+    """Appels base de données d'une requête HTTP"""
+
+    __slots__ = ("calls",)
+
+    def __init__(self):
+        self.calls: List[Dict] = []
+
+    def record(
+        self,
+        table: str,
+        operation: str,
+        duration: float,
+        rows: Optional[int] = None,
+        shape: Optional[str] = None
+    ):
+        self.calls.append({
+            "table": table,
+            "operation": operation,
+            "duration_ms": round(duration * 1000, 2),
+            "rows": rows,
+            "shape": shape or f"{operation} {table}",
+        })
+
+    @property
+    def count(self) -> int:
+        return len(self.calls)
+
+    @property
+    def duration_ms(self) -> float:
+        return round(sum(call["duration_ms"] for call in self.calls), 2)
+
+    def n_plus_one_candidates(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        """Formes de requêtes répétées au moins `threshold` fois"""
+        shapes = Counter(call["shape"] for call in self.calls)
+        return {shape: count for shape, count in shapes.most_common() if count >= threshold}
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration_ms};desc="{self.count} queries"'
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar("query_trace", default=None)
+
+
+def current_trace() -> Optional[QueryTrace]:
+    return _current_trace.get()
+
+
+def start_trace() -> Tuple[QueryTrace, Token]:
+    """Ouvrir la trace de la requête HTTP en cours"""
+    trace = QueryTrace()
+    return trace, _current_trace.set(trace)
+
+
+def stop_trace(token: Token):
+    _current_trace.reset(token)
+
+
+def record_query(table: str, operation: str, duration: float, rows: Optional[int] = None, shape: Optional[str] = None):
+    """Enregistrer un appel dans la trace courante (no-op hors requête HTTP)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(table, operation, duration, rows, shape)
+
+
+# ============================================
+# MIDDLEWARE HTTP
+# ============================================
+
+def report_trace(trace: QueryTrace, method: str, path: str, duration: float):
+    """Logs de budget et de N+1 en fin de requête"""
+    if trace.count > QUERY_COUNT_BUDGET or trace.duration_ms > QUERY_TIME_BUDGET_MS:
+        slowest = sorted(trace.calls, key=lambda call: call["duration_ms"], reverse=True)[:3]
+        logger.warning(
+            "db_budget_exceeded",
+            method=method,
+            path=path,
+            queries=trace.count,
+            db_ms=trace.duration_ms,
+            request_ms=round(duration * 1000, 2),
+            slowest=[f"{call['shape']} ({call['duration_ms']}ms)" for call in slowest],
+        )
+
+    for shape, count in trace.n_plus_one_candidates().items():
+        logger.warning("db_n_plus_one_candidate", method=method, path=path, shape=shape, count=count)
+
+
+async def query_trace_middleware(request, call_next: Callable):
+    """Middleware FastAPI: trace des appels Supabase + header Server-Timing"""
+    trace, token = start_trace()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        stop_trace(token)
+
+    if trace.count:
+        response.headers.append("Server-Timing", trace.server_timing())
+    report_trace(trace, request.method, request.url.path, time.perf_counter() - start)
+    return response
@@ -8,6 +8,7 @@ Features:
 - Templates HTML professionnels
 - Retry logic automatique
 - Logging structuré
+- Connexions HTTP persistantes + API batch (100 emails/requête)
 """
 
 import os
@@ -15,7 +16,14 @@ import requests
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 import structlog
-from pathlib import Path
+
+from services.email_delivery_service import (
+    RESEND_BATCH_API_URL,
+    RESEND_BATCH_SIZE,
+    chunked,
+    get_http_session,
+    rate_limiters,
+)
 
 logger = structlog.get_logger()
 
@@ -36,6 +44,9 @@ class ResendEmailService:
         self.from_name = EMAIL_FROM_NAME
         self.from_address = EMAIL_FROM_ADDRESS
         self.api_url = RESEND_API_URL
+        self.batch_api_url = RESEND_BATCH_API_URL
+        self.session = get_http_session()
+        self.rate_limiter = rate_limiters["resend"]
 
         if not self.api_key:
             logger.warning("resend_api_key_missing", message="Clé API Resend non configurée")
@@ -75,39 +86,13 @@ class ResendEmailService:
             Dict avec le résultat (success, message_id, error)
         """
         try:
-            # Construire le FROM avec nom
-            from_email = f"{self.from_name} <{self.from_address}>"
-
-            # Préparer le payload
-            payload = {
-                "from": from_email,
-                "to": [to_email],
-                "subject": subject,
-                "html": html_content
-            }
-
-            # Ajouter le contenu texte si fourni
-            if text_content:
-                payload["text"] = text_content
-
-            # Ajouter reply_to si fourni
-            if reply_to:
-                payload["reply_to"] = reply_to
-
-            # Ajouter CC si fourni
-            if cc:
-                payload["cc"] = cc
-
-            # Ajouter BCC si fourni
-            if bcc:
-                payload["bcc"] = bcc
-
-            # Ajouter tags si fourni
-            if tags:
-                payload["tags"] = tags
+            payload = self._build_payload(
+                to_email, subject, html_content, text_content, reply_to, cc, bcc, tags
+            )
 
-            # Envoyer la requête
-            response = requests.post(
+            # Envoyer la requête (connexion keep-alive partagée)
+            self.rate_limiter.acquire()
+            response = self.session.post(
                 self.api_url,
                 headers=self._get_headers(),
                 json=payload,
@@ -164,6 +149,111 @@ class ResendEmailService:
                 "error": f"Erreur inattendue: {str(e)}"
             }
 
+    def _build_payload(
+        self,
+        to_email: str,
+        subject: str,
+        html_content: str,
+        text_content: Optional[str] = None,
+        reply_to: Optional[str] = None,
+        cc: Optional[List[str]] = None,
+        bcc: Optional[List[str]] = None,
+        tags: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Construire le payload Resend d'un email"""
+        payload = {
+            "from": f"{self.from_name} <{self.from_address}>",
+            "to": [to_email],
+            "subject": subject,
+            "html": html_content
+        }
+
+        # Champs optionnels
+        if text_content:
+            payload["text"] = text_content
+        if reply_to:
+            payload["reply_to"] = reply_to
+        if cc:
+            payload["cc"] = cc
+        if bcc:
+            payload["bcc"] = bcc
+        if tags:
+            payload["tags"] = tags
+
+        return payload
+
+    def send_batch(self, emails: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envoyer plusieurs emails via l'API batch Resend
+
+        Les emails sont découpés en lots de 100 (limite Resend), soit une
+        requête HTTP par lot au lieu d'une par email.
+
+        Args:
+            emails: Liste de dicts avec les mêmes clés que send_email
+
+        Returns:
+            Liste de résultats {to_email, success, message_id | error}
+            dans l'ordre des emails
+        """
+        results: List[Dict[str, Any]] = []
+
+        for batch in chunked(emails, RESEND_BATCH_SIZE):
+            payloads = [
+                self._build_payload(
+                    email["to_email"],
+                    email["subject"],
+                    email["html_content"],
+                    email.get("text_content"),
+                    email.get("reply_to"),
+                    email.get("cc"),
+                    email.get("bcc"),
+                    email.get("tags")
+                )
+                for email in batch
+            ]
+
+            try:
+                self.rate_limiter.acquire()
+                response = self.session.post(
+                    self.batch_api_url,
+                    headers=self._get_headers(),
+                    json=payloads,
+                    timeout=30
+                )
+
+                if response.status_code in [200, 201]:
+                    data = response.json().get("data", [])
+                    for i, email in enumerate(batch):
+                        message_id = data[i].get("id") if i < len(data) else None
+                        results.append({
+                            "to_email": email["to_email"],
+                            "success": True,
+                            "message_id": message_id
+                        })
+                    logger.info("email_batch_sent", count=len(batch))
+                    continue
+
+                error_data = response.json() if response.content else {}
+                error = error_data.get("message", "Erreur d'envoi")
+                logger.error(
+                    "email_batch_failed",
+                    count=len(batch),
+                    status_code=response.status_code,
+                    error=error_data
+                )
+
+            except requests.exceptions.RequestException as e:
+                error = f"Erreur réseau: {str(e)}"
+                logger.error("email_batch_request_error", count=len(batch), error=str(e))
+
+            results.extend(
+                {"to_email": email["to_email"], "success": False, "error": error}
+                for email in batch
+            )
+
+        return results
+
     # ============================================
     # TEMPLATES D'EMAILS
     # ============================================
@@ -172,6 +262,11 @@ class ResendEmailService:
         """Email de bienvenue après inscription"""
         subject = f"🎉 Bienvenue sur ShareYourSales, {user_name}!"
 
+        if role in ['influencer', 'commercial']:
+            role_features_html = "<li>Parcourir notre marketplace de produits et services</li><li>Générer vos liens d'affiliation personnalisés</li><li>Gagner des commissions sur chaque vente (15% produits, 20% services)</li><li>Suivre vos performances en temps réel</li>"
+        else:
+            role_features_html = "<li>Créer et gérer vos produits/services</li><li>Recruter des affiliés (influenceurs/commerciaux)</li><li>Suivre les performances de vos affiliés</li><li>Gérer vos paiements de commissions</li>"
+
         html_content = f"""
         <!DOCTYPE html>
         <html>
@@ -193,7 +288,7 @@ class ResendEmailService:
                 <p>En tant que <strong>{role}</strong>, vous pouvez maintenant:</p>
 
                 <ul style="background: #f8f9fa; padding: 20px 20px 20px 40px; border-left: 4px solid #667eea; margin: 20px 0;">
-                    {'<li>Parcourir notre marketplace de produits et services</li><li>Générer vos liens d\'affiliation personnalisés</li><li>Gagner des commissions sur chaque vente (15% produits, 20% services)</li><li>Suivre vos performances en temps réel</li>' if role in ['influencer', 'commercial'] else '<li>Créer et gérer vos produits/services</li><li>Recruter des affiliés (influenceurs/commerciaux)</li><li>Suivre les performances de vos affiliés</li><li>Gérer vos paiements de commissions</li>'}
+                    {role_features_html}
                 </ul>
 
                 <div style="text-align: center; margin: 30px 0;">
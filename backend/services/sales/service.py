@@ -9,6 +9,7 @@ from uuid import UUID
 from datetime import datetime
 
 from supabase_client import get_supabase_client
+from services.user_context_service import user_context_service
 
 logger = logging.getLogger(__name__)
 
@@ -82,6 +83,7 @@ class SalesService:
 
             sale = result.data
             logger.info(f"Vente créée avec succès: sale_id={sale.get('id')}")
+            user_context_service.invalidate_owner(influencer_id)
 
             return sale
 
@@ -198,7 +200,10 @@ class SalesService:
                 self.supabase.table("sales").update(update_data).eq("id", str(sale_id)).execute()
             )
 
-            return result.data[0] if result.data else None
+            if not result.data:
+                return None
+            user_context_service.invalidate_owner(result.data[0].get("influencer_id"))
+            return result.data[0]
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour du statut de la vente: {str(e)}")
             return None
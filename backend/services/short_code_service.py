@@ -0,0 +1,150 @@
+"""
+Short Code Allocator - Codes courts uniques sans vérification d'existence
+
+Chaque code est l'encodage base62 (7 caractères) d'une valeur de séquence
+passée par une permutation affine de [0, 62^7). La permutation est une
+bijection: deux valeurs de séquence distinctes donnent toujours deux codes
+distincts, mais des liens consécutifs n'ont pas de codes consécutifs.
+
+La séquence Postgres est réservée par blocs (migration 007): un appel RPC
+pour SHORT_CODE_BLOCK_SIZE liens, puis allocation locale sous verrou.
+
+Les anciens codes (8 caractères) ne peuvent pas entrer en collision avec les
+nouveaux (7 caractères); les slugs personnalisés au format réservé sont refusés.
+
+Si la séquence reste indisponible après quelques tentatives, aucun code n'est
+attribué (ShortCodeUnavailable): pas de repli aléatoire sans garantie d'unicité.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+import structlog
+
+logger = structlog.get_logger()
+
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+SHORT_CODE_LENGTH = 7
+SHORT_CODE_SPACE = 62 ** SHORT_CODE_LENGTH
+
+# Permutation affine x -> (A*x + B) mod 62^7 (A premier avec 2 et 31)
+SCRAMBLE_MULTIPLIER = 1580030173
+SCRAMBLE_OFFSET = int(os.getenv("SHORT_CODE_SCRAMBLE_OFFSET", "982451653"))
+SCRAMBLE_INVERSE = pow(SCRAMBLE_MULTIPLIER, -1, SHORT_CODE_SPACE)
+
+SHORT_CODE_BLOCK_SIZE = int(os.getenv("SHORT_CODE_BLOCK_SIZE", "1000"))
+SHORT_CODE_BLOCK_RPC = "reserve_short_code_block"
+SHORT_CODE_RESERVE_ATTEMPTS = 3
+SHORT_CODE_RESERVE_BACKOFF = 0.2  # secondes, doublé à chaque tentative
+
+RESERVED_CODE_PATTERN = re.compile(rf"^[0-9A-Za-z]{{{SHORT_CODE_LENGTH}}}$")
+
+
+def base62_encode(value: int, length: int = SHORT_CODE_LENGTH) -> str:
+    """Encoder un entier en base62 sur `length` caractères"""
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 62)
+        chars.append(BASE62_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def base62_decode(code: str) -> int:
+    value = 0
+    for char in code:
+        value = value * 62 + BASE62_ALPHABET.index(char)
+    return value
+
+
+def encode_sequence(value: int) -> str:
+    """Valeur de séquence -> code court (bijectif sur [0, 62^7))"""
+    if not 0 <= value < SHORT_CODE_SPACE:
+        raise ValueError("Short code sequence exhausted")
+    return base62_encode((value * SCRAMBLE_MULTIPLIER + SCRAMBLE_OFFSET) % SHORT_CODE_SPACE)
+
+
+def decode_sequence(code: str) -> int:
+    """Code court -> valeur de séquence (diagnostic)"""
+    return ((base62_decode(code) - SCRAMBLE_OFFSET) * SCRAMBLE_INVERSE) % SHORT_CODE_SPACE
+
+
+def is_reserved_code(slug: str) -> bool:
+    """Un slug personnalisé ne doit pas avoir le format des codes alloués"""
+    return bool(RESERVED_CODE_PATTERN.match(slug))
+
+
+class ShortCodeUnavailable(RuntimeError):
+    """Séquence de codes courts indisponible: aucun code attribué"""
+
+
+class ShortCodeAllocator:
+    """
+    Allocation de codes courts par blocs de séquence
+
+    Thread-safe: les endpoints synchrones et asynchrones partagent l'instance.
+    """
+
+    def __init__(
+        self,
+        reserve_block: Optional[Callable[[int], int]] = None,
+        block_size: int = SHORT_CODE_BLOCK_SIZE,
+        backoff: float = SHORT_CODE_RESERVE_BACKOFF
+    ):
+        self._reserve_block = reserve_block or self._reserve_block_from_db
+        self.block_size = block_size
+        self.backoff = backoff
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _reserve_block_from_db(size: int) -> int:
+        from supabase_client import supabase
+
+        result = supabase.rpc(SHORT_CODE_BLOCK_RPC, {"p_size": size}).execute()
+        return int(result.data)
+
+    def _take(self, count: int) -> List[int]:
+        values: List[int] = []
+        with self._lock:
+            while len(values) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(values))
+                    start = self._reserve_with_retry(size)
+                    self._next, self._end = start, start + size
+                take = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + take))
+                self._next += take
+        return values
+
+    def _reserve_with_retry(self, size: int) -> int:
+        for attempt in range(SHORT_CODE_RESERVE_ATTEMPTS):
+            try:
+                return self._reserve_block(size)
+            except Exception as e:
+                logger.warning("short_code_sequence_unavailable", attempt=attempt + 1, error=str(e))
+                if attempt + 1 == SHORT_CODE_RESERVE_ATTEMPTS:
+                    raise ShortCodeUnavailable("Séquence de codes courts indisponible") from e
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def allocate_many(self, count: int) -> List[str]:
+        """
+        Allouer `count` codes distincts
+
+        Raises:
+            ShortCodeUnavailable: séquence injoignable après plusieurs tentatives
+        """
+        if count <= 0:
+            return []
+
+        return [encode_sequence(value) for value in self._take(count)]
+
+    def allocate(self) -> str:
+        """Allouer un code"""
+        return self.allocate_many(1)[0]
+
+
+# Instance globale
+short_code_allocator = ShortCodeAllocator()
@@ -0,0 +1,240 @@
+"""
+Time Series Engine - Séries temporelles des graphiques analytics
+
+Remplace la boucle « une requête par jour » des endpoints de graphiques par:
+1. Un appel RPC groupé `get_timeseries` (migration 010): GROUP BY date_trunc
+2. À défaut, une seule requête sur toute la plage, agrégée en Python
+
+Les buckets (jour, semaine ISO, mois) sont toujours complétés à zéro, quelle
+que soit la plage demandée (7 jours, 90 jours, 12 mois...).
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import structlog
+
+from utils.rpc import is_missing_function
+
+logger = structlog.get_logger()
+
+TIMESERIES_RPC = "get_timeseries"
+
+BUCKETS = ("day", "week", "month")
+
+# Nombre maximum de buckets par série (≈ 1 an en jours, 2 ans en semaines, 5 ans en mois)
+MAX_PERIODS = {"day": 366, "week": 104, "month": 60}
+
+# Fallback: lignes lues par page sur la plage
+FALLBACK_PAGE_SIZE = 1000
+
+
+# ============================================
+# SOURCES
+# ============================================
+
+TimeSeriesSource = namedtuple(
+    "TimeSeriesSource", ["table", "time_column", "value_columns", "scope_columns"]
+)
+
+SALES_SOURCE = TimeSeriesSource(
+    table="sales",
+    time_column="created_at",
+    value_columns=("amount", "commission"),
+    scope_columns={"merchant": "merchant_id", "influencer": "affiliate_id"}
+)
+
+COMMISSIONS_SOURCE = TimeSeriesSource(
+    table="commissions",
+    time_column="created_at",
+    value_columns=("amount",),
+    scope_columns={"influencer": "influencer_id"}
+)
+
+
+# ============================================
+# BUCKETS
+# ============================================
+
+def bucket_start(day: date, bucket: str) -> date:
+    """Début du bucket contenant `day` (mêmes bornes que date_trunc côté PostgreSQL)"""
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Invalid bucket: {bucket}")
+
+
+def shift_bucket(start: date, bucket: str, count: int) -> date:
+    """Début du bucket situé `count` buckets après (ou avant si négatif) `start`"""
+    if bucket == "day":
+        return start + timedelta(days=count)
+    if bucket == "week":
+        return start + timedelta(weeks=count)
+    month_index = start.year * 12 + start.month - 1 + count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def bucket_range(bucket: str, periods: int, end: Optional[date] = None) -> List[date]:
+    """
+    Débuts des `periods` derniers buckets, le dernier contenant `end`
+
+    Raises:
+        ValueError: bucket inconnu ou nombre de périodes hors limites
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Invalid bucket: {bucket}")
+    if not 1 <= periods <= MAX_PERIODS[bucket]:
+        raise ValueError(f"periods must be between 1 and {MAX_PERIODS[bucket]} for bucket '{bucket}'")
+
+    last = bucket_start(end or datetime.now().date(), bucket)
+    return [shift_bucket(last, bucket, i - periods + 1) for i in range(periods)]
+
+
+def _parse_day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).date()
+
+
+# ============================================
+# ENGINE
+# ============================================
+
+class TimeSeriesEngine:
+    """
+    Séries temporelles complétées à zéro pour une source et un périmètre
+
+    Si la fonction RPC n'est pas déployée, le moteur bascule sur la requête
+    de plage et ne retente plus la RPC pour ce processus. Une autre erreur RPC
+    (réseau, timeout) ne bascule que l'appel en cours.
+    """
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+        self._rpc_available = True
+
+    def series(
+        self,
+        source: TimeSeriesSource = SALES_SOURCE,
+        bucket: str = "day",
+        periods: int = 7,
+        scope: Optional[str] = None,
+        scope_id: Optional[str] = None,
+        end: Optional[date] = None
+    ) -> List[Dict]:
+        """
+        Une série complète en une requête
+
+        Args:
+            scope: None (plateforme) ou une clé de `source.scope_columns`
+
+        Returns:
+            [{"bucket": date, "count": int, <value_column>: float, ...}]
+            un élément par bucket, dans l'ordre chronologique
+
+        Raises:
+            ValueError: bucket, périodes ou périmètre invalides
+        """
+        starts = bucket_range(bucket, periods, end)
+        scope_column = None
+        if scope is not None:
+            if scope not in source.scope_columns:
+                raise ValueError(f"Invalid scope '{scope}' for {source.table}")
+            scope_column = source.scope_columns[scope]
+
+        range_start = starts[0]
+        range_end = shift_bucket(starts[-1], bucket, 1)
+
+        rows = None
+        if self._rpc_available:
+            rows = self._fetch_rpc(source, bucket, range_start, range_end, scope_column, scope_id)
+        if rows is None:
+            rows = self._fetch_range(source, bucket, range_start, range_end, scope_column, scope_id)
+
+        series = {
+            start: {"bucket": start, "count": 0, **{column: 0.0 for column in source.value_columns}}
+            for start in starts
+        }
+        for row in rows:
+            point = series.get(_parse_day(row["bucket"]))
+            if point is None:
+                continue
+            point["count"] += int(row.get("count") or 0)
+            for column in source.value_columns:
+                point[column] += float(row.get(column) or 0)
+
+        return [series[start] for start in starts]
+
+    def _fetch_rpc(self, source, bucket, range_start, range_end, scope_column, scope_id):
+        params = {
+            "p_table": source.table,
+            "p_time_column": source.time_column,
+            "p_value_columns": list(source.value_columns),
+            "p_bucket": bucket,
+            "p_start": range_start.isoformat(),
+            "p_end": range_end.isoformat(),
+            "p_scope_column": scope_column,
+            "p_scope_id": scope_id
+        }
+        try:
+            result = self.supabase.rpc(TIMESERIES_RPC, params).execute()
+        except Exception as e:
+            if is_missing_function(str(e)):
+                self._rpc_available = False
+            logger.warning("timeseries_rpc_unavailable", error=str(e), disabled=not self._rpc_available)
+            return None
+
+        # La RPC renvoie les sommes dans un tableau aligné sur p_value_columns
+        return [
+            {
+                "bucket": row["bucket"],
+                "count": row.get("row_count"),
+                **dict(zip(source.value_columns, row.get("totals") or []))
+            }
+            for row in result.data or []
+        ]
+
+    def _fetch_range(self, source, bucket, range_start, range_end, scope_column, scope_id):
+        """Fallback: une requête sur toute la plage (paginée), agrégée par bucket"""
+        columns = ", ".join((source.time_column,) + tuple(source.value_columns))
+        rows = []
+        offset = 0
+
+        while True:
+            query = self.supabase.table(source.table) \
+                .select(columns) \
+                .gte(source.time_column, range_start.isoformat()) \
+                .lt(source.time_column, range_end.isoformat())
+            if scope_column:
+                query = query.eq(scope_column, scope_id)
+            # Pages stables: ordre sur une clé unique
+            page = query.order("id").range(offset, offset + FALLBACK_PAGE_SIZE - 1).execute().data or []
+
+            for row in page:
+                rows.append({
+                    "bucket": bucket_start(_parse_day(row[source.time_column]), bucket),
+                    "count": 1,
+                    **{column: row.get(column) for column in source.value_columns}
+                })
+
+            if len(page) < FALLBACK_PAGE_SIZE:
+                return rows
+            offset += FALLBACK_PAGE_SIZE
+
+
+# ============================================
+# LIBELLÉS
+# ============================================
+
+def bucket_label(start: date, bucket: str) -> str:
+    """Libellé court pour l'axe des graphiques"""
+    if bucket == "week":
+        return f"Sem {start.isocalendar()[1]}"
+    if bucket == "month":
+        return start.strftime("%m/%Y")
+    return start.strftime("%d/%m")
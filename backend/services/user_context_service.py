@@ -0,0 +1,300 @@
+"""
+User Context Service - Instantané des données utilisateur pour le bot IA
+
+Le bot a besoin, à chaque message, du profil et des chiffres récents de
+l'utilisateur (ventes, liens actifs, solde, demandes d'affiliation en
+attente). Les lectures sont lancées en parallèle (asyncio.gather +
+asyncio.to_thread, le client Supabase étant synchrone): toutes filtrent
+directement sur `user_id` via une jointure `!inner`, aucune n'attend
+le profil.
+
+L'instantané est mis en cache (USER_CONTEXT_TTL):
+- cache Redis partagé (services.cache_service), précédé d'un cache local du
+  process plus court (USER_CONTEXT_LOCAL_TTL) pour borner le retard des
+  autres workers après une invalidation
+- invalidé à la validation d'une vente et à chaque paiement, par user_id
+  ou par influencer_id (alias enregistré avec l'instantané)
+
+Une conversation de plusieurs messages ne relit donc pas la base à chaque tour.
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import structlog
+
+logger = structlog.get_logger()
+
+USER_CONTEXT_TTL = int(os.getenv("USER_CONTEXT_TTL", "60"))
+USER_CONTEXT_LOCAL_TTL = 5
+USER_CONTEXT_LOCAL_SIZE = 1000
+RECENT_DAYS = 30
+
+CACHE_KEY_PREFIX = "user_context:"
+OWNER_KEY_PREFIX = "user_context:owner:"
+
+
+def _sum(rows: List[Dict], column: str) -> float:
+    return round(sum(float(row.get(column) or 0) for row in rows), 2)
+
+
+def compact_json(data: Optional[Dict[str, Any]]) -> str:
+    """Sérialisation compacte pour le prompt système (sans valeurs vides)"""
+    values = {key: value for key, value in (data or {}).items() if value not in (None, "", [], {})}
+    return json.dumps(values, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+# ============================================
+# SERVICE
+# ============================================
+
+class UserContextService:
+    """Instantanés des données utilisateur, lus en parallèle et mis en cache"""
+
+    def __init__(
+        self,
+        supabase=None,
+        shared_cache=None,
+        ttl: int = USER_CONTEXT_TTL,
+        local_ttl: Optional[int] = None
+    ):
+        self._supabase = supabase
+        self._shared = shared_cache
+        self.ttl = ttl
+        if local_ttl is None:
+            local_ttl = min(ttl, USER_CONTEXT_LOCAL_TTL) if shared_cache is not None else ttl
+        self.local_ttl = local_ttl
+        self._local: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._owners: Dict[str, str] = {}
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            from supabase_client import supabase
+            self._supabase = supabase
+        return self._supabase
+
+    # ---------- Lecture ----------
+
+    async def snapshot(self, user_id: str, role: str) -> Dict[str, Any]:
+        """Instantané de l'utilisateur (depuis le cache si encore valide)"""
+        cached = self._get(user_id)
+        if cached is not None:
+            return cached
+
+        fetchers = self._fetchers(role)
+        if not fetchers:
+            return {}
+
+        since = (datetime.utcnow() - timedelta(days=RECENT_DAYS)).isoformat()
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[asyncio.to_thread(self._safe_fetch, name, fetch, user_id, since) for name, fetch in fetchers],
+        )
+
+        snapshot: Dict[str, Any] = {}
+        for part in results:
+            snapshot.update(part)
+
+        owner_id = snapshot.pop("_owner_id", None)
+        self._set(user_id, snapshot, owner_id)
+        logger.info(
+            "user_context_fetched",
+            user_id=user_id,
+            role=role,
+            queries=len(fetchers),
+            duration_ms=round((time.perf_counter() - start) * 1000, 1)
+        )
+        return snapshot
+
+    def _fetchers(self, role: str) -> List[Tuple[str, Callable]]:
+        if role == "influencer":
+            return [
+                ("profile", self._influencer_profile),
+                ("recent_sales", self._influencer_recent_sales),
+                ("active_links", self._influencer_active_links),
+                ("pending_affiliations", self._influencer_pending_affiliations),
+                ("pending_payouts", self._influencer_pending_payouts),
+            ]
+        if role == "merchant":
+            return [
+                ("profile", self._merchant_profile),
+                ("recent_sales", self._merchant_recent_sales),
+                ("products", self._merchant_products),
+                ("pending_requests", self._merchant_pending_requests),
+            ]
+        return []
+
+    def _safe_fetch(self, name: str, fetch: Callable, user_id: str, since: str) -> Dict[str, Any]:
+        """Une lecture en échec n'empêche pas les autres: la donnée est juste absente"""
+        try:
+            return fetch(user_id, since)
+        except Exception as e:
+            logger.warning("user_context_fetch_failed", part=name, user_id=user_id, error=str(e))
+            return {}
+
+    # ---------- Influenceur ----------
+
+    def _influencer_profile(self, user_id: str, since: str) -> Dict[str, Any]:
+        result = (
+            self.supabase.table("influencers")
+            .select(
+                "id, username, category, audience_size, engagement_rate, "
+                "total_clicks, total_sales, total_earnings, balance, payment_method"
+            )
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        if not result.data:
+            return {}
+        profile = result.data[0]
+        return {
+            "_owner_id": profile["id"],
+            "username": profile.get("username"),
+            "category": profile.get("category"),
+            "followers": int(profile.get("audience_size") or 0),
+            "engagement_rate": float(profile.get("engagement_rate") or 0),
+            "total_clicks": int(profile.get("total_clicks") or 0),
+            "total_sales": int(profile.get("total_sales") or 0),
+            "commission_earned": float(profile.get("total_earnings") or 0),
+            "balance": float(profile.get("balance") or 0),
+            "payment_method_configured": bool(profile.get("payment_method")),
+        }
+
+    def _influencer_recent_sales(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("sales").select("amount, influencer_commission, status, influencers!inner(user_id)")
+        rows = query.eq("influencers.user_id", user_id).gte("created_at", since).execute().data or []
+        pending = [row for row in rows if row.get("status") == "pending"]
+        return {
+            "sales_30d": len(rows),
+            "revenue_30d": _sum(rows, "amount"),
+            "commission_30d": _sum(rows, "influencer_commission"),
+            "pending_commission": _sum(pending, "influencer_commission"),
+        }
+
+    def _influencer_active_links(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("trackable_links").select("id, influencers!inner(user_id)", count="exact")
+        result = query.eq("influencers.user_id", user_id).eq("is_active", True).limit(1).execute()
+        return {"active_links": result.count or 0}
+
+    def _influencer_pending_affiliations(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("affiliation_requests").select("id, influencers!inner(user_id)", count="exact")
+        result = query.eq("influencers.user_id", user_id).eq("status", "pending").limit(1).execute()
+        return {"pending_affiliations": result.count or 0}
+
+    def _influencer_pending_payouts(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("payouts").select("amount, influencers!inner(user_id)")
+        rows = query.eq("influencers.user_id", user_id).in_("status", ["pending", "processing"]).execute().data or []
+        return {"payout_in_progress": _sum(rows, "amount")}
+
+    # ---------- Marchand ----------
+
+    def _merchant_profile(self, user_id: str, since: str) -> Dict[str, Any]:
+        result = (
+            self.supabase.table("merchants")
+            .select("id, company_name, category, subscription_plan, total_sales, total_commission_paid")
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        if not result.data:
+            return {}
+        profile = result.data[0]
+        return {
+            "_owner_id": profile["id"],
+            "company_name": profile.get("company_name"),
+            "category": profile.get("category"),
+            "subscription_plan": profile.get("subscription_plan"),
+            "total_sales": float(profile.get("total_sales") or 0),
+            "total_commission_paid": float(profile.get("total_commission_paid") or 0),
+        }
+
+    def _merchant_recent_sales(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("sales").select("amount, influencer_id, merchants!inner(user_id)")
+        rows = query.eq("merchants.user_id", user_id).gte("created_at", since).execute().data or []
+        return {
+            "sales_30d": len(rows),
+            "revenue_30d": _sum(rows, "amount"),
+            "active_influencers": len({row["influencer_id"] for row in rows if row.get("influencer_id")}),
+        }
+
+    def _merchant_products(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("products").select("id, merchants!inner(user_id)", count="exact")
+        result = query.eq("merchants.user_id", user_id).limit(1).execute()
+        return {"total_products": result.count or 0}
+
+    def _merchant_pending_requests(self, user_id: str, since: str) -> Dict[str, Any]:
+        query = self.supabase.table("affiliation_requests").select("id, merchants!inner(user_id)", count="exact")
+        result = query.eq("merchants.user_id", user_id).eq("status", "pending").limit(1).execute()
+        return {"pending_requests": result.count or 0}
+
+    # ---------- Cache ----------
+
+    def _get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._local.get(user_id)
+        if entry is not None:
+            expires_at, snapshot = entry
+            if time.monotonic() < expires_at:
+                return dict(snapshot)
+            del self._local[user_id]
+
+        if self._shared is not None:
+            snapshot = self._shared.get(f"{CACHE_KEY_PREFIX}{user_id}")
+            if snapshot is not None:
+                self._remember(user_id, snapshot)
+                return dict(snapshot)
+        return None
+
+    def _set(self, user_id: str, snapshot: Dict[str, Any], owner_id: Optional[str]):
+        self._remember(user_id, snapshot)
+        if owner_id:
+            self._owners[str(owner_id)] = user_id
+        if self._shared is not None:
+            self._shared.set(f"{CACHE_KEY_PREFIX}{user_id}", snapshot, ttl=self.ttl)
+            if owner_id:
+                self._shared.set(f"{OWNER_KEY_PREFIX}{owner_id}", user_id, ttl=self.ttl)
+
+    def _remember(self, user_id: str, snapshot: Dict[str, Any]):
+        if len(self._local) >= USER_CONTEXT_LOCAL_SIZE:
+            now = time.monotonic()
+            self._local = {key: entry for key, entry in self._local.items() if entry[0] > now}
+            if len(self._local) >= USER_CONTEXT_LOCAL_SIZE:
+                self._local.pop(next(iter(self._local)))
+        self._local[user_id] = (time.monotonic() + self.local_ttl, dict(snapshot))
+
+    # ---------- Invalidation ----------
+
+    def invalidate(self, user_id: str):
+        """Invalider l'instantané d'un utilisateur (vente validée, paiement...)"""
+        if not user_id:
+            return
+        user_id = str(user_id)
+        self._local.pop(user_id, None)
+        if self._shared is not None:
+            self._shared.delete(f"{CACHE_KEY_PREFIX}{user_id}")
+
+    def invalidate_owner(self, owner_id: str):
+        """Invalider via l'id influenceur / marchand (les ventes ne portent pas le user_id)"""
+        if not owner_id:
+            return
+        owner_id = str(owner_id)
+        user_id = self._owners.pop(owner_id, None)
+        if user_id is None and self._shared is not None:
+            user_id = self._shared.get(f"{OWNER_KEY_PREFIX}{owner_id}")
+        if user_id:
+            self.invalidate(user_id)
+
+
+def _default_shared_cache():
+    try:
+        from services.cache_service import cache
+        return cache
+    except Exception:
+        return None
+
+
+user_context_service = UserContextService(shared_cache=_default_shared_cache())
@@ -6,6 +6,7 @@ import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from typing import Optional
+from services.metrics_service import instrument_supabase
 
 # Charger les variables d'environnement
 load_dotenv()
@@ -17,6 +18,9 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 # Client avec service_role (admin - pour backend)
 supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
+# Métriques Prometheus sur chaque appel PostgREST du client backend
+instrument_supabase(supabase_admin)
+
 # Client avec anon key (pour frontend si nécessaire)
 supabase_anon: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
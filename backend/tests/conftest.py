@@ -33,6 +33,229 @@ def mock_supabase():
     return mock
 
 
+class FakeResult:
+    """Réponse PostgREST (data, count)"""
+
+    def __init__(self, data=None, count=None):
+        self.data = data
+        self.count = count
+
+
+def _column(row, path):
+    """Valeur d'une colonne, y compris d'une ressource embarquée ("influencers.user_id")"""
+    value = row
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+_COMPARISONS = {
+    "eq": lambda actual, expected: actual == expected,
+    "neq": lambda actual, expected: actual != expected,
+    "gt": lambda actual, expected: actual is not None and actual > expected,
+    "gte": lambda actual, expected: actual is not None and actual >= expected,
+    "lt": lambda actual, expected: actual is not None and actual < expected,
+    "lte": lambda actual, expected: actual is not None and actual <= expected,
+    "in": lambda actual, expected: actual in expected,
+    "is": lambda actual, expected: actual is None if expected == "null" else actual == expected,
+}
+
+
+class FakeQuery:
+    """Requête Supabase jouée sur les tables en mémoire d'un FakeSupabase"""
+
+    def __init__(self, client, table, op="select", data=None):
+        self.client = client
+        self.table = table
+        self.op = op
+        self.data = data
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.bounds = None
+        self.count = None
+        self.head = False
+        self.one = False
+        self.on_conflict = None
+        self.ignore_duplicates = False
+
+    # ---------- Lecture ----------
+
+    def select(self, *columns, count=None, head=None):
+        self.count = count
+        self.head = bool(head)
+        return self
+
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", value)
+
+    def order(self, column, desc=False):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, size):
+        self.bounds = (0, size - 1)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end)
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    # ---------- Écriture ----------
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, **_):
+        self.op, self.payload = "upsert", rows
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # ---------- Exécution ----------
+
+    def matches(self, row):
+        return all(_COMPARISONS[op](_column(row, column), value) for column, op, value in self.filters)
+
+    def execute(self):
+        if self.client.on_execute is not None:
+            self.client.on_execute(self)
+        self.client.executed.append((self.table, self.op))
+
+        if self.op == "rpc":
+            return FakeResult(self.data)
+        if self.op != "select":
+            self.client.writes.append((self.table, self.op, self.payload, list(self.filters)))
+            return FakeResult(getattr(self, f"_{self.op}")(self.client.tables.setdefault(self.table, [])))
+
+        rows = [dict(row) for row in self.client.tables.get(self.table, []) if self.matches(row)]
+        for column, desc in reversed(self.order_by):
+            rows.sort(key=lambda row: _column(row, column), reverse=desc)
+        count = len(rows) if self.count else None
+        if self.bounds:
+            rows = rows[self.bounds[0]:self.bounds[1] + 1]
+        if self.head:
+            rows = []
+        if self.one:
+            return FakeResult(rows[0] if rows else None, count)
+        return FakeResult(rows, count)
+
+    def _insert(self, table):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = [{**row, "id": row.get("id", f"{self.table}-{len(table) + i}")} for i, row in enumerate(rows)]
+        table.extend(inserted)
+        return [dict(row) for row in inserted]
+
+    def _upsert(self, table):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        keys = (self.on_conflict or "id").split(",")
+        for row in rows:
+            existing = next(
+                (r for r in table if all(k in row and r.get(k) == row[k] for k in keys)), None
+            )
+            if existing is None:
+                table.append(dict(row))
+            elif not self.ignore_duplicates:
+                existing.update(row)
+        return rows
+
+    def _update(self, table):
+        matched = [row for row in table if self.matches(row)]
+        for row in matched:
+            row.update(self.payload)
+        return [dict(row) for row in matched]
+
+    def _delete(self, table):
+        deleted = [row for row in table if self.matches(row)]
+        table[:] = [row for row in table if not self.matches(row)]
+        return deleted
+
+
+class FakeSupabase:
+    """
+    Client Supabase en mémoire pour les tests de services
+
+    - tables: {nom: [lignes]}, lues et modifiées par les requêtes
+    - rpc_results: {fonction: données ou callable(params) -> données}
+    - executed: (table, opération) de chaque requête exécutée
+    - writes: (table, opération, payload, filtres) des écritures
+    - on_execute: callable(query) appelé avant chaque exécution (latence, panne...)
+    """
+
+    def __init__(self, tables=None, rpc_results=None):
+        self.tables = tables if tables is not None else {}
+        self.rpc_results = rpc_results or {}
+        self.executed = []
+        self.writes = []
+        self.rpc_calls = []
+        self.on_execute = None
+        self.storage = MagicMock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        self.rpc_calls.append((name, params))
+        result = self.rpc_results.get(name)
+        return FakeQuery(self, name, op="rpc", data=result(params) if callable(result) else result)
+
+    def payloads(self, table, op):
+        """Lignes écrites dans une table par une opération, dans l'ordre"""
+        rows = []
+        for name, write_op, payload, _ in self.writes:
+            if name == table and write_op == op:
+                rows.extend(payload if isinstance(payload, list) else [payload])
+        return rows
+
+
+@pytest.fixture
+def fake_supabase():
+    """Fabrique de FakeSupabase (tables et résultats RPC en mémoire)"""
+    return FakeSupabase
+
+
 @pytest.fixture
 def mock_supabase_response():
     """Factory pour créer des réponses Supabase mockées"""
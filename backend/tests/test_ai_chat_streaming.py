@@ -0,0 +1,197 @@
+"""
+Tests pour le streaming des chats IA
+
+Tests couvrant:
+- Lecture des flux SSE Anthropic / OpenAI par la passerelle, retries avant le premier token
+- Bot: tokens puis action, conversation enregistrée seulement à la fin du flux
+- Assistant multilingue: actions suggérées extraites en fin de flux
+- Endpoint /api/bot/chat/stream (text/event-stream)
+"""
+
+import json
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import ai_bot_endpoints
+from auth import get_current_user
+from services import ai_assistant_multilingual_service as assistant_module
+from services import ai_bot_service as bot_module
+from services.ai_assistant_multilingual_service import AIAssistantMultilingualService
+from services.ai_bot_service import AIBotService, MessageRole, create_conversation_context
+from services.llm_gateway import AnthropicProvider, FakeProvider, LLMError, LLMGateway, OpenAIProvider
+from utils.sse import sse_event
+
+USER = [{"role": "user", "content": "Bonjour"}]
+
+
+def anthropic_stream(*texts, error=None):
+    lines = ['event: message_start', 'data: {"type": "message_start", "message": {"usage": {"input_tokens": 9}}}', ""]
+    for text in texts:
+        delta = {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": text}}
+        lines += ["event: content_block_delta", f"data: {json.dumps(delta)}", ""]
+    if error:
+        lines += ["event: error", f'data: {{"type": "error", "error": {{"type": "{error}", "message": "x"}}}}', ""]
+    lines += ["event: message_stop", 'data: {"type": "message_stop"}', ""]
+    return httpx.Response(200, text="\n".join(lines), headers={"content-type": "text/event-stream"})
+
+
+class Recorder:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        return self.responses.pop(0)
+
+
+def gateway(recorder) -> LLMGateway:
+    return LLMGateway(
+        providers=[AnthropicProvider(api_key="sk-ant"), OpenAIProvider(api_key="sk-oai")],
+        transport=httpx.MockTransport(recorder),
+        backoff=0,
+    )
+
+
+async def collect(stream):
+    return [item async for item in stream]
+
+
+class TestGatewayStream:
+    """Tests de la lecture des flux fournisseurs"""
+
+    @pytest.mark.asyncio
+    async def test_anthropic_tokens(self):
+        recorder = Recorder(anthropic_stream("Bon", "jour", " !"))
+
+        chunks = await collect(gateway(recorder).stream("anthropic", USER, model="claude-x", system="Expert"))
+
+        assert chunks == ["Bon", "jour", " !"]
+        payload = json.loads(recorder.requests[0].content)
+        assert payload["stream"] is True
+        assert payload["system"] == "Expert"
+
+    @pytest.mark.asyncio
+    async def test_openai_tokens(self):
+        events = [{"choices": [{"delta": {"role": "assistant"}}]}, {"choices": [{"delta": {"content": "Salut"}}]}]
+        body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        recorder = Recorder(httpx.Response(200, text=body))
+
+        assert await collect(gateway(recorder).stream("openai", USER, model="gpt-4o-mini")) == ["Salut"]
+
+    @pytest.mark.asyncio
+    async def test_retry_before_first_token(self):
+        recorder = Recorder(httpx.Response(529, text="overloaded"), anthropic_stream("ok"))
+
+        assert await collect(gateway(recorder).stream("anthropic", USER, model="claude-x")) == ["ok"]
+        assert len(recorder.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_error_event_mid_stream(self):
+        recorder = Recorder(anthropic_stream("Bon", error="overloaded_error"))
+        chunks = []
+
+        with pytest.raises(LLMError):
+            async for chunk in gateway(recorder).stream("anthropic", USER, model="claude-x"):
+                chunks.append(chunk)
+
+        assert chunks == ["Bon"]
+        assert len(recorder.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_fake_provider_streams_words(self):
+        llm = LLMGateway(fake=FakeProvider(responses=["Votre solde est de 120 MAD"]))
+        chunks = await collect(llm.stream("anthropic", USER, model="m"))
+        assert len(chunks) == 6
+        assert "".join(chunks) == "Votre solde est de 120 MAD"
+
+
+class NoContext:
+    async def snapshot(self, user_id, role):
+        return {}
+
+
+class TestBotStream:
+    """Tests du bot en streaming"""
+
+    @pytest.mark.asyncio
+    async def test_tokens_then_done(self):
+        bot = AIBotService(api_key="sk-ant", context_service=NoContext())
+        context = create_conversation_context("user-1", "influencer", "fr")
+        llm = LLMGateway(fake=FakeProvider(responses=["Voici vos statistiques"]))
+
+        with patch.object(bot_module, "llm_gateway", llm):
+            events = await collect(bot.chat_stream("Mes stats?", context))
+
+        assert [event for event, _ in events] == ["token", "token", "token", "done"]
+        assert events[-1][1]["intent"] == "check_stats"
+        assert [m.role for m in context.messages] == [MessageRole.USER, MessageRole.ASSISTANT]
+        assert context.messages[-1].content == "Voici vos statistiques"
+
+    @pytest.mark.asyncio
+    async def test_aborted_stream_not_saved(self):
+        bot = AIBotService(api_key="sk-ant", context_service=NoContext())
+        context = create_conversation_context("user-1", "influencer", "fr")
+        llm = LLMGateway(fake=FakeProvider(responses=["une réponse longue"]))
+
+        with patch.object(bot_module, "llm_gateway", llm):
+            stream = bot.chat_stream("Bonjour", context)
+            assert (await stream.__anext__())[0] == "token"
+            await stream.aclose()
+
+        assert context.messages == []
+
+    @pytest.mark.asyncio
+    async def test_provider_down_falls_back(self):
+        bot = AIBotService(api_key="sk-ant", context_service=NoContext())
+        context = create_conversation_context("user-1", "influencer", "fr")
+        llm = LLMGateway(providers=[AnthropicProvider(api_key="sk-ant")], transport=httpx.MockTransport(
+            lambda request: httpx.Response(400, text="bad request")
+        ))
+
+        with patch.object(bot_module, "llm_gateway", llm):
+            events = await collect(bot.chat_stream("Bonjour", context))
+
+        assert [event for event, _ in events] == ["token", "done"]
+        assert "ShareBot" in events[0][1]["text"]
+
+
+@pytest.mark.asyncio
+async def test_assistant_suggested_actions_at_end():
+    service = AIAssistantMultilingualService(api_key="sk-ant")
+    llm = LLMGateway(fake=FakeProvider(responses=["Consultez vos statistiques puis demandez un paiement"]))
+
+    with patch.object(assistant_module, "llm_gateway", llm):
+        events = await collect(service.chat_stream("Mes gains?"))
+
+    assert all(event == "token" for event, _ in events[:-1])
+    assert events[-1] == ("done", {
+        "language": "fr", "model": service.model, "suggested_actions": ["view_stats", "request_payout"]
+    })
+
+
+@pytest.mark.asyncio
+async def test_bot_stream_endpoint():
+    app = FastAPI()
+    app.include_router(ai_bot_endpoints.router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user-1", "role": "influencer"}
+
+    with patch.object(bot_module, "user_context_service", NoContext()):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/api/bot/chat/stream", json={"message": "Bonjour", "session_id": "s-1"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    blocks = [block for block in response.text.split("\n\n") if block]
+    assert blocks[0].startswith("event: token\n")
+    done = json.loads(blocks[-1].split("data: ", 1)[1])
+    assert (done["session_id"], done["intent_detected"]) == ("s-1", "greeting")
+    assert len(ai_bot_endpoints.conversations_store.pop("s-1").messages) == 2
+
+
+def test_sse_event():
+    assert sse_event("token", {"text": "مرحبا"}) == 'event: token\ndata: {"text": "مرحبا"}\n\n'
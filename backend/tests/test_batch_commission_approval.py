@@ -0,0 +1,115 @@
+"""
+Tests pour l'approbation des commissions en lot
+
+Tests couvrant:
+- Un appel approve_payout_batch par tranche d'ids
+- Résultat par commission (succès / motif de refus)
+- Tranche en erreur: tous ses ids en échec, les autres tranches continuent
+- Repli une par une si la fonction n'est pas déployée
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+from services.payments import service as payments
+from services.payments.service import PaymentsService
+
+
+def _service(rpc):
+    client = MagicMock()
+    client.rpc.side_effect = rpc
+    with patch.object(payments, "get_supabase_client", return_value=client):
+        return PaymentsService(), client
+
+
+def _batch_rpc(refused=None):
+    """approve_payout_batch simulé: refuse les ids de `refused` avec leur motif"""
+    refused = refused or {}
+
+    def rpc(name, params):
+        assert name == "approve_payout_batch"
+        rows = [
+            {"commission_id": cid, "success": cid not in refused, "error": refused.get(cid)}
+            for cid in params["p_commission_ids"]
+        ]
+        return MagicMock(execute=MagicMock(return_value=MagicMock(data=rows)))
+
+    return rpc
+
+
+class TestBatchApproval:
+    """Tests du chemin ensembliste"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_and_per_id_results(self):
+        """Test: 2500 ids = 3 appels RPC, un refus reporté avec son motif"""
+        ids = [uuid4() for _ in range(2500)]
+        refused = {str(ids[7]): "Solde insuffisant pour approuver la commission"}
+        service, client = _service(_batch_rpc(refused))
+
+        result = await service.batch_approve_commissions(ids)
+
+        assert client.rpc.call_count == 3
+        assert [len(c.args[1]["p_commission_ids"]) for c in client.rpc.call_args_list] == [1000, 1000, 500]
+        assert result["success_count"] == 2499
+        assert result["failed"] == [
+            {"id": str(ids[7]), "error": "Solde insuffisant pour approuver cette commission"}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_duplicate_ids_sent_once(self):
+        commission_id = uuid4()
+        service, client = _service(_batch_rpc())
+
+        result = await service.batch_approve_commissions([commission_id, commission_id], "paid")
+
+        assert client.rpc.call_args.args[1] == {"p_commission_ids": [str(commission_id)], "p_status": "paid"}
+        assert result["success"] == [str(commission_id)]
+
+    @pytest.mark.asyncio
+    async def test_failed_chunk_reports_every_id(self):
+        """Test: Tranche annulée en bloc, la tranche suivante est traitée"""
+        ids = [str(uuid4()) for _ in range(3)]
+        ok = _batch_rpc()
+
+        def rpc(name, params):
+            if ids[0] in params["p_commission_ids"]:
+                raise Exception("canceling statement due to statement timeout")
+            return ok(name, params)
+
+        service, _ = _service(rpc)
+
+        with patch.object(payments, "BATCH_APPROVAL_CHUNK_SIZE", 2):
+            result = await service.batch_approve_commissions(ids)
+
+        assert [f["id"] for f in result["failed"]] == ids[:2]
+        assert result["success"] == [ids[2]]
+
+    @pytest.mark.asyncio
+    async def test_empty_list(self):
+        service, client = _service(_batch_rpc())
+        result = await service.batch_approve_commissions([])
+        assert result["success_count"] == result["failed_count"] == 0
+        client.rpc.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fallback_when_function_missing():
+    """Test: Sans approve_payout_batch, un approve_payout_transaction par id"""
+    calls = []
+
+    def rpc(name, params):
+        calls.append(name)
+        if name == "approve_payout_batch":
+            raise Exception("{'code': 'PGRST202', 'message': 'Could not find the function'}")
+        return MagicMock(execute=MagicMock(return_value=MagicMock(data=True)))
+
+    service, _ = _service(rpc)
+    ids = [uuid4() for _ in range(3)]
+
+    with patch.object(payments, "BATCH_APPROVAL_CHUNK_SIZE", 2):
+        result = await service.batch_approve_commissions(ids)
+
+    assert calls == ["approve_payout_batch"] + ["approve_payout_transaction"] * 3
+    assert result["success"] == [str(i) for i in ids]
@@ -0,0 +1,144 @@
+"""
+Tests pour l'analyse anti-fraude des clics
+
+Tests couvrant:
+- Détection des user-agents de bots
+- Rafales par IP, clics répétés IP + lien, rafales par lien
+- Fenêtres glissantes bornées
+- Agrégats par influenceur et signaux du Trust Score
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from services.click_screening_service import (
+    FLAG_BOT,
+    FLAG_BURST,
+    FLAG_DUPLICATE,
+    FLAG_IP_FLOOD,
+    IP_CLICKS_LIMIT,
+    IP_LINK_CLICKS_LIMIT,
+    LINK_BURST_LIMIT,
+    ClickScreeningService,
+    SlidingWindowCounter,
+)
+from trust_score_service import TrustScoreService
+
+BROWSER = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Safari/604.1"
+
+
+@pytest.fixture
+def screening():
+    service = ClickScreeningService()
+    service._redis_retry_at = float("inf")
+    return service
+
+
+class TestScreening:
+    """Tests des signaux à l'ingestion"""
+
+    @pytest.mark.parametrize("user_agent", ["curl/8.4.0", "Googlebot/2.1", "python-requests/2.31", "", "unknown"])
+    def test_bot_user_agents(self, screening, user_agent):
+        assert FLAG_BOT in screening.screen("l1", "inf", "1.1.1.1", user_agent, now=0).flags
+
+    def test_browser_click_is_clean(self, screening):
+        verdict = screening.screen("l1", "inf", "1.1.1.1", BROWSER, country="ma", now=0)
+        assert verdict.flags == ()
+        assert verdict.country == "MA"
+
+    def test_repeated_clicks_same_link(self, screening):
+        flags = [screening.screen("l1", None, "1.1.1.1", BROWSER, now=i).flags for i in range(IP_LINK_CLICKS_LIMIT + 1)]
+        assert flags[-2] == ()
+        assert flags[-1] == (FLAG_DUPLICATE,)
+        # Une heure plus tard, la fenêtre est vide
+        assert screening.screen("l1", None, "1.1.1.1", BROWSER, now=4000).flags == ()
+
+    def test_ip_flood_across_links(self, screening):
+        for i in range(IP_CLICKS_LIMIT):
+            assert screening.screen(f"l{i}", None, "2.2.2.2", BROWSER, now=i).flags == ()
+        assert screening.screen("lx", None, "2.2.2.2", BROWSER, now=30).flags == (FLAG_IP_FLOOD,)
+
+    def test_link_burst(self, screening):
+        for i in range(LINK_BURST_LIMIT):
+            screening.screen("hot", None, f"10.0.0.{i}", BROWSER, now=1)
+        assert screening.screen("hot", None, "10.0.1.1", BROWSER, now=2).flags == (FLAG_BURST,)
+
+
+def test_sliding_window_is_bounded():
+    counter = SlidingWindowCounter(window=60, max_events=3, max_keys=2)
+    assert [counter.hit("a", t) for t in range(5)] == [1, 2, 3, 3, 3]
+    counter.hit("b", 5)
+    counter.hit("c", 6)
+    assert len(counter) == 2
+    assert counter.hit("a", 7) == 1  # "a" évincée
+
+
+class TestTrafficSignals:
+    """Tests des agrégats par influenceur"""
+
+    def test_signals(self, screening):
+        for i in range(6):
+            screening.screen(f"l{i}", "inf-1", f"3.3.3.{i}", BROWSER, country="MA" if i < 5 else "FR")
+        screening.screen("l0", "inf-1", "4.4.4.4", "Googlebot/2.1", country="MA")
+        for _ in range(IP_LINK_CLICKS_LIMIT + 1):
+            screening.screen("l9", "inf-1", "5.5.5.5", BROWSER)
+
+        signals = screening.traffic_signals("inf-1")
+
+        assert signals["total_clicks"] == 13
+        assert signals["bot_percentage"] == 7.69
+        assert signals["suspicious_ip_percentage"] == 7.69
+        assert signals["click_pattern_score"] == 92.31
+        assert signals["geo_consistency"] == 85.71
+
+    def test_previous_month_included(self, screening):
+        screening._memory["click_screening:inf-2:2026-09"] = {"clicks": 4, "bot": 2}
+        screening._memory["click_screening:inf-2:2026-10"] = {"clicks": 4}
+        signals = screening.traffic_signals("inf-2", at=datetime(2026, 10, 3))
+        assert (signals["total_clicks"], signals["bot_percentage"]) == (8, 25.0)
+        assert "geo_consistency" not in signals
+
+    def test_unknown_influencer(self, screening):
+        assert screening.traffic_signals("nobody") == {"total_clicks": 0}
+
+    def test_redis_failure_falls_back_to_memory(self):
+        broken = MagicMock()
+        broken.pipeline.side_effect = ConnectionError("redis down")
+        service = ClickScreeningService(redis_client=broken)
+
+        service.screen("l1", "inf-3", "6.6.6.6", BROWSER)
+
+        assert service.traffic_signals("inf-3")["total_clicks"] == 1
+        broken.hgetall.assert_not_called()
+
+    def test_redis_retried_after_cooldown(self):
+        """Test: Redis retenté après la pause, compteurs de la coupure renvoyés"""
+        pipe = MagicMock()
+        redis = MagicMock()
+        redis.pipeline.side_effect = [ConnectionError("redis down"), pipe]
+        service = ClickScreeningService(redis_client=redis)
+
+        service.screen("l1", "inf-3", "6.6.6.6", BROWSER)
+        service.screen("l1", "inf-3", "6.6.6.6", BROWSER)
+        assert redis.pipeline.call_count == 1
+
+        service._redis_retry_at = 0.0  # Fin de la pause
+        service.screen("l1", "inf-3", "6.6.6.6", BROWSER)
+
+        key = service._key("inf-3", datetime.now().strftime("%Y-%m"))
+        clicks = sum(c.args[2] for c in pipe.hincrby.call_args_list if c.args[:2] == (key, "clicks"))
+        assert clicks == 3
+        assert service._memory == {}
+
+
+@pytest.mark.asyncio
+async def test_trust_score_uses_screening_signals():
+    """Test: Bots signalés = indicateur de fraude; sessions absentes non pénalisées"""
+    service = TrustScoreService()
+    clean = {"total_clicks": 100, "suspicious_ip_percentage": 0, "click_pattern_score": 100}
+    botted = {**clean, "bot_percentage": 40, "click_pattern_score": 30}
+
+    assert await service._analyze_traffic_authenticity(clean) == 100
+    indicators = await service._detect_fraud_indicators(botted, [])
+    assert [i.indicator for i in indicators] == ["bot_traffic", "click_bursts"]
@@ -0,0 +1,81 @@
+"""
+Tests pour la génération et l'attribution de liens en masse
+
+Tests couvrant:
+- Vérification de propriété en une requête
+- Liens existants réutilisés
+- INSERT groupé avec codes alloués d'un coup
+- Attribution en masse aux membres d'équipe
+"""
+
+import os
+import pytest
+from unittest.mock import patch
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+import company_links_management as links
+from company_links_management import BulkGenerateLinksRequest
+from services.short_code_service import ShortCodeAllocator
+
+
+MERCHANT = {"id": "merchant-1", "role": "merchant"}
+
+
+@pytest.fixture
+def db(fake_supabase):
+    fake = fake_supabase({
+        "products": [{"id": f"p{i}", "merchant_id": "merchant-1"} for i in range(300)]
+        + [{"id": "other", "merchant_id": "merchant-2"}],
+        "affiliate_links": [
+            {"id": "base-0", "merchant_id": "merchant-1", "product_id": "p0",
+             "influencer_id": None, "is_active": True, "short_code": "OLDCODE0", "commission_rate": 12.0},
+        ],
+        "team_members": [
+            {"company_id": "merchant-1", "member_id": f"m{i}", "status": "active"} for i in range(5)
+        ],
+    })
+    allocator = ShortCodeAllocator(reserve_block=lambda size: 0)
+    with patch.object(links, "supabase", fake), \
+            patch.object(links, "short_code_allocator", allocator):
+        yield fake
+
+
+@pytest.mark.asyncio
+async def test_bulk_generate_is_set_based(db):
+    """Test: 300 produits = 2 SELECT propriété + 2 SELECT existants + 1 INSERT"""
+    request = BulkGenerateLinksRequest(product_ids=[f"p{i}" for i in range(300)] + ["other", "p1"])
+
+    result = await links.bulk_generate_links(request, current_user=MERCHANT)
+
+    assert result["generated"] == 300
+    assert result["errors"] == [{"product_id": "other", "error": "Not your product"}]
+    assert db.executed.count(("affiliate_links", "insert")) == 1
+    assert len(db.executed) == 5
+    codes = {link["short_code"] for link in result["links"]}
+    assert len(codes) == 300
+
+
+@pytest.mark.asyncio
+async def test_bulk_assign_skips_non_members_and_existing(db):
+    """Test: Attribution groupée, membres déjà équipés conservés"""
+    db.tables["affiliate_links"].append(
+        {"id": "m0-link", "merchant_id": "merchant-1", "product_id": "p0",
+         "influencer_id": "m0", "is_active": True, "short_code": "OLDCODE1"}
+    )
+
+    result = await links.bulk_assign_links(
+        link_id="base-0", member_ids=["m0", "m1", "m2", "stranger"], current_user=MERCHANT
+    )
+
+    assert result["assigned"] == 3
+    assert result["errors"] == [{"member_id": "stranger", "error": "Not in team"}]
+    assert db.executed.count(("affiliate_links", "insert")) == 1
+    new_links = [link for link in result["links"] if link["id"] != "m0-link"]
+    assert all(link["metadata"]["parent_link_id"] == "base-0" for link in new_links)
+
+
+def test_batch_limit_raised():
+    """Test: Un catalogue entier passe en une requête"""
+    BulkGenerateLinksRequest(product_ids=[f"p{i}" for i in range(links.BULK_LINKS_MAX)])
@@ -0,0 +1,175 @@
+"""
+Tests pour le pipeline d'envoi d'emails
+
+Tests couvrant:
+- Pool de connexions SMTP (réutilisation, recyclage, connexions mortes)
+- Rate limiting token bucket
+- Cache de rendu des templates
+- Envoi groupé via l'API batch Resend
+"""
+
+import smtplib
+import pytest
+from unittest.mock import MagicMock, Mock
+
+from services.email_delivery_service import (
+    SMTPConnectionPool,
+    TemplateRenderCache,
+    TokenBucket,
+    chunked,
+)
+from services.resend_email_service import ResendEmailService
+
+
+class TestSMTPConnectionPool:
+    """Tests du pool de connexions SMTP"""
+
+    @pytest.fixture
+    def factory(self):
+        """Factory qui crée des connexions SMTP mockées"""
+        return Mock(side_effect=lambda: MagicMock(spec=smtplib.SMTP))
+
+    def test_connection_reused_between_messages(self, factory):
+        """Test: Une seule connexion (STARTTLS + login) pour plusieurs emails"""
+        pool = SMTPConnectionPool(factory=factory, max_size=2)
+
+        for _ in range(10):
+            pool.send_message(Mock())
+
+        assert factory.call_count == 1
+        assert pool.stats["reused"] == 9
+
+    def test_connection_recycled_after_max_messages(self, factory):
+        """Test: Connexion fermée après max_messages envois"""
+        pool = SMTPConnectionPool(factory=factory, max_size=2, max_messages=3)
+
+        for _ in range(7):
+            pool.send_message(Mock())
+
+        assert factory.call_count == 3
+
+    def test_broken_connection_discarded_and_retried(self, factory):
+        """Test: Une connexion coupée est jetée et l'envoi retenté"""
+        pool = SMTPConnectionPool(factory=factory, max_size=2)
+        pool.send_message(Mock())
+
+        broken = pool._idle.queue[0].server
+        broken.send_message.side_effect = smtplib.SMTPServerDisconnected()
+
+        pool.send_message(Mock())
+
+        assert factory.call_count == 2
+        assert pool.stats["discarded"] == 1
+
+    def test_server_rejection_not_resent(self, factory):
+        """Test: Un refus SMTP (5xx) n'est pas renvoyé sur une nouvelle connexion"""
+        pool = SMTPConnectionPool(factory=factory, max_size=2)
+        pool.send_message(Mock())
+
+        server = pool._idle.queue[0].server
+        server.send_message.side_effect = smtplib.SMTPRecipientsRefused({"x@example.com": (550, b"no such user")})
+
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            pool.send_message(Mock())
+
+        assert factory.call_count == 1
+        assert server.send_message.call_count == 2
+
+    def test_idle_connection_checked_with_noop(self, factory):
+        """Test: Connexion inactive vérifiée par NOOP avant réutilisation"""
+        pool = SMTPConnectionPool(factory=factory, max_size=2, max_idle=0)
+        pool.send_message(Mock())
+
+        server = pool._idle.queue[0].server
+        server.noop.return_value = (421, b"closing")
+
+        pool.send_message(Mock())
+
+        server.noop.assert_called_once()
+        assert factory.call_count == 2
+
+
+class TestTokenBucket:
+    """Tests du rate limiter"""
+
+    def test_burst_up_to_capacity(self):
+        """Test: Rafale autorisée jusqu'à la capacité"""
+        bucket = TokenBucket(rate=1, capacity=5)
+
+        assert all(bucket.try_acquire() for _ in range(5))
+        assert bucket.try_acquire() is False
+
+    def test_zero_rate_never_blocks(self):
+        """Test: rate=0 désactive la limitation"""
+        bucket = TokenBucket(rate=0)
+        bucket.acquire()
+
+
+class TestTemplateRenderCache:
+    """Tests du cache de rendu"""
+
+    def test_same_context_rendered_once(self):
+        """Test: Même template + même contexte = un seul rendu"""
+        cache = TemplateRenderCache(max_size=10)
+        render = Mock(return_value="<p>ok</p>")
+
+        for _ in range(3):
+            assert cache.get_or_render("welcome.html", {"name": "Sara"}, render) == "<p>ok</p>"
+
+        render.assert_called_once()
+        assert cache.stats == {"hits": 2, "misses": 1}
+
+    def test_lru_eviction(self):
+        """Test: Les entrées les plus anciennes sont évincées"""
+        cache = TemplateRenderCache(max_size=2)
+
+        for i in range(3):
+            cache.get_or_render("t.html", {"i": i}, lambda: "x")
+
+        assert len(cache._entries) == 2
+
+
+class TestResendBatch:
+    """Tests de l'envoi groupé Resend"""
+
+    @pytest.fixture
+    def resend(self):
+        service = ResendEmailService()
+        service.api_key = "re_test"
+        service.session = Mock()
+        service.rate_limiter = TokenBucket(rate=0)
+        return service
+
+    def _emails(self, count):
+        return [
+            {"to_email": f"user{i}@test.ma", "subject": "Hello", "html_content": "<p>Hi</p>"}
+            for i in range(count)
+        ]
+
+    def test_batch_split_in_chunks_of_100(self, resend):
+        """Test: 250 emails = 3 requêtes HTTP"""
+        response = Mock(status_code=200, content=b"{}")
+        response.json.side_effect = lambda: {"data": [{"id": "msg"}] * 100}
+        resend.session.post.return_value = response
+
+        results = resend.send_batch(self._emails(250))
+
+        assert resend.session.post.call_count == 3
+        assert len(results) == 250
+        assert all(r["success"] for r in results)
+
+    def test_batch_failure_reported_per_email(self, resend):
+        """Test: Un lot en échec marque chaque email en échec"""
+        response = Mock(status_code=429, content=b"{}")
+        response.json.return_value = {"message": "Too many requests"}
+        resend.session.post.return_value = response
+
+        results = resend.send_batch(self._emails(3))
+
+        assert [r["success"] for r in results] == [False, False, False]
+        assert results[0]["error"] == "Too many requests"
+
+
+def test_chunked():
+    """Test: Découpage en lots"""
+    assert list(chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
@@ -0,0 +1,204 @@
+"""
+Tests pour les prévisions de ventes
+
+Tests couvrant:
+- Séries creuses -> matrice, ajustement en lot (tendance + saisonnalité)
+- Prévision et mise à jour avec les données du jour
+- Ajustement nocturne (séries calculées une fois en base, lues par pages; upsert sales_forecasts)
+- Cache des entités sans mise en cache des utilisateurs sans fiche
+- Dashboard prédictif: lecture des modèles, repli sur l'historique de campagnes
+"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from predictive_dashboard_service import PredictionTimeframe, PredictiveDashboardService
+from services.ai_assistant_multilingual_service import AIAssistantMultilingualService
+from services.forecast_service import ForecastModel, ForecastService, daily_matrix, fit_batch
+
+LAST_DAY = date(2026, 10, 18)  # dimanche
+WEEKLY = np.array([2.0, 1.0, 0.0, -1.0, -2.0, 3.0, -3.0])  # lundi..dimanche
+
+
+def synthetic(level, slope, periods=56):
+    t = np.arange(periods) - (periods - 1)
+    weekdays = (LAST_DAY.weekday() + t) % 7
+    return level + slope * t + WEEKLY[weekdays]
+
+
+def model(**overrides):
+    params = dict(
+        level=10.0, slope=0.0, seasonal=(0.0,) * 7, sigma=1.0,
+        recent_totals=(70.0, 300.0, 900.0, 3650.0), fitted_through=LAST_DAY
+    )
+    params.update(overrides)
+    return ForecastModel(**params)
+
+
+class TestBatchFit:
+    """Tests de l'ajustement vectorisé"""
+
+    def test_daily_matrix(self):
+        matrix = daily_matrix([[0, 3], [1, 9]], [[5.0, 2.0], [1.5, 7.0]], periods=5)
+        assert matrix.tolist() == [[5, 0, 0, 2, 0], [0, 1.5, 0, 0, 0]]
+
+    def test_recovers_trend_and_weekly_seasonality(self):
+        matrix = np.vstack([synthetic(20, 0.5), synthetic(100, -1.0), np.zeros(56)])
+
+        params = fit_batch(matrix, LAST_DAY, fit_days=56)
+
+        np.testing.assert_allclose(params["level"], [20, 100, 0], atol=1e-8)
+        np.testing.assert_allclose(params["slope"], [0.5, -1.0, 0], atol=1e-8)
+        np.testing.assert_allclose(params["seasonal"][0], WEEKLY, atol=1e-8)
+        np.testing.assert_allclose(params["sigma"], 0, atol=1e-8)
+        assert params["recent_totals"][0, 0] == pytest.approx(matrix[0, -7:].sum())
+
+
+class TestModel:
+    """Tests de la prévision et de la mise à jour du jour"""
+
+    def test_forecast_horizon(self):
+        m = model(level=10.0, slope=1.0, seasonal=tuple(WEEKLY))
+
+        # Lundi 19 (h=1): 10 + 1 + 2, mardi 20 (h=2): 10 + 2 + 1
+        assert m.forecast(2, after=LAST_DAY) == pytest.approx(26.0)
+        assert m.forecast(7, after=LAST_DAY) == pytest.approx(7 * 10 + sum(range(1, 8)))
+        assert model(level=-50.0).forecast(7, after=LAST_DAY) == 0
+
+    def test_recent_total(self):
+        assert model().recent_total(7) == 70.0
+        assert model().recent_total(14) == pytest.approx(140.0)
+
+    def test_update_missed_day_and_partial_today(self):
+        m = model(level=10.0)
+
+        # Jour complet manqué à 20 (attendu 10): niveau +0.3 * 10
+        missed = m.updated({LAST_DAY + timedelta(days=1): 20.0}, LAST_DAY + timedelta(days=2), day_fraction=0)
+        assert missed.level == pytest.approx(13.0)
+        assert missed.fitted_through == LAST_DAY + timedelta(days=1)
+
+        # Mi-journée, 10 ventes (20 extrapolées): niveau +0.3 * 0.5 * 10
+        today = m.updated({LAST_DAY + timedelta(days=1): 10.0}, LAST_DAY + timedelta(days=1), day_fraction=0.5)
+        assert today.level == pytest.approx(11.5)
+        assert today.fitted_through == LAST_DAY
+
+
+@pytest.fixture
+def forecast_db(fake_supabase):
+    """Base en mémoire: la RPC de préparation copie les séries dans entity_daily_series"""
+
+    def build(tables=None, series=()):
+        series = list(series)
+
+        def stage(params):
+            db.tables["entity_daily_series"] = list(series)
+            return len(series)
+
+        db = fake_supabase(tables=tables, rpc_results={
+            "stage_entity_daily_series": stage,
+            "get_entity_daily_series": series,
+        })
+        return db
+
+    return build
+
+
+class TestService:
+    """Tests de l'ajustement nocturne et de la lecture au dashboard"""
+
+    def test_fit_all(self, forecast_db):
+        db = forecast_db(series=[
+            {"entity_type": "influencer", "entity_id": "inf-1", "days": [360, 364], "revenue": [100.0, 50.0],
+             "conversions": [2.0, 1.0], "clicks": [40.0, 20.0]},
+            {"entity_type": "merchant", "entity_id": "m-1", "days": [0], "revenue": [10.0],
+             "conversions": [1.0], "clicks": [5.0]},
+        ])
+
+        stats = ForecastService(supabase=db).fit_all(today=LAST_DAY + timedelta(days=1))
+
+        assert stats == {"entities": 2, "rows": 6}
+        assert db.rpc_calls == [("stage_entity_daily_series", {"p_start": "2025-10-19", "p_end": "2026-10-19T00:00:00"})]
+        (_, _, rows, _), delete = db.writes[0], db.writes[1]
+        revenue = next(r for r in rows if r["entity_id"] == "inf-1" and r["metric"] == "revenue")
+        assert revenue["recent_totals"] == [150.0, 150.0, 150.0, 150.0]
+        assert revenue["fitted_through"] == "2026-10-18"
+        assert len(revenue["seasonal"]) == 7
+        assert delete[:2] == ("sales_forecasts", "delete")
+
+    def test_models_updated_with_today(self, forecast_db):
+        rows = [
+            {"metric": metric, "level": 10.0, "slope": 0.0, "seasonal": [0.0] * 7, "sigma": 1.0,
+             "recent_totals": [70.0, 300.0, 900.0, 3650.0], "fitted_through": "2026-10-18",
+             "entity_type": "influencer", "entity_id": "inf-1"}
+            for metric in ("revenue", "conversions", "clicks")
+        ]
+        db = forecast_db(tables={"sales_forecasts": rows}, series=[
+            {"entity_type": "influencer", "entity_id": "inf-1", "days": [0], "revenue": [10.0],
+             "conversions": [0.0], "clicks": [5.0]},
+        ])
+
+        models = ForecastService(supabase=db).models("influencer", "inf-1", now=datetime(2026, 10, 19, 12))
+
+        assert [(name, params["p_entity_id"]) for name, params in db.rpc_calls] == [("get_entity_daily_series", "inf-1")]
+        assert models["revenue"].level == pytest.approx(11.5)
+        assert models["conversions"].level == pytest.approx(8.5)
+
+    def test_entity_lookup_miss_not_cached(self, forecast_db):
+        """Test: Un influenceur créé après une première visite est trouvé ensuite"""
+        db = forecast_db()
+        service = ForecastService(supabase=db)
+
+        assert service.entity_for_user("user-1", "influencer") is None
+        db.tables["influencers"] = [{"id": "inf-1", "user_id": "user-1"}]
+        assert service.entity_for_user("user-1", "influencer") == ("influencer", "inf-1")
+
+        db.tables["influencers"] = []
+        assert service.entity_for_user("user-1", "influencer") == ("influencer", "inf-1")
+
+
+class FakeForecasts:
+    def __init__(self, models):
+        self._models = models
+
+    def entity_for_user(self, user_id, role):
+        return ("influencer", "inf-1")
+
+    def models(self, entity_type, entity_id):
+        return self._models
+
+
+@pytest.mark.asyncio
+async def test_dashboard_predictions_from_models():
+    forecasts = FakeForecasts({
+        "revenue": model(level=12.0, recent_totals=(70.0, 300.0, 900.0, 3650.0)),
+        "conversions": model(level=1.0, recent_totals=(7.0, 30.0, 90.0, 365.0)),
+        "clicks": model(level=40.0, recent_totals=(280.0, 1200.0, 3600.0, 14600.0)),
+    })
+    dashboard = PredictiveDashboardService(leaderboards=object(), forecasts=forecasts)
+
+    revenue, conversions, rate = await dashboard._generate_predictions([], PredictionTimeframe.WEEK, user_id="user-1")
+
+    assert (revenue.current_value, revenue.predicted_value, revenue.trend) == (70.0, 84.0, "up")
+    assert revenue.change_percentage == 20.0
+    assert (conversions.current_value, conversions.predicted_value, conversions.trend) == (7, 7, "stable")
+    assert rate.current_value == rate.predicted_value == 2.5
+
+
+@pytest.mark.asyncio
+async def test_dashboard_falls_back_to_campaigns():
+    dashboard = PredictiveDashboardService(leaderboards=object(), forecasts=FakeForecasts({}))
+    history = [{"revenue": 100 * i, "conversions": i, "clicks": 50} for i in range(1, 6)]
+
+    predictions = await dashboard._generate_predictions(history, PredictionTimeframe.MONTH, user_id="user-1")
+
+    assert [p.metric for p in predictions] == ["revenue", "conversions", "conversion_rate"]
+
+
+def test_price_elasticity_least_squares():
+    service = AIAssistantMultilingualService(api_key="sk-ant")
+
+    assert service._calculate_price_elasticity([50, 55, 60, 65], [300, 300, 290, 290]) == -1.0
+    assert service._calculate_price_elasticity([10, 20], [99, 99]) == 0.0
+    assert service._calculate_price_elasticity([1, 2, 3], [1, 2]) == 0.0
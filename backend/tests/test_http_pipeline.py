@@ -0,0 +1,157 @@
+"""
+Tests pour le pipeline HTTP ASGI
+
+Tests couvrant:
+- Security headers, X-Request-ID et Server-Timing
+- Opt-out par route (/docs sans CSP, /r/ sans CSRF)
+- Rejets avant l'application: taille du body (opt-in, hors uploads), IP bloquée
+- Synchronisation de la réputation IP hors de la boucle asyncio
+- Métriques par template de route
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import RedirectResponse
+
+from services import http_pipeline as pipeline_module
+from services.http_pipeline import (
+    STAGE_BODY_SIZE,
+    STAGE_CONTENT_TYPE,
+    STAGE_CSRF,
+    HTTPPipelineMiddleware,
+    route_opt_outs,
+    security_headers,
+)
+from services.ip_reputation_service import IPReputationService
+from services.query_trace_service import record_query
+
+
+def _app(**options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/products/{product_id}")
+    async def product(product_id: str):
+        record_query("products", "GET", 0.002, rows=1)
+        return {"id": product_id}
+
+    @app.post("/api/orders")
+    async def order():
+        return {"ok": True}
+
+    @app.get("/r/{short_code}")
+    async def redirect(short_code: str):
+        return RedirectResponse("https://shop.example.com", status_code=302)
+
+    app.add_middleware(HTTPPipelineMiddleware, **options)
+    return app
+
+
+async def _request(app: FastAPI, method: str, path: str, **kwargs) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app, client=("203.0.113.9", 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.request(method, path, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def reputation():
+    service = IPReputationService(list_dir=None)
+    service._redis_retry_at = float("inf")
+    with patch.object(pipeline_module, "ip_reputation", service):
+        yield service
+
+
+@pytest.fixture
+def jwt_secret(monkeypatch):
+    """Le CSRF importe middleware/, qui exige un secret JWT"""
+    monkeypatch.setenv("JWT_SECRET", "test-secret-with-at-least-32-characters!")
+
+
+def test_route_opt_outs():
+    assert {STAGE_CSRF, STAGE_CONTENT_TYPE} <= route_opt_outs("/r/abc123")
+    assert route_opt_outs("/api/orders") == frozenset()
+    assert ("Cache-Control", "no-store, no-cache, must-revalidate, private") in security_headers("/api/auth/me")
+
+
+class TestResponses:
+    """Tests des headers ajoutés aux réponses"""
+
+    @pytest.mark.asyncio
+    async def test_security_headers_and_server_timing(self):
+        response = await _request(_app(), "GET", "/api/products/42", headers={"X-Request-ID": "req-1"})
+
+        assert response.status_code == 200
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
+        assert "default-src 'self'" in response.headers["Content-Security-Policy"]
+        assert response.headers["X-Request-ID"] == "req-1"
+        assert response.headers["X-Response-Time"].endswith("s")
+        assert response.headers["Server-Timing"].startswith("db;")
+
+    @pytest.mark.asyncio
+    async def test_docs_without_csp(self):
+        response = await _request(_app(), "GET", "/docs")
+        assert response.status_code == 200
+        assert "Content-Security-Policy" not in response.headers
+        assert "Server-Timing" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_metrics_use_route_template(self):
+        with patch.object(pipeline_module.metrics, "record_request") as record:
+            await _request(_app(), "GET", "/api/products/42")
+        record.assert_called_once()
+        method, route, status, _ = record.call_args.args
+        assert (method, route, status) == ("GET", "/api/products/{product_id}", 200)
+
+
+class TestScreening:
+    """Tests des contrôles avant l'application"""
+
+    @pytest.mark.asyncio
+    async def test_body_too_large(self):
+        app = _app(body_size=True, max_request_size=10)
+        response = await _request(app, "POST", "/api/orders", json={"items": "x" * 20})
+        assert response.status_code == 413
+        assert response.headers["X-Content-Type-Options"] == "nosniff"
+
+    @pytest.mark.asyncio
+    async def test_body_size_opt_in_and_uploads_exempt(self):
+        """Test: Plafond désactivé par défaut; activé, les uploads multi-fichiers passent"""
+        body = {"items": "x" * 20}
+        assert (await _request(_app(max_request_size=10), "POST", "/api/orders", json=body)).status_code == 200
+        assert STAGE_BODY_SIZE in route_opt_outs("/api/upload/multiple")
+
+    @pytest.mark.asyncio
+    async def test_reputation_sync_off_event_loop(self, reputation):
+        """Test: La synchronisation Redis de la réputation IP passe par un thread"""
+        reputation._next_sync = 0.0
+        with patch.object(pipeline_module.asyncio, "to_thread", wraps=asyncio.to_thread) as to_thread:
+            await _request(_app(), "GET", "/api/products/42")
+        to_thread.assert_called_once_with(reputation.sync)
+
+    @pytest.mark.asyncio
+    async def test_blacklisted_ip(self, reputation):
+        reputation.add("203.0.113.0/24", "blacklist")
+        response = await _request(_app(), "GET", "/api/products/42")
+        assert response.status_code == 403
+
+    @pytest.mark.asyncio
+    async def test_csrf_enforced_except_redirect(self, jwt_secret):
+        app = _app(csrf=True)
+
+        assert (await _request(app, "POST", "/api/orders", json={})).status_code == 403
+        redirect = await _request(app, "GET", "/r/abc123")
+        assert redirect.status_code == 302
+        assert "csrf_token" not in redirect.headers.get("set-cookie", "")
+
+    @pytest.mark.asyncio
+    async def test_csrf_token_accepted(self, jwt_secret):
+        app = _app(csrf=True)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/api/products/1")
+            token = client.cookies["csrf_token"]
+            response = await client.post("/api/orders", json={}, headers={"X-CSRF-Token": token})
+        assert response.status_code == 200
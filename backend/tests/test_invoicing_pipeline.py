@@ -0,0 +1,153 @@
+"""
+Tests pour le pipeline de facturation mensuelle
+
+Tests couvrant:
+- Totaux par merchant en une requête groupée
+- Lignes de facture écrites par pages (aucune vente chargée en bloc)
+- Emails confiés à la queue par lots
+- Reprise d'un run interrompu (checkpoints draft / pending / sent)
+"""
+
+import os
+from datetime import datetime
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+import invoicing_service as invoicing
+from invoicing_service import InvoicingService
+
+
+def _sale(i, merchant_id):
+    return {
+        "id": f"s{i:04d}", "merchant_id": merchant_id, "status": "completed",
+        "created_at": "2026-09-15T10:00:00", "order_id": f"o{i}", "product_name": "Argan",
+        "total_amount": 100, "platform_commission": 5, "platform_commission_rate": 5.0,
+    }
+
+
+@pytest.fixture
+def db(fake_supabase):
+    sales = [_sale(i, "m1") for i in range(25)] + [_sale(100 + i, "m2") for i in range(3)]
+    invoice_numbers = iter(range(1, 1000))
+    fake = fake_supabase(
+        tables={
+            "sales": sales,
+            "merchants": [
+                {"id": "m1", "company_name": "Argan Co", "email": "m1@example.ma"},
+                {"id": "m2", "company_name": "Atlas", "email": "m2@example.ma"},
+            ],
+        },
+        rpc_results={
+            "get_invoice_totals": [
+                {"merchant_id": "m1", "sales_count": 25, "total_sales_amount": 2500, "platform_commission": 125},
+                {"merchant_id": "m2", "sales_count": 3, "total_sales_amount": 300, "platform_commission": 15},
+            ],
+            "generate_invoice_number": lambda params: f"INV-{next(invoice_numbers)}",
+        },
+    )
+    fake.storage.from_.return_value.get_public_url.side_effect = lambda path: f"https://cdn/invoices/{path}"
+    with patch.object(invoicing, "supabase", fake), \
+            patch.object(invoicing, "INVOICE_LINES_PAGE_SIZE", 10), \
+            patch.object(invoicing, "ProcessPoolExecutor", ThreadPoolExecutor), \
+            patch.object(invoicing, "render_invoice_pdf", return_value=b"%PDF-1.4"):
+        yield fake
+
+
+def test_monthly_run_streams_lines_and_queues_emails(db):
+    """Test: Totaux groupés, lignes par pages de 10, un lot d'emails"""
+    service = InvoicingService()
+
+    with patch.object(service, "_queue_emails") as queue_emails:
+        result = service.generate_monthly_invoices(2026, 9)
+
+    assert result["success"] is True
+    assert result["invoices_created"] == 2
+    m1 = next(i for i in result["invoices"] if i["merchant_id"] == "m1")
+    assert m1["total_amount"] == 150.0
+    assert m1["status"] == "sent"
+    assert m1["pdf_url"] == f"https://cdn/invoices/m1/{m1['invoice_number']}.pdf"
+    db.storage.from_.assert_called_with("invoices")
+
+    assert len(db.tables["invoice_line_items"]) == 28
+    assert db.executed.count(("invoice_line_items", "upsert")) == 4  # 10 + 10 + 5, puis 3
+    queue_emails.assert_called_once()
+    messages = queue_emails.call_args.args[0]
+    assert [m["to_email"] for m in messages] == ["m1@example.ma", "m2@example.ma"]
+    assert m1["pdf_url"] in messages[0]["html_body"]
+    assert "data:" not in messages[0]["html_body"]
+
+
+def test_rerun_skips_sent_and_resumes_pending(db):
+    """Test: Relancer le mois reprend aux checkpoints"""
+    db.tables["platform_invoices"] = [
+        {"id": "inv-1", "merchant_id": "m1", "invoice_number": "INV-1", "status": "sent",
+         "period_start": "2026-09-01", "period_end": "2026-09-30"},
+        {"id": "inv-2", "merchant_id": "m2", "invoice_number": "INV-2", "status": "draft",
+         "period_start": "2026-09-01", "period_end": "2026-09-30", "total_amount": 18.0,
+         "due_date": "2026-10-30"},
+    ]
+    db.tables["invoice_line_items"] = [InvoicingService._line_item("inv-2", _sale(100, "m2"))]
+
+    with patch.object(InvoicingService, "_queue_emails"):
+        result = InvoicingService().generate_monthly_invoices(2026, 9)
+
+    assert result["invoices_skipped"] == 1
+    assert result["invoices_resumed"] == 1
+    assert ("platform_invoices", "insert") not in db.executed
+    assert len(db.tables["invoice_line_items"]) == 3
+    assert db.tables["platform_invoices"][1]["status"] == "sent"
+
+
+def test_queue_unavailable_leaves_invoices_pending(db):
+    """Test: Sans queue, aucun email envoyé: factures laissées `pending` pour la reprise"""
+    service = InvoicingService()
+
+    with patch.object(service, "_queue_emails", side_effect=ImportError("celery")):
+        result = service.generate_monthly_invoices(2026, 9)
+
+    assert all(i["status"] == "pending" for i in result["invoices"])
+    assert {i["status"] for i in db.tables["platform_invoices"]} == {"pending"}
+
+
+def test_merchant_without_email_left_pending(db):
+    """Test: Seules les factures confiées à la queue passent à `sent`"""
+    db.tables["merchants"][1]["email"] = None
+    service = InvoicingService()
+
+    with patch.object(service, "_queue_emails") as queue_emails:
+        service.generate_monthly_invoices(2026, 9)
+
+    statuses = {i["merchant_id"]: i["status"] for i in db.tables["platform_invoices"]}
+    assert statuses == {"m1": "sent", "m2": "pending"}
+    html = queue_emails.call_args.args[0][0]["html_body"]
+    assert 'href="https://cdn/invoices/m1/' in html
+
+
+def _failing_totals_rpc(error):
+    return MagicMock(execute=MagicMock(side_effect=Exception(error)))
+
+
+def test_missing_totals_rpc_aggregates_by_pages(db):
+    """Test: RPC non déployée: totaux recalculés par pages, mêmes montants"""
+    service = InvoicingService()
+
+    with patch.object(db, "rpc", return_value=_failing_totals_rpc("PGRST202 Could not find the function")):
+        totals = service._fetch_merchant_totals(datetime(2026, 9, 1), datetime(2026, 10, 1))
+
+    assert totals["m1"]["sales_count"] == 25
+    assert totals["m2"]["platform_commission"] == 15
+
+
+def test_transient_totals_error_fails_the_run(db):
+    """Test: Erreur passagère de la RPC: pas de balayage complet des ventes"""
+    service = InvoicingService()
+
+    with patch.object(db, "rpc", return_value=_failing_totals_rpc("canceling statement due to statement timeout")):
+        result = service.generate_monthly_invoices(2026, 9)
+
+    assert result["success"] is False
+    assert ("sales", "select") not in db.executed
@@ -0,0 +1,203 @@
+"""
+Tests pour le service de réputation IP
+
+Tests couvrant:
+- Trie de préfixes IPv4 / IPv6 (plages CIDR imbriquées)
+- Chargement des fichiers de listes
+- Whitelist prioritaire, listes flag non bloquantes
+- Synchronisation des entrées entre workers via Redis
+- Reprise de Redis après une coupure
+- Retrait de la blacklist sans toucher à la whitelist
+- Signalement des IPs de datacenter à l'analyse des clics
+"""
+
+import pytest
+
+from services import ip_reputation_service as reputation_module
+from services.click_screening_service import FLAG_IP_REPUTATION, ClickScreeningService
+from services.ip_reputation_service import IPReputationService, PrefixTrie, parse_network
+
+
+class FakeRedis:
+    """Hash + compteur partagés entre plusieurs services (= workers)"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.values = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hset(self, key, field, value):
+        self.ops.append(lambda: self.redis.hashes.setdefault(key, {}).__setitem__(field, value))
+
+    def hdel(self, key, field):
+        self.ops.append(lambda: self.redis.hashes.get(key, {}).pop(field, None))
+
+    def incr(self, key):
+        def op():
+            self.redis.values[key] = str(int(self.redis.values.get(key, 0)) + 1)
+            return self.redis.values[key]
+        self.ops.append(op)
+
+    def execute(self):
+        return [op() for op in self.ops]
+
+
+@pytest.fixture
+def lists(tmp_path):
+    (tmp_path / "datacenter.txt").write_text("# AWS (extrait)\n3.0.0.0/9\n2600:1f00::/24  # AWS IPv6\n")
+    (tmp_path / "blacklist.txt").write_text("198.51.100.7\n\nnot-an-ip\n")
+    return tmp_path
+
+
+class TestPrefixTrie:
+    """Tests du trie"""
+
+    def test_nested_ranges(self):
+        trie = PrefixTrie(32)
+        for cidr, name in [("10.0.0.0/8", "vpn"), ("10.1.2.0/24", "whitelist"), ("10.1.2.3/32", "blacklist")]:
+            network = parse_network(cidr)
+            trie.insert(int(network.network_address), network.prefixlen, name)
+
+        def lookup(ip):
+            return trie.lookup(int(parse_network(ip).network_address))
+
+        assert lookup("10.1.2.3") == {"vpn", "whitelist", "blacklist"}
+        assert lookup("10.1.2.4") == {"vpn", "whitelist"}
+        assert lookup("10.200.0.1") == {"vpn"}
+        assert lookup("11.0.0.1") == frozenset()
+
+    def test_default_route(self):
+        trie = PrefixTrie(32)
+        trie.insert(0, 0, "all")
+        assert trie.lookup(0xFFFFFFFF) == {"all"}
+
+
+class TestLists:
+    """Tests des fichiers de listes"""
+
+    def test_files_loaded(self, lists):
+        service = IPReputationService(list_dir=str(lists), redis_client=FakeRedis())
+
+        assert service.lookup("3.120.0.1") == {"datacenter"}
+        assert service.lookup("2600:1f18::1") == {"datacenter"}
+        assert service.lookup("::ffff:3.1.2.3") == {"datacenter"}
+        assert service.lookup("unknown") == frozenset()
+
+        assert service.is_allowed("3.120.0.1") is True
+        assert service.is_allowed("198.51.100.7") is False
+
+    def test_whitelist_wins(self, lists):
+        service = IPReputationService(list_dir=str(lists), redis_client=FakeRedis())
+        service.add("3.5.0.0/16", "whitelist")
+        service.add("198.51.100.0/24", "whitelist")
+
+        assert service.is_allowed("198.51.100.7") is True
+        assert service.flags("3.5.1.1") == frozenset()
+        assert service.flags("3.6.1.1") == {"datacenter"}
+
+    def test_remove_from_blacklist_keeps_whitelist(self, lists, monkeypatch):
+        """Test: Retirer une IP de la blacklist ne retire pas son entrée whitelist"""
+        # middleware/ exige un secret JWT à l'import
+        monkeypatch.setenv("JWT_SECRET", "test-secret-with-at-least-32-characters!")
+        from middleware.security import IPFilter
+
+        service = IPReputationService(list_dir=str(lists), redis_client=FakeRedis())
+        ip_filter = IPFilter(reputation=service)
+        ip_filter.add_to_whitelist("203.0.113.7")
+        ip_filter.add_to_blacklist("203.0.113.8")
+
+        ip_filter.remove_from_blacklist("203.0.113.7")
+        ip_filter.remove_from_blacklist("203.0.113.8")
+
+        assert service.entries() == ["203.0.113.7/32"]
+
+
+class TestSync:
+    """Tests de la synchronisation entre workers"""
+
+    def test_entries_shared_through_redis(self, monkeypatch):
+        monkeypatch.setattr(reputation_module, "IP_REPUTATION_SYNC_SECONDS", 0)
+        redis = FakeRedis()
+        worker_a = IPReputationService(list_dir=None, redis_client=redis)
+        worker_b = IPReputationService(list_dir=None, redis_client=redis)
+
+        worker_a.add("203.0.113.0/24", "blacklist")
+        assert worker_b.is_allowed("203.0.113.50") is False
+
+        worker_b.remove("203.0.113.0/24")
+        assert worker_a.is_allowed("203.0.113.50") is True
+
+    def test_sync_is_throttled(self, monkeypatch):
+        monkeypatch.setattr(reputation_module, "IP_REPUTATION_SYNC_SECONDS", 3600)
+        redis = FakeRedis()
+        worker_a = IPReputationService(list_dir=None, redis_client=redis)
+        worker_b = IPReputationService(list_dir=None, redis_client=redis)
+        worker_b.lookup("1.1.1.1")
+
+        worker_a.add("1.1.1.0/24", "blacklist")
+        assert worker_b.is_allowed("1.1.1.1") is True
+        worker_b.sync(force=True)
+        assert worker_b.is_allowed("1.1.1.1") is False
+
+    def test_redis_down_keeps_local_entries(self):
+        class DownRedis:
+            def pipeline(self):
+                raise ConnectionError("redis down")
+
+            def get(self, key):
+                raise ConnectionError("redis down")
+
+        service = IPReputationService(list_dir=None, redis_client=DownRedis())
+        service.add("192.0.2.0/24", "blacklist")
+        assert service.is_allowed("192.0.2.1") is False
+
+    def test_redis_retried_after_cooldown(self, monkeypatch):
+        """Test: Redis retenté après la pause, écritures de la coupure publiées"""
+        monkeypatch.setattr(reputation_module, "IP_REPUTATION_SYNC_SECONDS", 0)
+
+        class FlakyRedis(FakeRedis):
+            down = True
+
+            def pipeline(self):
+                if self.down:
+                    raise ConnectionError("redis down")
+                return super().pipeline()
+
+        redis = FlakyRedis()
+        worker_a = IPReputationService(list_dir=None, redis_client=redis)
+        worker_a.add("192.0.2.0/24", "blacklist")
+        assert worker_a._redis_retry_at > 0
+
+        redis.down = False
+        worker_a._redis_retry_at = 0.0  # Fin de la pause
+        worker_a.sync(force=True)
+
+        worker_b = IPReputationService(list_dir=None, redis_client=redis)
+        assert worker_b.is_allowed("192.0.2.1") is False
+        assert worker_a.is_allowed("192.0.2.1") is False
+
+
+def test_datacenter_click_flagged(lists):
+    """Test: Un clic depuis une plage datacenter est signalé comme IP suspecte"""
+    reputation = IPReputationService(list_dir=str(lists), redis_client=FakeRedis())
+    screening = ClickScreeningService(reputation=reputation)
+    screening._redis_retry_at = float("inf")
+
+    verdict = screening.screen("l1", "inf", "3.120.0.1", "Mozilla/5.0 (X11; Linux x86_64)", now=0)
+
+    assert verdict.flags == (FLAG_IP_REPUTATION,)
+    assert screening.traffic_signals("inf")["suspicious_ip_percentage"] == 100.0
@@ -0,0 +1,195 @@
+"""
+Tests pour les classements mensuels
+
+Tests couvrant:
+- Rang, percentile et top N après mises à jour incrémentales
+- Taux de conversion (seuil minimum de clics)
+- Moyennes plateforme pour les comparaisons
+- Échec d'un appel Redis sans bascule permanente
+- Reconstruction d'un mois depuis la base
+- Leaderboards du dashboard prédictif
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from services import leaderboard_service as lb
+from services.leaderboard_service import (
+    BOARD_CONVERSION,
+    BOARD_EARNINGS,
+    BOARD_SALES,
+    LeaderboardService,
+    MemoryLeaderboardStore,
+)
+
+MONTH = datetime(2026, 10, 5)
+
+
+@pytest.fixture
+def service():
+    service = LeaderboardService(store=MemoryLeaderboardStore())
+    for influencer, commissions in {"inf-a": [100, 50], "inf-b": [400], "inf-c": [20]}.items():
+        for commission in commissions:
+            service.record_sale(influencer, commission, at=MONTH)
+    return service
+
+
+class TestRankings:
+    """Tests des positions"""
+
+    def test_position_and_percentile(self, service):
+        position = service.position(BOARD_EARNINGS, "inf-a", month="2026-10")
+        assert position == {"rank": 2, "total": 3, "top_percentile": 66.67, "value": 150.0}
+
+    def test_unranked_member(self, service):
+        position = service.position(BOARD_EARNINGS, "inconnu", month="2026-10")
+        assert position["rank"] is None
+        assert position["total"] == 3
+
+    def test_top_n(self, service):
+        top = service.top(BOARD_EARNINGS, n=2, month="2026-10")
+        assert [(u["rank"], u["influencer_id"], u["value"]) for u in top] == [
+            (1, "inf-b", 400.0),
+            (2, "inf-a", 150.0),
+        ]
+        assert [u["influencer_id"] for u in service.top(BOARD_SALES, n=1, month="2026-10")] == ["inf-a"]
+
+    def test_months_are_separate(self, service):
+        service.record_sale("inf-c", 1000, at=datetime(2026, 11, 2))
+        assert service.position(BOARD_EARNINGS, "inf-c", month="2026-11")["rank"] == 1
+        assert service.position(BOARD_EARNINGS, "inf-c", month="2026-10")["rank"] == 3
+
+
+class TestConversion:
+    """Tests du classement par taux de conversion"""
+
+    def test_min_clicks_threshold(self, service):
+        with patch.object(lb, "MIN_CLICKS_FOR_CONVERSION", 4):
+            for _ in range(3):
+                service.record_click("inf-a", at=MONTH)
+            assert service.position(BOARD_CONVERSION, "inf-a", month="2026-10")["rank"] is None
+
+            service.record_click("inf-a", at=MONTH)
+            assert service.position(BOARD_CONVERSION, "inf-a", month="2026-10")["value"] == 50.0
+
+            service.record_sale("inf-a", 10, at=MONTH)
+            assert service.position(BOARD_CONVERSION, "inf-a", month="2026-10")["value"] == 75.0
+
+    def test_platform_averages(self, service):
+        for _ in range(8):
+            service.record_click("inf-b", at=MONTH)
+        averages = service.platform_averages(month="2026-10")
+        assert averages == {"avg_monthly_revenue": 190.0, "avg_conversion_rate": 50.0, "ranked_users": 3}
+
+
+class TestStores:
+    """Tests des stores"""
+
+    def test_memory_store_reorders_on_update(self):
+        store = MemoryLeaderboardStore()
+        store.incr("k", "a", 5)
+        store.incr("k", "b", 3)
+        store.incr("k", "b", 4)
+        assert store.top("k", 2) == [("b", 7.0), ("a", 5.0)]
+        assert store.rank("k", "a") == 1
+        store.remove("k", "b")
+        assert (store.rank("k", "a"), store.count("k")) == (0, 1)
+
+    def test_redis_failure_fails_soft_per_call(self):
+        """Test: Redis en panne = appel vide, le store Redis est conservé et retenté"""
+        store = MemoryLeaderboardStore()
+        flaky = MagicMock(wraps=store)
+        flaky.record.side_effect = ConnectionError("redis down")
+        flaky.count.side_effect = ConnectionError("redis down")
+        flaky.top.side_effect = ConnectionError("redis down")
+        service = LeaderboardService(store=flaky)
+
+        service.record_sale("inf-a", 10, at=MONTH)
+        assert service.leaderboard(BOARD_EARNINGS, "inf-a", month="2026-10")["top_users"] == []
+        assert service.position(BOARD_EARNINGS, "inf-a", month="2026-10")["total"] == 0
+        assert service.store is flaky
+
+        flaky.record.side_effect = None
+        flaky.count.side_effect = None
+        service.record_sale("inf-a", 10, at=MONTH)
+        assert service.position(BOARD_EARNINGS, "inf-a", month="2026-10")["rank"] == 1
+
+    def test_rebuild_month(self):
+        service = LeaderboardService(store=MemoryLeaderboardStore())
+        service.record_sale("stale", 999, at=MONTH)
+        service.rebuild_month("2026-10", [
+            {"influencer_id": "inf-a", "earnings": 300, "sales": 3, "clicks": 60},
+            {"influencer_id": "inf-b", "earnings": 100, "sales": 1, "clicks": 10},
+        ])
+        assert service.position(BOARD_EARNINGS, "stale", month="2026-10")["rank"] is None
+        assert service.position(BOARD_CONVERSION, "inf-a", month="2026-10")["value"] == 5.0
+        assert service.position(BOARD_CONVERSION, "inf-b", month="2026-10")["rank"] is None
+
+    def test_rebuild_swaps_keys_atomically(self):
+        """Test: Redis: clés temporaires puis RENAME sur les clés live, en une transaction"""
+        client = MagicMock()
+        pipe = client.pipeline.return_value
+        service = LeaderboardService(store=lb.RedisLeaderboardStore(client))
+
+        service.rebuild_month("2026-10", [{"influencer_id": "inf-a", "earnings": 300, "sales": 3, "clicks": 0}])
+
+        client.pipeline.assert_called_once_with(transaction=True)
+        pipe.execute.assert_called_once()
+        renamed = {call.args[1]: call.args[0] for call in pipe.rename.call_args_list}
+        assert set(renamed) == {
+            "leaderboard:earnings:2026-10", "leaderboard:sales:2026-10", "leaderboard:totals:2026-10",
+        }
+        assert all(tmp.startswith(live + ":rebuild:") for live, tmp in renamed.items())
+        pipe.zadd.assert_any_call(renamed["leaderboard:earnings:2026-10"], {"inf-a": 300.0})
+        deleted = {call.args[0] for call in pipe.delete.call_args_list}
+        assert deleted == {"leaderboard:clicks:2026-10", "leaderboard:conversion:2026-10"}
+        client.delete.assert_not_called()
+
+    def test_click_is_one_pipeline(self):
+        """Test: Un clic = un pipeline Redis + la mise à jour de la conversion"""
+        client = MagicMock()
+        client.pipeline.return_value.execute.return_value = [1.0, True, 1.0, True, None]
+        service = LeaderboardService(store=lb.RedisLeaderboardStore(client))
+
+        service.record_click("inf-a", at=MONTH)
+
+        client.pipeline.return_value.execute.assert_called_once()
+        client.zrem.assert_called_once_with("leaderboard:conversion:2026-10", "inf-a")
+        client.zscore.assert_not_called()
+
+    def test_rebuild_from_database(self):
+        """Test: Les agrégats du mois sont lus en une RPC sur [début, fin) du mois"""
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.return_value.data = [
+            {"influencer_id": "inf-a", "earnings": 250.5, "sales": 2, "clicks": 0},
+        ]
+        service = LeaderboardService(store=MemoryLeaderboardStore(), supabase=supabase)
+
+        assert service.rebuild("2026-12") == {"month": "2026-12", "influencers": 1}
+        supabase.rpc.assert_called_once_with(
+            "get_leaderboard_month_totals",
+            {"p_start": "2026-12-01T00:00:00", "p_end": "2027-01-01T00:00:00"},
+        )
+        assert service.position(BOARD_EARNINGS, "inf-a", month="2026-12")["value"] == 250.5
+
+
+@pytest.mark.asyncio
+async def test_dashboard_uses_real_rankings():
+    """Test: Le dashboard prédictif affiche la vraie position de l'influenceur"""
+    from predictive_dashboard_service import PredictiveDashboardService
+
+    service = LeaderboardService(store=MemoryLeaderboardStore())
+    service._member_ids["user-1"] = "inf-a"
+    service.record_sale("inf-a", 100)
+    service.record_sale("inf-b", 300)
+
+    dashboard = PredictiveDashboardService(leaderboards=service)
+    leaderboards = await dashboard._generate_leaderboards("user-1", {})
+    comparisons = await dashboard._generate_comparisons("user-1", {"monthly_revenue": 250})
+
+    earners = leaderboards[0]
+    assert (earners.user_rank, earners.total_users, earners.top_percentile) == (2, 2, 50.0)
+    assert [u["influencer_id"] for u in earners.top_users] == ["inf-b", "inf-a"]
+    assert comparisons["revenue_vs_average"]["platform_average"] == 200.0
+    assert comparisons["percentile_rank"] == 50.0
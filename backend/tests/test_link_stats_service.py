@@ -0,0 +1,124 @@
+"""
+Tests pour les stats groupées des liens et le rendu QR
+
+Tests couvrant:
+- Une requête RPC pour tous les liens d'une page
+- Fallback en comptages exacts si la RPC n'est pas déployée
+- Liens sans activité à 0
+- QR code PNG rendu localement et mis en cache
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from services.link_stats_service import LinkStatsResolver
+from services import qr_code_service
+from services.qr_code_service import qr_code_url, render_qr_png
+
+
+@pytest.fixture
+def supabase():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value.data = [
+        {"link_id": "l1", "clicks": 40, "conversions": 2, "total_commissions": "15.50"},
+    ]
+    return client
+
+
+class TestLinkStatsResolver:
+    """Tests du resolver"""
+
+    def test_single_rpc_for_page(self, supabase):
+        """Test: 20 liens = 1 appel RPC, aucune requête par lien"""
+        resolver = LinkStatsResolver(supabase)
+
+        stats = resolver.get_stats([f"l{i}" for i in range(1, 21)])
+
+        supabase.rpc.assert_called_once()
+        supabase.table.assert_not_called()
+        assert len(stats) == 20
+        assert stats["l1"] == {
+            "clicks": 40, "conversions": 2, "total_commissions": 15.5, "conversion_rate": 5.0
+        }
+        assert stats["l2"]["clicks"] == 0
+
+    def test_fallback_exact_counts(self, supabase):
+        """Test: RPC absente = COUNT exact par lien, aucune ligne de clic lue, puis plus de tentative RPC"""
+        supabase.rpc.side_effect = Exception("function get_link_stats_bulk does not exist")
+        counts = {
+            ("tracking_events", "l1"): 3, ("tracking_events", "l2"): 1,
+            ("conversions", "l1"): 1, ("conversions", "l2"): 0,
+        }
+        commissions = [{"link_id": "l1", "amount": 10}, {"link_id": "l1", "amount": 5}]
+        count_selects = []
+
+        def table(name):
+            query = MagicMock()
+            if name == "commissions":
+                paged = query.select.return_value.in_.return_value.eq.return_value.order.return_value
+                paged.range.return_value.execute.return_value.data = commissions
+            else:
+                count_selects.append(query.select)
+                query.select.return_value.eq.side_effect = lambda field, link_id: MagicMock(
+                    execute=MagicMock(return_value=MagicMock(count=counts[(name, link_id)]))
+                )
+            return query
+
+        supabase.table.side_effect = table
+        resolver = LinkStatsResolver(supabase)
+
+        stats = resolver.get_stats(["l1", "l2", "l1"])
+        resolver.get_stats(["l1"])
+
+        assert stats["l1"]["clicks"] == 3
+        assert stats["l2"]["clicks"] == 1
+        assert stats["l1"]["total_commissions"] == 15.0
+        assert stats["l2"]["conversions"] == 0
+        assert supabase.rpc.call_count == 1
+        assert len(count_selects) == 6
+        assert all(select.call_args.kwargs == {"count": "exact", "head": True} for select in count_selects)
+
+    def test_transient_rpc_error_retried(self, supabase):
+        """Test: Une erreur passagère ne désactive pas la RPC"""
+        supabase.rpc.return_value.execute.side_effect = [Exception("timeout"), MagicMock(data=[])]
+        resolver = LinkStatsResolver(supabase)
+
+        resolver.get_stats(["l1"])
+        stats = resolver.get_stats(["l1"])
+
+        assert supabase.rpc.call_count == 2
+        assert stats["l1"]["clicks"] == 0
+
+    def test_empty_page(self, supabase):
+        """Test: Aucun lien = aucune requête"""
+        assert LinkStatsResolver(supabase).get_stats([]) == {}
+        supabase.rpc.assert_not_called()
+
+
+class TestQRCode:
+    """Tests du rendu QR"""
+
+    def test_png_rendered_and_cached(self):
+        """Test: PNG valide, rendu une seule fois par contenu"""
+        render_qr_png.cache_clear()
+
+        first = render_qr_png("https://shareyoursales.ma/r/abc123")
+        second = render_qr_png("https://shareyoursales.ma/r/abc123")
+
+        assert first.startswith(b"\x89PNG")
+        assert first is second
+        assert render_qr_png.cache_info().hits == 1
+
+    def test_url_points_to_api(self, monkeypatch):
+        """Test: Plus de service QR tiers, URL absolue"""
+        monkeypatch.setattr(qr_code_service, "API_BASE_URL", "https://api.shareyoursales.ma")
+
+        assert qr_code_url("abc123") == "https://api.shareyoursales.ma/api/affiliate/qr/abc123.png"
+
+    def test_url_falls_back_to_request_base_url(self, monkeypatch):
+        """Test: Sans API_BASE_URL, l'origine de la requête est utilisée"""
+        monkeypatch.setattr(qr_code_service, "API_BASE_URL", "")
+
+        assert qr_code_url("abc123", "http://testserver/") == "http://testserver/api/affiliate/qr/abc123.png"
+        with pytest.raises(ValueError):
+            qr_code_url("abc123")
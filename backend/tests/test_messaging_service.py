@@ -0,0 +1,160 @@
+"""
+Tests pour le service de messagerie
+
+Tests couvrant:
+- Boîte de réception servie par une seule requête
+- Pagination keyset (curseur opaque)
+- Compteurs de non-lus par participant
+- Historique paginé (before/after/since)
+- Accusés de lecture seulement s'il y a des non-lus
+"""
+
+import pytest
+from unittest.mock import MagicMock
+
+from services.messaging_service import MessagingService, decode_cursor, encode_cursor
+
+
+def _conversation(i, **extra):
+    return {
+        "id": f"conv-{i}",
+        "user1_id": "me",
+        "user2_id": f"other-{i}",
+        "last_message_at": f"2026-10-{i:02d}T10:00:00",
+        "last_message_preview": f"Bonjour {i}",
+        "last_message_sender_id": f"other-{i}",
+        "user1_unread_count": i,
+        "user2_unread_count": 0,
+        **extra
+    }
+
+
+@pytest.fixture
+def supabase():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value.data = [_conversation(i) for i in (9, 8, 7)]
+    return client
+
+
+class TestInbox:
+    """Tests de la boîte de réception"""
+
+    def test_single_rpc_call(self, supabase):
+        """Test: Une requête quelle que soit la taille de la boîte"""
+        inbox = MessagingService(supabase).get_inbox("me", limit=10)
+
+        supabase.rpc.assert_called_once_with(
+            "get_conversation_inbox", {"p_user_id": "me", "p_limit": 11}
+        )
+        supabase.table.assert_not_called()
+        assert [c["id"] for c in inbox["conversations"]] == ["conv-9", "conv-8", "conv-7"]
+        assert inbox["next_cursor"] is None
+
+    def test_next_cursor_when_more_rows(self, supabase):
+        """Test: Curseur de la page suivante = dernière conversation de la page"""
+        service = MessagingService(supabase)
+
+        inbox = service.get_inbox("me", limit=2)
+        service.get_inbox("me", limit=2, cursor=inbox["next_cursor"])
+
+        assert len(inbox["conversations"]) == 2
+        params = supabase.rpc.call_args.args[1]
+        assert params["p_before_at"] == "2026-10-08T10:00:00"
+        assert params["p_before_id"] == "conv-8"
+
+    def test_unread_count_for_each_side(self, supabase):
+        """Test: Le compteur dépend de la place de l'utilisateur"""
+        service = MessagingService(supabase)
+        conversation = _conversation(3, user2_unread_count=5)
+
+        assert service.unread_count(conversation, "me") == 3
+        assert service.unread_count(conversation, "other-3") == 5
+        assert service.unread_count(conversation, "stranger") == 0
+
+    def test_last_message_shape(self, supabase):
+        """Test: last_message garde le champ content attendu par le frontend"""
+        item = MessagingService(supabase).get_inbox("me")["conversations"][0]
+
+        assert item["last_message"]["content"] == "Bonjour 9"
+        assert item["unread_count"] == 9
+
+    def test_invalid_cursor(self, supabase):
+        with pytest.raises(ValueError):
+            MessagingService(supabase).get_inbox("me", cursor="%%%")
+
+
+class TestMessageHistory:
+    """Tests de l'historique paginé"""
+
+    @pytest.fixture
+    def messages_query(self, supabase):
+        """Requête messages mockée: toutes les méthodes de filtre retournent la requête"""
+        query = MagicMock()
+        for method in ("select", "eq", "gt", "or_", "order", "limit"):
+            getattr(query, method).return_value = query
+        supabase.table.return_value = query
+        return query
+
+    def _rows(self, ids):
+        return [{"id": f"m{i}", "created_at": f"2026-10-18T10:{i:02d}:00"} for i in ids]
+
+    def test_latest_page_chronological(self, supabase, messages_query):
+        """Test: Page la plus récente, renvoyée dans l'ordre chronologique"""
+        messages_query.execute.return_value.data = self._rows([9, 8, 7])
+        conversation = _conversation(1, user1_unread_count=0)
+
+        page = MessagingService(supabase).get_messages(conversation, "me", limit=2)
+
+        assert [m["id"] for m in page["messages"]] == ["m8", "m9"]
+        assert page["has_more"] is True
+        messages_query.limit.assert_called_once_with(3)
+        assert decode_cursor(page["before_cursor"]) == ("2026-10-18T10:08:00", "m8")
+
+    def test_before_cursor_keyset_filter(self, supabase, messages_query):
+        """Test: before = filtre keyset (created_at, id)"""
+        messages_query.execute.return_value.data = []
+        cursor = encode_cursor("2026-10-18T10:08:00", "m8")
+
+        MessagingService(supabase).get_messages(_conversation(1, user1_unread_count=0), "me", before=cursor)
+
+        messages_query.or_.assert_called_once_with(
+            "created_at.lt.2026-10-18T10:08:00,and(created_at.eq.2026-10-18T10:08:00,id.lt.m8)"
+        )
+
+    def test_since_sync(self, supabase, messages_query):
+        """Test: since = nouveaux messages en ordre croissant"""
+        messages_query.execute.return_value.data = self._rows([10, 11])
+
+        page = MessagingService(supabase).get_messages(
+            _conversation(1, user1_unread_count=0), "me", since="2026-10-18T10:09:00"
+        )
+
+        messages_query.gt.assert_called_once_with("created_at", "2026-10-18T10:09:00")
+        assert [m["id"] for m in page["messages"]] == ["m10", "m11"]
+
+    def test_no_read_update_without_unread(self, supabase, messages_query):
+        """Test: Aucun UPDATE si rien à marquer comme lu"""
+        messages_query.execute.return_value.data = self._rows([1])
+
+        MessagingService(supabase).get_messages(_conversation(1, user1_unread_count=0), "me")
+
+        supabase.rpc.assert_not_called()
+
+    def test_read_update_when_unread(self, supabase, messages_query):
+        """Test: Un seul appel de marquage quand il y a des non-lus"""
+        messages_query.execute.return_value.data = self._rows([1])
+        supabase.rpc.return_value.execute.return_value.data = 2
+
+        page = MessagingService(supabase).get_messages(_conversation(2), "me")
+
+        supabase.rpc.assert_called_once_with(
+            "mark_conversation_read", {"p_conversation_id": "conv-2", "p_user_id": "me"}
+        )
+        assert page["marked_read"] == 2
+        assert page["conversation"]["user1_unread_count"] == 0
+
+
+def test_cursor_roundtrip():
+    """Test: Curseur opaque réversible"""
+    cursor = encode_cursor("2026-10-18T09:30:00+00:00", "conv-1")
+    assert decode_cursor(cursor) == ("2026-10-18T09:30:00+00:00", "conv-1")
@@ -0,0 +1,136 @@
+"""
+Tests pour le service de métriques
+
+Tests couvrant:
+- Labels Supabase (table / opération) à partir des requêtes PostgREST
+- Hooks httpx du client Supabase
+- Label de route = template FastAPI
+- Exposition Prometheus (si prometheus_client est installé)
+- Accès à /metrics (jeton ou réseaux autorisés)
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from services import metrics_service
+from services.metrics_service import (
+    UNMATCHED_ROUTE,
+    instrument_supabase,
+    metrics_access_allowed,
+    metrics_middleware,
+    parse_networks,
+    route_template,
+    supabase_call_labels,
+)
+
+
+class TestSupabaseLabels:
+    """Tests des labels Supabase"""
+
+    def test_table_operations(self):
+        assert supabase_call_labels("GET", "/rest/v1/sales") == ("sales", "select")
+        assert supabase_call_labels("PATCH", "/rest/v1/platform_invoices") == ("platform_invoices", "update")
+
+    def test_rpc(self):
+        assert supabase_call_labels("POST", "/rest/v1/rpc/get_timeseries") == ("get_timeseries", "rpc")
+
+    def test_hooks_record_each_call(self):
+        """Test: Un appel PostgREST = une observation (table, opération, statut)"""
+        session = httpx.Client(
+            base_url="https://test.supabase.co/rest/v1",
+            transport=httpx.MockTransport(lambda request: httpx.Response(404, json=[])),
+        )
+        client = SimpleNamespace(postgrest=SimpleNamespace(session=session))
+
+        with patch.object(metrics_service.metrics, "record_supabase_call") as record:
+            assert instrument_supabase(client) is True
+            session.get("/sales")
+
+        table, operation, duration = record.call_args.args
+        assert (table, operation) == ("sales", "select")
+        assert duration >= 0
+        assert record.call_args.kwargs == {"ok": False}
+
+
+class TestHttpMetrics:
+    """Tests du middleware HTTP"""
+
+    def test_route_template(self):
+        request = SimpleNamespace(scope={"route": SimpleNamespace(path="/api/products/{product_id}")})
+        assert route_template(request) == "/api/products/{product_id}"
+        assert route_template(SimpleNamespace(scope={})) == UNMATCHED_ROUTE
+
+    @pytest.mark.asyncio
+    async def test_middleware_records_status(self):
+        request = SimpleNamespace(method="GET", scope={"route": SimpleNamespace(path="/api/sales")})
+
+        async def call_next(_):
+            return MagicMock(status_code=201)
+
+        with patch.object(metrics_service.metrics, "record_request") as record:
+            await metrics_middleware(request, call_next)
+
+        method, route, status, _ = record.call_args.args
+        assert (method, route, status) == ("GET", "/api/sales", 201)
+
+    @pytest.mark.asyncio
+    async def test_middleware_records_errors_as_500(self):
+        request = SimpleNamespace(method="POST", scope={})
+
+        async def call_next(_):
+            raise RuntimeError("boom")
+
+        with patch.object(metrics_service.metrics, "record_request") as record:
+            with pytest.raises(RuntimeError):
+                await metrics_middleware(request, call_next)
+
+        assert record.call_args.args[1:3] == (UNMATCHED_ROUTE, 500)
+
+
+def test_prometheus_exposition():
+    """Test: Histogramme par route dans le format texte Prometheus"""
+    pytest.importorskip("prometheus_client")
+
+    metrics_service.metrics.record_request("GET", "/api/test-metrics", 200, 0.042)
+    body, content_type = metrics_service.metrics.render()
+
+    assert content_type.startswith("text/plain")
+    assert b'http_request_duration_seconds_bucket{le="0.05",method="GET",route="/api/test-metrics",status="200"} 1.0' in body
+
+
+class TestMetricsAccess:
+    """Tests de la restriction d'accès à /metrics"""
+
+    LOOPBACK = parse_networks("127.0.0.1/32,::1/128")
+
+    @staticmethod
+    def _request(host, authorization=None):
+        headers = {"authorization": authorization} if authorization else {}
+        return SimpleNamespace(headers=headers, client=SimpleNamespace(host=host) if host else None)
+
+    def test_loopback_allowed(self):
+        assert metrics_access_allowed(self._request("127.0.0.1"), token="", networks=self.LOOPBACK)
+        assert metrics_access_allowed(self._request("::1"), token="", networks=self.LOOPBACK)
+
+    def test_remote_refused(self):
+        assert not metrics_access_allowed(self._request("203.0.113.7"), token="", networks=self.LOOPBACK)
+        assert not metrics_access_allowed(self._request(None), token="", networks=self.LOOPBACK)
+
+    def test_bearer_token(self):
+        """Test: Le jeton ouvre l'accès depuis n'importe quelle adresse, un mauvais jeton non"""
+        ok = self._request("203.0.113.7", "Bearer s3cret")
+        wrong = self._request("203.0.113.7", "Bearer other")
+        assert metrics_access_allowed(ok, token="s3cret", networks=self.LOOPBACK)
+        assert not metrics_access_allowed(wrong, token="s3cret", networks=self.LOOPBACK)
+
+    def test_no_token_configured_ignores_header(self):
+        request = self._request("203.0.113.7", "Bearer ")
+        assert not metrics_access_allowed(request, token="", networks=self.LOOPBACK)
+
+    def test_cidr_list(self):
+        networks = parse_networks("10.0.0.0/8, invalid, ")
+        assert len(networks) == 1
+        assert metrics_access_allowed(self._request("10.2.3.4"), token="", networks=networks)
@@ -0,0 +1,152 @@
+"""
+Tests pour le pipeline de modération
+
+Tests couvrant:
+- Pré-filtre mots-clés compilé
+- Rejet immédiat sans appel IA
+- Cache des verdicts par contenu normalisé
+- Regroupement des appels IA par lots
+"""
+
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+pytest.importorskip("openai")
+
+import moderation_service
+from moderation_service import (
+    ModerationBatcher,
+    content_hash,
+    moderate_product,
+    moderate_product_keywords,
+    moderate_products,
+    quick_check_prohibited_keywords,
+    scan_prohibited_keywords,
+)
+
+
+def _ai_response(results):
+    """Réponse OpenAI mockée"""
+    message = MagicMock()
+    message.content = json.dumps({"results": results})
+    return MagicMock(choices=[MagicMock(message=message)])
+
+
+@pytest.fixture
+def ai_client():
+    """Client OpenAI mocké qui approuve tout ce qu'on lui envoie"""
+    client = MagicMock()
+
+    async def create(**kwargs):
+        prompt = kwargs["messages"][1]["content"]
+        items = json.loads(prompt.split("PRODUITS À ANALYSER (JSON):\n")[1].split("\n\nINSTRUCTIONS")[0])
+        return _ai_response([
+            {"id": item["id"], "approved": True, "confidence": 0.9, "risk_level": "low", "flags": []}
+            for item in items
+        ])
+
+    client.chat.completions.create = AsyncMock(side_effect=create)
+
+    with patch.object(moderation_service, "client", client), \
+            patch.object(moderation_service, "moderation_batcher", ModerationBatcher(batch_size=20, max_wait=0.01)), \
+            patch.object(moderation_service.verdict_cache, "_shared", None):
+        moderation_service.verdict_cache.clear()
+        yield client
+
+
+class TestKeywordPrefilter:
+    """Tests du pré-filtre compilé"""
+
+    def test_detects_categories(self):
+        """Test: Catégories détectées en un passage"""
+        flags, instant = scan_prohibited_keywords("Pistolet et casino en ligne")
+        assert flags == ["weapons", "gambling"]
+        assert instant is True
+
+    def test_prefix_match(self):
+        """Test: Les mots-clés sont des préfixes de mots"""
+        flags, _ = scan_prohibited_keywords("Vibromasseur discret")
+        assert flags == ["adult_content"]
+
+    def test_no_match_inside_words(self):
+        """Test: Pas de faux positif au milieu d'un mot"""
+        flags, _ = scan_prohibited_keywords("Crème au charme de l'alphabet")
+        assert flags == []
+
+    def test_case_insensitive(self):
+        """Test: Insensible à la casse"""
+        assert quick_check_prohibited_keywords("XXX collection") is True
+        assert quick_check_prohibited_keywords("Caftan marocain") is False
+
+    def test_keyword_moderation_result(self):
+        """Test: moderate_product_keywords conserve son format"""
+        result = moderate_product_keywords("Couteau de chasse", "Lame acier")
+        assert result["approved"] is False
+        assert result["flags"] == ["weapons"]
+
+
+class TestContentHash:
+    """Tests de l'empreinte de contenu"""
+
+    def test_normalization(self):
+        """Test: Casse, accents, ponctuation et espaces ignorés"""
+        assert content_hash("Crème Hydratante!", "Peau  sèche") == content_hash("creme hydratante", "peau seche.")
+
+    def test_different_content(self):
+        assert content_hash("Savon", "Argan") != content_hash("Savon", "Olive")
+
+
+class TestModerationPipeline:
+    """Tests du pipeline en deux étapes"""
+
+    @pytest.mark.asyncio
+    async def test_instant_reject_skips_ai(self, ai_client):
+        """Test: Rejet immédiat sans appel IA"""
+        result = await moderate_product("Cocaine pure", "Livraison rapide")
+
+        assert result["approved"] is False
+        assert result["moderation_method"] == "prefilter"
+        ai_client.chat.completions.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_content_served_from_cache(self, ai_client):
+        """Test: Un doublon ne repasse pas par l'IA"""
+        first = await moderate_product("Huile d'argan", "Bio, pressée à froid")
+        second = await moderate_product("HUILE D'ARGAN", "bio pressee a froid")
+
+        assert first["moderation_method"] == "ai"
+        assert second["moderation_method"] == "cache"
+        assert ai_client.chat.completions.create.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_catalog_import_batched(self, ai_client):
+        """Test: 50 produits = 3 appels IA (lots de 20)"""
+        products = [
+            {"product_name": f"Produit {i}", "description": f"Description {i}"}
+            for i in range(50)
+        ]
+
+        results = await moderate_products(products)
+
+        assert len(results) == 50
+        assert all(r["approved"] for r in results)
+        assert [r["product_name"] for r in results] == [p["product_name"] for p in products]
+        assert ai_client.chat.completions.create.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_missing_result_not_cached(self, ai_client):
+        """Test: Un résultat manquant est rejeté par précaution et non caché"""
+        ai_client.chat.completions.create = AsyncMock(return_value=_ai_response([]))
+
+        result = await moderate_product("Tapis berbère", "Laine naturelle")
+
+        assert result["approved"] is False
+        assert "ai_error" in result["flags"]
+        assert moderation_service.verdict_cache.get(content_hash("Tapis berbère", "Laine naturelle")) is None
+
+    @pytest.mark.asyncio
+    async def test_incomplete_product_rejected(self, ai_client):
+        """Test: Produit incomplet rejeté"""
+        result = await moderate_product("", "")
+        assert result["flags"] == ["incomplete_data"]
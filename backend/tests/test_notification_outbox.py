@@ -0,0 +1,116 @@
+"""
+Tests pour l'outbox de notifications
+
+Tests couvrant:
+- Résolution des user_id en une seule requête
+- Insertion groupée des notifications
+- Fan-out vers plusieurs destinataires
+- Planification de la livraison multi-canal
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from services.notification_service import NotificationOutbox, NotificationService
+
+
+@pytest.fixture
+def supabase():
+    """Client Supabase mocké: influencers inf-1..inf-3 -> user-1..user-3"""
+    client = MagicMock()
+
+    def table(name):
+        query = MagicMock()
+        if name == "influencers":
+            query.select.return_value.in_.return_value.execute.return_value.data = [
+                {"id": f"inf-{i}", "user_id": f"user-{i}"} for i in range(1, 4)
+            ]
+        if name == "notifications":
+            query.insert.side_effect = lambda rows: MagicMock(
+                execute=MagicMock(return_value=MagicMock(
+                    data=[{**r, "id": f"n-{i}"} for i, r in enumerate(rows)]
+                ))
+            )
+        return query
+
+    client.table.side_effect = table
+    return client
+
+
+def _tables(supabase):
+    return [c.args[0] for c in supabase.table.call_args_list]
+
+
+def test_fan_out_single_lookup_and_single_insert(supabase):
+    """Test: N destinataires = 1 requête de résolution + 1 INSERT"""
+    outbox = NotificationOutbox(supabase)
+
+    inserted = outbox.fan_out(
+        {"type": "campaign_stopped_influencer", "title": "Pause", "message": "..."},
+        recipient_key="influencer_id",
+        recipient_ids=["inf-1", "inf-2", "inf-3", "inf-2"]
+    )
+
+    assert _tables(supabase) == ["influencers", "notifications"]
+    assert [r["user_id"] for r in inserted] == ["user-1", "user-2", "user-3"]
+    assert all(r["is_read"] is False for r in inserted)
+    assert all("influencer_id" not in r for r in inserted)
+
+
+def test_unknown_recipients_are_skipped(supabase):
+    """Test: Destinataire introuvable ignoré"""
+    outbox = NotificationOutbox(supabase)
+
+    inserted = outbox.publish([
+        {"influencer_id": "inf-1", "type": "sale", "title": "t", "message": "m"},
+        {"influencer_id": "inf-404", "type": "sale", "title": "t", "message": "m"},
+    ])
+
+    assert len(inserted) == 1
+
+
+def test_known_user_id_skips_lookup(supabase):
+    """Test: Pas de requête de résolution si user_id déjà connu"""
+    outbox = NotificationOutbox(supabase)
+
+    outbox.publish([{"user_id": "user-9", "type": "sale", "title": "t", "message": "m"}])
+
+    assert _tables(supabase) == ["notifications"]
+
+
+def test_empty_publish_makes_no_query(supabase):
+    """Test: Rien à publier = aucune requête"""
+    assert NotificationOutbox(supabase).publish([]) == []
+    supabase.table.assert_not_called()
+
+
+def test_channels_queue_background_delivery(supabase):
+    """Test: Les canaux email/WhatsApp sont délégués aux workers"""
+    outbox = NotificationOutbox(supabase)
+
+    with patch.object(outbox, "_queue_delivery") as queue_delivery:
+        outbox.publish(
+            [{"user_id": "user-1", "type": "deposit_depleted", "title": "t", "message": "m"}],
+            channels=["email"]
+        )
+
+    rows, channels = queue_delivery.call_args.args
+    assert channels == ["email"]
+    assert rows[0]["user_id"] == "user-1"
+
+
+def test_campaign_stopped_uses_outbox(supabase):
+    """Test: L'arrêt de campagne notifie tous les influenceurs en un lot"""
+    leads = MagicMock()
+    leads.select.return_value.eq.return_value.execute.return_value.data = [
+        {"influencer_id": "inf-1"}, {"influencer_id": "inf-2"}, {"influencer_id": "inf-1"}
+    ]
+    table = supabase.table.side_effect
+    supabase.table.side_effect = lambda name: leads if name == "leads" else table(name)
+
+    service = NotificationService(supabase)
+    with patch.object(service.outbox, "fan_out", wraps=service.outbox.fan_out) as fan_out:
+        service._notify_influencers_campaign_stopped("camp-1", "Acme")
+
+    fan_out.assert_called_once()
+    assert _tables(supabase) == ["leads", "influencers", "notifications"]
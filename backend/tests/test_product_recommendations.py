@@ -0,0 +1,214 @@
+"""
+Tests pour les recommandations produits item-item
+
+Tests couvrant:
+- Top-K voisins (similarité cosinus atténuée, rang par produit)
+- Index en mémoire: historique pondéré, exclusions, mise à jour incrémentale
+- Rafraîchissement du modèle (RPC + upsert product_neighbors, produits sans voisins vidés)
+- Rechargement incrémental sans perte à updated_at égal
+- suggest_products: voisins puis produits populaires
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from services import ai_assistant_multilingual_service as assistant_module
+from services.ai_assistant_multilingual_service import AIAssistantMultilingualService
+from services.product_recommendation_service import (
+    ItemNeighborIndex,
+    ProductRecommendationService,
+    top_k_neighbors,
+)
+
+
+@pytest.fixture
+def recommendation_db(fake_supabase):
+    """Tables de co-occurrence; la RPC d'accumulation renvoie les produits touchés"""
+
+    def build(tables, touched=()):
+        return fake_supabase(tables=tables, rpc_results={
+            "accumulate_product_cooccurrence": [{"product_id": product_id} for product_id in touched],
+        })
+
+    return build
+
+
+def cooccurrence(pairs):
+    """Paires symétriques {(a, b): poids} -> lignes product_cooccurrence"""
+    rows = []
+    for (a, b), weight in pairs.items():
+        rows += [{"product_a": a, "product_b": b, "weight": weight}, {"product_a": b, "product_b": a, "weight": weight}]
+    return rows
+
+
+PAIRS = {("p1", "p2"): 30, ("p1", "p3"): 10, ("p2", "p3"): 2, ("p3", "p4"): 1}
+TOTALS = {"p1": 40, "p2": 40, "p3": 20, "p4": 5}
+
+
+class TestTopK:
+    """Tests du calcul des voisins"""
+
+    def test_ranked_by_shrunk_cosine(self):
+        rows = cooccurrence(PAIRS)
+        neighbors = top_k_neighbors(
+            [r["product_a"] for r in rows], [r["product_b"] for r in rows], [r["weight"] for r in rows],
+            TOTALS, k=2, shrinkage=5
+        )
+
+        ids, scores = neighbors["p1"]
+        assert ids == ["p2", "p3"]
+        assert scores[0] == pytest.approx(30 / 40 * 30 / 35, rel=1e-5)
+        assert scores[0] > scores[1]
+        assert neighbors["p3"][0] == ["p1", "p2"]  # k=2: p4 coupé
+        assert neighbors["p4"][0] == ["p3"]
+
+    def test_empty_and_unknown_totals(self):
+        assert top_k_neighbors([], [], [], {}) == {}
+        assert top_k_neighbors(["a"], ["b"], [3.0], {}) == {}
+
+
+class TestIndex:
+    """Tests de l'index en mémoire"""
+
+    ROWS = [
+        {"product_id": "p1", "neighbor_ids": ["p2", "p3"], "scores": [0.6, 0.2]},
+        {"product_id": "p2", "neighbor_ids": ["p1", "p3"], "scores": [0.6, 0.1]},
+        {"product_id": "p3", "neighbor_ids": ["p1", "p4"], "scores": [0.2, 0.5]},
+    ]
+
+    def test_recommend_weighted_history(self):
+        index = ItemNeighborIndex(self.ROWS, k=3)
+
+        # p3: 0.2 * 1 (p1) + 0.1 * 3 (p2) = 0.5, p4 absent (p3 n'est pas dans l'historique)
+        assert index.recommend({"p1": 1.0, "p2": 3.0}, limit=5) == [("p3", 0.5)]
+        assert index.recommend({"p3": 1.0}, limit=1) == [("p4", 0.5)]
+        assert index.recommend({"p3": 1.0}, limit=5, exclude=["p4"]) == [("p1", pytest.approx(0.2))]
+        assert index.recommend({"unknown": 1.0}, limit=5) == []
+
+    def test_merged_replaces_rows_without_touching_original(self):
+        index = ItemNeighborIndex(self.ROWS, popular=["p1"], k=3)
+
+        updated = index.merged([
+            {"product_id": "p3", "neighbor_ids": ["p5"], "scores": [0.9]},
+            {"product_id": "p6", "neighbor_ids": ["p1"], "scores": [0.4]},
+        ])
+
+        assert updated.similar("p3") == [("p5", pytest.approx(0.9))]
+        assert updated.similar("p6") == [("p1", pytest.approx(0.4))]
+        assert updated.popular == ["p1"]
+        assert len(updated) == 4
+        assert index.similar("p3") == [("p1", pytest.approx(0.2)), ("p4", pytest.approx(0.5))]
+        assert "p6" not in index
+
+
+class TestService:
+    """Tests du rafraîchissement et du chargement incrémental"""
+
+    def test_refresh_recomputes_touched_products(self, recommendation_db):
+        db = recommendation_db(
+            {
+                "product_cooccurrence": cooccurrence(PAIRS),
+                "product_interaction_totals": [{"product_id": p, "weight": w} for p, w in TOTALS.items()],
+            },
+            touched=["p4"],
+        )
+        service = ProductRecommendationService(supabase=db, k=5)
+
+        stats = service.refresh()
+
+        assert db.rpc_calls[0][0] == "accumulate_product_cooccurrence"
+        assert stats == {"products": 1, "pairs": 1, "rows": 1}
+        assert [(r["product_id"], r["neighbor_ids"]) for r in db.payloads("product_neighbors", "upsert")] == [("p4", ["p3"])]
+
+    def test_full_refresh_covers_all_products(self, recommendation_db):
+        db = recommendation_db({
+            "product_cooccurrence": cooccurrence(PAIRS),
+            "product_interaction_totals": [{"product_id": p, "weight": w} for p, w in TOTALS.items()],
+        })
+        service = ProductRecommendationService(supabase=db, k=5)
+
+        assert service.refresh(full=True)["rows"] == 4
+
+    def test_ensure_fresh_loads_only_new_rows(self, recommendation_db):
+        db = recommendation_db({
+            "product_neighbors": [
+                {"product_id": "p1", "neighbor_ids": ["p2"], "scores": [0.5], "updated_at": "2026-01-01T00:00:00"},
+            ],
+            "product_interaction_totals": [{"product_id": "p2", "weight": 9}, {"product_id": "p1", "weight": 4}],
+        })
+        service = ProductRecommendationService(supabase=db, reload_interval=0)
+
+        service.ensure_fresh()
+        assert service.recommend({"p1": 1.0}, limit=3) == [("p2", 0.5)]
+        assert service.popular(5, exclude=["p1"]) == ["p2"]
+
+        db.tables["product_neighbors"].append(
+            {"product_id": "p1", "neighbor_ids": ["p3"], "scores": [0.7], "updated_at": "2026-01-02T00:00:00"}
+        )
+        with patch.object(ItemNeighborIndex, "merged", wraps=service.index.merged) as merged:
+            service.ensure_fresh()
+
+        assert [row["product_id"] for row in merged.call_args[0][0]] == ["p1"]
+        assert service.recommend({"p1": 1.0}, limit=3) == [("p3", pytest.approx(0.7))]
+
+    def test_reload_sees_rows_written_at_the_same_timestamp(self, recommendation_db):
+        """Test: Une tranche écrite après un rechargement avec le même updated_at est chargée"""
+        stamp = "2026-01-01T00:00:00"
+        db = recommendation_db({
+            "product_neighbors": [{"product_id": "p1", "neighbor_ids": ["p2"], "scores": [0.5], "updated_at": stamp}],
+            "product_interaction_totals": [],
+        })
+        service = ProductRecommendationService(supabase=db, reload_interval=0)
+        service.ensure_fresh()
+
+        db.tables["product_neighbors"].append(
+            {"product_id": "p3", "neighbor_ids": ["p4"], "scores": [0.6], "updated_at": stamp}
+        )
+        original = ItemNeighborIndex.merged
+        with patch.object(ItemNeighborIndex, "merged", autospec=True, side_effect=original) as merged:
+            service.ensure_fresh()
+            service.ensure_fresh()
+
+        assert [row["product_id"] for row in merged.call_args_list[0].args[1]] == ["p3"]
+        assert merged.call_args_list[1].args[1] == []
+        assert service.recommend({"p3": 1.0}, limit=3) == [("p4", pytest.approx(0.6))]
+
+    def test_refresh_clears_products_without_neighbors(self, recommendation_db):
+        """Test: Un produit touché sans voisin voit sa ligne product_neighbors vidée"""
+        db = recommendation_db({
+            "product_cooccurrence": [],
+            "product_interaction_totals": [{"product_id": "p5", "weight": 3}],
+            "product_neighbors": [{"product_id": "p5", "neighbor_ids": ["p1"], "scores": [0.2], "updated_at": "x"}],
+        }, touched=["p5", "p6"])
+        service = ProductRecommendationService(supabase=db)
+
+        service.refresh()
+
+        assert db.payloads("product_neighbors", "upsert") == [{"product_id": "p5", "neighbor_ids": [], "scores": []}]
+
+
+@pytest.mark.asyncio
+async def test_suggest_products_neighbors_then_popular():
+    index = ItemNeighborIndex(
+        [{"product_id": "p1", "neighbor_ids": ["p2", "p3"], "scores": [0.8, 0.4]}], popular=["p1", "p9", "p2"], k=3
+    )
+    recommendations = ProductRecommendationService(supabase=object())
+    recommendations.index = index
+    recommendations._checked_at = float("inf")
+    products = {
+        p: {"id": p, "name": p.upper(), "category": "mode", "price": 100, "currency": "MAD"}
+        for p in ("p2", "p3", "p9")
+    }
+    service = AIAssistantMultilingualService(api_key="sk-ant")
+
+    with patch.object(assistant_module, "product_recommendations", recommendations), \
+            patch.object(AIAssistantMultilingualService, "_fetch_products", lambda self, ids: [products[i] for i in ids]):
+        suggestions = await service.suggest_products(
+            "user-1", {}, purchase_history=[{"product_id": "p1", "category": "mode"}], max_suggestions=3
+        )
+
+    assert [s["id"] for s in suggestions] == ["p2", "p3", "p9"]
+    assert suggestions[0]["relevance_score"] == pytest.approx(1.0)
+    assert suggestions[0]["reason"] == "Souvent associé à vos achats récents"
+    assert suggestions[-1]["reason"] == "Très populaire au Maroc"
@@ -0,0 +1,124 @@
+"""
+Tests pour la trace des appels Supabase
+
+Tests couvrant:
+- Forme normalisée des requêtes (valeurs retirées)
+- Nombre de lignes d'après Content-Range
+- Trace par requête HTTP et header Server-Timing
+- Détection des candidats N+1 et dépassement de budget
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from services import query_trace_service as tracing
+from services.metrics_service import instrument_supabase
+from services.query_trace_service import (
+    QueryTrace,
+    current_trace,
+    query_shape,
+    query_trace_middleware,
+    record_query,
+    rows_from_content_range,
+)
+
+
+def _request(path="/api/dashboard"):
+    return SimpleNamespace(method="GET", url=SimpleNamespace(path=path))
+
+
+class TestShapes:
+    """Tests de normalisation"""
+
+    def test_values_removed(self):
+        a = query_shape("GET", "sales", "select=id%2Camount&merchant_id=eq.1&limit=10")
+        b = query_shape("GET", "sales", "merchant_id=eq.2&select=id%2Camount&limit=50")
+        assert a == b == "GET sales?merchant_id=eq&select=id,amount"
+
+    def test_operators_kept(self):
+        assert query_shape("GET", "sales", "created_at=gte.2026-01-01") != query_shape(
+            "GET", "sales", "created_at=lt.2026-01-01"
+        )
+
+    def test_content_range(self):
+        assert rows_from_content_range("0-24/*") == 25
+        assert rows_from_content_range("*/0") == 0
+        assert rows_from_content_range("*/*") is None
+        assert rows_from_content_range(None) is None
+
+
+class TestMiddleware:
+    """Tests du middleware de trace"""
+
+    @pytest.mark.asyncio
+    async def test_server_timing_and_n_plus_one(self):
+        """Test: 6 requêtes de même forme = 1 candidat N+1, header Server-Timing"""
+        response = MagicMock(headers=MagicMock())
+
+        async def call_next(_):
+            record_query("users", "select", 0.002, rows=1, shape="GET users?id=eq")
+            for _ in range(6):
+                record_query("sales", "select", 0.010, rows=3, shape="GET sales?merchant_id=eq")
+            return response
+
+        with patch.object(tracing, "logger") as logger:
+            await query_trace_middleware(_request(), call_next)
+
+        response.headers.append.assert_called_once_with(
+            "Server-Timing", 'db;dur=62.0;desc="7 queries"'
+        )
+        events = [c.args[0] for c in logger.warning.call_args_list]
+        assert events == ["db_n_plus_one_candidate"]
+        assert logger.warning.call_args.kwargs["count"] == 6
+        assert current_trace() is None
+
+    @pytest.mark.asyncio
+    async def test_budget_exceeded(self):
+        async def call_next(_):
+            record_query("sales", "select", 0.6, shape="GET sales?")
+            return MagicMock(headers=MagicMock())
+
+        with patch.object(tracing, "logger") as logger:
+            await query_trace_middleware(_request(), call_next)
+
+        assert logger.warning.call_args.args[0] == "db_budget_exceeded"
+        assert logger.warning.call_args.kwargs["db_ms"] == 600.0
+
+    def test_no_trace_outside_request(self):
+        record_query("sales", "select", 0.01)
+        assert current_trace() is None
+
+
+@pytest.mark.asyncio
+async def test_supabase_hooks_feed_trace():
+    """Test: Les appels PostgREST instrumentés alimentent la trace courante"""
+    session = httpx.Client(
+        base_url="https://test.supabase.co/rest/v1",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json=[], headers={"Content-Range": "0-2/*"})
+        ),
+    )
+    instrument_supabase(SimpleNamespace(postgrest=SimpleNamespace(session=session)))
+    traces = []
+
+    async def call_next(_):
+        session.get("/sales", params={"merchant_id": "eq.7"})
+        traces.append(current_trace())
+        return MagicMock(headers=MagicMock())
+
+    await query_trace_middleware(_request(), call_next)
+
+    call = traces[0].calls[0]
+    assert (call["table"], call["operation"], call["rows"]) == ("sales", "select", 3)
+    assert call["shape"] == "GET sales?merchant_id=eq"
+
+
+def test_trace_totals():
+    trace = QueryTrace()
+    trace.record("a", "select", 0.001)
+    trace.record("b", "insert", 0.0025)
+    assert trace.count == 2
+    assert trace.duration_ms == 3.5
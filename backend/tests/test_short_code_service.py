@@ -0,0 +1,95 @@
+"""
+Tests pour l'allocation des codes courts
+
+Tests couvrant:
+- Encodage bijectif séquence <-> code
+- Réservation par blocs (un appel par bloc)
+- Unicité sans vérification d'existence
+- Slugs personnalisés au format réservé
+"""
+
+import pytest
+from unittest.mock import Mock
+
+from services.short_code_service import (
+    SHORT_CODE_LENGTH,
+    ShortCodeAllocator,
+    ShortCodeUnavailable,
+    decode_sequence,
+    encode_sequence,
+    is_reserved_code,
+)
+
+
+class TestEncoding:
+    """Tests de l'encodage"""
+
+    def test_roundtrip(self):
+        """Test: decode(encode(x)) == x"""
+        for value in (0, 1, 61, 62, 123456789, 62 ** 7 - 1):
+            assert decode_sequence(encode_sequence(value)) == value
+
+    def test_consecutive_values_not_consecutive_codes(self):
+        """Test: Codes non devinables à partir du précédent"""
+        codes = [encode_sequence(i) for i in range(3)]
+        assert len(set(codes)) == 3
+        assert all(len(code) == SHORT_CODE_LENGTH and code.isalnum() for code in codes)
+        assert codes[0][:-1] != codes[1][:-1]
+
+    def test_out_of_range(self):
+        with pytest.raises(ValueError):
+            encode_sequence(62 ** 7)
+
+
+class TestAllocator:
+    """Tests de l'allocateur"""
+
+    def test_block_reserved_once(self):
+        """Test: 250 codes avec des blocs de 100 = 3 réservations"""
+        starts = iter([0, 100, 200])
+        reserve = Mock(side_effect=lambda size: next(starts))
+        allocator = ShortCodeAllocator(reserve_block=reserve, block_size=100)
+
+        codes = [allocator.allocate() for _ in range(250)]
+
+        assert len(set(codes)) == 250
+        assert reserve.call_count == 3
+
+    def test_allocate_many_larger_than_block(self):
+        """Test: Un lot plus grand qu'un bloc réserve un bloc à sa taille"""
+        reserve = Mock(return_value=5000)
+        allocator = ShortCodeAllocator(reserve_block=reserve, block_size=100)
+
+        codes = allocator.allocate_many(1000)
+
+        assert len(set(codes)) == 1000
+        reserve.assert_called_once_with(1000)
+        assert decode_sequence(codes[0]) == 5000
+
+    def test_transient_reservation_error_retried(self):
+        """Test: Une erreur passagère de réservation est retentée"""
+        reserve = Mock(side_effect=[Exception("timeout"), 42])
+        allocator = ShortCodeAllocator(reserve_block=reserve, backoff=0)
+
+        code = allocator.allocate()
+
+        assert len(code) == SHORT_CODE_LENGTH
+        assert decode_sequence(code) == 42
+        assert reserve.call_count == 2
+
+    def test_sequence_unavailable_raises(self):
+        """Test: Séquence indisponible = aucun code (pas de code aléatoire)"""
+        reserve = Mock(side_effect=Exception("rpc missing"))
+        allocator = ShortCodeAllocator(reserve_block=reserve, backoff=0)
+
+        with pytest.raises(ShortCodeUnavailable):
+            allocator.allocate_many(3)
+
+        assert reserve.call_count == 3
+
+
+def test_reserved_slug_format():
+    """Test: Les slugs de 7 caractères alphanumériques sont réservés"""
+    assert is_reserved_code("Ab3dE9z") is True
+    assert is_reserved_code("ma-promo-beaute") is False
+    assert is_reserved_code("Ab3dE9zz") is False
@@ -0,0 +1,134 @@
+"""
+Tests pour le moteur de séries temporelles
+
+Tests couvrant:
+- Buckets jour / semaine ISO / mois complétés à zéro
+- Une seule requête RPC quelle que soit la plage
+- Fallback: une requête de plage agrégée en Python
+- Validation du bucket, des périodes et du périmètre
+"""
+
+import pytest
+from datetime import date
+from unittest.mock import MagicMock
+
+from services.timeseries_service import (
+    TimeSeriesEngine,
+    SALES_SOURCE,
+    COMMISSIONS_SOURCE,
+    bucket_label,
+    bucket_range,
+)
+
+
+END = date(2026, 10, 18)  # dimanche
+
+
+@pytest.fixture
+def supabase():
+    client = MagicMock()
+    client.rpc.return_value.execute.return_value.data = []
+    return client
+
+
+class TestBucketRange:
+    """Tests de génération des buckets"""
+
+    def test_days(self):
+        """Test: 7 jours se terminant aujourd'hui"""
+        starts = bucket_range("day", 7, END)
+        assert starts[0] == date(2026, 10, 12)
+        assert starts[-1] == END
+
+    def test_weeks_start_on_monday(self):
+        """Test: Semaines ISO (comme date_trunc('week'))"""
+        starts = bucket_range("week", 4, END)
+        assert starts == [date(2026, 9, 21), date(2026, 9, 28), date(2026, 10, 5), date(2026, 10, 12)]
+
+    def test_months_cross_year(self):
+        """Test: 12 mois à cheval sur deux années"""
+        starts = bucket_range("month", 12, END)
+        assert starts[0] == date(2025, 11, 1)
+        assert starts[-1] == date(2026, 10, 1)
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            bucket_range("year", 1, END)
+        with pytest.raises(ValueError):
+            bucket_range("day", 400, END)
+
+
+class TestEngine:
+    """Tests du moteur"""
+
+    def test_single_rpc_zero_filled(self, supabase):
+        """Test: 90 jours = une requête, jours sans ventes à 0"""
+        supabase.rpc.return_value.execute.return_value.data = [
+            {"bucket": "2026-10-18", "row_count": 3, "totals": [150.5, 15]},
+        ]
+
+        series = TimeSeriesEngine(supabase).series(
+            SALES_SOURCE, "day", 90, scope="merchant", scope_id="m1", end=END
+        )
+
+        supabase.rpc.assert_called_once()
+        name, params = supabase.rpc.call_args.args
+        assert name == "get_timeseries"
+        assert params["p_scope_column"] == "merchant_id"
+        assert params["p_start"] == "2026-07-21"
+        assert params["p_end"] == "2026-10-19"
+        assert len(series) == 90
+        assert series[-1] == {"bucket": END, "count": 3, "amount": 150.5, "commission": 15.0}
+        assert series[0]["count"] == 0 and series[0]["amount"] == 0.0
+        supabase.table.assert_not_called()
+
+    def test_fallback_range_query(self, supabase):
+        """Test: RPC absente = une requête de plage, agrégée par semaine"""
+        supabase.rpc.side_effect = Exception("function get_timeseries does not exist")
+        query = MagicMock()
+        for method in ("select", "gte", "lt", "eq", "order", "range"):
+            getattr(query, method).return_value = query
+        query.execute.return_value.data = [
+            {"created_at": "2026-10-13T10:00:00Z", "amount": "10"},
+            {"created_at": "2026-10-18T23:00:00+00:00", "amount": 5},
+            {"created_at": "2026-09-29T08:00:00", "amount": 7},
+        ]
+        supabase.table.return_value = query
+
+        engine = TimeSeriesEngine(supabase)
+        series = engine.series(COMMISSIONS_SOURCE, "week", 4, scope="influencer", scope_id="i1", end=END)
+
+        query.eq.assert_called_once_with("influencer_id", "i1")
+        assert [p["amount"] for p in series] == [0.0, 7.0, 0.0, 15.0]
+        assert series[-1]["count"] == 2
+
+        engine.series(COMMISSIONS_SOURCE, "week", 4, end=END)
+        assert supabase.rpc.call_count == 1
+        query.order.assert_called_with("id")
+
+    def test_transient_rpc_error_retried(self, supabase):
+        """Test: Une erreur passagère ne désactive pas la RPC"""
+        supabase.rpc.return_value.execute.side_effect = [Exception("timeout"), MagicMock(data=[])]
+        query = MagicMock()
+        for method in ("select", "gte", "lt", "eq", "order", "range"):
+            getattr(query, method).return_value = query
+        query.execute.return_value.data = []
+        supabase.table.return_value = query
+
+        engine = TimeSeriesEngine(supabase)
+        engine.series(SALES_SOURCE, "day", 7, end=END)
+        engine.series(SALES_SOURCE, "day", 7, end=END)
+
+        assert supabase.rpc.call_count == 2
+        assert supabase.table.call_count == 1
+
+    def test_invalid_scope(self, supabase):
+        with pytest.raises(ValueError):
+            TimeSeriesEngine(supabase).series(COMMISSIONS_SOURCE, scope="merchant", scope_id="m1")
+
+
+def test_labels():
+    """Test: Libellés compatibles avec les anciens graphiques"""
+    assert bucket_label(date(2026, 6, 1), "day") == "01/06"
+    assert bucket_label(date(2026, 10, 12), "week") == "Sem 42"
+    assert bucket_label(date(2026, 10, 1), "month") == "10/2026"
@@ -0,0 +1,222 @@
+"""
+Tests pour le service de traduction
+
+Tests couvrant:
+- Bundle en mémoire par langue (une seule requête DB)
+- Invalidation par version après écriture ou import
+- ETag stable dérivé du contenu
+- Mise à jour groupée de last_used
+- Traduction par lots OpenAI et coalescence des requêtes concurrentes
+"""
+
+import json
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+pytest.importorskip("openai")
+
+import translation_service as translation_module
+from translation_service import TranslationService
+
+
+@pytest.fixture
+def supabase():
+    """Client Supabase mocké: traductions françaises uniquement"""
+    client = MagicMock()
+    client.rows = [
+        {"key": "nav_dashboard", "value": "Tableau de Bord"},
+        {"key": "nav_settings", "value": "Paramètres"},
+    ]
+
+    def select_eq(field, value):
+        filtered = MagicMock()
+        rows = list(client.rows) if value == "fr" else []
+        filtered.execute.return_value = MagicMock(data=rows)
+        filtered.in_.return_value.execute.return_value = MagicMock(data=rows)
+        return filtered
+
+    def table(name):
+        query = MagicMock()
+        query.select.return_value.eq.side_effect = select_eq
+        return query
+
+    client.table.side_effect = table
+    return client
+
+
+@pytest.fixture
+def service(supabase):
+    with patch.object(translation_module, "OPENAI_API_KEY", None):
+        return TranslationService(supabase)
+
+
+def _selects(supabase):
+    return sum(1 for c in supabase.table.call_args_list if c.args[0] == "translations")
+
+
+class TestTranslationBundle:
+    """Tests du bundle en mémoire"""
+
+    @pytest.mark.asyncio
+    async def test_bundle_loaded_once(self, service, supabase):
+        """Test: Chargements répétés = une seule requête DB"""
+        for _ in range(5):
+            translations = await service.get_all_translations("fr")
+
+        assert translations["nav_dashboard"] == "Tableau de Bord"
+        assert _selects(supabase) == 1
+
+    @pytest.mark.asyncio
+    async def test_key_lookup_served_from_bundle(self, service, supabase):
+        """Test: get_translation ne fait ni SELECT ni UPDATE par clé"""
+        await service.get_bundle("fr")
+        supabase.table.reset_mock()
+
+        value = await service.get_translation("nav_settings", "fr", auto_translate=False)
+
+        assert value == "Paramètres"
+        supabase.table.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_etag_depends_on_content(self, service, supabase):
+        """Test: ETag identique si contenu identique, différent sinon"""
+        first = await service.get_bundle("fr")
+
+        service.invalidate_bundle("fr")
+        same = await service.get_bundle("fr")
+        assert same.etag == first.etag
+
+        supabase.rows.append({"key": "nav_help", "value": "Aide"})
+        service.invalidate_bundle("fr")
+        changed = await service.get_bundle("fr")
+        assert changed.etag != first.etag
+        assert changed.version > first.version
+
+    @pytest.mark.asyncio
+    async def test_unsupported_language_not_cached(self, service, supabase):
+        """Test: Langue inconnue = aucun bundle, aucune requête, caches inchangés"""
+        for language in ("xx", "fr-evil", "../etc"):
+            assert await service.get_bundle(language) is None
+            service.invalidate_bundle(language)
+
+        supabase.table.assert_not_called()
+        assert service._bundles == {} and service._versions == {} and service._bundle_locks == {}
+
+    @pytest.mark.asyncio
+    async def test_save_invalidates_bundle(self, service, supabase):
+        """Test: _save_translation force le rechargement"""
+        await service.get_bundle("fr")
+
+        await service._save_translation("nav_help", "fr", "Aide")
+        supabase.rows.append({"key": "nav_help", "value": "Aide"})
+        bundle = await service.get_bundle("fr")
+
+        assert bundle.translations["nav_help"] == "Aide"
+
+    @pytest.mark.asyncio
+    async def test_import_is_bulk(self, service, supabase):
+        """Test: Import de 1200 clés = 3 upserts + invalidation"""
+        await service.get_bundle("fr")
+        version = service._versions.get("fr", 0)
+        supabase.table.reset_mock()
+
+        imported = await service.import_static_translations(
+            {f"key_{i}": f"valeur {i}" for i in range(1200)}, "fr"
+        )
+
+        assert imported == 1200
+        assert supabase.table.call_count == 3
+        assert service._versions["fr"] == version + 1
+
+
+class TestLastUsedTracking:
+    """Tests du suivi last_used"""
+
+    def test_flush_groups_keys_by_language(self, service, supabase):
+        """Test: Une requête UPDATE par langue"""
+        supabase.table.reset_mock()
+
+        updated = service.flush_last_used({"fr": {"a", "b", "c"}, "en": {"a"}})
+
+        assert updated == 4
+        assert supabase.table.call_count == 2
+
+    def test_touch_buffers_until_threshold(self, service):
+        """Test: Les lectures sont mises en attente, pas écrites"""
+        with patch.object(service, "_schedule_last_used_flush") as flush:
+            service._touch("nav_dashboard", "fr")
+            flush.assert_not_called()
+
+            with patch.object(translation_module, "LAST_USED_FLUSH_SIZE", 2):
+                service._touch("nav_settings", "fr")
+            flush.assert_called_once()
+
+
+@pytest.fixture
+def openai_client(service, supabase):
+    """Client OpenAI asynchrone mocké: traduit en préfixant par la langue"""
+    supabase.rows = [{"key": f"key_{i}", "value": f"texte {i}"} for i in range(100)]
+    client = MagicMock()
+
+    async def create(**kwargs):
+        prompt = kwargs["messages"][1]["content"]
+        texts = json.loads(prompt.split("(JSON, clé -> texte):\n")[1].split("\n")[0])
+        await asyncio.sleep(0.01)
+        message = MagicMock(content=json.dumps({
+            "translations": {k: f"[tr] {v}" for k, v in texts.items()}
+        }))
+        usage = MagicMock(prompt_tokens=100, completion_tokens=100)
+        return MagicMock(choices=[MagicMock(message=message)], usage=usage)
+
+    client.chat.completions.create = AsyncMock(side_effect=create)
+    service.openai_client = client
+    return client
+
+
+class TestBatchTranslation:
+    """Tests de la traduction par lots"""
+
+    @pytest.mark.asyncio
+    async def test_keys_packed_per_request(self, service, openai_client, supabase):
+        """Test: 100 clés manquantes = 3 requêtes OpenAI (lots de 40)"""
+        with patch.object(service, "_save_translations", AsyncMock(return_value=100)) as save:
+            result = await service.translate_missing([f"key_{i}" for i in range(100)], "en")
+
+        assert len(result) == 100
+        assert result["key_7"] == "[tr] texte 7"
+        assert openai_client.chat.completions.create.await_count == 3
+        save.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_coalesced(self, service, openai_client):
+        """Test: Deux appels simultanés pour la même clé = une requête OpenAI"""
+        with patch.object(service, "_save_translations", AsyncMock(return_value=1)):
+            first, second = await asyncio.gather(
+                service.translate_missing(["key_1"], "ar"),
+                service.get_translation("key_1", "ar"),
+            )
+
+        assert first == {"key_1": "[tr] texte 1"}
+        assert second == "[tr] texte 1"
+        assert openai_client.chat.completions.create.await_count == 1
+        assert service._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_languages_translated_in_parallel(self, service, openai_client):
+        """Test: Nouvelle langue + nouvel écran = un seul appel"""
+        keys = [f"key_{i}" for i in range(10)]
+        with patch.object(service, "_save_translations", AsyncMock(return_value=10)):
+            results = await service.translate_languages(keys, ["en", "ar", "darija"])
+
+        assert set(results) == {"en", "ar", "darija"}
+        assert all(len(translations) == 10 for translations in results.values())
+        assert openai_client.chat.completions.create.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_bulk_upsert_and_single_invalidation(self, service, supabase):
+        """Test: Sauvegarde groupée puis une seule nouvelle version"""
+        saved = await service._save_translations("en", {f"k{i}": "v" for i in range(600)})
+
+        assert saved == 600
+        assert service._versions["en"] == 1
@@ -0,0 +1,165 @@
+"""
+Tests pour l'instantané de contexte utilisateur du bot IA
+
+Tests couvrant:
+- Lectures lancées en parallèle, agrégées en un instantané
+- Lecture en échec = donnée absente, pas d'erreur
+- Cache par utilisateur et invalidation (user_id ou influencer_id, entre workers)
+- Sérialisation compacte et réponses du bot avec les vraies données
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.ai_bot_service import AIBotService, create_conversation_context
+from services.user_context_service import UserContextService, compact_json
+
+OWNER = {"user_id": "user-1"}
+RECENT = (datetime.utcnow() - timedelta(days=2)).isoformat()
+
+INFLUENCER_ROWS = {
+    "influencers": [{
+        "id": "inf-1", "user_id": "user-1", "username": "sara", "category": "Beauté", "audience_size": 25000,
+        "engagement_rate": "4.2", "total_clicks": 900, "total_sales": 40,
+        "total_earnings": "375.5", "balance": "120", "payment_method": "paypal",
+    }],
+    "sales": [
+        {"amount": 200, "influencer_commission": 20, "status": "completed", "created_at": RECENT, "influencers": OWNER},
+        {"amount": 100, "influencer_commission": 10, "status": "pending", "created_at": RECENT, "influencers": OWNER},
+    ],
+    "trackable_links": [{"id": f"link-{i}", "is_active": True, "influencers": OWNER} for i in range(5)],
+    "affiliation_requests": [{"id": f"req-{i}", "status": "pending", "influencers": OWNER} for i in range(2)],
+    "payouts": [],
+}
+
+
+@pytest.fixture
+def context_db(fake_supabase):
+    """Tables d'un influenceur; chaque lecture peut passer par une barrière ou échouer"""
+
+    def build(parallel=None, failing=()):
+        db = fake_supabase(tables={name: list(rows) for name, rows in INFLUENCER_ROWS.items()})
+        # Barrière: ne se débloque que si toutes les lectures sont en cours en même temps
+        barrier = threading.Barrier(parallel, timeout=5) if parallel else None
+
+        def on_execute(query):
+            if barrier is not None:
+                barrier.wait()
+            if query.table in failing:
+                raise ConnectionError("timeout")
+
+        db.on_execute = on_execute
+        return db
+
+    return build
+
+
+class FakeCache:
+    """services.cache_service.cache partagé entre workers"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        return self.values.pop(key, None) is not None
+
+
+@pytest.mark.asyncio
+async def test_snapshot_fetched_in_parallel(context_db):
+    db = context_db(parallel=5)
+    service = UserContextService(supabase=db)
+
+    snapshot = await service.snapshot("user-1", "influencer")
+
+    assert len(db.executed) == 5
+    assert snapshot["followers"] == 25000
+    assert snapshot["balance"] == 120.0
+    assert snapshot["active_links"] == 5
+    assert snapshot["pending_affiliations"] == 2
+    assert (snapshot["sales_30d"], snapshot["commission_30d"], snapshot["pending_commission"]) == (2, 30.0, 10.0)
+    assert "_owner_id" not in snapshot
+
+
+@pytest.mark.asyncio
+async def test_failed_read_is_skipped(context_db):
+    service = UserContextService(supabase=context_db(failing={"sales"}))
+
+    snapshot = await service.snapshot("user-1", "influencer")
+
+    assert "sales_30d" not in snapshot
+    assert snapshot["active_links"] == 5
+
+
+@pytest.mark.asyncio
+async def test_unknown_role_reads_nothing(context_db):
+    db = context_db()
+    assert await UserContextService(supabase=db).snapshot("admin-1", "admin") == {}
+    assert db.executed == []
+
+
+class TestCache:
+    """Tests du cache et de l'invalidation"""
+
+    @pytest.mark.asyncio
+    async def test_cached_between_turns(self, context_db):
+        db = context_db()
+        service = UserContextService(supabase=db)
+
+        await service.snapshot("user-1", "influencer")
+        await service.snapshot("user-1", "influencer")
+        assert len(db.executed) == 5
+
+        service.invalidate("user-1")
+        await service.snapshot("user-1", "influencer")
+        assert len(db.executed) == 10
+
+    @pytest.mark.asyncio
+    async def test_expired_after_ttl(self, context_db):
+        db = context_db()
+        service = UserContextService(supabase=db, ttl=0)
+
+        await service.snapshot("user-1", "influencer")
+        await service.snapshot("user-1", "influencer")
+        assert len(db.executed) == 10
+
+    @pytest.mark.asyncio
+    async def test_sale_invalidates_across_workers(self, context_db):
+        shared = FakeCache()
+        db = context_db()
+        bot_worker = UserContextService(supabase=db, shared_cache=shared, local_ttl=0)
+        payment_worker = UserContextService(supabase=db, shared_cache=shared)
+
+        await bot_worker.snapshot("user-1", "influencer")
+        await bot_worker.snapshot("user-1", "influencer")
+        assert len(db.executed) == 5
+
+        # Vente validée sur un autre worker: seul l'influencer_id est connu
+        payment_worker.invalidate_owner("inf-1")
+        await bot_worker.snapshot("user-1", "influencer")
+        assert len(db.executed) == 10
+
+
+def test_compact_json():
+    assert compact_json({"balance": 12.5, "category": None, "username": "sara"}) == '{"balance":12.5,"username":"sara"}'
+    assert compact_json(None) == "{}"
+
+
+@pytest.mark.asyncio
+async def test_bot_answers_with_user_data(context_db):
+    bot = AIBotService(context_service=UserContextService(supabase=context_db()))
+    context = create_conversation_context("user-1", "influencer", "fr")
+
+    response, _ = await bot.chat("Quelles sont mes statistiques?", context)
+
+    assert "375.5 MAD" in response
+    assert "Liens actifs: 5" in response
+    assert '"pending_affiliations":2' in bot._build_system_prompt(context)
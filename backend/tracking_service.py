@@ -8,16 +8,17 @@ from fastapi.responses import RedirectResponse
 from datetime import datetime, timedelta
 from supabase_client import supabase
 from typing import Optional, Dict
-import hashlib
-import secrets
 import logging
 
+from services.click_screening_service import click_screening_service
+from services.leaderboard_service import leaderboard_service
+from services.short_code_service import short_code_allocator
+
 logger = logging.getLogger(__name__)
 
 # Configuration
 COOKIE_NAME = "systrack"  # ShareYourSales tracking
 COOKIE_EXPIRY_DAYS = 30  # Durée d'attribution (30 jours)
-SHORT_CODE_LENGTH = 8
 
 
 class TrackingService:
@@ -30,13 +31,9 @@ class TrackingService:
     # 1. GÉNÉRATION DE LIENS TRACKÉS
     # ============================================
 
-    def generate_short_code(self, link_id: str) -> str:
-        """Génère un code court unique pour un lien"""
-        # Utiliser hash + timestamp pour unicité
-        raw = f"{link_id}-{datetime.now().isoformat()}-{secrets.token_hex(4)}"
-        hash_obj = hashlib.sha256(raw.encode())
-        short_code = hash_obj.hexdigest()[:SHORT_CODE_LENGTH]
-        return short_code.upper()
+    def generate_short_code(self, link_id: Optional[str] = None) -> str:
+        """Génère un code court unique (séquence encodée, sans collision)"""
+        return short_code_allocator.allocate()
 
     async def create_tracking_link(
         self,
@@ -63,8 +60,12 @@ class TrackingService:
             }
         """
         try:
-            # 1. Créer l'entrée tracking_link
+            # 1. Allouer le code court (unique par construction)
+            short_code = self.generate_short_code()
+
+            # 2. Créer l'entrée tracking_link en un seul INSERT
             link_data = {
+                "short_code": short_code,
                 "influencer_id": influencer_id,
                 "product_id": product_id,
                 "campaign_id": campaign_id,
@@ -79,15 +80,7 @@ class TrackingService:
             result = supabase.table("tracking_links").insert(link_data).execute()
             link_id = result.data[0]["id"]
 
-            # 2. Générer un code court unique
-            short_code = self.generate_short_code(link_id)
-
-            # 3. Mettre à jour avec le short_code
-            supabase.table("tracking_links").update({"short_code": short_code}).eq(
-                "id", link_id
-            ).execute()
-
-            # 4. Construire l'URL de tracking
+            # 3. Construire l'URL de tracking
             tracking_url = f"http://localhost:8000/r/{short_code}"
             # En production: https://tracknow.io/r/{short_code}
 
@@ -145,6 +138,9 @@ class TrackingService:
             user_agent = request.headers.get("user-agent", "unknown")
             referer = request.headers.get("referer", "")
 
+            # Analyse anti-fraude (en mémoire): le clic est signalé, pas bloqué
+            verdict = click_screening_service.screen_request(link, request)
+
             # 3. Enregistrer le clic dans la table click_logs
             click_data = {
                 "link_id": link["id"],
@@ -152,6 +148,9 @@ class TrackingService:
                 "ip_address": client_ip,
                 "user_agent": user_agent,
                 "referer": referer,
+                "country": verdict.country,
+                "is_suspicious": verdict.suspicious,
+                "fraud_flags": list(verdict.flags),
                 "clicked_at": datetime.now().isoformat(),
             }
 
@@ -163,6 +162,8 @@ class TrackingService:
             supabase.table("tracking_links").update(
                 {"clicks": new_clicks, "last_click_at": datetime.now().isoformat()}
             ).eq("id", link["id"]).execute()
+            if not verdict.suspicious:
+                leaderboard_service.record_click(link["influencer_id"])
 
             # 5. Créer le cookie d'attribution (expire dans 30 jours)
             cookie_value = self._generate_attribution_cookie(
@@ -3,13 +3,18 @@ Service de Traduction Intelligent avec Cache en Base de Données
 - Traduit automatiquement avec OpenAI pour les nouveaux textes
 - Stocke les traductions en base de données
 - Cache les traductions existantes pour éviter les coûts
+- Bundle en mémoire par langue (versionné, ETag = hash du contenu)
+- Traduction par lots: plusieurs clés par requête OpenAI, langues en parallèle
 """
 
 import os
 import json
-from typing import Dict, Optional, List
+import time
+import asyncio
+import hashlib
+from typing import Dict, Optional, List, Set, Tuple
 from datetime import datetime
-from openai import OpenAI
+from services.llm_gateway import llm_gateway
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,6 +23,21 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # Modèle le moins cher
 
+# Bundle en mémoire: durée de vie max (filet de sécurité entre workers)
+TRANSLATION_BUNDLE_TTL = int(os.getenv("TRANSLATION_BUNDLE_TTL", "300"))
+
+# Suivi last_used: écrit par lots, au plus une fois par intervalle
+LAST_USED_FLUSH_INTERVAL = int(os.getenv("TRANSLATION_LAST_USED_FLUSH_INTERVAL", "60"))
+LAST_USED_FLUSH_SIZE = int(os.getenv("TRANSLATION_LAST_USED_FLUSH_SIZE", "200"))
+
+UPSERT_CHUNK_SIZE = 500
+
+# Traduction par lots: clés par requête OpenAI et requêtes simultanées max
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "40"))
+TRANSLATION_MAX_CONCURRENCY = int(os.getenv("TRANSLATION_MAX_CONCURRENCY", "4"))
+
+SOURCE_LANGUAGE = 'fr'
+
 # Langues supportées
 SUPPORTED_LANGUAGES = {
     'fr': 'Français',
@@ -26,6 +46,40 @@ SUPPORTED_LANGUAGES = {
     'darija': 'الدارجة المغربية (Moroccan Darija)'
 }
 
+# Consignes de style par langue cible
+LANGUAGE_INSTRUCTIONS = {
+    'darija': "Traduire en Darija marocaine (dialecte populaire du Maroc). "
+              "Utiliser l'alphabet arabe mais avec un style conversationnel marocain.",
+    'ar': "Traduire en arabe standard moderne (MSA). Utiliser un style formel et professionnel.",
+}
+
+class TranslationBundle:
+    """
+    Toutes les traductions d'une langue, prêtes à servir
+
+    Le corps JSON de /api/translations/{language} est sérialisé une seule fois
+    au chargement; l'ETag est le hash de ce corps.
+    """
+
+    __slots__ = ("language", "translations", "version", "etag", "body", "loaded_at")
+
+    def __init__(self, language: str, translations: Dict[str, str], version: int):
+        self.language = language
+        self.translations = translations
+        self.version = version
+        self.body = json.dumps({
+            "success": True,
+            "language": language,
+            "translations": translations,
+            "count": len(translations)
+        }, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.loaded_at = time.monotonic()
+
+    def is_expired(self) -> bool:
+        return time.monotonic() - self.loaded_at > TRANSLATION_BUNDLE_TTL
+
+
 class TranslationService:
     """Service de traduction intelligent avec cache DB et OpenAI"""
     
@@ -33,10 +87,24 @@ class TranslationService:
         self.supabase = supabase_client
         self.openai_client = None
         
+        # Bundles par langue + version incrémentée à chaque écriture
+        self._bundles: Dict[str, TranslationBundle] = {}
+        self._versions: Dict[str, int] = {}
+        self._bundle_locks: Dict[str, asyncio.Lock] = {}
+        
+        # Clés lues en attente de mise à jour de last_used
+        self._pending_last_used: Dict[str, Set[str]] = {}
+        self._last_used_flushed_at = time.monotonic()
+
+        # Traductions en cours: (langue, clé) -> future partagée par les appels concurrents
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._llm_semaphore = asyncio.Semaphore(TRANSLATION_MAX_CONCURRENCY)
+        
         # Initialiser OpenAI si la clé existe
         if OPENAI_API_KEY and OPENAI_API_KEY != "VOTRE_NOUVELLE_CLE_APRES_REVOCATION":
             try:
-                self.openai_client = OpenAI(api_key=OPENAI_API_KEY)
+                # Client SDK sur le pool de connexions partagé de la passerelle LLM
+                self.openai_client = llm_gateway.openai_client(OPENAI_API_KEY)
                 print("✅ OpenAI Translation Service initialized")
             except Exception as e:
                 print(f"⚠️ OpenAI initialization failed: {e}")
@@ -64,144 +132,216 @@ class TranslationService:
             Texte traduit ou None si non trouvé
         """
         
-        # 1. Vérifier dans le cache DB
+        # 1. Bundle en mémoire (aucune requête DB)
+        bundle = await self.get_bundle(language)
+        if bundle and key in bundle.translations:
+            self._touch(key, language)
+            return bundle.translations[key]
+        
+        # 1b. Clé absente du bundle: elle a pu être ajoutée par un autre worker
         if self.supabase:
             try:
                 result = self.supabase.table('translations') \
-                    .select('value, last_used') \
+                    .select('value') \
                     .eq('key', key) \
                     .eq('language', language) \
                     .execute()
                 
                 if result.data and len(result.data) > 0:
-                    translation = result.data[0]['value']
-                    
-                    # Mettre à jour last_used
-                    self.supabase.table('translations') \
-                        .update({'last_used': datetime.now().isoformat()}) \
-                        .eq('key', key) \
-                        .eq('language', language) \
-                        .execute()
-                    
-                    return translation
+                    self.invalidate_bundle(language)
+                    self._touch(key, language)
+                    return result.data[0]['value']
             except Exception as e:
                 print(f"⚠️ DB cache lookup failed: {e}")
         
         # 2. Si pas trouvé et auto_translate activé, traduire avec OpenAI
         if auto_translate and self.openai_client:
             try:
-                # Récupérer la version française (langue source)
-                source_text = await self._get_source_text(key)
-                
-                if source_text:
-                    translated = await self._translate_with_openai(
-                        source_text, 
-                        language, 
-                        context
-                    )
-                    
-                    # Stocker en DB
-                    if translated and self.supabase:
-                        await self._save_translation(key, language, translated, context)
-                    
-                    return translated
+                translated = await self.translate_missing([key], language, context)
+                return translated.get(key)
             except Exception as e:
                 print(f"⚠️ Auto-translation failed for {key}: {e}")
-        
+
         return None
-    
-    async def _get_source_text(self, key: str) -> Optional[str]:
-        """Récupère le texte source (français) pour une clé"""
-        
+
+    async def _get_source_texts(self, keys: List[str]) -> Dict[str, str]:
+        """Récupère les textes source (français) pour plusieurs clés"""
+
         if not self.supabase:
-            return None
-        
-        try:
-            result = self.supabase.table('translations') \
-                .select('value') \
-                .eq('key', key) \
-                .eq('language', 'fr') \
-                .execute()
-            
-            if result.data and len(result.data) > 0:
-                return result.data[0]['value']
-        except Exception as e:
-            print(f"⚠️ Source text lookup failed: {e}")
-        
-        return None
-    
-    async def _translate_with_openai(
-        self, 
-        text: str, 
+            return {}
+
+        sources = {}
+        bundle = await self.get_bundle(SOURCE_LANGUAGE)
+        if bundle:
+            sources = {k: bundle.translations[k] for k in keys if k in bundle.translations}
+
+        missing = [k for k in keys if k not in sources]
+        if missing:
+            try:
+                result = self.supabase.table('translations') \
+                    .select('key, value') \
+                    .eq('language', SOURCE_LANGUAGE) \
+                    .in_('key', missing) \
+                    .execute()
+
+                for row in result.data:
+                    sources[row['key']] = row['value']
+            except Exception as e:
+                print(f"⚠️ Source text lookup failed: {e}")
+
+        return sources
+
+    async def _translate_batch_with_openai(
+        self,
+        texts: Dict[str, str],
         target_language: str,
         context: Optional[str] = None
-    ) -> Optional[str]:
-        """Traduit un texte avec OpenAI"""
-        
-        if not self.openai_client:
-            return None
-        
-        language_name = SUPPORTED_LANGUAGES.get(target_language, target_language)
-        
-        # Construire le prompt selon la langue cible
-        if target_language == 'darija':
-            prompt = f"""Traduire ce texte en Darija marocaine (dialecte populaire du Maroc).
-Utiliser l'alphabet arabe mais avec un style conversationnel marocain.
+    ) -> Dict[str, str]:
+        """
+        Traduit plusieurs textes en une seule requête OpenAI
 
-Texte à traduire: "{text}"
-{f'Contexte: {context}' if context else ''}
+        Args:
+            texts: {key: texte source}
 
-Traduction en Darija:"""
-        
-        elif target_language == 'ar':
-            prompt = f"""Traduire ce texte en arabe standard moderne (MSA).
-Utiliser un style formel et professionnel.
+        Returns:
+            {key: traduction} (les clés absentes de la réponse sont ignorées)
+        """
 
-Texte à traduire: "{text}"
+        if not self.openai_client or not texts:
+            return {}
+
+        language_name = SUPPORTED_LANGUAGES.get(target_language, target_language)
+        instructions = LANGUAGE_INSTRUCTIONS.get(
+            target_language,
+            f"Translate to {language_name}. Use professional and appropriate tone for a business application."
+        )
+
+        prompt = f"""{instructions}
 {f'Contexte: {context}' if context else ''}
 
-Traduction en arabe:"""
-        
-        else:
-            prompt = f"""Translate this text to {language_name}.
-Use professional and appropriate tone for a business application.
+Textes à traduire (JSON, clé -> texte):
+{json.dumps(texts, ensure_ascii=False)}
 
-Text to translate: "{text}"
-{f'Context: {context}' if context else ''}
+Réponds UNIQUEMENT en JSON: {{"translations": {{"<clé>": "<traduction>"}}}}
+Conserver exactement les mêmes clés."""
 
-Translation in {language_name}:"""
-        
         try:
-            response = self.openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional translator specializing in business and e-commerce terminology. Provide accurate, natural translations."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3,  # Basse température pour plus de précision
-                max_tokens=150
-            )
-            
-            translated_text = response.choices[0].message.content.strip()
-            
+            async with self._llm_semaphore:
+                response = await self.openai_client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a professional translator specializing in business and e-commerce terminology. Provide accurate, natural translations."
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    temperature=0.3,  # Basse température pour plus de précision
+                    max_tokens=min(4000, 100 + 80 * len(texts)),
+                    response_format={"type": "json_object"}
+                )
+
+            payload = json.loads(response.choices[0].message.content)
+            translations = payload.get("translations", {})
+
+            result = {
+                key: value.strip()
+                for key, value in translations.items()
+                if key in texts and isinstance(value, str) and value.strip()
+            }
+
             # Log du coût approximatif
             input_tokens = response.usage.prompt_tokens
             output_tokens = response.usage.completion_tokens
             cost = (input_tokens * 0.00015 + output_tokens * 0.0006) / 1000  # Prix gpt-4o-mini
-            print(f"✅ Translated '{text}' → {target_language} (Cost: ${cost:.6f})")
-            
-            return translated_text
-        
+            print(f"✅ Translated {len(result)}/{len(texts)} keys → {target_language} (Cost: ${cost:.6f})")
+
+            return result
+
         except Exception as e:
             print(f"❌ OpenAI translation error: {e}")
-            return None
-    
+            return {}
+
+    async def translate_missing(
+        self,
+        keys: List[str],
+        language: str,
+        context: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Traduit des clés depuis le français et les sauvegarde en masse
+
+        Les clés déjà en cours de traduction (même langue) par un autre appel
+        ne sont pas renvoyées à OpenAI: on attend le résultat existant.
+        """
+
+        loop = asyncio.get_running_loop()
+        owned: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+
+        for key in dict.fromkeys(keys):
+            future = self._inflight.get((language, key))
+            if future is not None:
+                waiting[key] = future
+            else:
+                self._inflight[(language, key)] = loop.create_future()
+                owned.append(key)
+
+        results: Dict[str, str] = {}
+        try:
+            if owned:
+                results.update(await self._translate_and_save(owned, language, context))
+        finally:
+            for key in owned:
+                future = self._inflight.pop((language, key))
+                if not future.done():
+                    future.set_result(results.get(key))
+
+        for key, future in waiting.items():
+            value = await asyncio.shield(future)
+            if value:
+                results[key] = value
+
+        return results
+
+    async def _translate_and_save(
+        self,
+        keys: List[str],
+        language: str,
+        context: Optional[str] = None
+    ) -> Dict[str, str]:
+        """Découpe en lots, traduit les lots en parallèle puis upsert groupé"""
+
+        if language == SOURCE_LANGUAGE:
+            return {}
+
+        sources = await self._get_source_texts(keys)
+        items = [(k, sources[k]) for k in keys if k in sources]
+        if not items:
+            return {}
+
+        chunks = [
+            dict(items[i:i + TRANSLATION_BATCH_SIZE])
+            for i in range(0, len(items), TRANSLATION_BATCH_SIZE)
+        ]
+
+        batches = await asyncio.gather(*[
+            self._translate_batch_with_openai(chunk, language, context)
+            for chunk in chunks
+        ])
+
+        translations = {}
+        for batch in batches:
+            translations.update(batch)
+
+        if translations and self.supabase:
+            await self._save_translations(language, translations, context)
+
+        return translations
+
     async def _save_translation(
         self, 
         key: str, 
@@ -230,6 +370,7 @@ Translation in {language_name}:"""
                 data,
                 on_conflict='key,language'
             ).execute()
+            self.invalidate_bundle(language)
             
             print(f"💾 Saved translation: {key} [{language}] = {value}")
             return True
@@ -238,6 +379,53 @@ Translation in {language_name}:"""
             print(f"❌ Save translation error: {e}")
             return False
     
+    async def _save_translations(
+        self,
+        language: str,
+        translations: Dict[str, str],
+        context: Optional[str] = None,
+        source: str = 'openai'
+    ) -> int:
+        """Upsert groupé (lots de 500) puis une seule invalidation du bundle"""
+
+        if not self.supabase:
+            return 0
+
+        now = datetime.now().isoformat()
+        rows = [
+            {
+                'key': key,
+                'language': language,
+                'value': value,
+                'context': context,
+                'created_at': now,
+                'last_used': now,
+                'source': source
+            }
+            for key, value in translations.items()
+        ]
+
+        saved = 0
+
+        try:
+            for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+                chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+                self.supabase.table('translations').upsert(
+                    chunk,
+                    on_conflict='key,language'
+                ).execute()
+                saved += len(chunk)
+
+        except Exception as e:
+            print(f"❌ Save translations error: {e}")
+
+        finally:
+            if saved:
+                self.invalidate_bundle(language)
+
+        print(f"💾 Saved {saved} translations [{language}]")
+        return saved
+
     async def batch_translate(
         self, 
         keys: List[str], 
@@ -256,46 +444,45 @@ Translation in {language_name}:"""
             Dictionnaire {key: traduction}
         """
         
-        translations = {}
-        missing_keys = []
-        
-        # 1. Récupérer les traductions existantes en une seule requête
-        if self.supabase:
-            try:
-                result = self.supabase.table('translations') \
-                    .select('key, value') \
-                    .eq('language', target_language) \
-                    .in_('key', keys) \
-                    .execute()
-                
-                for row in result.data:
-                    translations[row['key']] = row['value']
-                
-                # Identifier les clés manquantes
-                missing_keys = [k for k in keys if k not in translations]
-            except Exception as e:
-                print(f"⚠️ Batch lookup failed: {e}")
-                missing_keys = keys
-        else:
-            missing_keys = keys
-        
-        # 2. Traduire les clés manquantes
+        # 1. Traductions existantes depuis le bundle en mémoire
+        bundle = await self.get_bundle(target_language)
+        known = bundle.translations if bundle else {}
+
+        translations = {k: known[k] for k in keys if k in known}
+        missing_keys = [k for k in keys if k not in translations]
+
+        for key in translations:
+            self._touch(key, target_language)
+
+        # 2. Traduire les clés manquantes (une requête OpenAI par lot de clés)
         if missing_keys and self.openai_client:
             print(f"🔄 Translating {len(missing_keys)} missing keys...")
-            
-            for key in missing_keys:
-                translated = await self.get_translation(
-                    key, 
-                    target_language, 
-                    context, 
-                    auto_translate=True
-                )
-                
-                if translated:
-                    translations[key] = translated
-        
+            translations.update(
+                await self.translate_missing(missing_keys, target_language, context)
+            )
+
         return translations
-    
+
+    async def translate_languages(
+        self,
+        keys: List[str],
+        languages: List[str],
+        context: Optional[str] = None
+    ) -> Dict[str, Dict[str, str]]:
+        """
+        Traduit des clés dans plusieurs langues en parallèle
+        Utilisé pour ajouter une langue ou les clés d'un nouvel écran
+
+        Returns:
+            {language: {key: traduction}}
+        """
+
+        results = await asyncio.gather(*[
+            self.batch_translate(keys, language, context)
+            for language in languages
+        ])
+        return dict(zip(languages, results))
+
     async def get_all_translations(
         self, 
         language: str
@@ -308,23 +495,8 @@ Translation in {language_name}:"""
             Dictionnaire {key: value} de toutes les traductions
         """
         
-        if not self.supabase:
-            return {}
-        
-        try:
-            result = self.supabase.table('translations') \
-                .select('key, value') \
-                .eq('language', language) \
-                .execute()
-            
-            translations = {row['key']: row['value'] for row in result.data}
-            
-            print(f"📦 Loaded {len(translations)} translations for {language}")
-            return translations
-        
-        except Exception as e:
-            print(f"❌ Load all translations error: {e}")
-            return {}
+        bundle = await self.get_bundle(language)
+        return dict(bundle.translations) if bundle else {}
     
     async def import_static_translations(
         self, 
@@ -346,20 +518,123 @@ Translation in {language_name}:"""
         if not self.supabase:
             return 0
         
-        imported = 0
+        imported = await self._save_translations(
+            language,
+            translations_dict,
+            context='static_import',
+            source='static_import'
+        )
+
+        print(f"✅ Imported {imported} translations for {language}")
+        return imported
+
+    # ============================================
+    # BUNDLES EN MÉMOIRE
+    # ============================================
+    
+    async def get_bundle(self, language: str) -> Optional[TranslationBundle]:
+        """
+        Bundle de toutes les traductions d'une langue
         
-        try:
-            for key, value in translations_dict.items():
-                await self._save_translation(key, language, value, context='static_import')
-                imported += 1
+        Chargé une seule fois (une requête DB), puis servi depuis la mémoire
+        jusqu'à la prochaine écriture ou l'expiration du TTL. Seules les
+        langues de SUPPORTED_LANGUAGES ont un bundle (caches bornés).
+        """
+        
+        if language not in SUPPORTED_LANGUAGES:
+            return None
+        
+        bundle = self._bundles.get(language)
+        if bundle and bundle.version == self._versions.get(language, 0) and not bundle.is_expired():
+            return bundle
+        
+        if not self.supabase:
+            return None
+        
+        lock = self._bundle_locks.setdefault(language, asyncio.Lock())
+        async with lock:
+            # Un autre appel a pu charger le bundle pendant l'attente
+            bundle = self._bundles.get(language)
+            version = self._versions.get(language, 0)
+            if bundle and bundle.version == version and not bundle.is_expired():
+                return bundle
             
-            print(f"✅ Imported {imported} translations for {language}")
-            return imported
+            try:
+                result = self.supabase.table('translations') \
+                    .select('key, value') \
+                    .eq('language', language) \
+                    .execute()
+            except Exception as e:
+                print(f"❌ Load all translations error: {e}")
+                return None
+            
+            translations = {row['key']: row['value'] for row in result.data}
+            bundle = TranslationBundle(language, translations, version)
+            
+            # Ne pas publier un bundle invalidé pendant le chargement
+            if version == self._versions.get(language, 0):
+                self._bundles[language] = bundle
+            
+            print(f"📦 Loaded {len(translations)} translations for {language}")
+            return bundle
+    
+    def invalidate_bundle(self, language: str):
+        """Invalider le bundle d'une langue (nouvelle version)"""
+        if language not in SUPPORTED_LANGUAGES:
+            return
+        self._versions[language] = self._versions.get(language, 0) + 1
+        self._bundles.pop(language, None)
+    
+    # ============================================
+    # SUIVI last_used (par lots)
+    # ============================================
+    
+    def _touch(self, key: str, language: str):
+        """Noter l'utilisation d'une clé; la DB est mise à jour par lots"""
+        self._pending_last_used.setdefault(language, set()).add(key)
+        
+        pending = sum(len(keys) for keys in self._pending_last_used.values())
+        elapsed = time.monotonic() - self._last_used_flushed_at
+        if pending >= LAST_USED_FLUSH_SIZE or elapsed >= LAST_USED_FLUSH_INTERVAL:
+            self._schedule_last_used_flush()
+    
+    def _schedule_last_used_flush(self):
+        pending, self._pending_last_used = self._pending_last_used, {}
+        self._last_used_flushed_at = time.monotonic()
         
-        except Exception as e:
-            print(f"❌ Import error: {e}")
-            return imported
-
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_last_used(pending)
+            return
+        
+        # Client Supabase synchrone: hors de la boucle pour ne pas bloquer la requête
+        loop.run_in_executor(None, self.flush_last_used, pending)
+    
+    def flush_last_used(self, pending: Dict[str, Set[str]]) -> int:
+        """Mettre à jour last_used: une requête par langue et par lot de clés"""
+        
+        if not self.supabase:
+            return 0
+        
+        now = datetime.now().isoformat()
+        updated = 0
+        
+        for language, keys in pending.items():
+            keys = sorted(keys)
+            for i in range(0, len(keys), UPSERT_CHUNK_SIZE):
+                chunk = keys[i:i + UPSERT_CHUNK_SIZE]
+                try:
+                    self.supabase.table('translations') \
+                        .update({'last_used': now}) \
+                        .eq('language', language) \
+                        .in_('key', chunk) \
+                        .execute()
+                    updated += len(chunk)
+                except Exception as e:
+                    print(f"⚠️ last_used update failed: {e}")
+        
+        return updated
 
 # Instance globale
 translation_service = None
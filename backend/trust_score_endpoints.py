@@ -5,11 +5,13 @@ Endpoints pour le système de Trust Score anti-fraude
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Optional
+from datetime import datetime, timedelta
 
 from trust_score_service import TrustScoreService, TrustReport
 from auth import get_current_user
 # from db_helpers import log_user_activity  # TODO: Implémenter log_user_activity dans db_helpers
 from supabase_client import supabase
+from services.click_screening_service import click_screening_service
 
 router = APIRouter(prefix="/api/trust-score", tags=["Trust Score"])
 
@@ -270,18 +272,30 @@ async def get_user_campaign_history(user_id: str) -> List[dict]:
 
 
 async def get_user_traffic_data(user_id: str) -> dict:
-    """Récupère les données de trafic pour analyse de fraude"""
+    """
+    Récupère les données de trafic pour analyse de fraude
+
+    Signaux calculés à la redirection (mois courant + précédent). Taux de
+    rebond et durée de session ne sont pas observables à la redirection:
+    absents, ils ne sont pas pris en compte dans le score.
+    """
     try:
-        # TODO: Implémenter avec vraies données
-        return {
-            "total_clicks": 5000,
-            "total_conversions": 125,
-            "bounce_rate": 65.0,
-            "avg_session_duration": 45,
-            "suspicious_ip_percentage": 5.0,
-            "click_pattern_score": 85.0,
-            "geo_consistency": 92.0
-        }
+        influencer = supabase.table("influencers").select("id").eq(
+            "user_id", user_id
+        ).limit(1).execute()
+        if not influencer.data:
+            return {}
+
+        influencer_id = influencer.data[0]["id"]
+        traffic_data = click_screening_service.traffic_signals(influencer_id)
+
+        window_start = (datetime.now().replace(day=1) - timedelta(days=1)).replace(day=1)
+        sales = supabase.table("sales").select("id", count="exact").eq(
+            "influencer_id", influencer_id
+        ).gte("created_at", window_start.date().isoformat()).limit(1).execute()
+        traffic_data["total_conversions"] = sales.count or 0
+
+        return traffic_data
     except:
         return {}
 
@@ -246,23 +246,29 @@ class TrustScoreService:
         - IPs suspectes (VPN, data centers)
         - Patterns de clics (tous en même temps)
         - Géolocalisation incohérente
+        - User-agents de bots
+
+        Les signaux absents (ex: session, non observable à la redirection)
+        ne pénalisent pas le score.
         """
 
         score = 100.0  # On commence à 100 et on déduit
 
         # 1. Taux de rebond
-        bounce_rate = traffic_data.get("bounce_rate", 0)
-        if bounce_rate > 90:
-            score -= 30
-        elif bounce_rate > 75:
-            score -= 15
+        bounce_rate = traffic_data.get("bounce_rate")
+        if bounce_rate is not None:
+            if bounce_rate > 90:
+                score -= 30
+            elif bounce_rate > 75:
+                score -= 15
 
         # 2. Durée de session
-        avg_session_duration = traffic_data.get("avg_session_duration", 0)
-        if avg_session_duration < 5:
-            score -= 25
-        elif avg_session_duration < 15:
-            score -= 10
+        avg_session_duration = traffic_data.get("avg_session_duration")
+        if avg_session_duration is not None:
+            if avg_session_duration < 5:
+                score -= 25
+            elif avg_session_duration < 15:
+                score -= 10
 
         # 3. IPs suspectes
         suspicious_ip_percentage = traffic_data.get("suspicious_ip_percentage", 0)
@@ -278,6 +284,9 @@ class TrustScoreService:
         if geo_consistency < 70:
             score -= 15
 
+        # 6. Bots (analyse des clics à la redirection)
+        score -= traffic_data.get("bot_percentage", 0) * 0.5
+
         return max(score, 0)
 
     def _calculate_completion_rate(self, campaign_history: List[Dict[str, Any]]) -> float:
@@ -443,7 +452,7 @@ class TrustScoreService:
                 ))
 
         # 4. Sessions trop courtes
-        if traffic_data.get("avg_session_duration", 0) < 3:
+        if traffic_data.get("avg_session_duration") is not None and traffic_data["avg_session_duration"] < 3:
             indicators.append(FraudIndicator(
                 indicator="short_sessions",
                 severity="medium",
@@ -451,6 +460,24 @@ class TrustScoreService:
                 detected_at=datetime.now()
             ))
 
+        # 5. Trafic de bots
+        if traffic_data.get("bot_percentage", 0) > 30:
+            indicators.append(FraudIndicator(
+                indicator="bot_traffic",
+                severity="high",
+                description=f"{traffic_data['bot_percentage']}% des clics proviennent de bots ou d'outils automatisés",
+                detected_at=datetime.now()
+            ))
+
+        # 6. Clics en rafale / répétés
+        if traffic_data.get("click_pattern_score", 100) < 50:
+            indicators.append(FraudIndicator(
+                indicator="click_bursts",
+                severity="medium",
+                description="Clics en rafale ou répétés depuis les mêmes IPs",
+                detected_at=datetime.now()
+            ))
+
         return indicators
 
     def _get_trust_level(self, score: float) -> TrustLevel:
@@ -3,9 +3,14 @@ Package utilitaires pour l'application backend
 """
 
 from .supabase_client import get_supabase_client, init_supabase, set_supabase_client
+from .rpc import is_missing_function
+from .sse import sse_event, sse_response
 
 __all__ = [
     'get_supabase_client',
     'init_supabase',
     'set_supabase_client',
+    'is_missing_function',
+    'sse_event',
+    'sse_response',
 ]
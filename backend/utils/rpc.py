@@ -0,0 +1,18 @@
+"""
+Utilitaire pour les appels RPC PostgREST
+
+Les services appellent des fonctions SQL livrées par migration. Tant qu'une
+migration n'est pas appliquée, l'appel échoue avec une erreur « fonction
+introuvable »: le service bascule alors sur son repli. Les autres erreurs
+(réseau, timeout, erreur SQL) ne désactivent pas la RPC.
+"""
+
+
+def is_missing_function(error_msg: str) -> bool:
+    """La fonction RPC n'est pas déployée (PostgREST PGRST202 / PostgreSQL 42883)"""
+    return (
+        "PGRST202" in error_msg
+        or "42883" in error_msg
+        or "Could not find the function" in error_msg
+        or ("function" in error_msg and "does not exist" in error_msg)
+    )
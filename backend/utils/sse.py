@@ -0,0 +1,34 @@
+"""
+Utilitaire pour les réponses Server-Sent Events (streaming des chats IA)
+
+Chaque événement est une ligne `event:` + une ligne `data:` JSON. Les headers
+désactivent la mise en tampon des proxies (nginx: X-Accel-Buffering) pour que
+chaque token parte dès qu'il est produit.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Formate un événement SSE"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> StreamingResponse:
+    """
+    Réponse text/event-stream à partir d'un itérateur de (événement, données)
+    """
+    async def body():
+        async for event, data in events:
+            yield sse_event(event, data)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
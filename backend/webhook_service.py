@@ -5,6 +5,7 @@ Supporte Shopify, WooCommerce, Stripe, etc.
 
 from fastapi import Request, HTTPException
 from supabase_client import supabase
+from services.notification_service import NotificationOutbox
 from datetime import datetime
 from typing import Dict, Optional
 import hmac
@@ -20,6 +21,7 @@ class WebhookService:
 
     def __init__(self):
         self.supabase = supabase
+        self.notification_outbox = NotificationOutbox(supabase)
 
     # ============================================
     # 1. SHOPIFY WEBHOOKS
@@ -633,28 +635,15 @@ class WebhookService:
     async def _notify_influencer_sale(self, influencer_id: str, amount: float, commission: float):
         """Envoie une notification à l'influenceur"""
         try:
-            # Récupérer le user_id de l'influenceur
-            influencer = (
-                supabase.table("influencers").select("user_id").eq("id", influencer_id).execute()
-            )
-
-            if not influencer.data:
-                return
-
-            user_id = influencer.data[0]["user_id"]
-
-            # Créer la notification
-            notification_data = {
-                "user_id": user_id,
+            self.notification_outbox.publish([{
+                "influencer_id": influencer_id,
                 "type": "sale",
                 "title": "🎉 Nouvelle vente !",
                 "message": f"Vous avez généré une vente de {amount}€. Commission: {commission}€ (validation dans 14 jours)",
                 "is_read": False,
                 "metadata": {"amount": amount, "commission": commission},
                 "created_at": datetime.now().isoformat(),
-            }
-
-            supabase.table("notifications").insert(notification_data).execute()
+            }])
 
             logger.info(f"📧 Notification envoyée à influenceur {influencer_id}")
 
@@ -23,6 +23,7 @@ class EventTypes:
     PAYMENT_STATUS_CHANGED = "payment_status_changed"
     SALE_CREATED = "sale_created"
     DASHBOARD_UPDATE = "dashboard_update"
+    NOTIFICATION_CREATED = "notification_created"
 
 
 async def websocket_handler(request):
@@ -167,6 +168,29 @@ async def listen_to_database_changes():
                         },
                     )
 
+            # Check for new notifications (written in bulk by NotificationOutbox)
+            response = (
+                supabase.table("notifications")
+                .select("id, user_id, type, title, message, action_url")
+                .gte("created_at", last_check.isoformat())
+                .execute()
+            )
+
+            for notification in response.data:
+                user_id = notification.get("user_id")
+                if user_id:
+                    await broadcast_to_user(
+                        str(user_id),
+                        EventTypes.NOTIFICATION_CREATED,
+                        {
+                            "notification_id": notification["id"],
+                            "type": notification.get("type"),
+                            "title": notification.get("title"),
+                            "message": notification.get("message"),
+                            "action_url": notification.get("action_url"),
+                        },
+                    )
+
             last_check = datetime.now()
 
         except Exception as e:
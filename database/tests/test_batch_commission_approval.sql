@@ -0,0 +1,87 @@
+-- ============================================================================
+-- Script de validation pour approve_payout_batch (backend/migrations/012)
+-- Usage : \i database/tests/test_batch_commission_approval.sql
+-- Vérifie que le contrôle de solde d'un lot donne le même résultat qu'une
+-- suite d'appels approve_payout_transaction : solde 100, commissions
+-- [150, 50] dans cet ordre -> 150 refusée, 50 approuvée, solde final 50.
+-- Une exception est levée si le résultat diffère.
+-- Toutes les opérations sont annulées en fin de test (ROLLBACK).
+-- ============================================================================
+
+BEGIN;
+
+CREATE TEMP TABLE test_vars (
+    influencer_user_id UUID,
+    influencer_id UUID,
+    large_commission_id UUID,
+    small_commission_id UUID
+);
+
+INSERT INTO test_vars VALUES (
+    gen_random_uuid(),
+    gen_random_uuid(),
+    gen_random_uuid(),
+    gen_random_uuid()
+);
+
+INSERT INTO users (id, email, password_hash, role, is_active)
+SELECT
+    influencer_user_id,
+    CONCAT('influencer+', influencer_user_id::text, '@example.com'),
+    'hashed',
+    'influencer',
+    TRUE
+FROM test_vars;
+
+INSERT INTO influencers (id, user_id, username, balance)
+SELECT influencer_id, influencer_user_id, CONCAT('influencer_', influencer_id::text), 100
+FROM test_vars;
+
+INSERT INTO commissions (id, influencer_id, amount, status)
+SELECT large_commission_id, influencer_id, 150, 'pending' FROM test_vars
+UNION ALL
+SELECT small_commission_id, influencer_id, 50, 'pending' FROM test_vars;
+
+CREATE TEMP TABLE test_results AS
+SELECT r.*
+FROM test_vars v,
+     approve_payout_batch(ARRAY[v.large_commission_id, v.small_commission_id], 'approved') r;
+
+SELECT * FROM test_results;
+
+DO $$
+DECLARE
+    v test_vars%ROWTYPE;
+    v_large test_results%ROWTYPE;
+    v_small test_results%ROWTYPE;
+    v_balance NUMERIC;
+BEGIN
+    SELECT * INTO v FROM test_vars;
+    SELECT * INTO v_large FROM test_results WHERE commission_id = v.large_commission_id;
+    SELECT * INTO v_small FROM test_results WHERE commission_id = v.small_commission_id;
+    SELECT balance INTO v_balance FROM influencers WHERE id = v.influencer_id;
+
+    IF v_large.success OR v_large.error <> 'Solde insuffisant pour approuver la commission' THEN
+        RAISE EXCEPTION 'Commission de 150 : refus attendu, obtenu %', v_large;
+    END IF;
+    IF NOT v_small.success THEN
+        RAISE EXCEPTION 'Commission de 50 : approbation attendue, obtenu %', v_small;
+    END IF;
+    IF v_balance <> 50 THEN
+        RAISE EXCEPTION 'Solde attendu 50, obtenu %', v_balance;
+    END IF;
+    IF (SELECT status FROM commissions WHERE id = v.small_commission_id) <> 'approved'
+       OR (SELECT status FROM commissions WHERE id = v.large_commission_id) <> 'pending' THEN
+        RAISE EXCEPTION 'Statuts des commissions inattendus';
+    END IF;
+
+    RAISE NOTICE 'approve_payout_batch : solde 100, [150, 50] -> OK';
+END;
+$$;
+
+DROP TABLE test_results;
+DROP TABLE test_vars;
+
+ROLLBACK;
+
+-- Fin du script =============================================================